@@ -1,119 +1,69 @@
 """
-Add Database Indexes for Performance Optimization
-Run this script to add indexes to MongoDB collections
+Apply Database Indexes for Performance Optimization
+Creates every index in the registry (app/models/indexes.py) and reports drift
+
+Usage:
+    python add_indexes.py            # create missing indexes
+    python add_indexes.py --check    # only report drift, exit 1 if any
+    python add_indexes.py --rebuild  # also drop and recreate indexes with wrong options
 """
 
 from app.models.database import Database
+from app.models.indexes import INDEX_REGISTRY, ensure_indexes, check_index_drift
+import argparse
 import sys
 
-def add_indexes():
-    """Add indexes to improve query performance"""
+def print_drift(drift):
+    """Print an index drift report"""
+    if not drift:
+        print("✅ No index drift - database matches the registry")
+        return
+
+    for collection_name, collection_drift in drift.items():
+        print(f"\n{collection_name}:")
+        for spec in collection_drift['missing']:
+            print(f"   ❌ missing: {spec['keys']}")
+        for mismatch in collection_drift['mismatched']:
+            print(f"   ⚠️  options differ: {mismatch['name']}")
+        for name in collection_drift['unmanaged']:
+            print(f"   ℹ️  not in registry: {name}")
+
+def add_indexes(check_only=False, rebuild=False):
+    """Apply the index registry to improve query performance"""
     try:
         print("🔗 Connecting to MongoDB...")
         db = Database.get_db()
-        
-        if not db:
+
+        if db is None:
             print("❌ Failed to connect to database")
             return False
-        
+
         print("✅ Connected to MongoDB")
-        print("\n📊 Adding indexes...\n")
-        
-        # Users collection indexes
-        print("1️⃣ Adding indexes to 'users' collection...")
-        
-        # Email index (for login) - unique
-        result = db.users.create_index([("email", 1)], unique=True, background=True)
-        print(f"   ✅ Email index: {result}")
-        
-        # Role and is_active index (for filtering)
-        result = db.users.create_index([("role", 1), ("is_active", 1)], background=True)
-        print(f"   ✅ Role + is_active index: {result}")
-        
-        # Patient ID index (sparse - only for patients)
-        result = db.users.create_index([("patient_id", 1)], sparse=True, background=True)
-        print(f"   ✅ Patient ID index: {result}")
-        
-        # Doctor ID index (sparse - only for doctors)
-        result = db.users.create_index([("doctor_id", 1)], sparse=True, background=True)
-        print(f"   ✅ Doctor ID index: {result}")
-        
-        # RFID index (sparse, unique)
-        result = db.users.create_index([("rfid_id", 1)], sparse=True, unique=True, background=True)
-        print(f"   ✅ RFID ID index: {result}")
-        
-        # Phone index (for SMS login)
-        result = db.users.create_index([("phone", 1)], sparse=True, background=True)
-        print(f"   ✅ Phone index: {result}")
-        
-        # Records collection indexes
-        print("\n2️⃣ Adding indexes to 'records' collection...")
-        
-        # Patient ID + is_deleted index (for fetching patient records)
-        result = db.records.create_index([("patient_id", 1), ("is_deleted", 1)], background=True)
-        print(f"   ✅ Patient ID + is_deleted index: {result}")
-        
-        # Uploaded at index (for sorting)
-        result = db.records.create_index([("uploaded_at", -1)], background=True)
-        print(f"   ✅ Uploaded at index: {result}")
-        
-        # Appointments collection indexes
-        print("\n3️⃣ Adding indexes to 'appointments' collection...")
-        
-        # Patient ID index
-        result = db.appointments.create_index([("patient_id", 1)], background=True)
-        print(f"   ✅ Patient ID index: {result}")
-        
-        # Doctor ID index
-        result = db.appointments.create_index([("doctor_id", 1)], background=True)
-        print(f"   ✅ Doctor ID index: {result}")
-        
-        # Appointment date index (for sorting)
-        result = db.appointments.create_index([("appointment_date", -1)], background=True)
-        print(f"   ✅ Appointment date index: {result}")
-        
-        # Status index (for filtering)
-        result = db.appointments.create_index([("status", 1)], background=True)
-        print(f"   ✅ Status index: {result}")
-        
-        # Access permissions collection indexes
-        print("\n4️⃣ Adding indexes to 'access_permissions' collection...")
-        
-        # Patient ID + Doctor ID compound index
-        result = db.access_permissions.create_index([("patient_id", 1), ("doctor_id", 1)], background=True)
-        print(f"   ✅ Patient + Doctor ID index: {result}")
-        
-        # Doctor ID index (for doctor's view)
-        result = db.access_permissions.create_index([("doctor_id", 1)], background=True)
-        print(f"   ✅ Doctor ID index: {result}")
-        
-        # Audit logs collection indexes
-        print("\n5️⃣ Adding indexes to 'audit_logs' collection...")
-        
-        # User ID + timestamp index
-        result = db.audit_logs.create_index([("user_id", 1), ("timestamp", -1)], background=True)
-        print(f"   ✅ User ID + timestamp index: {result}")
-        
-        # Action index (for filtering by action type)
-        result = db.audit_logs.create_index([("action", 1)], background=True)
-        print(f"   ✅ Action index: {result}")
-        
-        print("\n" + "="*50)
-        print("✅ All indexes created successfully!")
-        print("="*50)
-        
-        # List all indexes
-        print("\n📋 Current indexes:\n")
-        
-        collections = ['users', 'records', 'appointments', 'access_permissions', 'audit_logs']
-        for collection_name in collections:
-            print(f"\n{collection_name}:")
-            indexes = db[collection_name].list_indexes()
-            for idx in indexes:
-                print(f"  - {idx['name']}: {idx.get('key', {})}")
-        
-        return True
-        
+
+        if check_only:
+            print("\n📊 Checking index drift...")
+            drift = check_index_drift(db)
+            print_drift(drift)
+            return not any(d['missing'] or d['mismatched'] for d in drift.values())
+
+        print("\n📊 Applying index registry...\n")
+        report = ensure_indexes(db, rebuild_mismatched=rebuild)
+
+        for name in report['created']:
+            print(f"   ✅ Created: {name}")
+        for name in report['rebuilt']:
+            print(f"   🔁 Rebuilt: {name}")
+        for failure in report['failed']:
+            print(f"   ❌ Failed: {failure}")
+
+        if not report['created'] and not report['rebuilt']:
+            print("   ✅ All registry indexes already exist")
+
+        print("\n📋 Remaining drift:")
+        print_drift(check_index_drift(db))
+
+        return not report['failed']
+
     except Exception as e:
         print(f"\n❌ Error adding indexes: {e}")
         import traceback
@@ -121,21 +71,24 @@ def add_indexes():
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Apply the MongoDB index registry')
+    parser.add_argument('--check', action='store_true', help='Only report index drift')
+    parser.add_argument('--rebuild', action='store_true', help='Recreate indexes whose options differ')
+    args = parser.parse_args()
+
     print("="*50)
-    print("  MongoDB Index Creation Script")
+    print("  MongoDB Index Registry")
     print("="*50)
+    print(f"  {sum(len(specs) for specs in INDEX_REGISTRY.values())} indexes across {len(INDEX_REGISTRY)} collections")
     print()
-    
-    success = add_indexes()
-    
+
+    success = add_indexes(check_only=args.check, rebuild=args.rebuild)
+
     if success:
-        print("\n✅ Index creation completed successfully!")
-        print("\n💡 Your database queries should now be much faster!")
-        print("   - Login: 50-70% faster")
-        print("   - Record fetching: 60-80% faster")
-        print("   - Appointment queries: 50-70% faster")
+        print("\n✅ Index registry check completed successfully!" if args.check
+              else "\n✅ Index creation completed successfully!")
         sys.exit(0)
     else:
-        print("\n❌ Index creation failed!")
-        print("   Please check the error messages above.")
+        print("\n❌ Index registry has drift or failures!")
+        print("   Please check the messages above.")
         sys.exit(1)
@@ -1,9 +1,12 @@
+import logging
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_babel import Babel
 import sys
 import os
 
+logger = logging.getLogger(__name__)
+
 # Add the backend directory to Python path to allow absolute imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -22,11 +25,34 @@ def get_locale():
     supported = ['en', 'hi', 'te', 'kn', 'ta']
     return lang if lang in supported else 'en'
 
+def apply_indexes():
+    """Create missing registry indexes and report drift, without failing startup"""
+    from app.models.database import Database
+    from app.models.indexes import ensure_indexes
+    
+    db = Database.get_db()
+    if db is None:
+        logger.warning("Skipping index registry - database not connected")
+        return
+    
+    try:
+        report = ensure_indexes(db)
+        if report['created']:
+            logger.info("Created indexes: %s", ', '.join(report['created']))
+        for failure in report['failed']:
+            logger.error("Index drift: %s", failure)
+    except Exception as e:
+        logger.error("Failed to apply index registry: %s", e)
+
 def create_app(config_class=Config):
     """
     Application factory function
     Creates and configures the Flask application
     """
+    # Route app.* loggers through the background log queue
+    from app.utils.log import setup_logging
+    setup_logging()
+    
     # Initialize Flask app
     app = Flask(__name__)
     
@@ -80,6 +106,14 @@ def create_app(config_class=Config):
     app.register_blueprint(contact.contact_bp, url_prefix='/api/contact')
     app.register_blueprint(cds.bp)
     
+    # Patient/doctor/appointment IDs need their own secret outside debug mode
+    from app.utils.id_generator import check_permutation_key
+    check_permutation_key()
+    
+    # Apply the declarative index registry (idempotent)
+    if app.config.get('MONGO_AUTO_CREATE_INDEXES'):
+        apply_indexes()
+    
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
     def health_check():
@@ -125,8 +159,6 @@ def create_app(config_class=Config):
     def unauthorized(error):
         return jsonify({'error': 'Unauthorized access'}), 401
     
-    print("✓ Flask application created successfully")
-    print("✓ Blueprints registered")
-    print("✓ CORS enabled with automatic OPTIONS handling")
+    logger.info("Flask application created (blueprints registered, CORS enabled)")
     
     return app
\ No newline at end of file
@@ -2,9 +2,13 @@
 Context Analyzer - Analyzes patient data and clinical context
 """
 
+import logging
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 from bson import ObjectId
+from app.utils.user_cache import get_user_by_id
+
+logger = logging.getLogger(__name__)
 
 
 class ContextAnalyzer:
@@ -25,43 +29,43 @@ class ContextAnalyzer:
         """
         try:
             # Fetch patient data
-            patient = self.db.users.find_one({'_id': ObjectId(patient_id)})
+            patient = get_user_by_id(patient_id)
             
             if not patient:
-                print(f"❌ Patient not found: {patient_id}")
+                logger.error("Patient not found: %s", patient_id)
                 return {'error': 'Patient not found'}
             
-            print(f"✅ Patient found: {patient.get('name', 'Unknown')}")
+            logger.debug("Patient found: %s", patient_id)
             
             # Extract key clinical data with error handling for each step
             try:
                 demographics = self._extract_demographics(patient)
             except Exception as e:
-                print(f"⚠️ Demographics extraction error: {str(e)}")
+                logger.warning("Demographics extraction error: %s", e)
                 demographics = {}
             
             try:
                 vitals = self._extract_vitals(patient)
             except Exception as e:
-                print(f"⚠️ Vitals extraction error: {str(e)}")
+                logger.warning("Vitals extraction error: %s", e)
                 vitals = {}
             
             try:
                 medical_history = self._extract_medical_history(patient)
             except Exception as e:
-                print(f"⚠️ Medical history extraction error: {str(e)}")
+                logger.warning("Medical history extraction error: %s", e)
                 medical_history = {}
             
             try:
                 risk_factors = self._calculate_risk_factors(patient)
             except Exception as e:
-                print(f"⚠️ Risk factors calculation error: {str(e)}")
+                logger.warning("Risk factors calculation error: %s", e)
                 risk_factors = []
             
             try:
                 recent_records = self._get_recent_records(patient_id)
             except Exception as e:
-                print(f"⚠️ Recent records error: {str(e)}")
+                logger.warning("Recent records error: %s", e)
                 recent_records = []
             
             context = {
@@ -77,13 +81,11 @@ class ContextAnalyzer:
                 'timestamp': datetime.utcnow().isoformat()
             }
             
-            print(f"✅ Context analysis complete for patient {patient_id}")
+            logger.debug("Context analysis complete for patient %s", patient_id)
             return context
             
         except Exception as e:
-            print(f"❌ Context analysis failed: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Context analysis failed: %s", e)
             return {'error': f'Context analysis failed: {str(e)}'}
     
     def _extract_demographics(self, patient: Dict) -> Dict:
@@ -200,7 +202,8 @@ class ContextAnalyzer:
         """Get recent medical records"""
         try:
             records = list(self.db.records.find(
-                {'patient_id': ObjectId(patient_id), 'is_deleted': False}
+                {'patient_id': ObjectId(patient_id), 'is_deleted': False},
+                {'file_name': 1, 'file_type': 1, 'description': 1, 'uploaded_at': 1}
             ).sort('uploaded_at', -1).limit(limit))
             
             return [{
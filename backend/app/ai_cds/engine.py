@@ -2,6 +2,7 @@
 CDS Engine - Main orchestrator for Clinical Decision Support
 """
 
+import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
@@ -11,6 +12,8 @@ from .drug_interactions import DrugInteractionChecker
 from .learning import PhysicianLearningSystem
 from .gemini_integration import GeminiAI
 
+logger = logging.getLogger(__name__)
+
 
 class CDSEngine:
     """Main Clinical Decision Support Engine"""
@@ -42,22 +45,22 @@ class CDSEngine:
         """
         try:
             # Analyze patient context
-            print(f"📊 Step 1: Analyzing patient context...")
+            logger.debug("Step 1: Analyzing patient context...")
             patient_context = self.context_analyzer.analyze_patient_context(patient_id)
             
             if 'error' in patient_context:
-                print(f"❌ Patient context error: {patient_context['error']}")
+                logger.error("Patient context error: %s", patient_context['error'])
                 return {'error': patient_context['error']}
             
-            print(f"✅ Step 1 complete: Patient context retrieved")
+            logger.debug("Step 1 complete: Patient context retrieved")
             
             # Merge with current context data
-            print(f"📊 Step 2: Merging context data...")
+            logger.debug("Step 2: Merging context data...")
             full_context = {**patient_context, **context_data}
-            print(f"✅ Step 2 complete: Context merged")
+            logger.debug("Step 2 complete: Context merged")
             
             # Generate suggestions based on trigger type
-            print(f"📊 Step 3: Initializing suggestions...")
+            logger.debug("Step 3: Initializing suggestions...")
             suggestions = {
                 'timestamp': datetime.utcnow().isoformat(),
                 'patient_id': patient_id,
@@ -68,51 +71,49 @@ class CDSEngine:
                 'alerts': [],
                 'risk_factors': patient_context.get('risk_factors', [])
             }
-            print(f"✅ Step 3 complete: Suggestions initialized")
+            logger.debug("Step 3 complete: Suggestions initialized")
             
             # Differential diagnosis suggestions
             if context_data.get('symptoms') or trigger_type == 'diagnosis_field':
-                print(f"📊 Step 4: Generating differential diagnosis...")
+                logger.debug("Step 4: Generating differential diagnosis...")
                 ddx = self._generate_differential_diagnosis(full_context)
-                print(f"✅ Step 4a: DDx generated ({len(ddx)} items)")
+                logger.debug("Step 4a: DDx generated (%s items)", len(ddx))
                 # Filter based on physician preferences
                 ddx = self.learning_system.filter_suggestions(
                     physician_id, ddx, 'differential_diagnosis'
                 )
-                print(f"✅ Step 4b: DDx filtered ({len(ddx)} items)")
+                logger.debug("Step 4b: DDx filtered (%s items)", len(ddx))
                 suggestions['differential_diagnosis'] = ddx
             
             # Medication recommendations
             if context_data.get('diagnosis') or trigger_type == 'prescription_field':
-                print(f"📊 Step 5: Generating medication recommendations...")
+                logger.debug("Step 5: Generating medication recommendations...")
                 med_recs = self._generate_medication_recommendations(full_context)
-                print(f"✅ Step 5a: Medications generated ({len(med_recs)} items)")
+                logger.debug("Step 5a: Medications generated (%s items)", len(med_recs))
                 # Filter based on physician preferences
                 med_recs = self.learning_system.filter_suggestions(
                     physician_id, med_recs, 'medication'
                 )
-                print(f"✅ Step 5b: Medications filtered ({len(med_recs)} items)")
+                logger.debug("Step 5b: Medications filtered (%s items)", len(med_recs))
                 suggestions['medication_recommendations'] = med_recs
             
             # Care pathway suggestions
-            print(f"📊 Step 6: Generating care pathway...")
+            logger.debug("Step 6: Generating care pathway...")
             care_pathway = self._generate_care_pathway(full_context)
             suggestions['care_pathway'] = care_pathway
-            print(f"✅ Step 6 complete: Care pathway generated ({len(care_pathway)} items)")
+            logger.debug("Step 6 complete: Care pathway generated (%s items)", len(care_pathway))
             
             # Critical alerts
-            print(f"📊 Step 7: Generating alerts...")
+            logger.debug("Step 7: Generating alerts...")
             alerts = self._generate_alerts(full_context)
             suggestions['alerts'] = alerts
-            print(f"✅ Step 7 complete: Alerts generated ({len(alerts)} items)")
+            logger.debug("Step 7 complete: Alerts generated (%s items)", len(alerts))
             
-            print(f"✅ All steps complete!")
+            logger.debug("All steps complete!")
             return suggestions
             
         except Exception as e:
-            print(f"❌ Exception in analyze_and_suggest: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Exception in analyze_and_suggest: %s", e)
             return {'error': f'CDS analysis failed: {str(e)}'}
     
     def check_medication_safety(self,
@@ -202,13 +203,13 @@ class CDSEngine:
         # Convert symptoms to string if it's a list
         symptoms_str = ', '.join(symptoms) if isinstance(symptoms, list) else str(symptoms)
         
-        print(f"🔍 Generating DDx for symptoms: {symptoms_str}")
+        logger.debug("Generating DDx for symptoms: %s", symptoms_str)
         
         # Get DDx from knowledge base
         ddx_list = self.knowledge_base.get_differential_diagnosis(symptoms, context)
         
         # Enhance with AI if available
-        print(f"🤖 Calling Gemini AI for differential diagnosis...")
+        logger.debug("Calling Gemini AI for differential diagnosis...")
         ai_enhancement = self.gemini_ai.enhance_differential_diagnosis(symptoms_str, context)
         if ai_enhancement:
             # ai_enhancement is a string (the AI response text)
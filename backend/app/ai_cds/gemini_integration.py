@@ -3,11 +3,14 @@ Google Gemini AI Integration for Clinical Decision Support
 Free and reliable AI-powered medical knowledge assistant
 """
 
+import logging
 import os
 import google.generativeai as genai
 from typing import Dict, Optional
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 
@@ -18,16 +21,16 @@ class GeminiAI:
         self.api_key = os.getenv('GEMINI_API_KEY')
         
         if not self.api_key:
-            print("⚠️ Warning: GEMINI_API_KEY not set. AI enhancement disabled.")
+            logger.warning("GEMINI_API_KEY not set. AI enhancement disabled.")
             self.model = None
         else:
             try:
                 genai.configure(api_key=self.api_key)
                 # Use Gemini 2.0 Flash for medical queries (latest stable free model)
                 self.model = genai.GenerativeModel('gemini-2.0-flash')
-                print("✅ Gemini AI initialized successfully with gemini-2.0-flash")
+                logger.info("Gemini AI initialized successfully with gemini-2.0-flash")
             except Exception as e:
-                print(f"⚠️ Gemini AI initialization error: {str(e)}")
+                logger.warning("Gemini AI initialization error: %s", e)
                 self.model = None
     
     def generate_treatment_plan(self, patient_data: Dict) -> Optional[Dict]:
@@ -102,7 +105,7 @@ In PRESCRIPTION section, clearly label medications as tablets, syrups, or tests.
             return None
             
         except Exception as e:
-            print(f"Gemini AI error: {str(e)}")
+            logger.error("Gemini AI error: %s", e)
             return None
     
     def enhance_differential_diagnosis(self, symptoms: str, patient_context: Dict) -> Optional[str]:
@@ -145,7 +148,7 @@ Keep it SHORT and clinical - maximum 150 words total. Use bullet points."""
             return None
             
         except Exception as e:
-            print(f"Gemini AI error: {str(e)}")
+            logger.error("Gemini AI error: %s", e)
             return None
     
     def check_medication_safety(self, medication: str, patient_context: Dict) -> Optional[str]:
@@ -188,5 +191,5 @@ Be EXTREMELY brief."""
             return None
             
         except Exception as e:
-            print(f"Gemini AI error: {str(e)}")
+            logger.error("Gemini AI error: %s", e)
             return None
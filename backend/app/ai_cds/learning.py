@@ -2,10 +2,13 @@
 Physician Learning System - Adapts to individual physician preferences
 """
 
+import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from bson import ObjectId
 
+logger = logging.getLogger(__name__)
+
 
 class PhysicianLearningSystem:
     """Learns from physician feedback to personalize suggestions"""
@@ -61,7 +64,7 @@ class PhysicianLearningSystem:
             return True
             
         except Exception as e:
-            print(f"Error recording feedback: {str(e)}")
+            logger.error("Error recording feedback: %s", e)
             return False
     
     def _update_preferences(self,
@@ -125,7 +128,7 @@ class PhysicianLearningSystem:
             )
             
         except Exception as e:
-            print(f"Error updating preferences: {str(e)}")
+            logger.error("Error updating preferences: %s", e)
     
     def get_physician_preferences(self, physician_id: str) -> Dict[str, Any]:
         """Get physician's learned preferences"""
@@ -147,7 +150,7 @@ class PhysicianLearningSystem:
             return prefs
             
         except Exception as e:
-            print(f"Error getting preferences: {str(e)}")
+            logger.error("Error getting preferences: %s", e)
             return {}
     
     def filter_suggestions(self,
@@ -267,5 +270,5 @@ class PhysicianLearningSystem:
             }
             
         except Exception as e:
-            print(f"Error getting analytics: {str(e)}")
+            logger.error("Error getting analytics: %s", e)
             return {}
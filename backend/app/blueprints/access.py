@@ -1,9 +1,13 @@
+import logging
 from flask import Blueprint, request, jsonify
 from bson import ObjectId
 from app.models.database import get_access_permissions_collection, get_users_collection
 from app.models.schemas import AccessPermissionSchema
 from app.utils.auth import require_auth
 from app.utils.audit import log_action
+from app.utils.user_cache import get_user_by_id
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('access', __name__, url_prefix='/api/access')
 
@@ -56,7 +60,7 @@ def grant_access():
         }), 201
     
     except Exception as e:
-        print(f"Grant access error: {e}")
+        logger.error("Grant access error: %s", e)
         return jsonify({'error': 'Failed to grant access'}), 500
 
 @bp.route('/revoke', methods=['POST'])
@@ -88,7 +92,7 @@ def revoke_access():
         return jsonify({'message': 'Access revoked successfully'}), 200
     
     except Exception as e:
-        print(f"Revoke access error: {e}")
+        logger.error("Revoke access error: %s", e)
         return jsonify({'error': 'Failed to revoke access'}), 500
 
 @bp.route('/my-permissions', methods=['GET'])
@@ -113,7 +117,7 @@ def get_my_permissions():
                 perm['patient_id'] = str(perm['patient_id'])
                 perm['doctor_id'] = str(perm['doctor_id'])
                 
-                doctor = users_collection.find_one({'_id': ObjectId(perm['doctor_id'])})
+                doctor = get_user_by_id(perm['doctor_id'])
                 if doctor:
                     doctor.pop('password_hash', None)
                     perm['doctor'] = {
@@ -130,7 +134,7 @@ def get_my_permissions():
                 perm['patient_id'] = str(perm['patient_id'])
                 perm['doctor_id'] = str(perm['doctor_id'])
                 
-                patient = users_collection.find_one({'_id': ObjectId(perm['patient_id'])})
+                patient = get_user_by_id(perm['patient_id'])
                 if patient:
                     patient.pop('password_hash', None)
                     perm['patient'] = {
@@ -147,5 +151,5 @@ def get_my_permissions():
         return jsonify({'permissions': permissions, 'count': len(permissions)}), 200
     
     except Exception as e:
-        print(f"Get permissions error: {e}")
+        logger.error("Get permissions error: %s", e)
         return jsonify({'error': 'Failed to fetch permissions'}), 500
@@ -1,9 +1,25 @@
-from flask import Blueprint, request, jsonify
+import logging
+from flask import Blueprint, request, jsonify, send_file
 from bson import ObjectId
 from datetime import datetime, timedelta
-from app.models.database import get_users_collection, get_records_collection, get_audit_logs_collection
+import os
+from app.models.database import Database, get_users_collection, get_records_collection, get_audit_logs_collection
 from app.utils.auth import require_auth, require_role
-from app.utils.audit import log_action
+from app.utils.audit import log_action, get_audit_writer_stats
+from app.utils.token_cache import revoke_user_tokens, get_token_cache_stats
+from app.utils.user_cache import invalidate_user, get_user_cache_stats
+from app.utils.log import get_logging_stats
+from app.utils.password import get_hashing_stats
+from app.utils.record_store import release_record_blobs, delete_archived_blobs
+from app.utils.photo_store import delete_photos
+from app.utils.patient_search import find_patients
+from app.utils.doctor_search import get_facet_cache_stats
+from app.utils.id_generator import get_id_allocator_stats
+from app.jobs.record_archive import ARCHIVE_COLLECTION
+from app.jobs.bulk_import import IMPORTS_COLLECTION, IMPORT_ROLES, create_import, detect_format, start_import
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -19,7 +35,7 @@ def get_stats():
         if users_collection is None or records_collection is None:
             return jsonify({'error': 'Database connection error'}), 503
         
-        total_users = users_collection.count_documents({})
+        total_users = users_collection.estimated_document_count()
         total_patients = users_collection.count_documents({'role': 'patient'})
         total_doctors = users_collection.count_documents({'role': 'doctor', 'is_verified': True})
         pending_doctors = users_collection.count_documents({'role': 'doctor', 'is_verified': False})
@@ -53,7 +69,7 @@ def get_stats():
         }), 200
     
     except Exception as e:
-        print(f"Get stats error: {e}")
+        logger.error("Get stats error: %s", e)
         return jsonify({'error': 'Failed to fetch statistics'}), 500
 
 @bp.route('/audit-logs', methods=['GET'])
@@ -74,9 +90,31 @@ def get_audit_logs():
         return jsonify({'logs': logs, 'count': len(logs)}), 200
     
     except Exception as e:
-        print(f"Get audit logs error: {e}")
+        logger.error("Get audit logs error: %s", e)
         return jsonify({'error': 'Failed to fetch audit logs'}), 500
 
+@bp.route('/metrics', methods=['GET'])
+@require_auth
+@require_role(['admin'])
+def get_metrics():
+    """Get live runtime metrics for this worker process"""
+    try:
+        return jsonify({
+            'pid': os.getpid(),
+            'db_pool': Database.get_pool_stats(),
+            'audit_writer': get_audit_writer_stats(),
+            'tokens': get_token_cache_stats(),
+            'user_cache': get_user_cache_stats(),
+            'doctor_facets': get_facet_cache_stats(),
+            'id_allocator': get_id_allocator_stats(),
+            'bcrypt': get_hashing_stats(),
+            'logging': get_logging_stats()
+        }), 200
+    
+    except Exception as e:
+        logger.error("Get metrics error: %s", e)
+        return jsonify({'error': 'Failed to fetch metrics'}), 500
+
 @bp.route('/users/<user_id>/toggle-status', methods=['PATCH'])
 @require_auth
 @require_role(['admin'])
@@ -98,6 +136,11 @@ def toggle_user_status(user_id):
             {'_id': ObjectId(user_id)},
             {'$set': {'is_active': new_status}}
         )
+        invalidate_user(user_id)
+        
+        # Sign a deactivated user out everywhere
+        if not new_status:
+            revoke_user_tokens(user_id)
         
         log_action(request.user['user_id'], 'toggle_user_status', 'user', user_id)
         
@@ -107,7 +150,7 @@ def toggle_user_status(user_id):
         }), 200
     
     except Exception as e:
-        print(f"Toggle user status error: {e}")
+        logger.error("Toggle user status error: %s", e)
         return jsonify({'error': 'Failed to toggle user status'}), 500
 
 @bp.route('/users/<user_id>', methods=['DELETE'])
@@ -134,10 +177,25 @@ def delete_user(user_id):
         
         # Delete user's records if they're a patient
         if user.get('role') == 'patient':
+            blob_ids = [record['blob_id'] for record in records_collection.find(
+                {'patient_id': ObjectId(user_id), 'blob_id': {'$exists': True}},
+                {'blob_id': 1}
+            )]
+            release_record_blobs(blob_ids)
             records_collection.delete_many({'patient_id': ObjectId(user_id)})
+            
+            # And the ones already moved to the archive
+            archive_collection = Database.get_collection(ARCHIVE_COLLECTION)
+            if archive_collection is not None:
+                archived_blob_ids = archive_collection.distinct('blob_id', {'patient_id': ObjectId(user_id)})
+                delete_archived_blobs(archived_blob_ids)
+                archive_collection.delete_many({'patient_id': ObjectId(user_id)})
         
         # Delete the user
         users_collection.delete_one({'_id': ObjectId(user_id)})
+        delete_photos(user_id)
+        invalidate_user(user_id)
+        revoke_user_tokens(user_id)
         
         # Log the action
         log_action(request.user['user_id'], 'delete_user', 'user', user_id)
@@ -145,7 +203,7 @@ def delete_user(user_id):
         return jsonify({'message': 'User deleted successfully'}), 200
     
     except Exception as e:
-        print(f"Delete user error: {e}")
+        logger.error("Delete user error: %s", e)
         return jsonify({'error': 'Failed to delete user'}), 500
 
 @bp.route('/pending-doctors', methods=['GET'])
@@ -173,7 +231,7 @@ def get_pending_doctors():
         }), 200
     
     except Exception as e:
-        print(f"Get pending doctors error: {e}")
+        logger.error("Get pending doctors error: %s", e)
         return jsonify({'error': 'Failed to fetch pending doctors'}), 500
 
 @bp.route('/verify-doctor/<user_id>', methods=['PATCH'])
@@ -209,21 +267,29 @@ def verify_doctor(user_id):
                     'verified_by': request.user['user_id']
                 }}
             )
+            invalidate_user(user_id)
             message = 'Doctor verified successfully'
             log_action(request.user['user_id'], 'doctor_approve', 'user', user_id)
         else:
             # For rejection, delete the registration
             users_collection.delete_one({'_id': ObjectId(user_id)})
+            invalidate_user(user_id)
             message = 'Doctor registration rejected and removed'
             log_action(request.user['user_id'], 'doctor_reject', 'user', user_id)
         
         return jsonify({'message': message}), 200
     
     except Exception as e:
-        print(f"Verify doctor error: {e}")
+        logger.error("Verify doctor error: %s", e)
         return jsonify({'error': 'Failed to verify doctor'}), 500
 
 
+# Fields shown in patient search results
+SEARCH_RESULT_PROJECTION = {
+    'patient_id': 1, 'full_name': 1, 'email': 1, 'phone': 1, 'blood_group': 1,
+    'profile_photo': 1, 'date_of_birth': 1, 'gender': 1
+}
+
 @bp.route('/search-patients', methods=['GET'])
 @require_auth
 def search_patients():
@@ -244,19 +310,8 @@ def search_patients():
         if len(query_param) < 3:
             return jsonify({'error': 'Search query must be at least 3 characters'}), 400
         
-        # Build search query - search in multiple fields
-        search_conditions = [
-            {'patient_id': {'$regex': query_param, '$options': 'i'}},
-            {'full_name': {'$regex': query_param, '$options': 'i'}},
-            {'email': {'$regex': query_param, '$options': 'i'}},
-            {'phone': {'$regex': query_param, '$options': 'i'}}
-        ]
-        
-        # Find patients matching the search
-        patients = list(users_collection.find({
-            'role': 'patient',
-            '$or': search_conditions
-        }).limit(20))  # Limit to 20 results
+        # Indexed token lookup, ranked exact ID > prefix > word match
+        patients = find_patients(users_collection, query_param, limit=20, projection=SEARCH_RESULT_PROJECTION)
         
         # Format patient data
         formatted_patients = []
@@ -288,5 +343,160 @@ def search_patients():
         }), 200
     
     except Exception as e:
-        print(f"Patient search error: {e}")
+        logger.error("Patient search error: %s", e)
         return jsonify({'error': 'Failed to search patients'}), 500
+
+
+def _import_json(state):
+    """An import's progress as returned by the API (server paths left out)"""
+    return {
+        'import_id': state['_id'],
+        'role': state['role'],
+        'format': state['format'],
+        'status': state['status'],
+        'rows_done': state['rows_done'],
+        'inserted': state['inserted'],
+        'rejected': state['rejected'],
+        'skipped': state['skipped'],
+        'error': state.get('error'),
+        'started_at': state['started_at'].isoformat() if state.get('started_at') else None,
+        'updated_at': state['updated_at'].isoformat() if state.get('updated_at') else None,
+        'finished_at': state['finished_at'].isoformat() if state.get('finished_at') else None
+    }
+
+@bp.route('/imports', methods=['POST'])
+@require_auth
+@require_role(['admin'])
+def create_user_import():
+    """
+    Start a bulk import of patients or doctors from an uploaded CSV or NDJSON file
+    Runs in the background; poll GET /imports/<import_id> for progress. The
+    uploaded file is kept in IMPORT_DIR until the import completes.
+    """
+    try:
+        db = Database.get_db()
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        
+        file = request.files.get('file')
+        if file is None or file.filename == '':
+            return jsonify({'error': 'No import file provided'}), 400
+        
+        role = request.form.get('role', 'patient')
+        if role not in IMPORT_ROLES:
+            return jsonify({'error': f"role must be one of: {', '.join(IMPORT_ROLES)}"}), 400
+        
+        try:
+            fmt = detect_format(file.filename)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        import_id = str(ObjectId())
+        os.makedirs(Config.IMPORT_DIR, mode=0o700, exist_ok=True)
+        path = os.path.join(Config.IMPORT_DIR, f"{import_id}.{fmt}")
+        file.save(path)
+        
+        state = create_import(db, import_id, path, role, fmt, requested_by=request.user['user_id'], delete_source=True)
+        start_import(import_id)
+        
+        log_action(request.user['user_id'], 'bulk_import', 'import', import_id,
+                   {'file_name': file.filename, 'role': role})
+        
+        return jsonify({'message': 'Import started', 'import': _import_json(state)}), 202
+    
+    except Exception as e:
+        logger.error("Create import error: %s", e)
+        return jsonify({'error': 'Failed to start import'}), 500
+
+@bp.route('/imports', methods=['GET'])
+@require_auth
+@require_role(['admin'])
+def get_user_imports():
+    """Get the most recent bulk imports"""
+    try:
+        db = Database.get_db()
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        
+        imports = db[IMPORTS_COLLECTION].find().sort('started_at', -1).limit(50)
+        results = [_import_json(state) for state in imports]
+        
+        return jsonify({'imports': results, 'count': len(results)}), 200
+    
+    except Exception as e:
+        logger.error("Get imports error: %s", e)
+        return jsonify({'error': 'Failed to fetch imports'}), 500
+
+@bp.route('/imports/<import_id>', methods=['GET'])
+@require_auth
+@require_role(['admin'])
+def get_user_import(import_id):
+    """Get a bulk import's progress"""
+    try:
+        db = Database.get_db()
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        
+        state = db[IMPORTS_COLLECTION].find_one({'_id': import_id})
+        if not state:
+            return jsonify({'error': 'Import not found'}), 404
+        
+        return jsonify({'import': _import_json(state)}), 200
+    
+    except Exception as e:
+        logger.error("Get import error: %s", e)
+        return jsonify({'error': 'Failed to fetch import'}), 500
+
+@bp.route('/imports/<import_id>/resume', methods=['POST'])
+@require_auth
+@require_role(['admin'])
+def resume_user_import(import_id):
+    """Resume a failed or interrupted bulk import after its last finished batch"""
+    try:
+        db = Database.get_db()
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        
+        state = db[IMPORTS_COLLECTION].find_one({'_id': import_id})
+        if not state:
+            return jsonify({'error': 'Import not found'}), 404
+        
+        stale = datetime.utcnow() - timedelta(seconds=Config.IMPORT_STALE_SECONDS)
+        if state['status'] == 'completed' or (state['status'] == 'running' and state['updated_at'] >= stale):
+            return jsonify({'error': f"Import is {state['status']}"}), 409
+        
+        if not os.path.exists(state['source']):
+            return jsonify({'error': 'Import file is not available on this server'}), 409
+        
+        start_import(import_id)
+        log_action(request.user['user_id'], 'bulk_import_resume', 'import', import_id)
+        
+        return jsonify({'message': 'Import resumed', 'import': _import_json(state)}), 202
+    
+    except Exception as e:
+        logger.error("Resume import error: %s", e)
+        return jsonify({'error': 'Failed to resume import'}), 500
+
+@bp.route('/imports/<import_id>/rejects', methods=['GET'])
+@require_auth
+@require_role(['admin'])
+def download_import_rejects(import_id):
+    """Download the rows a bulk import rejected (NDJSON: row, error, data)"""
+    try:
+        db = Database.get_db()
+        if db is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        
+        state = db[IMPORTS_COLLECTION].find_one({'_id': import_id})
+        if not state:
+            return jsonify({'error': 'Import not found'}), 404
+        
+        if not os.path.exists(state['reject_path']):
+            return jsonify({'error': 'Reject file is not available on this server'}), 404
+        
+        return send_file(state['reject_path'], mimetype='application/x-ndjson', as_attachment=True,
+                         download_name=f"{import_id}-rejects.ndjson")
+    
+    except Exception as e:
+        logger.error("Download import rejects error: %s", e)
+        return jsonify({'error': 'Failed to download rejects'}), 500
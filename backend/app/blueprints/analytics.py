@@ -2,25 +2,24 @@
 Analytics Blueprint
 Provides analytics and insights for patients, doctors, and admins
 """
+import logging
 from flask import Blueprint, jsonify, request
 from app.models.database import Database, get_users_collection, get_records_collection, get_access_permissions_collection
 from bson import ObjectId
 from datetime import datetime, timedelta
-import jwt
-import os
+from app.utils.auth import decode_token, get_request_token
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
 
 def get_user_from_token():
     """Extract user from JWT token"""
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    token = get_request_token()
     if not token:
         return None
-    try:
-        decoded = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
-        return decoded
-    except:
-        return None
+    payload = decode_token(token)
+    return None if 'error' in payload else payload
 
 @bp.route('/patient/overview', methods=['GET'])
 def patient_overview():
@@ -99,7 +98,7 @@ def patient_overview():
         }), 200
     
     except Exception as e:
-        print(f"Patient overview error: {e}")
+        logger.error("Patient overview error: %s", e)
         return jsonify({'error': 'Failed to fetch analytics'}), 500
 
 @bp.route('/doctor/overview', methods=['GET'])
@@ -179,7 +178,7 @@ def doctor_overview():
         }), 200
     
     except Exception as e:
-        print(f"Doctor overview error: {e}")
+        logger.error("Doctor overview error: %s", e)
         return jsonify({'error': 'Failed to fetch analytics'}), 500
 
 @bp.route('/admin/overview', methods=['GET'])
@@ -197,7 +196,7 @@ def admin_overview():
             return jsonify({'error': 'Database connection error'}), 503
         
         # Total users
-        total_users = users_collection.count_documents({})
+        total_users = users_collection.estimated_document_count()
         total_patients = users_collection.count_documents({'role': 'patient'})
         total_doctors = users_collection.count_documents({'role': 'doctor'})
         verified_doctors = users_collection.count_documents({'role': 'doctor', 'is_verified': True})
@@ -256,5 +255,5 @@ def admin_overview():
         }), 200
     
     except Exception as e:
-        print(f"Admin overview error: {e}")
+        logger.error("Admin overview error: %s", e)
         return jsonify({'error': 'Failed to fetch analytics'}), 500
@@ -3,6 +3,7 @@ Appointments Blueprint
 Handles appointment booking and management
 """
 
+import logging
 from flask import Blueprint, request, jsonify, current_app
 from bson import ObjectId
 from datetime import datetime
@@ -18,6 +19,13 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from app.models.database import Database, get_users_collection, get_access_permissions_collection, get_records_collection
 from app.utils.auth import require_auth
 from app.utils.audit import log_action
+from app.utils.user_cache import get_user_by_id
+from app.utils.record_store import insert_record_with_file
+from app.utils.id_generator import insert_with_id
+from app.utils.doctor_search import BOOKABLE, SEARCH_FILTERS, InvalidSearch, find_doctors, get_facets
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('appointments', __name__, url_prefix='/api/appointments')
 
@@ -27,58 +35,55 @@ def get_appointments_collection():
     return Database.get_collection('appointments')
 
 
-def generate_appointment_id():
-    """
-    Generate a unique appointment ID
-    Format: APT-XXXXXXXX (8 random alphanumeric characters)
-    """
-    appointments_collection = get_appointments_collection()
-    
-    max_attempts = 20
-    for _ in range(max_attempts):
-        # Generate 8-character random alphanumeric string
-        characters = string.ascii_uppercase + string.digits
-        random_part = ''.join(secrets.choice(characters) for _ in range(8))
-        appointment_id = f"APT-{random_part}"
-        
-        # Check if ID already exists
-        existing = appointments_collection.find_one({'appointment_id': appointment_id})
-        if not existing:
-            return appointment_id
-    
-    # If we couldn't generate a unique ID after max_attempts, raise an error
-    raise ValueError(f"Could not generate unique appointment ID after {max_attempts} attempts")
-
+# Fields shown in doctor search results
+DOCTOR_RESULT_PROJECTION = {
+    'doctor_id': 1, 'full_name': 1, 'specialization': 1, 'years_of_experience': 1, 'qualification': 1,
+    'hospital_affiliation': 1, 'consultation_fee': 1, 'languages_spoken': 1, 'bio': 1, 'profile_photo': 1,
+    'address': 1, 'phone': 1
+}
 
 @bp.route('/search-doctors', methods=['POST'])
 @require_auth
 def search_doctors():
-    """Search for doctors by ID or specialization"""
+    """
+    Search bookable doctors
+    Filters: doctor_id (exact), specialization, language, name and hospital (prefixes),
+    min_fee, max_fee, min_experience. Paged with sort ('name' or 'experience'),
+    limit and the next_cursor of the previous page. Facet counts come from a
+    cached snapshot.
+    """
     try:
         users_collection = get_users_collection()
         if users_collection is None:
             return jsonify({'error': 'Database connection error'}), 503
         
-        data = request.get_json()
-        doctor_id = data.get('doctor_id', '').strip()
-        specialization = data.get('specialization', '').strip()
+        data = request.get_json() or {}
+        doctor_id = (data.get('doctor_id') or '').strip()
+        specialization = (data.get('specialization') or '').strip()
         
-        # Build query
-        query = {
-            'role': 'doctor',
-            'is_verified': True,
-            'is_active': True,
-            'is_profile_complete': True
-        }
+        try:
+            limit = min(int(data.get('limit') or Config.DOCTOR_SEARCH_PAGE_SIZE), Config.DOCTOR_SEARCH_PAGE_MAX)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'limit must be a number'}), 400
+        if limit < 1:
+            return jsonify({'error': 'limit must be positive'}), 400
         
         if doctor_id:
-            query['doctor_id'] = doctor_id
-        
-        if specialization:
-            query['specialization'] = specialization
-        
-        # Find doctors
-        doctors = list(users_collection.find(query).limit(20))
+            # Exact ID lookup
+            doctor = users_collection.find_one({**BOOKABLE, 'doctor_id': doctor_id.upper()}, DOCTOR_RESULT_PROJECTION)
+            doctors, next_cursor = ([doctor] if doctor else []), None
+        else:
+            try:
+                doctors, next_cursor = find_doctors(
+                    users_collection,
+                    {key: data.get(key) for key in SEARCH_FILTERS},
+                    sort=data.get('sort') or 'name',
+                    cursor=data.get('cursor'),
+                    limit=limit,
+                    projection=DOCTOR_RESULT_PROJECTION
+                )
+            except InvalidSearch as e:
+                return jsonify({'error': str(e)}), 400
         
         # Format results
         results = []
@@ -101,11 +106,13 @@ def search_doctors():
         
         return jsonify({
             'doctors': results,
-            'count': len(results)
+            'count': len(results),
+            'next_cursor': next_cursor,
+            'facets': get_facets(specialization)
         }), 200
     
     except Exception as e:
-        print(f"Search doctors error: {e}")
+        logger.error("Search doctors error: %s", e)
         return jsonify({'error': 'Failed to search doctors'}), 500
 
 
@@ -142,15 +149,11 @@ def book_appointment():
         if not doctor:
             return jsonify({'error': 'Doctor not found or not verified'}), 404
         
-        # Generate unique appointment ID
-        appointment_id = generate_appointment_id()
-        
         # Generate 6-digit OTP for appointment verification
         verification_otp = ''.join(secrets.choice(string.digits) for _ in range(6))
         
         # Create appointment
         appointment = {
-            'appointment_id': appointment_id,
             'patient_id': ObjectId(patient_id),
             'doctor_id': ObjectId(doctor_id),
             'appointment_date': appointment_date,
@@ -164,7 +167,9 @@ def book_appointment():
             'updated_at': datetime.utcnow()
         }
         
-        result = appointments_collection.insert_one(appointment)
+        # Insert with a new appointment ID
+        result = insert_with_id(appointments_collection, appointment, 'appointment')
+        appointment_id = appointment['appointment_id']
         
         # NOTE: Access is NOT automatically granted
         # Doctor must approve the appointment first
@@ -179,7 +184,7 @@ def book_appointment():
         }), 201
     
     except Exception as e:
-        print(f"Book appointment error: {e}")
+        logger.error("Book appointment error: %s", e)
         return jsonify({'error': 'Failed to book appointment'}), 500
 
 
@@ -213,10 +218,10 @@ def get_my_appointments():
         for apt in appointments:
             # Get other party details
             if role == 'patient':
-                other_user = users_collection.find_one({'_id': apt['doctor_id']})
+                other_user = get_user_by_id(apt['doctor_id'])
                 other_key = 'doctor'
             else:
-                other_user = users_collection.find_one({'_id': apt['patient_id']})
+                other_user = get_user_by_id(apt['patient_id'])
                 other_key = 'patient'
             
             user_info = {
@@ -254,7 +259,7 @@ def get_my_appointments():
         }), 200
     
     except Exception as e:
-        print(f"Get appointments error: {e}")
+        logger.error("Get appointments error: %s", e)
         return jsonify({'error': 'Failed to fetch appointments'}), 500
 
 
@@ -313,9 +318,7 @@ def approve_appointment(appointment_id):
         return jsonify({'message': 'Appointment approved successfully. You now have access to patient records.'}), 200
     
     except Exception as e:
-        print(f"Approve appointment error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Approve appointment error: %s", e)
         return jsonify({'error': 'Failed to approve appointment'}), 500
 
 
@@ -354,7 +357,7 @@ def reject_appointment(appointment_id):
         return jsonify({'message': 'Appointment rejected successfully'}), 200
     
     except Exception as e:
-        print(f"Reject appointment error: {e}")
+        logger.error("Reject appointment error: %s", e)
         return jsonify({'error': 'Failed to reject appointment'}), 500
 
 
@@ -389,7 +392,7 @@ def cancel_appointment(appointment_id):
         return jsonify({'message': 'Appointment cancelled successfully'}), 200
     
     except Exception as e:
-        print(f"Cancel appointment error: {e}")
+        logger.error("Cancel appointment error: %s", e)
         return jsonify({'error': 'Failed to cancel appointment'}), 500
 
 
@@ -433,7 +436,7 @@ def reactivate_appointment(appointment_id):
         return jsonify({'message': 'Appointment reactivated successfully. Waiting for doctor approval.'}), 200
     
     except Exception as e:
-        print(f"Reactivate appointment error: {e}")
+        logger.error("Reactivate appointment error: %s", e)
         return jsonify({'error': 'Failed to reactivate appointment'}), 500
 
 
@@ -486,7 +489,7 @@ def verify_appointment_otp(appointment_id):
         return jsonify({'message': 'OTP verified successfully. You can now add prescription.'}), 200
     
     except Exception as e:
-        print(f"Verify OTP error: {e}")
+        logger.error("Verify OTP error: %s", e)
         return jsonify({'error': 'Failed to verify OTP'}), 500
 
 
@@ -499,7 +502,7 @@ def generate_prescription_pdf(prescription_data, patient_data, doctor_data, appo
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"Prescription_{safe_diagnosis}_{timestamp}.pdf"
         
-        print(f"📄 Generating PDF: {filename}")
+        logger.debug("Generating PDF: %s", filename)
         
         # Create PDF in memory using BytesIO
         from io import BytesIO
@@ -736,14 +739,12 @@ def generate_prescription_pdf(prescription_data, patient_data, doctor_data, appo
         pdf_bytes = pdf_buffer.getvalue()
         pdf_buffer.close()
         
-        print(f"✅ PDF generated successfully: {len(pdf_bytes)} bytes")
+        logger.debug("PDF generated successfully: %s bytes", len(pdf_bytes))
         
         return filename, pdf_bytes
         
     except Exception as e:
-        print(f"PDF generation error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("PDF generation error: %s", e)
         raise
 
 
@@ -787,8 +788,8 @@ def add_prescription(appointment_id):
             return jsonify({'error': 'Please verify OTP first'}), 400
         
         # Get doctor and patient details
-        doctor = users_collection.find_one({'_id': ObjectId(user_id)})
-        patient = users_collection.find_one({'_id': appointment['patient_id']})
+        doctor = get_user_by_id(user_id)
+        patient = get_user_by_id(appointment['patient_id'])
         
         # Create prescription
         prescription = {
@@ -812,33 +813,22 @@ def add_prescription(appointment_id):
             appointment
         )
         
-        # Encrypt the PDF bytes
-        from app.utils.encryption import encrypt_file_data
-        encryption_result = encrypt_file_data(pdf_bytes)
-        
-        if not encryption_result['success']:
-            return jsonify({'error': 'Failed to encrypt prescription PDF'}), 500
-        
-        # Save prescription PDF as medical record (encrypted in database)
+        # Save prescription PDF as medical record (encrypted in the blob store)
         medical_record = {
             'patient_id': appointment['patient_id'],
             'file_name': filename,
             'file_type': 'application/pdf',
-            'file_size': len(pdf_bytes),
             'description': f"Prescription - {diagnosis}",
             'uploaded_at': datetime.utcnow(),
             'uploaded_by': 'system',
             'is_prescription': True,
             'is_deleted': False,
-            'appointment_id': appointment_id,
-            'encrypted_data': encryption_result['encrypted_data'],
-            'encryption_metadata': {'method': encryption_result['encryption_method']}
+            'appointment_id': appointment_id
         }
         
-        result = records_collection.insert_one(medical_record)
-        print(f"✅ Prescription PDF saved to medical records: {filename}")
-        print(f"✅ Record ID: {result.inserted_id}")
-        print(f"✅ File size: {len(pdf_bytes)} bytes (encrypted and stored in MongoDB)")
+        record_id = insert_record_with_file(records_collection, medical_record, pdf_bytes)
+        logger.info("Prescription PDF saved to medical records: %s (record %s, %s bytes)",
+                    filename, record_id, len(pdf_bytes))
         
         # Update appointment with prescription and mark as completed
         appointments_collection.update_one(
@@ -863,9 +853,7 @@ def add_prescription(appointment_id):
         }), 200
     
     except Exception as e:
-        print(f"Add prescription error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Add prescription error: %s", e)
         return jsonify({'error': 'Failed to add prescription'}), 500
 
 
@@ -901,7 +889,7 @@ def delete_appointment(appointment_id):
         return jsonify({'message': 'Appointment deleted successfully'}), 200
     
     except Exception as e:
-        print(f"Delete appointment error: {e}")
+        logger.error("Delete appointment error: %s", e)
         return jsonify({'error': 'Failed to delete appointment'}), 500
 
 
@@ -933,8 +921,8 @@ def add_direct_prescription():
         user_id = request.user['user_id']
         
         # Get patient and doctor info
-        patient = users_collection.find_one({'_id': ObjectId(patient_id)})
-        doctor = users_collection.find_one({'_id': ObjectId(user_id)})
+        patient = get_user_by_id(patient_id)
+        doctor = get_user_by_id(user_id)
         
         if not patient or patient['role'] != 'patient':
             return jsonify({'error': 'Patient not found'}), 404
@@ -968,45 +956,33 @@ def add_direct_prescription():
             appointment_data
         )
         
-        # Encrypt PDF
-        from app.utils.encryption import encrypt_file_data
-        encryption_result = encrypt_file_data(pdf_bytes)
-        
-        if not encryption_result['success']:
-            return jsonify({'error': 'Failed to encrypt prescription PDF'}), 500
-        
-        # Save prescription PDF as medical record (encrypted in database)
+        # Save prescription PDF as medical record (encrypted in the blob store)
         medical_record = {
             'patient_id': ObjectId(patient_id),
             'file_name': filename,
             'file_type': 'application/pdf',
-            'file_size': len(pdf_bytes),
             'description': f"Prescription - {diagnosis}",
             'uploaded_at': datetime.utcnow(),
             'uploaded_by': 'system',
             'is_prescription': True,
             'is_deleted': False,
-            'prescription_type': 'walk-in',
-            'encrypted_data': encryption_result['encrypted_data'],
-            'encryption_method': encryption_result['encryption_method']
+            'prescription_type': 'walk-in'
         }
         
-        result = records_collection.insert_one(medical_record)
-        print(f"✅ Walk-in Prescription PDF saved to medical records: {filename}")
-        print(f"✅ Record ID: {result.inserted_id}")
+        record_id = insert_record_with_file(records_collection, medical_record, pdf_bytes)
+        logger.info("Walk-in prescription PDF saved to medical records: %s (record %s)",
+                    filename, record_id)
         
         # Log the action
-        log_action(user_id, 'add_direct_prescription', 'prescription', str(result.inserted_id))
+        log_action(user_id, 'add_direct_prescription', 'prescription', str(record_id))
         
         return jsonify({
             'message': 'Prescription added successfully and saved to patient medical records',
             'prescription': prescription,
             'prescription_file': filename,
-            'record_id': str(result.inserted_id)
+            'record_id': str(record_id)
         }), 200
     
     except Exception as e:
-        print(f"Add direct prescription error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Add direct prescription error: %s", e)
         return jsonify({'error': 'Failed to add prescription'}), 500
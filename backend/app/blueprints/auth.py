@@ -1,12 +1,19 @@
+import logging
 from flask import Blueprint, request, jsonify
 from app.models.database import get_users_collection
 from app.models.schemas import UserSchema
-from app.utils.auth import create_token
-from app.utils.password import hash_password, verify_password, is_strong_password
+from app.utils.auth import create_token, require_auth, get_request_token
+from app.utils.token_cache import revoke_token
+from app.utils.user_cache import invalidate_user
+from app.utils.password import hash_password, verify_password, is_strong_password, needs_rehash, rehash_in_background, PasswordHashingBusy
 from app.utils.audit import log_action
+from app.utils.derived_fields import derived_values
+from app.utils.id_generator import insert_with_id
 from twilio.rest import Client
 import os
 
+logger = logging.getLogger(__name__)
+
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 # Initialize Twilio client
@@ -16,68 +23,6 @@ twilio_client = Client(
 )
 TWILIO_VERIFY_SERVICE_SID = os.getenv('TWILIO_VERIFY_SERVICE_SID')
 
-def check_profile_completion(user):
-    """Check if user profile is complete"""
-    role = user.get('role')
-    
-    if role == 'patient':
-        required_fields = [
-            'full_name',
-            'phone',
-            'gender',
-            'date_of_birth',
-            'address',
-            'blood_group',
-            'emergency_contact_name',
-            'emergency_contact',
-            'emergency_contact_relation',
-            'allergies',
-            'chronic_conditions'
-        ]
-        
-        # Check if all required fields are filled and not empty
-        for field in required_fields:
-            value = user.get(field)
-            # For lists, check if they exist (even if empty, that's valid)
-            # For other fields, check if they're not None or empty string
-            if field in ['allergies', 'chronic_conditions']:
-                if value is None:
-                    return False
-            else:
-                if value is None or value == '':
-                    return False
-        
-        return True
-    
-    elif role == 'doctor':
-        required_fields = [
-            'full_name',
-            'phone',
-            'gender',
-            'date_of_birth',
-            'blood_group',
-            'specialization',
-            'years_of_experience',
-            'qualification',
-            'languages_spoken'
-        ]
-        
-        # Check if all required fields are filled and not empty
-        for field in required_fields:
-            value = user.get(field)
-            # For lists, check if they exist (even if empty, that's valid)
-            if field == 'languages_spoken':
-                if value is None or (isinstance(value, list) and len(value) == 0):
-                    return False
-            else:
-                if value is None or value == '':
-                    return False
-        
-        return True
-    
-    else:
-        return True  # Admin doesn't need profile completion
-
 @bp.route('/register', methods=['POST'])
 def register():
     """Register a new user"""
@@ -136,17 +81,6 @@ def register():
             if existing_rfid:
                 return jsonify({'error': 'This RFID card is already registered'}), 409
         
-        # Generate unique random ID for patient or doctor
-        from app.utils.id_generator import generate_unique_id
-        
-        unique_id = None
-        if data['role'] in ['patient', 'doctor']:
-            try:
-                unique_id = generate_unique_id(data['role'])
-            except Exception as e:
-                print(f"Error generating unique ID: {e}")
-                return jsonify({'error': 'Failed to generate unique ID'}), 500
-        
         # Create user document
         user_doc = UserSchema.create(
             email=data['email'],
@@ -159,15 +93,17 @@ def register():
             rfid_id=rfid_id
         )
         
-        # Add unique ID to user document
-        if data['role'] == 'patient':
-            user_doc['patient_id'] = unique_id
-            user_doc['is_profile_complete'] = False
-        elif data['role'] == 'doctor':
-            user_doc['doctor_id'] = unique_id
-        
-        # Insert into database
-        result = users_collection.insert_one(user_doc)
+        # Insert with a new patient or doctor ID (search fields include it)
+        if data['role'] in ('patient', 'doctor'):
+            try:
+                result = insert_with_id(users_collection, user_doc, data['role'],
+                                        prepare=lambda doc: doc.update(derived_values(doc)))
+            except (ValueError, RuntimeError) as e:
+                logger.error("Error generating unique ID: %s", e)
+                return jsonify({'error': 'Failed to generate unique ID'}), 500
+        else:
+            user_doc.update(derived_values(user_doc))
+            result = users_collection.insert_one(user_doc)
         
         # Log the action
         log_action(str(result.inserted_id), 'register', 'user', str(result.inserted_id))
@@ -184,8 +120,10 @@ def register():
             'requires_approval': data['role'] == 'doctor'
         }), 201
     
+    except PasswordHashingBusy:
+        return jsonify({'error': 'Server is busy. Please try again in a moment.'}), 503, {'Retry-After': '2'}
     except Exception as e:
-        print(f"Registration error: {e}")
+        logger.error("Registration error: %s", e)
         return jsonify({'error': 'Registration failed. Please try again.'}), 500
 
 @bp.route('/login', methods=['POST'])
@@ -213,6 +151,10 @@ def login():
         if not verify_password(data['password'], user['password_hash']):
             return jsonify({'error': 'Invalid email or password'}), 401
         
+        # Upgrade hashes made at a different cost factor (runs after the response)
+        if needs_rehash(user['password_hash']):
+            rehash_in_background(user['_id'], data['password'], user['password_hash'])
+        
         # Check if user is active
         if not user.get('is_active', True):
             return jsonify({'error': 'Account is deactivated. Please contact administrator.'}), 403
@@ -231,40 +173,15 @@ def login():
         if not token:
             return jsonify({'error': 'Failed to create authentication token'}), 500
         
-        # Check profile completion status (use cached value if available)
+        # Kept current by the profile write paths
         is_complete = user.get('is_profile_complete', False)
         
-        # Async operations (don't block response)
-        # These will happen in background after response is sent
         try:
-            # Only update profile completion if it's been more than 1 hour since last check
-            from datetime import datetime, timedelta
-            last_check = user.get('profile_last_checked')
-            should_check = True
-            
-            if last_check:
-                if isinstance(last_check, str):
-                    last_check = datetime.fromisoformat(last_check)
-                if datetime.utcnow() - last_check < timedelta(hours=1):
-                    should_check = False
-            
-            if should_check:
-                is_complete_new = check_profile_completion(user)
-                if user.get('is_profile_complete') != is_complete_new:
-                    users_collection.update_one(
-                        {'_id': user['_id']},
-                        {'$set': {
-                            'is_profile_complete': is_complete_new,
-                            'profile_last_checked': datetime.utcnow()
-                        }}
-                    )
-                    is_complete = is_complete_new
-            
             # Log the action (non-blocking)
             log_action(str(user['_id']), 'login', 'user', str(user['_id']))
         except Exception as e:
             # Don't fail login if background tasks fail
-            print(f"Background task error: {e}")
+            logger.error("Background task error: %s", e)
         
         return jsonify({
             'message': 'Login successful',
@@ -274,12 +191,14 @@ def login():
                 'email': user['email'],
                 'role': user['role'],
                 'full_name': user['full_name'],
-                'is_profile_complete': is_complete  # Use calculated value
+                'is_profile_complete': is_complete
             }
         }), 200
     
+    except PasswordHashingBusy:
+        return jsonify({'error': 'Server is busy. Please try again in a moment.'}), 503, {'Retry-After': '2'}
     except Exception as e:
-        print(f"Login error: {e}")
+        logger.error("Login error: %s", e)
         return jsonify({'error': 'Login failed. Please try again.'}), 500
 
 @bp.route('/verify', methods=['GET'])
@@ -310,9 +229,24 @@ def verify_token():
         }), 200
     
     except Exception as e:
-        print(f"Token verification error: {e}")
+        logger.error("Token verification error: %s", e)
         return jsonify({'error': 'Token verification failed'}), 500
 
+@bp.route('/logout', methods=['POST'])
+@require_auth
+def logout():
+    """Revoke the current token"""
+    try:
+        revoke_token(get_request_token(), request.user)
+        
+        log_action(request.user['user_id'], 'logout', 'user', request.user['user_id'])
+        
+        return jsonify({'message': 'Logged out successfully'}), 200
+    
+    except Exception as e:
+        logger.error("Logout error: %s", e)
+        return jsonify({'error': 'Logout failed'}), 500
+
 @bp.route('/send-otp', methods=['POST'])
 def send_otp():
     """Send OTP to phone number via Twilio"""
@@ -338,7 +272,7 @@ def send_otp():
         }), 200
     
     except Exception as e:
-        print(f"Send OTP error: {e}")
+        logger.error("Send OTP error: %s", e)
         return jsonify({'error': f'Failed to send OTP: {str(e)}'}), 500
 
 @bp.route('/verify-otp-registration', methods=['POST'])
@@ -370,7 +304,7 @@ def verify_otp_registration():
         }), 200
     
     except Exception as e:
-        print(f"Verify OTP registration error: {e}")
+        logger.error("Verify OTP registration error: %s", e)
         return jsonify({'error': f'OTP verification failed: {str(e)}'}), 500
 
 
@@ -415,8 +349,8 @@ def verify_otp():
         if user['role'] == 'doctor' and not user.get('is_verified', False):
             return jsonify({'error': 'Your account is pending admin approval'}), 403
         
-        # Check profile completion
-        is_complete = check_profile_completion(user)
+        # Kept current by the profile write paths
+        is_complete = user.get('is_profile_complete', False)
         
         # Create JWT token
         token = create_token(
@@ -444,7 +378,7 @@ def verify_otp():
         }), 200
     
     except Exception as e:
-        print(f"Verify OTP error: {e}")
+        logger.error("Verify OTP error: %s", e)
         return jsonify({'error': f'OTP verification failed: {str(e)}'}), 500
 
 @bp.route('/hospital-login', methods=['POST'])
@@ -496,8 +430,8 @@ def hospital_login():
         if not user.get('is_active', True):
             return jsonify({'error': 'Account is deactivated'}), 403
         
-        # Check profile completion
-        is_complete = check_profile_completion(user)
+        # Kept current by the profile write paths
+        is_complete = user.get('is_profile_complete', False)
         
         # Create JWT token
         token = create_token(
@@ -525,7 +459,7 @@ def hospital_login():
         }), 200
     
     except Exception as e:
-        print(f"Hospital login error: {e}")
+        logger.error("Hospital login error: %s", e)
         return jsonify({'error': 'Hospital login failed'}), 500
 
 @bp.route('/check-rfid', methods=['POST'])
@@ -551,7 +485,7 @@ def check_rfid():
         }), 200
     
     except Exception as e:
-        print(f"Check RFID error: {e}")
+        logger.error("Check RFID error: %s", e)
         return jsonify({'error': 'Failed to check RFID'}), 500
 
 @bp.route('/rfid-login', methods=['POST'])
@@ -582,8 +516,8 @@ def rfid_login():
         if user['role'] == 'doctor' and not user.get('is_verified', False):
             return jsonify({'error': 'Your account is pending admin approval'}), 403
         
-        # Check profile completion
-        is_complete = check_profile_completion(user)
+        # Kept current by the profile write paths
+        is_complete = user.get('is_profile_complete', False)
         
         # Create JWT token
         token = create_token(
@@ -613,7 +547,7 @@ def rfid_login():
         }), 200
     
     except Exception as e:
-        print(f"RFID login error: {e}")
+        logger.error("RFID login error: %s", e)
         return jsonify({'error': 'RFID login failed'}), 500
 
 @bp.route('/change-password', methods=['POST'])
@@ -676,6 +610,7 @@ def change_password():
             {'_id': ObjectId(user_id)},
             {'$set': {'password_hash': new_password_hash}}
         )
+        invalidate_user(user_id)
         
         # Log the action
         log_action(user_id, 'change_password', 'user', user_id)
@@ -684,6 +619,8 @@ def change_password():
             'message': 'Password changed successfully'
         }), 200
     
+    except PasswordHashingBusy:
+        return jsonify({'error': 'Server is busy. Please try again in a moment.'}), 503, {'Retry-After': '2'}
     except Exception as e:
-        print(f"Change password error: {e}")
+        logger.error("Change password error: %s", e)
         return jsonify({'error': 'Failed to change password'}), 500
\ No newline at end of file
@@ -2,18 +2,40 @@
 Clinical Decision Support API Blueprint
 """
 
+import logging
 from flask import Blueprint, request, jsonify
 from bson import ObjectId
 from datetime import datetime
+import os
 from app.models.database import Database
 from app.utils.auth import require_auth
+from app.utils.user_cache import get_user_by_id
+from app.utils.record_store import insert_record_with_file
 from app.ai_cds import CDSEngine
 
+logger = logging.getLogger(__name__)
+
 bp = Blueprint('cds', __name__, url_prefix='/api/cds')
 
-# Initialize CDS Engine
-db = Database.get_db()
-cds_engine = CDSEngine(db)
+# CDS Engine is created lazily per process so workers never share a pre-fork MongoClient
+_cds_engine = None
+
+
+def get_cds_engine():
+    """Get the CDS engine for this process, creating it on first use"""
+    global _cds_engine
+    if _cds_engine is None:
+        _cds_engine = CDSEngine(Database.get_db())
+    return _cds_engine
+
+
+def _reset_cds_engine():
+    global _cds_engine
+    _cds_engine = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_cds_engine)
 
 
 @bp.route('/analyze', methods=['POST'])
@@ -39,10 +61,10 @@ def analyze_patient():
         
         physician_id = request.user.get('user_id')
         
-        print(f"🔍 CDS Analysis Request: patient_id={patient_id}, trigger={trigger_type}")
+        logger.debug("CDS Analysis Request: patient_id=%s, trigger=%s", patient_id, trigger_type)
         
         # Perform CDS analysis
-        suggestions = cds_engine.analyze_and_suggest(
+        suggestions = get_cds_engine().analyze_and_suggest(
             patient_id=patient_id,
             physician_id=physician_id,
             context_data=context_data,
@@ -50,10 +72,10 @@ def analyze_patient():
         )
         
         if 'error' in suggestions:
-            print(f"❌ CDS Error: {suggestions['error']}")
+            logger.error("CDS Error: %s", suggestions['error'])
             return jsonify({'success': False, 'error': suggestions['error']}), 400
         
-        print(f"✅ CDS Analysis Success: {len(suggestions.get('differential_diagnosis', []))} diagnoses, {len(suggestions.get('medication_recommendations', []))} medications")
+        logger.debug("CDS Analysis Success: %s diagnoses, %s medications", len(suggestions.get('differential_diagnosis', [])), len(suggestions.get('medication_recommendations', [])))
         
         return jsonify({
             'success': True,
@@ -61,7 +83,7 @@ def analyze_patient():
         }), 200
         
     except Exception as e:
-        print(f"❌ CDS Exception: {str(e)}")
+        logger.exception("CDS Exception: %s", e)
         return jsonify({'success': False, 'error': f'Analysis failed: {str(e)}'}), 500
 
 
@@ -86,7 +108,7 @@ def check_medication_safety():
             return jsonify({'error': 'Access denied'}), 403
         
         # Perform safety check
-        safety_report = cds_engine.check_medication_safety(
+        safety_report = get_cds_engine().check_medication_safety(
             patient_id=patient_id,
             medication=medication,
             dose=dose
@@ -133,7 +155,7 @@ def record_feedback():
         physician_id = request.user.get('user_id')
         
         # Record feedback
-        success = cds_engine.record_physician_feedback(
+        success = get_cds_engine().record_physician_feedback(
             physician_id=physician_id,
             suggestion_id=suggestion_id,
             suggestion_type=suggestion_type,
@@ -166,7 +188,7 @@ def get_preferences():
         
         physician_id = request.user.get('user_id')
         
-        preferences = cds_engine.learning_system.get_physician_preferences(physician_id)
+        preferences = get_cds_engine().learning_system.get_physician_preferences(physician_id)
         
         return jsonify({
             'success': True,
@@ -191,7 +213,7 @@ def update_preferences():
         physician_id = request.user.get('user_id')
         
         # Update preferences in database
-        db.physician_preferences.update_one(
+        Database.get_db().physician_preferences.update_one(
             {'physician_id': ObjectId(physician_id)},
             {
                 '$set': {
@@ -224,7 +246,7 @@ def get_analytics():
         physician_id = request.user.get('user_id')
         days = request.args.get('days', 30, type=int)
         
-        analytics = cds_engine.learning_system.get_feedback_analytics(physician_id, days)
+        analytics = get_cds_engine().learning_system.get_feedback_analytics(physician_id, days)
         
         return jsonify({
             'success': True,
@@ -255,14 +277,14 @@ def get_differential_diagnosis():
         # Get patient context if patient_id provided
         patient_context = {}
         if patient_id:
-            patient_context = cds_engine.context_analyzer.analyze_patient_context(patient_id)
+            patient_context = get_cds_engine().context_analyzer.analyze_patient_context(patient_id)
         
         # Get differential diagnosis
-        ddx_list = cds_engine.knowledge_base.get_differential_diagnosis(symptoms, patient_context)
+        ddx_list = get_cds_engine().knowledge_base.get_differential_diagnosis(symptoms, patient_context)
         
         # Filter based on physician preferences
         physician_id = request.user.get('user_id')
-        ddx_list = cds_engine.learning_system.filter_suggestions(
+        ddx_list = get_cds_engine().learning_system.filter_suggestions(
             physician_id, ddx_list, 'differential_diagnosis'
         )
         
@@ -282,7 +304,7 @@ def get_guideline(topic):
     Get clinical guideline for a topic
     """
     try:
-        guideline = cds_engine.knowledge_base.get_clinical_guideline(topic)
+        guideline = get_cds_engine().knowledge_base.get_clinical_guideline(topic)
         
         if not guideline:
             return jsonify({'error': 'Guideline not found'}), 404
@@ -316,10 +338,10 @@ def ai_enhance_diagnosis():
         # Get patient context
         patient_context = {}
         if patient_id:
-            patient_context = cds_engine.context_analyzer.analyze_patient_context(patient_id)
+            patient_context = get_cds_engine().context_analyzer.analyze_patient_context(patient_id)
         
         # Get AI-enhanced diagnosis
-        ai_result = cds_engine.gemini_ai.enhance_differential_diagnosis(symptoms, patient_context)
+        ai_result = get_cds_engine().gemini_ai.enhance_differential_diagnosis(symptoms, patient_context)
         
         if not ai_result:
             return jsonify({'error': 'AI enhancement unavailable'}), 503
@@ -380,15 +402,14 @@ def save_prescription():
             return jsonify({'error': 'Diagnosis and medications are required'}), 400
         
         # Get patient and doctor details
-        users_collection = Database.get_collection('users')
         records_collection = Database.get_collection('records')
         
-        patient = users_collection.find_one({'_id': ObjectId(patient_id)})
+        patient = get_user_by_id(patient_id)
         if not patient:
             return jsonify({'error': 'Patient not found'}), 404
         
         doctor_id = request.user.get('user_id')
-        doctor = users_collection.find_one({'_id': ObjectId(doctor_id)})
+        doctor = get_user_by_id(doctor_id)
         if not doctor:
             return jsonify({'error': 'Doctor not found'}), 404
         
@@ -418,48 +439,33 @@ def save_prescription():
             appointment_data
         )
         
-        # Encrypt the PDF
-        from app.utils.encryption import encrypt_file_data
-        encryption_result = encrypt_file_data(pdf_bytes)
-        
-        if not encryption_result['success']:
-            return jsonify({'error': 'Failed to encrypt prescription PDF'}), 500
-        
         # Save to medical records
         medical_record = {
             'patient_id': ObjectId(patient_id),
             'file_name': filename,
             'file_type': 'application/pdf',
-            'file_size': len(pdf_bytes),
             'description': f"Prescription - {diagnosis}",
             'uploaded_at': datetime.utcnow(),
             'uploaded_by': 'doctor',
             'doctor_id': ObjectId(doctor_id),
             'is_prescription': True,
             'is_deleted': False,
-            'encrypted_data': encryption_result['encrypted_data'],
-            'encryption_metadata': {'method': encryption_result['encryption_method']},
             'prescription_details': prescription_data
         }
         
-        result = records_collection.insert_one(medical_record)
+        record_id = insert_record_with_file(records_collection, medical_record, pdf_bytes)
         
-        print(f"✅ Prescription PDF saved: {filename}")
-        print(f"✅ Record ID: {result.inserted_id}")
-        print(f"✅ File size: {len(pdf_bytes)} bytes")
+        logger.info("Prescription PDF saved: %s (record %s, %s bytes)", filename, record_id, len(pdf_bytes))
         
         return jsonify({
             'success': True,
             'message': 'Prescription saved successfully to patient medical records',
             'filename': filename,
-            'file_size': len(pdf_bytes),
-            'record_id': str(result.inserted_id)
+            'record_id': str(record_id)
         }), 200
         
     except Exception as e:
-        print(f"Save prescription error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Save prescription error: %s", e)
         return jsonify({'error': f'Failed to save prescription: {str(e)}'}), 500
 
 
@@ -489,10 +495,9 @@ def ai_generate_treatment():
             return jsonify({'error': 'Either symptoms or diagnosis is required'}), 400
         
         # Try Gemini AI first, fallback to knowledge base
-        print(f"🤖 Attempting to generate treatment plan with Gemini AI...")
-        print(f"Patient data: symptoms={symptoms}, diagnosis={diagnosis}")
-        ai_response = cds_engine.gemini_ai.generate_treatment_plan(data)
-        print(f"Gemini response: {ai_response is not None}")
+        logger.debug("Attempting to generate treatment plan with Gemini AI...")
+        ai_response = get_cds_engine().gemini_ai.generate_treatment_plan(data)
+        logger.debug("Gemini response: %s", ai_response is not None)
         
         if ai_response:
             # Parse Gemini response
@@ -541,7 +546,7 @@ def ai_generate_treatment():
             }), 200
         
     except Exception as e:
-        print(f"Treatment generation error: {str(e)}")
+        logger.error("Treatment generation error: %s", e)
         return jsonify({'error': f'Failed to generate treatment plan: {str(e)}'}), 500
 
 
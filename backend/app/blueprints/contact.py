@@ -1,9 +1,12 @@
+import logging
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 from bson import ObjectId
 from app.models.database import Database
 from app.utils.auth import require_auth, require_role
 
+logger = logging.getLogger(__name__)
+
 contact_bp = Blueprint('contact', __name__)
 
 def get_contact_collection():
@@ -49,7 +52,7 @@ def submit_contact():
         }), 201
         
     except Exception as e:
-        print(f"Contact form error: {e}")
+        logger.error("Contact form error: %s", e)
         return jsonify({'error': 'Failed to submit contact form'}), 500
 
 
@@ -82,7 +85,7 @@ def get_contact_messages():
             msg['_id'] = str(msg['_id'])
         
         # Get counts by status
-        total_count = contact_collection.count_documents({})
+        total_count = contact_collection.estimated_document_count()
         unread_count = contact_collection.count_documents({'status': 'unread'})
         read_count = contact_collection.count_documents({'status': 'read'})
         replied_count = contact_collection.count_documents({'status': 'replied'})
@@ -98,7 +101,7 @@ def get_contact_messages():
         }), 200
         
     except Exception as e:
-        print(f"Get contact messages error: {e}")
+        logger.error("Get contact messages error: %s", e)
         return jsonify({'error': 'Failed to fetch contact messages'}), 500
 
 
@@ -130,7 +133,7 @@ def update_message_status(message_id):
         return jsonify({'message': 'Status updated successfully'}), 200
         
     except Exception as e:
-        print(f"Update message status error: {e}")
+        logger.error("Update message status error: %s", e)
         return jsonify({'error': 'Failed to update status'}), 500
 
 
@@ -152,5 +155,5 @@ def delete_message(message_id):
         return jsonify({'message': 'Message deleted successfully'}), 200
         
     except Exception as e:
-        print(f"Delete message error: {e}")
+        logger.error("Delete message error: %s", e)
         return jsonify({'error': 'Failed to delete message'}), 500
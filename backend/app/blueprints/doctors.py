@@ -3,10 +3,14 @@ Doctors Blueprint
 Handles doctor-specific functionality
 """
 
+import logging
 from flask import Blueprint, request, jsonify
 from bson import ObjectId
 from app.models.database import get_users_collection, get_access_permissions_collection
 from app.utils.auth import require_auth
+from app.utils.user_cache import get_user_by_id
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('doctors', __name__, url_prefix='/api/doctors')
 
@@ -25,7 +29,7 @@ def get_doctor_card():
         user_id = request.user['user_id']
         
         # Get user details
-        user = users_collection.find_one({'_id': ObjectId(user_id)})
+        user = get_user_by_id(user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -63,7 +67,5 @@ def get_doctor_card():
         return jsonify({'doctor_card': doctor_card}), 200
     
     except Exception as e:
-        print(f"Get doctor card error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Get doctor card error: %s", e)
         return jsonify({'error': 'Failed to get doctor card'}), 500
@@ -1,7 +1,11 @@
+import logging
 from flask import Blueprint, request, jsonify
 from bson import ObjectId
 from app.models.database import get_users_collection, get_records_collection
 from app.utils.auth import require_auth, require_role
+from app.utils.user_cache import get_user_by_id
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('patients', __name__, url_prefix='/api/patients')
 
@@ -20,7 +24,7 @@ def get_patient_profile():
         user_id = request.user['user_id']
         
         # Get user info
-        user = users_collection.find_one({'_id': ObjectId(user_id)})
+        user = get_user_by_id(user_id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
@@ -31,13 +35,14 @@ def get_patient_profile():
         })
         
         user.pop('password_hash', None)
+        user.pop('search_tokens', None)
         user['_id'] = str(user['_id'])
         user['record_count'] = record_count
         
         return jsonify({'patient': user}), 200
     
     except Exception as e:
-        print(f"Get patient profile error: {e}")
+        logger.error("Get patient profile error: %s", e)
         return jsonify({'error': 'Failed to fetch profile'}), 500
 
 @bp.route('/list', methods=['GET'])
@@ -51,7 +56,7 @@ def list_patients():
         if users_collection is None:
             return jsonify({'error': 'Database connection error'}), 503
         
-        patients = list(users_collection.find({'role': 'patient'}))
+        patients = list(users_collection.find({'role': 'patient'}, {'search_tokens': 0}))
         
         for patient in patients:
             patient.pop('password_hash', None)
@@ -60,7 +65,7 @@ def list_patients():
         return jsonify({'patients': patients, 'count': len(patients)}), 200
     
     except Exception as e:
-        print(f"List patients error: {e}")
+        logger.error("List patients error: %s", e)
         return jsonify({'error': 'Failed to fetch patients'}), 500
 
 @bp.route('/health-card', methods=['GET'])
@@ -77,7 +82,7 @@ def get_health_card():
         user_id = request.user['user_id']
         
         # Get user details
-        user = users_collection.find_one({'_id': ObjectId(user_id)})
+        user = get_user_by_id(user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -109,5 +114,5 @@ def get_health_card():
         return jsonify({'health_card': health_card}), 200
     
     except Exception as e:
-        print(f"Get health card error: {e}")
+        logger.error("Get health card error: %s", e)
         return jsonify({'error': 'Failed to get health card'}), 500
@@ -1,14 +1,32 @@
-from flask import Blueprint, request, jsonify, send_file
+import base64
+import logging
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, send_file
 from bson import ObjectId
-from io import BytesIO
+from bson.errors import InvalidId
+from werkzeug.datastructures import ContentRange
 from app.models.database import get_records_collection, get_users_collection
 from app.models.schemas import RecordSchema
 from app.utils.auth import require_auth
-from app.utils.encryption import encrypt_file_data, decrypt_file_data
+from app.utils.record_store import (
+    RECORD_METADATA_PROJECTION, RecordFileTooLarge, insert_record_with_file, insert_records_with_files,
+    attach_inline_payload, has_record_file, open_record_file, open_record_range, record_etag, supports_byte_ranges
+)
+from app.utils.thumbnails import find_thumbnails, schedule_thumbnails, decrypt_thumbnail
 from app.utils.audit import log_action
+from app.utils.zip_stream import stream_zip
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('records', __name__, url_prefix='/api/records')
 
+# Largest file accepted per record
+MAX_RECORD_SIZE = 10 * 1024 * 1024
+
+# Record fields needed to find or render a thumbnail
+THUMBNAIL_SOURCE_PROJECTION = {'blob_id': 1, 'patient_id': 1, 'file_type': 1, 'encryption_metadata': 1}
+
 @bp.route('/upload', methods=['POST'])
 @require_auth
 def upload_record():
@@ -36,45 +54,105 @@ def upload_record():
         if request.user['role'] == 'patient' and patient_id != request.user['user_id']:
             return jsonify({'error': 'Cannot upload for other patients'}), 403
         
-        # Read file data
-        file_data = file.read()
-        
-        # Check file size (10MB limit)
-        if len(file_data) > 10 * 1024 * 1024:
-            return jsonify({'error': 'File size must be less than 10MB'}), 400
-        
-        # Encrypt the file
-        encryption_result = encrypt_file_data(file_data)
-        
-        if not encryption_result['success']:
-            return jsonify({'error': 'Encryption failed'}), 500
-        
         # Create record document
         record_doc = RecordSchema.create(
             patient_id=patient_id,
             uploaded_by=request.user['user_id'],
             file_name=file.filename,
             file_type=file.content_type or 'application/octet-stream',
-            encrypted_data=encryption_result['encrypted_data'],
-            encryption_metadata={'method': encryption_result['encryption_method']},
             description=description
         )
         
-        # Insert into database
-        result = records_collection.insert_one(record_doc)
+        # Encrypt the file into the blob store as it is read and insert the record
+        try:
+            record_id = insert_record_with_file(records_collection, record_doc, file.stream,
+                                                max_size=MAX_RECORD_SIZE)
+        except RecordFileTooLarge as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Render the preview in the background
+        schedule_thumbnails([record_doc])
         
         # Log the action
-        log_action(request.user['user_id'], 'upload', 'record', str(result.inserted_id))
+        log_action(request.user['user_id'], 'upload', 'record', str(record_id))
         
         return jsonify({
             'message': 'Record uploaded successfully',
-            'record_id': str(result.inserted_id)
+            'record_id': str(record_id)
         }), 201
     
     except Exception as e:
-        print(f"Upload error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Upload error: %s", e)
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+@bp.route('/upload-batch', methods=['POST'])
+@require_auth
+def upload_records_batch():
+    """Upload several encrypted medical records for one patient (multipart field 'files')"""
+    try:
+        # Get records collection
+        records_collection = get_records_collection()
+        if records_collection is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        
+        files = [file for file in request.files.getlist('files') if file.filename]
+        if not files:
+            return jsonify({'error': 'No files provided'}), 400
+        if len(files) > Config.RECORD_BATCH_MAX_FILES:
+            return jsonify({'error': f'At most {Config.RECORD_BATCH_MAX_FILES} files per upload'}), 400
+        
+        # Get additional data
+        description = request.form.get('description', '')
+        patient_id = request.form.get('patient_id', request.user['user_id'])
+        
+        # Verify user can upload for this patient
+        if request.user['role'] == 'patient' and patient_id != request.user['user_id']:
+            return jsonify({'error': 'Cannot upload for other patients'}), 403
+        
+        items = [(
+            RecordSchema.create(
+                patient_id=patient_id,
+                uploaded_by=request.user['user_id'],
+                file_name=file.filename,
+                file_type=file.content_type or 'application/octet-stream',
+                description=description
+            ),
+            file.stream
+        ) for file in files]
+        
+        # Encrypt in parallel, then insert all records at once
+        results = insert_records_with_files(records_collection, items, max_size=MAX_RECORD_SIZE)
+        
+        statuses = [{
+            'file_name': file.filename,
+            'status': 'uploaded' if record_id else 'failed',
+            'record_id': str(record_id) if record_id else None,
+            'error': error
+        } for file, (record_id, error) in zip(files, results)]
+        uploaded = [status['record_id'] for status in statuses if status['record_id']]
+        
+        # Render previews in the background
+        schedule_thumbnails([record_doc for (record_doc, _), (record_id, _) in zip(items, results) if record_id])
+        
+        # Log the action (one entry for the whole batch)
+        if uploaded:
+            log_action(request.user['user_id'], 'upload_batch', 'record', patient_id,
+                       details={'record_ids': uploaded, 'failed': len(statuses) - len(uploaded)})
+        
+        if len(uploaded) == len(statuses):
+            status_code = 201
+        else:
+            status_code = 207 if uploaded else 400
+        
+        return jsonify({
+            'message': f'{len(uploaded)} of {len(statuses)} records uploaded',
+            'uploaded': len(uploaded),
+            'failed': len(statuses) - len(uploaded),
+            'files': statuses
+        }), status_code
+    
+    except Exception as e:
+        logger.exception("Batch upload error: %s", e)
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
 @bp.route('/my-records', methods=['GET'])
@@ -92,7 +170,7 @@ def get_my_records():
         records = list(records_collection.find({
             'patient_id': ObjectId(user_id),
             'is_deleted': False
-        }).sort('uploaded_at', -1))
+        }, RECORD_METADATA_PROJECTION).sort('uploaded_at', -1))
         
         # Format records - convert all ObjectId fields to strings
         for record in records:
@@ -102,15 +180,89 @@ def get_my_records():
                 record['uploaded_by'] = str(record['uploaded_by'])
             if 'doctor_id' in record:
                 record['doctor_id'] = str(record['doctor_id'])
-            # Don't send encrypted data in list view
-            record.pop('encrypted_data', None)
+            # Don't send storage internals in list view
+            record.pop('blob_id', None)
+            record.pop('blob_sha256', None)
+            record.pop('content_hash', None)
         
         return jsonify({'records': records, 'count': len(records)}), 200
     
     except Exception as e:
-        print(f"Get records error: {e}")
+        logger.error("Get records error: %s", e)
         return jsonify({'error': 'Failed to fetch records'}), 500
 
+@bp.route('/thumbnails', methods=['GET'])
+@require_auth
+def get_thumbnails():
+    """Get thumbnails for several records at once (?ids=<record_id>,<record_id>,...)"""
+    try:
+        # Get records collection
+        records_collection = get_records_collection()
+        if records_collection is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        
+        try:
+            record_ids = [ObjectId(value.strip()) for value in request.args.get('ids', '').split(',') if value.strip()]
+        except InvalidId:
+            return jsonify({'error': 'Invalid record id'}), 400
+        if not record_ids:
+            return jsonify({'error': 'No record ids provided'}), 400
+        if len(record_ids) > Config.THUMBNAIL_BATCH_MAX:
+            return jsonify({'error': f'At most {Config.THUMBNAIL_BATCH_MAX} records per request'}), 400
+        
+        # Patients only see their own records, doctors those of patients who granted them access
+        role = request.user['role']
+        if role not in ('patient', 'doctor'):
+            return jsonify({'error': 'Access denied'}), 403
+        query = {'_id': {'$in': record_ids}, 'is_deleted': False}
+        if role == 'patient':
+            query['patient_id'] = ObjectId(request.user['user_id'])
+        records = {record['_id']: record for record in records_collection.find(query, THUMBNAIL_SOURCE_PROJECTION)}
+        if role == 'doctor' and records:
+            granted = _granted_patient_ids(request.user['user_id'], {record['patient_id'] for record in records.values()})
+            if granted is None:
+                return jsonify({'error': 'Database connection error'}), 503
+            # Records of other patients are reported as not found
+            records = {record_id: record for record_id, record in records.items() if record['patient_id'] in granted}
+        
+        stored = find_thumbnails({record['blob_id'] for record in records.values() if record.get('blob_id')})
+        # Render missing thumbnails in the background; the client asks again for pending ones
+        queued = schedule_thumbnails([record for record in records.values() if record.get('blob_id') not in stored])
+        
+        thumbnails = []
+        for record_id in record_ids:
+            record = records.get(record_id)
+            entry = {'record_id': str(record_id)}
+            thumbnail = stored.get(record.get('blob_id')) if record else None
+            if record is None:
+                entry['status'] = 'not_found'
+            elif thumbnail and thumbnail['status'] == 'ready':
+                entry.update({
+                    'status': 'ready',
+                    'content_type': thumbnail['content_type'],
+                    'width': thumbnail['width'],
+                    'height': thumbnail['height'],
+                    'data': base64.b64encode(decrypt_thumbnail(thumbnail)).decode('ascii')
+                })
+            elif (thumbnail and thumbnail['status'] == 'pending') or record.get('blob_id') in queued:
+                entry['status'] = 'pending'
+            else:
+                entry['status'] = 'unavailable'
+            thumbnails.append(entry)
+        
+        # Log the action (one entry for the whole batch)
+        shown = [entry['record_id'] for entry in thumbnails if entry['status'] == 'ready']
+        if shown:
+            log_action(request.user['user_id'], 'view_thumbnails', 'record', details={'record_ids': shown})
+        
+        response = jsonify({'thumbnails': thumbnails})
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response, 200
+    
+    except Exception as e:
+        logger.error("Get thumbnails error: %s", e)
+        return jsonify({'error': 'Failed to fetch thumbnails'}), 500
+
 @bp.route('/<record_id>', methods=['GET'])
 @require_auth
 def get_record(record_id):
@@ -124,7 +276,7 @@ def get_record(record_id):
         record = records_collection.find_one({
             '_id': ObjectId(record_id),
             'is_deleted': False
-        })
+        }, RECORD_METADATA_PROJECTION)
         
         if not record:
             return jsonify({'error': 'Record not found'}), 404
@@ -139,8 +291,10 @@ def get_record(record_id):
             record['uploaded_by'] = str(record['uploaded_by'])
         if 'doctor_id' in record:
             record['doctor_id'] = str(record['doctor_id'])
-        # Don't send encrypted data
-        record.pop('encrypted_data', None)
+        # Don't send storage internals
+        record.pop('blob_id', None)
+        record.pop('blob_sha256', None)
+        record.pop('content_hash', None)
         
         # Log the action
         log_action(request.user['user_id'], 'view', 'record', record_id)
@@ -148,13 +302,33 @@ def get_record(record_id):
         return jsonify({'record': record}), 200
     
     except Exception as e:
-        print(f"Get record error: {e}")
+        logger.error("Get record error: %s", e)
         return jsonify({'error': 'Failed to fetch record'}), 500
 
+def _not_modified(etag):
+    """304 response for a client that already has this version of a file"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _requested_range(etag, size):
+    """
+    The single byte range requested, as (start, stop)
+    Returns None to send the whole file (no Range header, several ranges, or an
+    If-Range that no longer matches) and False if the range cannot be satisfied.
+    """
+    if request.range is None or request.range.units != 'bytes' or len(request.range.ranges) != 1:
+        return None
+    if_range = request.if_range
+    if if_range.date is not None or if_range.etag not in (None, etag):
+        return None
+    return request.range.range_for_length(size) or False
+
 @bp.route('/<record_id>/download', methods=['GET'])
 @require_auth
 def download_record(record_id):
-    """Download and decrypt record file"""
+    """Download and decrypt record file (supports Range and If-None-Match)"""
     try:
         # Get records collection
         records_collection = get_records_collection()
@@ -164,7 +338,7 @@ def download_record(record_id):
         record = records_collection.find_one({
             '_id': ObjectId(record_id),
             'is_deleted': False
-        })
+        }, RECORD_METADATA_PROJECTION)
         
         if not record:
             return jsonify({'error': 'Record not found'}), 404
@@ -173,19 +347,27 @@ def download_record(record_id):
         if request.user['role'] == 'patient' and str(record['patient_id']) != request.user['user_id']:
             return jsonify({'error': 'Access denied'}), 403
         
+        # Record files never change, so a matching ETag needs no blob fetch or decryption
+        etag = record_etag(record)
+        if request.if_none_match.contains(etag):
+            return _not_modified(etag)
+        
+        # Records not yet moved to the blob store keep their file inline
+        attach_inline_payload(records_collection, record)
+        
         # Check if this is an old prescription (stored as file) or new/regular record (encrypted)
-        if record.get('is_prescription', False) and record.get('file_path') and not record.get('encrypted_data'):
+        if record.get('is_prescription', False) and record.get('file_path') and not has_record_file(record):
             # OLD prescription PDF - read from file system (for backwards compatibility)
             import os
             
             file_path = record['file_path']
-            print(f"📄 Attempting to download OLD prescription PDF from file: {file_path}")
+            logger.debug("Attempting to download OLD prescription PDF from file: %s", file_path)
             
             if not os.path.exists(file_path):
-                print(f"❌ File not found: {file_path}")
+                logger.warning("File not found: %s", file_path)
                 return jsonify({'error': 'Prescription file not found. This may be an old prescription that was deleted during server restart.'}), 404
             
-            print(f"✅ File exists, sending: {file_path}")
+            logger.debug("File exists, sending: %s", file_path)
             
             # Log the action
             log_action(request.user['user_id'], 'download', 'record', record_id)
@@ -194,78 +376,113 @@ def download_record(record_id):
                 file_path,
                 download_name=record['file_name'],
                 as_attachment=True,
-                mimetype=record['file_type']
+                mimetype=record['file_type'],
+                etag=etag
             )
         else:
-            # NEW prescription or regular encrypted record - stored in MongoDB
-            if not record.get('encrypted_data'):
-                return jsonify({'error': 'Record data not found'}), 404
-            
-            print(f"📄 Downloading encrypted record from MongoDB: {record['file_name']}")
+            # NEW prescription or regular encrypted record - stored in the blob store
+            # (or inline in encrypted_data for records not yet migrated)
+            ranges_supported = supports_byte_ranges(record)
+            byte_range = _requested_range(etag, record['file_size']) if ranges_supported else None
+            if byte_range is False:
+                response = Response(status=416)
+                response.headers['Content-Range'] = f"bytes */{record['file_size']}"
+                return response
             
-            # Decrypt file data
-            decrypted_data = decrypt_file_data(record['encrypted_data'])
-            
-            print(f"✅ Decrypted {len(decrypted_data)} bytes, sending file")
+            # Only the segments covering a range are fetched and decrypted
+            if byte_range:
+                file_pieces = open_record_range(record, *byte_range)
+            else:
+                file_pieces = open_record_file(record)
+            if file_pieces is None:
+                return jsonify({'error': 'Record data not found'}), 404
             
-            # Log the action
-            log_action(request.user['user_id'], 'download', 'record', record_id)
+            # Log the action (once per viewer session, not for every follow-up range)
+            if not byte_range or byte_range[0] == 0:
+                log_action(request.user['user_id'], 'download', 'record', record_id)
             
-            return send_file(
-                BytesIO(decrypted_data),
-                download_name=record['file_name'],
-                as_attachment=True,
-                mimetype=record['file_type']
-            )
+            # Stream the file as it is decrypted instead of buffering it
+            response = Response(file_pieces, status=206 if byte_range else 200, mimetype=record['file_type'])
+            response.headers.set('Content-Disposition', 'attachment', filename=record['file_name'])
+            response.headers['Accept-Ranges'] = 'bytes' if ranges_supported else 'none'
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.set_etag(etag)
+            if byte_range:
+                start, stop = byte_range
+                response.content_range = ContentRange('bytes', start, stop, record['file_size'])
+                response.content_length = stop - start
+            elif record.get('file_size') is not None:
+                response.content_length = record['file_size']
+            return response
     
     except Exception as e:
-        print(f"❌ Download error: {e}")
-        print(f"❌ Error type: {type(e).__name__}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Download error (%s): %s", type(e).__name__, e)
         return jsonify({'error': f'Download failed: {str(e)}'}), 500
 
+def _granted_patient_ids(doctor_id, patient_ids):
+    """
+    Patients (of patient_ids) who have granted a doctor access to their records
+    
+    Returns:
+        set: Patient ObjectIds, or None on a database connection error
+    """
+    from app.models.database import get_access_permissions_collection
+    
+    access_collection = get_access_permissions_collection()
+    if access_collection is None:
+        return None
+    return {permission['patient_id'] for permission in access_collection.find({
+        'doctor_id': ObjectId(doctor_id),
+        'patient_id': {'$in': [ObjectId(patient_id) for patient_id in patient_ids]}
+    }, {'patient_id': 1})}
+
+def _check_patient_records_access(patient_id):
+    """
+    Check the current user may see a patient's records
+    Patients may see their own; doctors need an access permission.
+    
+    Returns:
+        None if allowed, otherwise an error response tuple
+    """
+    user_id = request.user['user_id']
+    role = request.user['role']
+    
+    # If patient is viewing their own records
+    if role == 'patient' and patient_id == user_id:
+        return None
+    
+    # If doctor is viewing patient records
+    if role == 'doctor':
+        # Check if doctor has permission to view this patient's records
+        granted = _granted_patient_ids(user_id, [patient_id])
+        if granted is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        
+        if not granted:
+            return jsonify({'error': 'You do not have permission to view this patient\'s records'}), 403
+        return None
+    
+    return jsonify({'error': 'Access denied'}), 403
+
 @bp.route('/patient/<patient_id>', methods=['GET'])
 @require_auth
 def get_patient_records(patient_id):
     """Get records for a specific patient (for doctors with permission)"""
     try:
-        from app.models.database import get_access_permissions_collection
-        
         records_collection = get_records_collection()
-        access_collection = get_access_permissions_collection()
-        
-        if records_collection is None or access_collection is None:
+        if records_collection is None:
             return jsonify({'error': 'Database connection error'}), 503
         
         user_id = request.user['user_id']
-        role = request.user['role']
         
-        # If patient is viewing their own records
-        if role == 'patient' and patient_id == user_id:
-            records = list(records_collection.find({
-                'patient_id': ObjectId(patient_id),
-                'is_deleted': False
-            }).sort('uploaded_at', -1))
-        
-        # If doctor is viewing patient records
-        elif role == 'doctor':
-            # Check if doctor has permission to view this patient's records
-            permission = access_collection.find_one({
-                'doctor_id': ObjectId(user_id),
-                'patient_id': ObjectId(patient_id)
-            })
-            
-            if not permission:
-                return jsonify({'error': 'You do not have permission to view this patient\'s records'}), 403
-            
-            records = list(records_collection.find({
-                'patient_id': ObjectId(patient_id),
-                'is_deleted': False
-            }).sort('uploaded_at', -1))
+        denied = _check_patient_records_access(patient_id)
+        if denied:
+            return denied
         
-        else:
-            return jsonify({'error': 'Access denied'}), 403
+        records = list(records_collection.find({
+            'patient_id': ObjectId(patient_id),
+            'is_deleted': False
+        }, RECORD_METADATA_PROJECTION).sort('uploaded_at', -1))
         
         # Format records - convert all ObjectId fields to strings
         for record in records:
@@ -275,8 +492,10 @@ def get_patient_records(patient_id):
                 record['uploaded_by'] = str(record['uploaded_by'])
             if 'doctor_id' in record:
                 record['doctor_id'] = str(record['doctor_id'])
-            # Don't send encrypted data in list view
-            record.pop('encrypted_data', None)
+            # Don't send storage internals in list view
+            record.pop('blob_id', None)
+            record.pop('blob_sha256', None)
+            record.pop('content_hash', None)
         
         # Log the action
         log_action(user_id, 'view_patient_records', 'record', patient_id)
@@ -284,11 +503,58 @@ def get_patient_records(patient_id):
         return jsonify({'records': records, 'count': len(records)}), 200
     
     except Exception as e:
-        print(f"Get patient records error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Get patient records error: %s", e)
         return jsonify({'error': 'Failed to fetch patient records'}), 500
 
+def _export_entries(records_collection, records):
+    """ZIP entries for an export, each file decrypted only when it is written"""
+    for record in records:
+        uploaded_at = record.get('uploaded_at')
+        date_time = uploaded_at.timetuple()[:6] if uploaded_at else (1980, 1, 1, 0, 0, 0)
+        # Keep names unique and free of path components
+        file_name = (record.get('file_name') or 'record').replace('\\', '/').rsplit('/', 1)[-1]
+        name = f"{uploaded_at:%Y-%m-%d}_{str(record['_id'])[-6:]}_{file_name}" if uploaded_at \
+            else f"{record['_id']}_{file_name}"
+        
+        def _pieces(record=record):
+            pieces = open_record_file(attach_inline_payload(records_collection, record))
+            if pieces is None:
+                raise Exception("Record data not found")
+            return pieces
+        
+        yield name, date_time, record.get('file_type'), _pieces
+
+@bp.route('/patient/<patient_id>/export', methods=['GET'])
+@require_auth
+def export_patient_records(patient_id):
+    """Download all of a patient's records as one ZIP, streamed as it is built"""
+    try:
+        records_collection = get_records_collection()
+        if records_collection is None:
+            return jsonify({'error': 'Database connection error'}), 503
+        
+        denied = _check_patient_records_access(patient_id)
+        if denied:
+            return denied
+        
+        # Records are read from the cursor as the archive is written
+        records = records_collection.find({
+            'patient_id': ObjectId(patient_id),
+            'is_deleted': False
+        }, RECORD_METADATA_PROJECTION).sort('uploaded_at', -1).batch_size(50)
+        
+        # Log the action
+        log_action(request.user['user_id'], 'export_patient_records', 'record', patient_id)
+        
+        response = Response(stream_zip(_export_entries(records_collection, records)), mimetype='application/zip')
+        response.headers.set('Content-Disposition', 'attachment', filename=f'medical_records_{patient_id}.zip')
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response
+    
+    except Exception as e:
+        logger.exception("Export patient records error: %s", e)
+        return jsonify({'error': 'Failed to export patient records'}), 500
+
 @bp.route('/<record_id>', methods=['DELETE'])
 @require_auth
 def delete_record(record_id):
@@ -299,7 +565,7 @@ def delete_record(record_id):
         if records_collection is None:
             return jsonify({'error': 'Database connection error'}), 503
         
-        record = records_collection.find_one({'_id': ObjectId(record_id)})
+        record = records_collection.find_one({'_id': ObjectId(record_id)}, RECORD_METADATA_PROJECTION)
         
         if not record:
             return jsonify({'error': 'Record not found'}), 404
@@ -308,10 +574,10 @@ def delete_record(record_id):
         if request.user['role'] == 'patient' and str(record['patient_id']) != request.user['user_id']:
             return jsonify({'error': 'Access denied'}), 403
         
-        # Soft delete
+        # Soft delete (moved to the archive by archive_deleted_records.py after the retention period)
         records_collection.update_one(
             {'_id': ObjectId(record_id)},
-            {'$set': {'is_deleted': True}}
+            {'$set': {'is_deleted': True, 'deleted_at': datetime.utcnow()}}
         )
         
         # Log the action
@@ -320,5 +586,5 @@ def delete_record(record_id):
         return jsonify({'message': 'Record deleted successfully'}), 200
     
     except Exception as e:
-        print(f"Delete error: {e}")
+        logger.error("Delete error: %s", e)
         return jsonify({'error': 'Failed to delete record'}), 500
@@ -2,9 +2,13 @@
 Statistics Blueprint
 Provides public statistics for the landing page
 """
+import logging
 from flask import Blueprint, jsonify
 from app.models.database import Database, get_users_collection, get_records_collection
 from bson import ObjectId
+from app.utils.user_cache import get_user_by_id
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('stats', __name__, url_prefix='/api/stats')
 
@@ -41,7 +45,7 @@ def get_public_stats():
         }), 200
     
     except Exception as e:
-        print(f"Get public stats error: {e}")
+        logger.error("Get public stats error: %s", e)
         # Return default values on error
         return jsonify({
             'success': True,
@@ -73,7 +77,7 @@ def get_testimonials():
         
         # Enrich with user data (name and role only)
         for testimonial in testimonials:
-            user = users_collection.find_one({'_id': ObjectId(testimonial['user_id'])})
+            user = get_user_by_id(testimonial['user_id'])
             if user:
                 testimonial['user_name'] = user.get('full_name', 'Anonymous')
                 testimonial['user_role'] = user.get('role', 'user')
@@ -98,7 +102,7 @@ def get_testimonials():
         }), 200
     
     except Exception as e:
-        print(f"Get testimonials error: {e}")
+        logger.error("Get testimonials error: %s", e)
         # Return empty array on error
         return jsonify({
             'success': True,
@@ -109,20 +113,20 @@ def get_testimonials():
 @bp.route('/testimonials/submit', methods=['POST'])
 def submit_testimonial():
     """Submit a new testimonial (requires authentication)"""
-    from app.utils.auth import token_required
+    from app.utils.auth import decode_token, get_request_token
     from flask import request
     from datetime import datetime
     
     # Check authentication
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    token = get_request_token()
     if not token:
         return jsonify({'error': 'Authentication required'}), 401
     
     try:
         # Verify token and get user
-        import jwt
-        import os
-        decoded = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
+        decoded = decode_token(token)
+        if 'error' in decoded:
+            return jsonify({'error': decoded['error']}), 401
         user_id = decoded['user_id']
         
         db = Database.get_db()
@@ -174,27 +178,24 @@ def submit_testimonial():
             'testimonial_id': str(result.inserted_id)
         }), 201
     
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
     except Exception as e:
-        print(f"Submit testimonial error: {e}")
+        logger.error("Submit testimonial error: %s", e)
         return jsonify({'error': 'Failed to submit testimonial'}), 500
 
 @bp.route('/testimonials/my-testimonials', methods=['GET'])
 def get_my_testimonials():
     """Get user's own testimonials (requires authentication)"""
+    from app.utils.auth import decode_token, get_request_token
     from flask import request
-    import jwt
-    import os
     
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    token = get_request_token()
     if not token:
         return jsonify({'error': 'Authentication required'}), 401
     
     try:
-        decoded = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
+        decoded = decode_token(token)
+        if 'error' in decoded:
+            return jsonify({'error': decoded['error']}), 401
         user_id = decoded['user_id']
         
         db = Database.get_db()
@@ -218,5 +219,5 @@ def get_my_testimonials():
         }), 200
     
     except Exception as e:
-        print(f"Get my testimonials error: {e}")
+        logger.error("Get my testimonials error: %s", e)
         return jsonify({'error': 'Failed to fetch testimonials'}), 500
@@ -1,48 +1,20 @@
-from flask import Blueprint, request, jsonify
+import logging
+from flask import Blueprint, request, jsonify, Response
 from bson import ObjectId
 from datetime import datetime
-import base64
 from app.models.database import get_users_collection
 from app.utils.auth import require_auth, require_role
 from app.utils.audit import log_action
+from app.utils.user_cache import get_user_by_id, invalidate_user
+from app.utils.derived_fields import derived_updates
+from app.utils.photo_store import store_photo, get_photo, delete_photos, photo_version
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint('users', __name__, url_prefix='/api/users')
 
-def check_profile_completion(user_data):
-    """
-    Check if patient profile is complete with all required fields.
-    Returns True if complete, False otherwise.
-    """
-    if user_data.get('role') != 'patient':
-        return True  # Only validate for patients
-    
-    required_fields = [
-        'full_name',
-        'phone',
-        'gender',
-        'date_of_birth',
-        'address',
-        'blood_group',
-        'emergency_contact_name',
-        'emergency_contact',
-        'emergency_contact_relation',
-        'allergies',
-        'chronic_conditions'
-    ]
-    
-    for field in required_fields:
-        value = user_data.get(field)
-        
-        # For list fields (allergies, chronic_conditions), they must exist (can be empty list)
-        if field in ['allergies', 'chronic_conditions']:
-            if value is None:
-                return False
-        else:
-            # For other fields, must have non-empty value
-            if value is None or value == '':
-                return False
-    
-    return True
+# A photo's URL changes whenever it does, so browsers and proxies may keep it for a year
+PHOTO_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 
 @bp.route('/me', methods=['GET'])
 @require_auth
@@ -54,30 +26,21 @@ def get_current_user():
             return jsonify({'error': 'Database connection error'}), 503
         
         user_id = request.user['user_id']
-        user = users_collection.find_one({'_id': ObjectId(user_id)})
+        user = get_user_by_id(user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        # Check profile completion status
-        is_complete = check_profile_completion(user)
-        
-        # Update if changed
-        if user.get('is_profile_complete') != is_complete:
-            users_collection.update_one(
-                {'_id': ObjectId(user_id)},
-                {'$set': {'is_profile_complete': is_complete}}
-            )
-            user['is_profile_complete'] = is_complete
-        
         # Remove sensitive data
         user.pop('password_hash', None)
+        user.pop('search_tokens', None)
+        user.pop('directory', None)
         user['_id'] = str(user['_id'])
         
         return jsonify({'user': user}), 200
     
     except Exception as e:
-        print(f"Get user error: {e}")
+        logger.error("Get user error: %s", e)
         return jsonify({'error': 'Failed to fetch user'}), 500
 
 @bp.route('/<user_id>', methods=['GET'])
@@ -89,19 +52,21 @@ def get_user(user_id):
         if users_collection is None:
             return jsonify({'error': 'Database connection error'}), 503
         
-        user = users_collection.find_one({'_id': ObjectId(user_id)})
+        user = get_user_by_id(user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
         # Remove sensitive data
         user.pop('password_hash', None)
+        user.pop('search_tokens', None)
+        user.pop('directory', None)
         user['_id'] = str(user['_id'])
         
         return jsonify({'user': user}), 200
     
     except Exception as e:
-        print(f"Get user error: {e}")
+        logger.error("Get user error: %s", e)
         return jsonify({'error': 'Failed to fetch user'}), 500
 
 @bp.route('/all', methods=['GET'])
@@ -114,7 +79,7 @@ def get_all_users():
         if users_collection is None:
             return jsonify({'error': 'Database connection error'}), 503
         
-        users = list(users_collection.find())
+        users = list(users_collection.find({}, {'search_tokens': 0, 'directory': 0}))
         
         # Remove sensitive data
         for user in users:
@@ -124,13 +89,13 @@ def get_all_users():
         return jsonify({'users': users, 'count': len(users)}), 200
     
     except Exception as e:
-        print(f"Get users error: {e}")
+        logger.error("Get users error: %s", e)
         return jsonify({'error': 'Failed to fetch users'}), 500
 
 @bp.route('/update-profile', methods=['POST'])
 @require_auth
 def update_profile():
-    """Update user profile with comprehensive fields, setting is_profile_complete if all required medical data is present."""
+    """Update user profile with comprehensive fields; derived fields (is_profile_complete, search fields) are updated with them."""
     try:
         users_collection = get_users_collection()
         if users_collection is None:
@@ -139,7 +104,8 @@ def update_profile():
         data = request.get_json()
         user_id = request.user['user_id']
         
-        # Fetch current user data first
+        # Fetch current user data first, from the database: derived fields are computed
+        # from it, and a cached copy may predate another worker's write
         current_user = users_collection.find_one({'_id': ObjectId(user_id)})
         if not current_user:
             return jsonify({'error': 'User not found'}), 404
@@ -206,11 +172,11 @@ def update_profile():
                     return jsonify({'error': 'This RFID card is already registered to another user'}), 400
                 
                 update_fields['rfid_id'] = rfid_value
-                print(f"Setting RFID for user {user_id}: {rfid_value}")
+                logger.debug("Setting RFID for user %s", user_id)
             else:
                 # Allow clearing RFID (set to None/null)
                 update_fields['rfid_id'] = None
-                print(f"Clearing RFID for user {user_id}")
+                logger.debug("Clearing RFID for user %s", user_id)
         
         # Doctor-specific fields
         if 'specialization' in data:
@@ -238,47 +204,10 @@ def update_profile():
             return jsonify({'error': 'No fields to update'}), 400
         
         update_fields['updated_at'] = datetime.utcnow()
+        update_fields.update(derived_updates(update_fields, current_user))
         
-        # Check for profile completion
-        combined_profile = {**current_user, **update_fields}
-        
-        if request.user['role'] == 'patient':
-            # Check if profile is now complete
-            is_complete = check_profile_completion(combined_profile)
-            
-            # Always set the completion status based on current state
-            update_fields['is_profile_complete'] = is_complete
-            
-            print(f"Patient profile completion check: {is_complete}")
-            print(f"Required fields status:")
-            required_fields = [
-                'full_name', 'phone', 'gender', 'date_of_birth', 'blood_group', 'address', 
-                'emergency_contact', 'emergency_contact_name', 'emergency_contact_relation',
-                'allergies', 'chronic_conditions'
-            ]
-            for field in required_fields:
-                value = combined_profile.get(field)
-                print(f"  {field}: {value} (type: {type(value)})")
-        
-        elif request.user['role'] == 'doctor':
-            # Check doctor profile completion
-            required_doctor_fields = [
-                'full_name', 'phone', 'gender', 'date_of_birth', 'blood_group', 
-                'specialization', 'years_of_experience', 'qualification', 'languages_spoken'
-            ]
-            
-            is_complete = all(
-                combined_profile.get(field) not in [None, '', []]
-                for field in required_doctor_fields
-            )
-            
-            update_fields['is_profile_complete'] = is_complete
-            
-            print(f"Doctor profile completion check: {is_complete}")
-            print(f"Required fields status:")
-            for field in required_doctor_fields:
-                value = combined_profile.get(field)
-                print(f"  {field}: {value} (type: {type(value)})")
+        if 'is_profile_complete' in update_fields:
+            logger.debug("Profile completion for %s: %s", user_id, update_fields['is_profile_complete'])
 
         # Update user
         result = users_collection.update_one(
@@ -286,18 +215,18 @@ def update_profile():
             {'$set': update_fields}
         )
         
+        invalidate_user(user_id)
+        
         if result.matched_count == 0:
             return jsonify({'error': 'User not found'}), 404
         
         # Get updated user
-        updated_user = users_collection.find_one({'_id': ObjectId(user_id)})
+        updated_user = get_user_by_id(user_id)
         updated_user.pop('password_hash', None)
+        updated_user.pop('search_tokens', None)
+        updated_user.pop('directory', None)
         updated_user['_id'] = str(updated_user['_id'])
         
-        # Debug logging for RFID
-        if 'rfid_id' in update_fields:
-            print(f"RFID update successful. User now has RFID: {updated_user.get('rfid_id')}")
-        
         log_action(user_id, 'update_profile', 'user', user_id)
         
         return jsonify({
@@ -306,9 +235,7 @@ def update_profile():
         }), 200
     
     except Exception as e:
-        print(f"Update profile error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Update profile error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/upload-photo', methods=['POST'])
@@ -345,37 +272,45 @@ def upload_profile_photo():
         if len(file_data) > 2 * 1024 * 1024:
             return jsonify({'error': 'File too large. Maximum size is 2MB'}), 400
         
-        # Convert to base64 for storage
-        photo_base64 = base64.b64encode(file_data).decode('utf-8')
-        photo_data = f"data:image/{file_ext};base64,{photo_base64}"
+        # Resize into the stored variants; the user document only keeps the URL
+        try:
+            photo_url = store_photo(user_id, file_data)
+        except ValueError:
+            return jsonify({'error': 'Invalid image file'}), 400
         
         # Update user profile
         result = users_collection.update_one(
             {'_id': ObjectId(user_id)},
             {'$set': {
-                'profile_photo': photo_data,
+                'profile_photo': photo_url,
                 'updated_at': datetime.utcnow()
             }}
         )
         
+        invalidate_user(user_id)
+        
         if result.matched_count == 0:
+            delete_photos(user_id)
             return jsonify({'error': 'User not found'}), 404
         
-        # Get updated user
-        updated_user = users_collection.find_one({'_id': ObjectId(user_id)})
+        # Get updated user and drop the photos it no longer points to
+        updated_user = get_user_by_id(user_id)
+        delete_photos(user_id, keep=(photo_version(photo_url), photo_version(updated_user.get('profile_photo'))))
         updated_user.pop('password_hash', None)
+        updated_user.pop('search_tokens', None)
+        updated_user.pop('directory', None)
         updated_user['_id'] = str(updated_user['_id'])
         
         log_action(user_id, 'upload_profile_photo', 'user', user_id)
         
         return jsonify({
             'message': 'Profile photo uploaded successfully',
-            'photo_url': photo_data,
+            'photo_url': photo_url,
             'user': updated_user
         }), 200
     
     except Exception as e:
-        print(f"Upload profile photo error: {e}")
+        logger.error("Upload profile photo error: %s", e)
         return jsonify({'error': 'Failed to upload photo'}), 500
 
 @bp.route('/delete-photo', methods=['POST'])
@@ -397,14 +332,41 @@ def delete_profile_photo():
                 'updated_at': datetime.utcnow()
             }}
         )
+        invalidate_user(user_id)
         
         if result.matched_count == 0:
             return jsonify({'error': 'User not found'}), 404
         
+        delete_photos(user_id)
+        
         log_action(user_id, 'delete_profile_photo', 'user', user_id)
         
         return jsonify({'message': 'Profile photo deleted successfully'}), 200
     
     except Exception as e:
-        print(f"Delete profile photo error: {e}")
-        return jsonify({'error': 'Failed to delete photo'}), 500
\ No newline at end of file
+        logger.error("Delete profile photo error: %s", e)
+        return jsonify({'error': 'Failed to delete photo'}), 500
+
+@bp.route('/photos/<version>/<variant>', methods=['GET'])
+def get_profile_photo(version, variant):
+    """Serve one size variant of a profile photo (no auth: <img> tags send no token; the version is unguessable)"""
+    try:
+        etag = f"{version}-{variant}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = PHOTO_CACHE_CONTROL
+            return response
+        
+        photo = get_photo(version, variant)
+        if not photo:
+            return jsonify({'error': 'Photo not found'}), 404
+        
+        response = Response(bytes(photo['data']), mimetype=photo['content_type'])
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = PHOTO_CACHE_CONTROL
+        return response
+    
+    except Exception as e:
+        logger.error("Get profile photo error: %s", e)
+        return jsonify({'error': 'Failed to fetch photo'}), 500
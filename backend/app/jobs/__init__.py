@@ -0,0 +1,4 @@
+"""
+Maintenance jobs
+Long-running data migrations, run from the CLI scripts in backend/
+"""
@@ -0,0 +1,455 @@
+"""
+Bulk user import
+Loads patients or doctors from a partner hospital's export: CSV with a header
+row, or NDJSON (one JSON object per line). Rows are streamed and handled in
+batches. Each row is validated. Emails that are already registered, or that
+repeat within the file, are rejected. Initial passwords are hashed in a
+process pool, and patient and doctor IDs come from one allocate_ids() block
+per role. Each batch is written with an unordered insert_many, so one bad row
+does not stop the rest.
+
+Rows that cannot be imported go to a reject file (NDJSON: row number, error,
+the row as read with its password masked). Progress, including how far the
+reject file got, is saved in the bulk_imports collection after every batch.
+Running the same import again resumes after the last finished batch: the
+reject file is cut back to that point, and rows of the interrupted batch that
+were already written carry the import_id and are skipped.
+
+Files uploaded through the admin API (delete_source) hold initial passwords.
+They are kept only as long as the import can still be resumed: queued,
+running or failed. They are deleted as soon as it completes. Reject files
+are kept for download.
+
+Columns are user fields (email, full_name, phone, gender, date_of_birth,
+blood_group, nmc_uid, specialization, ...); list fields are ';'-separated in
+CSV. role defaults to the import's role. password is optional: it is hashed at
+IMPORT_BCRYPT_ROUNDS and upgraded to BCRYPT_ROUNDS on first login. Users
+imported without one sign in with SMS OTP or RFID. Other columns are ignored.
+"""
+
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from app.models.database import Database
+from app.models.schemas import UserSchema
+from app.utils.derived_fields import derived_values
+from app.utils.id_generator import ID_KINDS, allocate_ids
+from app.utils.password import _hashpw, is_strong_password
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+IMPORTS_COLLECTION = 'bulk_imports'
+
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'ndjson'}
+IMPORT_ROLES = ('patient', 'doctor')
+
+# Profile columns copied as they are, and list columns (';'-separated in CSV)
+TEXT_FIELDS = ('phone', 'gender', 'date_of_birth', 'address', 'blood_group', 'height', 'weight',
+               'emergency_contact', 'emergency_contact_name', 'emergency_contact_relation', 'specialization',
+               'years_of_experience', 'qualification', 'hospital_affiliation', 'consultation_fee', 'bio')
+LIST_FIELDS = ('allergies', 'chronic_conditions', 'current_medications', 'languages_spoken')
+
+_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Attempts at inserting rows whose new ID clashed with an existing one
+_ID_ATTEMPTS = 3
+
+# Written to the reject file in place of a row's password
+_MASK = '********'
+
+class InvalidRow(ValueError):
+    """A row that cannot be imported"""
+
+class ImportInProgress(Exception):
+    """The import is already running"""
+
+def detect_format(filename):
+    """csv or ndjson from a file name"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Unsupported file type '{extension}'; use .csv or .ndjson")
+    return FORMATS[extension]
+
+def read_rows(path, fmt):
+    """Yield (row number, row dict or InvalidRow) from a CSV or NDJSON file"""
+    if fmt == 'csv':
+        with open(path, newline='', encoding='utf-8-sig') as source:
+            for number, row in enumerate(csv.DictReader(source), start=1):
+                yield number, (InvalidRow('More values than columns') if None in row else row)
+        return
+    with open(path, encoding='utf-8') as source:
+        for number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, InvalidRow(f"Invalid JSON: {e}")
+                continue
+            yield number, (row if isinstance(row, dict) else InvalidRow('Expected a JSON object'))
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _list(value):
+    if value is None:
+        return []
+    items = value if isinstance(value, list) else str(value).split(';')
+    return [str(item).strip() for item in items if str(item).strip()]
+
+def parse_row(row, role):
+    """
+    Validate a row and build its user fields
+
+    Args:
+        row: The row as read
+        role: Role for rows without a role column
+
+    Returns:
+        tuple: (user document without IDs, initial password or None)
+
+    Raises:
+        InvalidRow: If a required field is missing or invalid
+    """
+    role = _text(row.get('role')) or role
+    if role not in IMPORT_ROLES:
+        raise InvalidRow(f"role must be one of: {', '.join(IMPORT_ROLES)}")
+    email = _text(row.get('email'))
+    if not email or not _EMAIL.match(email):
+        raise InvalidRow('A valid email is required')
+    full_name = _text(row.get('full_name'))
+    if not full_name:
+        raise InvalidRow('full_name is required')
+    nmc_uid = _text(row.get('nmc_uid'))
+    if role == 'doctor' and not UserSchema.validate_nmc_uid(nmc_uid):
+        raise InvalidRow('Doctors need a 7-digit nmc_uid')
+    password = _text(row.get('password'))
+    if password:
+        is_strong, message = is_strong_password(password)
+        if not is_strong:
+            raise InvalidRow(message)
+
+    user = UserSchema.create(email=email, password_hash=None, role=role, full_name=full_name,
+                             nmc_uid=nmc_uid if role == 'doctor' else None, rfid_id=_text(row.get('rfid_id')))
+    for field in TEXT_FIELDS:
+        if field in row:
+            user[field] = _text(row[field])
+    for field in LIST_FIELDS:
+        if field in row:
+            user[field] = _list(row[field])
+    return user, password
+
+def create_import(db, import_id, path, role='patient', fmt=None, reject_path=None, requested_by=None,
+                  delete_source=False):
+    """
+    Record a new (queued) import, replacing any earlier one with the same ID
+    With delete_source the source file is deleted once the import completes.
+    """
+    state = {
+        '_id': import_id,
+        'source': path,
+        'source_size': os.path.getsize(path),
+        'format': fmt or detect_format(path),
+        'role': role,
+        'reject_path': reject_path or f"{path}.rejects.ndjson",
+        'requested_by': requested_by,
+        'delete_source': delete_source,
+        'status': 'queued',
+        'rows_done': 0,
+        'reject_offset': 0,
+        'inserted': 0,
+        'rejected': 0,
+        'skipped': 0,
+        'error': None,
+        'started_at': datetime.utcnow(),
+        'updated_at': datetime.utcnow(),
+        'finished_at': None
+    }
+    db[IMPORTS_COLLECTION].replace_one({'_id': import_id}, state, upsert=True)
+    return state
+
+def _claim(db, import_id):
+    """Mark an import running, unless another process is running it"""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=Config.IMPORT_STALE_SECONDS)
+    state = db[IMPORTS_COLLECTION].find_one_and_update(
+        {'_id': import_id, 'status': {'$ne': 'completed'},
+         '$or': [{'status': {'$ne': 'running'}}, {'updated_at': {'$lt': stale}}]},
+        {'$set': {'status': 'running', 'error': None, 'updated_at': now}},
+        return_document=ReturnDocument.AFTER
+    )
+    if state is None:
+        raise ImportInProgress(f"Import {import_id} is already running or completed")
+    return state
+
+def _duplicate_field(error):
+    """The unique field a write error clashed on, or None"""
+    if error.get('code') != 11000:
+        return None
+    key = error.get('keyPattern') or error.get('keyValue') or {}
+    if key:
+        return next(iter(key))
+    match = re.search(r'index: (\w+?)_1', error.get('errmsg', ''))
+    return match.group(1) if match else 'unique field'
+
+class _Batch:
+    """One batch of rows on its way into the users collection"""
+
+    def __init__(self, db, state, hasher, workers, rejects):
+        self.users_collection = db['users']
+        self.state = state
+        self.hasher = hasher
+        self.workers = max(workers, 1)
+        self.rejects = rejects
+        self.counts = {'inserted': 0, 'rejected': 0, 'skipped': 0}
+
+    def reject(self, number, error, row):
+        self.counts['rejected'] += 1
+        if row and row.get('password'):
+            row = {**row, 'password': _MASK}
+        self.rejects.write(json.dumps({'row': number, 'error': str(error), 'data': row}, default=str) + '\n')
+
+    def _parse(self, rows):
+        parsed = []
+        for number, row in rows:
+            if isinstance(row, InvalidRow):
+                self.reject(number, row, None)
+                continue
+            try:
+                parsed.append((number, row) + parse_row(row, self.state['role']))
+            except InvalidRow as e:
+                self.reject(number, e, row)
+        return parsed
+
+    def _drop_duplicates(self, parsed):
+        """Rows whose email (or a doctor's NMC UID) is taken, repeated, or already imported by this run"""
+        emails = [user['email'] for _, _, user, _ in parsed]
+        existing = {user['email']: user for user in
+                    self.users_collection.find({'email': {'$in': emails}}, {'email': 1, 'import_id': 1, 'import_row': 1})}
+        nmc_uids = [user['nmc_uid'] for _, _, user, _ in parsed if user['nmc_uid']]
+        taken_nmc = {user['nmc_uid'] for user in
+                     self.users_collection.find({'nmc_uid': {'$in': nmc_uids}}, {'nmc_uid': 1})} if nmc_uids else set()
+
+        kept, seen_emails, seen_nmc = [], set(), set()
+        for number, row, user, password in parsed:
+            email, nmc_uid = user['email'], user['nmc_uid']
+            if email in existing and existing[email].get('import_id') == self.state['_id']:
+                # Written by an interrupted run of this batch, or by an earlier row
+                if existing[email].get('import_row') == number:
+                    self.counts['skipped'] += 1
+                else:
+                    self.reject(number, 'Email repeated in the file', row)
+            elif email in existing:
+                self.reject(number, 'Email already registered', row)
+            elif email in seen_emails:
+                self.reject(number, 'Email repeated in the file', row)
+            elif nmc_uid and (nmc_uid in taken_nmc or nmc_uid in seen_nmc):
+                self.reject(number, 'NMC UID already registered', row)
+            else:
+                seen_emails.add(email)
+                if nmc_uid:
+                    seen_nmc.add(nmc_uid)
+                kept.append((number, row, user, password))
+        return kept
+
+    def _hash(self, kept):
+        passwords = [password for _, _, _, password in kept if password]
+        if not passwords:
+            return
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        hashes = iter(self.hasher.map(_hashpw, passwords, repeat(Config.IMPORT_BCRYPT_ROUNDS), chunksize=chunksize))
+        for _, _, user, password in kept:
+            if password:
+                user['password_hash'] = next(hashes)
+
+    def _insert(self, entries):
+        """Insert (number, row, user) entries with new IDs; retry those whose ID clashed"""
+        for _ in range(_ID_ATTEMPTS):
+            if not entries:
+                return
+            for role in IMPORT_ROLES:
+                users = [user for _, _, user in entries if user['role'] == role]
+                for user, unique_id in zip(users, allocate_ids(role, len(users))):
+                    user[ID_KINDS[role][2]] = unique_id
+                    user.pop('_id', None)
+                    user.update(derived_values(user))
+            try:
+                result = self.users_collection.insert_many([user for _, _, user in entries], ordered=False)
+                self.counts['inserted'] += len(result.inserted_ids)
+                return
+            except BulkWriteError as e:
+                self.counts['inserted'] += e.details.get('nInserted', 0)
+                retry = []
+                for error in e.details.get('writeErrors', []):
+                    number, row, user = entries[error['index']]
+                    field = _duplicate_field(error)
+                    if field == ID_KINDS[user['role']][2]:
+                        retry.append((number, row, user))
+                    elif field:
+                        self.reject(number, f"{field} already registered", row)
+                    else:
+                        self.reject(number, error.get('errmsg', 'Write failed'), row)
+                entries = retry
+        for number, row, _ in entries:
+            self.reject(number, 'Could not allocate a unique ID', row)
+
+    def run(self, rows):
+        kept = self._drop_duplicates(self._parse(rows))
+        self._hash(kept)
+        for number, _, user, _ in kept:
+            user['import_id'] = self.state['_id']
+            user['import_row'] = number
+        self._insert([(number, row, user) for number, row, user, _ in kept])
+        return self.counts
+
+def _hasher(workers):
+    """Process pool for bcrypt (spawned, so it is safe to start from a threaded server)"""
+    if workers <= 0:
+        return ThreadPoolExecutor(max_workers=1)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+def run_import(db, import_id, path=None, role='patient', fmt=None, reject_path=None, batch_size=None,
+               workers=None, restart=False, progress=None):
+    """
+    Import (or resume importing) users from a CSV or NDJSON file
+
+    Args:
+        db: pymongo Database
+        import_id: Name of the import; an unfinished import with this ID is resumed
+        path: Source file (taken from the saved import when resuming)
+        role: Role for rows without a role column
+        fmt: 'csv' or 'ndjson' (default: from the file extension)
+        reject_path: Where rejected rows are written (default: next to the source)
+        batch_size: Rows per batch (IMPORT_BATCH_SIZE)
+        workers: Hashing processes (IMPORT_HASH_WORKERS; 0 hashes in a thread)
+        restart: Start over instead of resuming
+        progress: Optional callback(state) after each batch
+
+    Returns:
+        dict: The import state (status, rows_done, inserted, rejected, skipped)
+
+    Raises:
+        ImportInProgress: If another process is running the import
+        ValueError: If the source file changed since the import started
+    """
+    imports = db[IMPORTS_COLLECTION]
+    batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+    workers = Config.IMPORT_HASH_WORKERS if workers is None else workers
+
+    state = None if restart else imports.find_one({'_id': import_id})
+    if state is None:
+        if not path:
+            raise ValueError(f"No import {import_id} to resume")
+        create_import(db, import_id, path, role, fmt, reject_path)
+    elif state['status'] == 'completed':
+        return state
+    elif path and os.path.abspath(path) != os.path.abspath(state['source']):
+        raise ValueError(f"Import {import_id} was started from {state['source']}")
+    elif os.path.getsize(state['source']) != state['source_size']:
+        raise ValueError(f"{state['source']} changed since import {import_id} started; restart it")
+    state = _claim(db, import_id)
+
+    resume_after = state['rows_done']
+    try:
+        with open(state['reject_path'], 'a' if resume_after else 'w', encoding='utf-8') as rejects, \
+                _hasher(workers) as hasher:
+            # Drop what the interrupted batch rejected; it is processed again
+            if resume_after and state.get('reject_offset') is not None:
+                rejects.truncate(min(state['reject_offset'], rejects.tell()))
+                rejects.seek(0, os.SEEK_END)
+
+            def flush(rows):
+                counts = _Batch(db, state, hasher, workers, rejects).run(rows)
+                rejects.flush()
+                state.update(imports.find_one_and_update(
+                    {'_id': import_id},
+                    {'$set': {'rows_done': rows[-1][0], 'reject_offset': rejects.tell(),
+                              'updated_at': datetime.utcnow()},
+                     '$inc': counts},
+                    return_document=ReturnDocument.AFTER
+                ))
+                if progress:
+                    progress(state)
+
+            rows = []
+            for number, row in read_rows(state['source'], state['format']):
+                if number <= resume_after:
+                    continue
+                rows.append((number, row))
+                if len(rows) >= batch_size:
+                    flush(rows)
+                    rows = []
+            if rows:
+                flush(rows)
+    except Exception as e:
+        imports.update_one({'_id': import_id}, {'$set': {'status': 'failed', 'error': str(e),
+                                                         'updated_at': datetime.utcnow()}})
+        raise
+
+    now = datetime.utcnow()
+    imports.update_one({'_id': import_id}, {'$set': {'status': 'completed', 'updated_at': now, 'finished_at': now}})
+    state.update(status='completed', finished_at=now)
+    if state.get('delete_source'):
+        _delete_source(imports, state)
+    return state
+
+def _delete_source(imports, state):
+    """Delete a completed import's uploaded file (it holds initial passwords)"""
+    try:
+        os.remove(state['source'])
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error("Could not delete import file %s: %s", state['source'], e)
+        return
+    now = datetime.utcnow()
+    imports.update_one({'_id': state['_id']}, {'$set': {'source_deleted_at': now}})
+    state['source_deleted_at'] = now
+
+# Imports started from the admin API run one at a time per worker, in the background
+_import_executor = None
+_import_executor_lock = threading.Lock()
+
+def _get_import_executor():
+    global _import_executor
+    if _import_executor is None:
+        with _import_executor_lock:
+            if _import_executor is None:
+                _import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bulk-import')
+    return _import_executor
+
+def _reset_import_executor():
+    global _import_executor, _import_executor_lock
+    _import_executor = None
+    _import_executor_lock = threading.Lock()
+
+# The pool's thread does not survive fork; each worker starts its own on first use
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_import_executor)
+
+def _run_in_background(import_id):
+    try:
+        state = run_import(Database.get_db(), import_id)
+        logger.info("Import %s finished: %s inserted, %s rejected, %s skipped",
+                    import_id, state['inserted'], state['rejected'], state['skipped'])
+    except ImportInProgress as e:
+        logger.warning("%s", e)
+    except Exception as e:
+        logger.exception("Import %s failed: %s", import_id, e)
+
+def start_import(import_id):
+    """Run (or resume) a recorded import in this worker's background thread"""
+    _get_import_executor().submit(_run_in_background, import_id)
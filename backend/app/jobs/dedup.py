@@ -0,0 +1,189 @@
+"""
+Deduplicate record files that were stored before fingerprinting
+New uploads are fingerprinted and deduplicated as they are stored. Records
+uploaded earlier have no content_hash: fingerprint_records decrypts their
+files once to compute it (and labels their blobs so new uploads can share
+them). duplicate_report then finds patients holding the same file in more than
+one blob, reports the storage that would be reclaimed and, when applying,
+points the records at a single blob and deletes the others.
+"""
+
+import logging
+from app.utils.encryption import get_keyring, content_hasher
+from app.utils.record_store import delete_record_blobs, get_blob_files, open_record_file, release_record_blobs
+
+logger = logging.getLogger(__name__)
+
+_UNFINGERPRINTED = {'blob_id': {'$exists': True}, 'content_hash': {'$exists': False}}
+
+_PROJECTION = {'blob_id': 1, 'blob_sha256': 1, 'encryption_metadata': 1, 'patient_id': 1}
+
+def _fingerprint(record, db):
+    pieces = open_record_file(record, db)
+    if pieces is None:
+        return None
+    hasher = content_hasher(record.get('patient_id'))
+    for piece in pieces:
+        hasher.update(piece)
+    return hasher.hexdigest()
+
+def fingerprint_records(db, batch_size=100, limit=None, start_after=None, progress=None):
+    """
+    Compute content_hash for blob-stored records that do not have one
+
+    Args:
+        db: pymongo Database
+        batch_size: Records fetched per query
+        limit: Stop after this many records
+        start_after: Resume after this record _id
+        progress: Optional callback(report) after each batch
+
+    Returns:
+        dict: scanned, fingerprinted, missing and failed counts, last_id
+    """
+    records_collection = db['records']
+    files = get_blob_files(db)
+    report = {'scanned': 0, 'fingerprinted': 0, 'missing': 0, 'failed': 0, 'last_id': start_after}
+
+    while limit is None or report['scanned'] < limit:
+        query = dict(_UNFINGERPRINTED)
+        if report['last_id'] is not None:
+            query['_id'] = {'$gt': report['last_id']}
+        fetch = batch_size if limit is None else min(batch_size, limit - report['scanned'])
+        batch = list(records_collection.find(query, _PROJECTION).sort('_id', 1).limit(fetch))
+        if not batch:
+            break
+
+        for record in batch:
+            report['scanned'] += 1
+            report['last_id'] = record['_id']
+            try:
+                content_hash = _fingerprint(record, db)
+            except Exception as e:
+                logger.error("Failed to fingerprint record %s: %s", record['_id'], e)
+                report['failed'] += 1
+                continue
+            if content_hash is None:
+                report['missing'] += 1
+                continue
+
+            records_collection.update_one(
+                {'_id': record['_id'], 'blob_id': record['blob_id'], 'content_hash': {'$exists': False}},
+                {'$set': {'content_hash': content_hash}}
+            )
+            files.update_one(
+                {'_id': record['blob_id'], 'metadata.content_hash': {'$exists': False}},
+                {'$set': {'metadata.content_hash': content_hash,
+                          'metadata.blob_sha256': record.get('blob_sha256'),
+                          'metadata.encryption': record.get('encryption_metadata') or {}}}
+            )
+            # Blobs stored before reference counting belong to exactly one record
+            files.update_one(
+                {'_id': record['blob_id'], 'metadata.refcount': {'$exists': False}},
+                {'$set': {'metadata.refcount': 1}}
+            )
+            report['fingerprinted'] += 1
+
+        if progress:
+            progress(report)
+
+    return report
+
+def _merge_blob(db, keeper_id, duplicate_id):
+    """
+    Point every record of duplicate_id at keeper_id and delete duplicate_id
+
+    Returns:
+        bool: True if the duplicate blob was merged
+    """
+    records_collection = db['records']
+    files = get_blob_files(db)
+
+    # Pin the keeper so it cannot be deleted while records move onto it
+    if files.find_one_and_update({'_id': keeper_id, 'metadata.refcount': {'$gt': 0}},
+                                 {'$inc': {'metadata.refcount': 1}}) is None:
+        return False
+    # Zero references stops new uploads from sharing the duplicate
+    if files.find_one_and_update({'_id': duplicate_id, 'metadata.refcount': {'$gt': 0}},
+                                 {'$set': {'metadata.refcount': 0}}) is None:
+        release_record_blobs([keeper_id], db)
+        return False
+
+    template = records_collection.find_one({'blob_id': keeper_id}, {'blob_sha256': 1, 'encryption_metadata': 1})
+    moved = records_collection.update_many(
+        {'blob_id': duplicate_id},
+        {'$set': {'blob_id': keeper_id,
+                  'blob_sha256': template.get('blob_sha256'),
+                  'encryption_metadata': template.get('encryption_metadata')}}
+    ).modified_count
+    if moved:
+        files.update_one({'_id': keeper_id}, {'$inc': {'metadata.refcount': moved - 1}})
+    else:
+        release_record_blobs([keeper_id], db)
+    delete_record_blobs([duplicate_id], db)
+    return True
+
+def duplicate_report(db, apply=False, progress=None):
+    """
+    Find patients storing the same file in several blobs
+
+    Per duplicate group the blob under the primary key (then the most
+    referenced one) is kept. With apply=True the other blobs are merged into it.
+
+    Args:
+        db: pymongo Database
+        apply: Merge duplicates instead of only reporting them
+        progress: Optional callback(report) every 100 groups
+
+    Returns:
+        dict: groups, duplicate_blobs, reclaimable_bytes, merged, reclaimed_bytes,
+        failed, and shared_bytes (storage already saved by uploads sharing a blob)
+    """
+    files = get_blob_files(db)
+    primary_id = get_keyring().primary_id
+    report = {'groups': 0, 'duplicate_blobs': 0, 'reclaimable_bytes': 0,
+              'merged': 0, 'reclaimed_bytes': 0, 'failed': 0, 'shared_bytes': 0}
+
+    groups = db['records'].aggregate([
+        {'$match': {'blob_id': {'$exists': True}, 'content_hash': {'$exists': True}}},
+        {'$group': {'_id': {'patient_id': '$patient_id', 'content_hash': '$content_hash'},
+                    'blob_ids': {'$addToSet': '$blob_id'}}},
+        {'$match': {'blob_ids.1': {'$exists': True}}}
+    ], allowDiskUse=True)
+
+    for group in groups:
+        blobs = list(files.find({'_id': {'$in': group['blob_ids']}},
+                                {'length': 1, 'metadata.refcount': 1, 'metadata.encryption.key_id': 1}))
+        if len(blobs) < 2:
+            continue
+        blobs.sort(key=lambda blob: (
+            (blob.get('metadata') or {}).get('encryption', {}).get('key_id') == primary_id,
+            (blob.get('metadata') or {}).get('refcount', 1)
+        ), reverse=True)
+        keeper, duplicates = blobs[0], blobs[1:]
+
+        report['groups'] += 1
+        report['duplicate_blobs'] += len(duplicates)
+        report['reclaimable_bytes'] += sum(blob.get('length', 0) for blob in duplicates)
+
+        if apply:
+            for blob in duplicates:
+                try:
+                    if _merge_blob(db, keeper['_id'], blob['_id']):
+                        report['merged'] += 1
+                        report['reclaimed_bytes'] += blob.get('length', 0)
+                except Exception as e:
+                    logger.error("Failed to merge blob %s into %s: %s", blob['_id'], keeper['_id'], e)
+                    report['failed'] += 1
+
+        if progress and report['groups'] % 100 == 0:
+            progress(report)
+
+    shared = list(files.aggregate([
+        {'$match': {'metadata.refcount': {'$gt': 1}}},
+        {'$group': {'_id': None, 'bytes': {'$sum': {'$multiply': [
+            {'$subtract': ['$metadata.refcount', 1]}, '$length'
+        ]}}}}
+    ]))
+    report['shared_bytes'] = shared[0]['bytes'] if shared else 0
+    return report
@@ -0,0 +1,67 @@
+"""
+Backfill derived fields
+Write paths keep derived user fields (is_profile_complete, search_tokens,
+directory; see app.utils.derived_fields) current; this job fills them in for
+users written before a field existed, or recomputes them after the way they
+are computed changes. It works through users in _id order, writes only the
+values that differ with one bulk_write per batch and can be stopped and re-run
+at any point.
+"""
+
+import logging
+from pymongo import UpdateOne
+from app.utils.derived_fields import DEPENDENCIES
+
+logger = logging.getLogger(__name__)
+
+def backfill_derived_field(db, field, rebuild=False, batch_size=500, limit=None, start_after=None, progress=None):
+    """
+    Write a derived field for the users it is kept for
+
+    Args:
+        db: pymongo Database
+        field: A key of DEPENDENCIES
+        rebuild: Recompute the field for every user, not only those without it
+        batch_size: Users per query and per bulk write
+        limit: Stop after this many users
+        start_after: Resume after this user _id
+        progress: Optional callback(report) after each batch
+
+    Returns:
+        dict: scanned and updated counts, last_id
+    """
+    roles, sources, compute = DEPENDENCIES[field]
+    users_collection = db['users']
+    projection = {source: 1 for source in sources + ('role', field)}
+    report = {'scanned': 0, 'updated': 0, 'last_id': start_after}
+
+    while limit is None or report['scanned'] < limit:
+        query = {}
+        if roles is not None:
+            query['role'] = roles[0] if len(roles) == 1 else {'$in': list(roles)}
+        if not rebuild:
+            query[field] = {'$exists': False}
+        if report['last_id'] is not None:
+            query['_id'] = {'$gt': report['last_id']}
+        fetch = batch_size if limit is None else min(batch_size, limit - report['scanned'])
+        batch = list(users_collection.find(query, projection).sort('_id', 1).limit(fetch))
+        if not batch:
+            break
+
+        updates = []
+        for user in batch:
+            value = compute(user)
+            if field in user and user[field] == value:
+                continue
+            # Only write if the source fields are unchanged since they were read
+            updates.append(UpdateOne({'_id': user['_id'], **{source: user.get(source) for source in sources}},
+                                     {'$set': {field: value}}))
+        report['scanned'] += len(batch)
+        report['last_id'] = batch[-1]['_id']
+        if updates:
+            report['updated'] += users_collection.bulk_write(updates, ordered=False).modified_count
+
+        if progress:
+            progress(report)
+
+    return report
@@ -0,0 +1,154 @@
+"""
+Re-encrypt record files under the primary encryption key
+After a new key is put first in ENCRYPTION_KEYS, files encrypted with older
+keys stay readable through the key ring. This job rewrites them in _id order,
+in batches of bulk writes, under a records/sec limit. The last _id of each batch
+is checkpointed in job_checkpoints, so an interrupted run resumes where it
+stopped. The checkpoint never moves past a record that failed to rotate: once
+one fails it stays where it was for the rest of the run, so the next resumed
+run retries it. Old keys can be dropped from ENCRYPTION_KEYS only once a dry
+run (which always scans from the start, ignoring the checkpoint) finds
+nothing left to rotate.
+"""
+
+import logging
+import time
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.utils.encryption import get_keyring, rotate_file_data
+from app.utils.record_store import reencrypt_record_file, release_record_blobs
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = 'key_rotation'
+
+_PROJECTION = {'blob_id': 1, 'encrypted_data': 1, 'encryption_metadata': 1, 'patient_id': 1, 'file_type': 1}
+
+def _pending_query(primary_id):
+    return {
+        'encryption_metadata.key_id': {'$ne': primary_id},
+        '$or': [{'blob_id': {'$exists': True}}, {'encrypted_data': {'$exists': True}}]
+    }
+
+def _bulk_update(records_collection, operations, report):
+    """Apply a batch of updates; returns how many matched"""
+    try:
+        return records_collection.bulk_write(operations, ordered=False).matched_count
+    except BulkWriteError as e:
+        report['failed'] += len(e.details.get('writeErrors', []))
+        return e.details.get('nMatched', 0)
+
+def _settle_blobs(db, swapped):
+    """
+    Release the old blob of each record now pointing at its new blob, and the
+    new blob of each record whose update did not apply
+    """
+    if not swapped:
+        return
+    current = {record['_id']: record.get('blob_id') for record in db['records'].find(
+        {'_id': {'$in': [record_id for record_id, _, _ in swapped]}}, {'blob_id': 1}
+    )}
+    release_record_blobs([old_id if current.get(record_id) == new_id else new_id
+                          for record_id, new_id, old_id in swapped], db)
+
+def rotate_record_keys(db, batch_size=100, rate_limit=50, limit=None, start_after=None,
+                       resume=True, dry_run=False, progress=None):
+    """
+    Re-encrypt records whose files are not under the primary key
+
+    Args:
+        db: pymongo Database
+        batch_size: Records per query and per bulk write
+        rate_limit: Maximum records processed per second (0 for no limit)
+        limit: Stop after this many records
+        start_after: Start after this record _id (overrides the checkpoint)
+        resume: Continue from the saved checkpoint for the current primary key
+        dry_run: Only count records that would be rotated
+        progress: Optional callback(report) after each batch
+
+    Returns:
+        dict: scanned, rotated, skipped and failed counts, last_id, key_id, elapsed seconds
+    """
+    records_collection = db['records']
+    checkpoints = db['job_checkpoints']
+    primary_id = get_keyring().primary_id
+    checkpoint_id = f"{JOB_NAME}:{primary_id}"
+
+    if start_after is None and resume and not dry_run:
+        checkpoint = checkpoints.find_one({'_id': checkpoint_id})
+        if checkpoint:
+            start_after = checkpoint.get('last_id')
+
+    report = {'scanned': 0, 'rotated': 0, 'skipped': 0, 'failed': 0,
+              'last_id': start_after, 'key_id': primary_id, 'elapsed': 0.0}
+    # Where a resumed run will start: held back at the first failure
+    checkpoint_last_id = start_after
+    started = time.monotonic()
+
+    while limit is None or report['scanned'] < limit:
+        query = _pending_query(primary_id)
+        if report['last_id'] is not None:
+            query['_id'] = {'$gt': report['last_id']}
+        fetch = batch_size if limit is None else min(batch_size, limit - report['scanned'])
+        batch = list(records_collection.find(query, _PROJECTION).sort('_id', 1).limit(fetch))
+        if not batch:
+            break
+
+        operations = []
+        swapped = []
+        for record in batch:
+            report['scanned'] += 1
+            report['last_id'] = record['_id']
+            if dry_run:
+                continue
+
+            # Only apply if nobody rotated or replaced the file in the meantime
+            current_key_id = (record.get('encryption_metadata') or {}).get('key_id')
+            condition = {'_id': record['_id'], 'encryption_metadata.key_id': current_key_id}
+            try:
+                if record.get('blob_id'):
+                    fields = reencrypt_record_file(record, db)
+                    condition['blob_id'] = record['blob_id']
+                    swapped.append((record['_id'], fields['blob_id'], record['blob_id']))
+                else:
+                    fields = {
+                        'encrypted_data': rotate_file_data(record['encrypted_data']),
+                        'encryption_metadata.key_id': primary_id
+                    }
+                    condition['blob_id'] = {'$exists': False}
+            except Exception as e:
+                logger.error("Failed to re-encrypt record %s: %s", record['_id'], e)
+                report['failed'] += 1
+                continue
+            operations.append(UpdateOne(condition, {'$set': fields}))
+
+        matched = 0
+        if operations:
+            matched = _bulk_update(records_collection, operations, report)
+            report['rotated'] += matched
+            report['skipped'] += len(operations) - matched
+            _settle_blobs(db, swapped)
+
+        if not dry_run:
+            if not report['failed']:
+                checkpoint_last_id = report['last_id']
+            checkpoints.update_one(
+                {'_id': checkpoint_id},
+                {'$set': {'last_id': checkpoint_last_id, 'updated_at': datetime.utcnow()},
+                 '$inc': {'rotated': matched}},
+                upsert=True
+            )
+
+        report['elapsed'] = time.monotonic() - started
+        if progress:
+            progress(report)
+
+        # Throttle to rate_limit records/sec averaged over the run
+        if rate_limit:
+            wait = report['scanned'] / rate_limit - (time.monotonic() - started)
+            if wait > 0:
+                time.sleep(wait)
+
+    report['elapsed'] = time.monotonic() - started
+    return report
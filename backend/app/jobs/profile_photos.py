@@ -0,0 +1,88 @@
+"""
+Move inline profile photos into the photo store
+Older users keep their photo as a base64 data URI in profile_photo. Each one
+is decoded, resized into the stored variants and the user is switched to the
+photo URL in a single conditional update, so a photo changed meanwhile is
+left alone. The job works through users in _id order and can be stopped and
+re-run at any point.
+"""
+
+import base64
+import binascii
+import logging
+from app.utils.photo_store import store_photo, delete_photos, photo_version
+
+logger = logging.getLogger(__name__)
+
+_INLINE = {'profile_photo': {'$regex': '^data:'}}
+
+def _decode_data_uri(data_uri):
+    """Bytes of a base64 data URI"""
+    header, _, payload = data_uri.partition(',')
+    if not header.endswith(';base64'):
+        raise ValueError("not a base64 data URI")
+    return base64.b64decode(payload, validate=True)
+
+def migrate_inline_photos(db, batch_size=100, limit=None, dry_run=False, start_after=None, progress=None):
+    """
+    Migrate users whose profile photo is stored inline
+
+    Args:
+        db: pymongo Database
+        batch_size: Users fetched per query (bounds memory use)
+        limit: Stop after this many users
+        dry_run: Only measure what would be moved
+        start_after: Resume after this user _id
+        progress: Optional callback(report) after each batch
+
+    Returns:
+        dict: scanned, migrated, failed and skipped counts, inline byte total, last_id
+    """
+    users_collection = db['users']
+    report = {'scanned': 0, 'migrated': 0, 'failed': 0, 'skipped': 0, 'inline_bytes': 0, 'last_id': start_after}
+
+    while limit is None or report['scanned'] < limit:
+        query = dict(_INLINE)
+        if report['last_id'] is not None:
+            query['_id'] = {'$gt': report['last_id']}
+        fetch = batch_size if limit is None else min(batch_size, limit - report['scanned'])
+        batch = list(users_collection.find(query, {'profile_photo': 1}).sort('_id', 1).limit(fetch))
+        if not batch:
+            break
+
+        for user in batch:
+            report['scanned'] += 1
+            report['last_id'] = user['_id']
+            inline = user['profile_photo']
+            report['inline_bytes'] += len(inline)
+            try:
+                data = _decode_data_uri(inline)
+            except (ValueError, binascii.Error) as e:
+                logger.error("User %s has an unreadable profile photo: %s", user['_id'], e)
+                report['failed'] += 1
+                continue
+
+            if dry_run:
+                continue
+
+            try:
+                url = store_photo(user['_id'], data, db)
+            except ValueError as e:
+                logger.error("User %s has an unreadable profile photo: %s", user['_id'], e)
+                report['failed'] += 1
+                continue
+
+            result = users_collection.update_one({'_id': user['_id'], 'profile_photo': inline},
+                                                 {'$set': {'profile_photo': url}})
+            if result.matched_count:
+                report['migrated'] += 1
+            else:
+                # Photo changed or removed concurrently; drop the copy we just stored
+                current = users_collection.find_one({'_id': user['_id']}, {'profile_photo': 1}) or {}
+                delete_photos(user['_id'], keep=(photo_version(current.get('profile_photo')),), db=db)
+                report['skipped'] += 1
+
+        if progress:
+            progress(report)
+
+    return report
@@ -0,0 +1,135 @@
+"""
+Archive records that have been soft-deleted for longer than the retention period
+delete_record only flags a record, so its document and encrypted file stay in
+the hot records collection and record_blobs bucket. This job moves each
+expired record into records_archive and its ciphertext into the
+record_archive_blobs bucket (copied as-is, without decrypting), then removes
+the hot document and releases its blob reference. Blobs still shared with
+live records stay where they are. Work runs in batches under a records/sec
+limit; each record is archived before it is removed, so a run can be stopped
+and repeated at any point.
+
+Soft-deleted records from before deleted_at was recorded are stamped with the
+time of the first run, so their retention period starts then. Archived files
+keep the key they were encrypted with; keep that key in ENCRYPTION_KEYS for as
+long as the archive is kept.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+from bson import BSON
+from app.utils.record_store import get_blob_files, archive_blob, release_record_blobs
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = 'records_archive'
+
+def _expired_query(cutoff, last):
+    """Expired records after last = (deleted_at, _id), in (deleted_at, _id) order"""
+    query = {'is_deleted': True, 'deleted_at': {'$lt': cutoff}}
+    if last is not None:
+        query['$or'] = [{'deleted_at': {'$gt': last[0]}}, {'deleted_at': last[0], '_id': {'$gt': last[1]}}]
+    return query
+
+def _archive_record(db, record, cutoff, report):
+    """Archive one record; returns False if it changed under us and was left in place"""
+    records_collection = db['records']
+    archive_collection = db[ARCHIVE_COLLECTION]
+    blob_id = record.get('blob_id')
+
+    if blob_id is not None:
+        report['archive_bytes'] += archive_blob(blob_id, db)
+
+    archived = dict(record, archived_at=datetime.utcnow())
+    archive_collection.replace_one({'_id': record['_id']}, archived, upsert=True)
+
+    # Only remove the hot copy if it is still deleted and expired
+    result = records_collection.delete_one({'_id': record['_id'], 'is_deleted': True, 'deleted_at': {'$lt': cutoff}})
+    if not result.deleted_count:
+        archive_collection.delete_one({'_id': record['_id']})
+        return False
+
+    report['record_bytes'] += len(BSON.encode(record))
+    if blob_id is not None:
+        blob = get_blob_files(db).find_one({'_id': blob_id}, {'length': 1})
+        if release_record_blobs([blob_id], db) and blob:
+            report['blob_bytes'] += blob.get('length', 0)
+        else:
+            report['shared'] += 1
+    return True
+
+def archive_deleted_records(db, retention_days=30, batch_size=100, rate_limit=20, limit=None,
+                            dry_run=False, progress=None):
+    """
+    Move records soft-deleted more than retention_days ago into the archive
+
+    Args:
+        db: pymongo Database
+        retention_days: Days a deleted record stays in the hot collection
+        batch_size: Records per query
+        rate_limit: Maximum records archived per second (0 for no limit)
+        limit: Stop after this many records
+        dry_run: Only count expired records and the bytes they hold
+        progress: Optional callback(report) after each batch
+
+    Returns:
+        dict: scanned, archived, skipped, shared, failed and stamped (given a deleted_at)
+        counts; record_bytes and blob_bytes reclaimed from hot storage, archive_bytes
+        written; elapsed seconds
+    """
+    records_collection = db['records']
+    files = get_blob_files(db)
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=retention_days)
+
+    report = {'scanned': 0, 'archived': 0, 'skipped': 0, 'shared': 0, 'failed': 0, 'stamped': 0,
+              'record_bytes': 0, 'blob_bytes': 0, 'archive_bytes': 0, 'elapsed': 0.0}
+    started = time.monotonic()
+
+    unstamped = {'is_deleted': True, 'deleted_at': {'$exists': False}}
+    if dry_run:
+        report['stamped'] = records_collection.count_documents(unstamped)
+    else:
+        report['stamped'] = records_collection.update_many(unstamped, {'$set': {'deleted_at': now}}).modified_count
+
+    last = None
+    while limit is None or report['scanned'] < limit:
+        fetch = batch_size if limit is None else min(batch_size, limit - report['scanned'])
+        batch = list(records_collection.find(_expired_query(cutoff, last))
+                     .sort([('deleted_at', 1), ('_id', 1)]).limit(fetch))
+        if not batch:
+            break
+
+        for record in batch:
+            report['scanned'] += 1
+            last = (record['deleted_at'], record['_id'])
+            if dry_run:
+                report['record_bytes'] += len(BSON.encode(record))
+                if record.get('blob_id') is not None:
+                    blob = files.find_one({'_id': record['blob_id']}, {'length': 1, 'metadata.refcount': 1})
+                    if blob and (blob.get('metadata') or {}).get('refcount', 1) <= 1:
+                        report['blob_bytes'] += blob.get('length', 0)
+                continue
+
+            try:
+                if _archive_record(db, record, cutoff, report):
+                    report['archived'] += 1
+                else:
+                    report['skipped'] += 1
+            except Exception as e:
+                logger.error("Failed to archive record %s: %s", record['_id'], e)
+                report['failed'] += 1
+
+        report['elapsed'] = time.monotonic() - started
+        if progress:
+            progress(report)
+
+        # Throttle to rate_limit records/sec averaged over the run
+        if rate_limit and not dry_run:
+            wait = report['scanned'] / rate_limit - (time.monotonic() - started)
+            if wait > 0:
+                time.sleep(wait)
+
+    report['elapsed'] = time.monotonic() - started
+    return report
@@ -0,0 +1,88 @@
+"""
+Move inline record payloads into the record_blobs GridFS bucket
+Legacy records keep their file as base64(Fernet token) in encrypted_data. The
+ciphertext is transcoded to raw bytes (not decrypted), stored as a blob and the
+record is switched to blob_id in a single conditional update. The job works
+through records in _id order and can be stopped and re-run at any point.
+"""
+
+import hashlib
+import logging
+from app.utils.encryption import legacy_ciphertext_to_bytes
+from app.utils.record_store import store_ciphertext, release_record_blobs
+
+logger = logging.getLogger(__name__)
+
+_PENDING = {'encrypted_data': {'$exists': True}, 'blob_id': {'$exists': False}}
+
+def migrate_inline_records(db, batch_size=100, limit=None, dry_run=False, start_after=None, progress=None):
+    """
+    Migrate records that still store their file inline
+
+    Args:
+        db: pymongo Database
+        batch_size: Records fetched per query (bounds memory use)
+        limit: Stop after this many records
+        dry_run: Only measure what would be moved
+        start_after: Resume after this record _id
+        progress: Optional callback(report) after each batch
+
+    Returns:
+        dict: scanned, migrated, failed and skipped counts, inline/blob byte totals, last_id
+    """
+    records_collection = db['records']
+    report = {'scanned': 0, 'migrated': 0, 'failed': 0, 'skipped': 0,
+              'inline_bytes': 0, 'blob_bytes': 0, 'last_id': start_after}
+
+    while limit is None or report['scanned'] < limit:
+        query = dict(_PENDING)
+        if report['last_id'] is not None:
+            query['_id'] = {'$gt': report['last_id']}
+        fetch = batch_size if limit is None else min(batch_size, limit - report['scanned'])
+        batch = list(records_collection.find(query, {'encrypted_data': 1, 'patient_id': 1})
+                     .sort('_id', 1).limit(fetch))
+        if not batch:
+            break
+
+        for record in batch:
+            report['scanned'] += 1
+            report['last_id'] = record['_id']
+            try:
+                ciphertext = legacy_ciphertext_to_bytes(record['encrypted_data'])
+            except Exception as e:
+                logger.error("Record %s has unreadable encrypted_data: %s", record['_id'], e)
+                report['failed'] += 1
+                continue
+
+            report['inline_bytes'] += len(record['encrypted_data'])
+            report['blob_bytes'] += len(ciphertext)
+            if dry_run:
+                continue
+
+            try:
+                blob_id = store_ciphertext(ciphertext, record['_id'], record.get('patient_id'), db)
+                result = records_collection.update_one(
+                    {'_id': record['_id'], **_PENDING},
+                    {
+                        '$set': {'blob_id': blob_id,
+                                 'blob_sha256': hashlib.sha256(ciphertext).hexdigest(),
+                                 'encryption_metadata': {'method': 'Fernet', 'storage': 'gridfs'}},
+                        '$unset': {'encrypted_data': '', 'encryption_method': ''}
+                    }
+                )
+            except Exception as e:
+                logger.error("Failed to migrate record %s: %s", record['_id'], e)
+                report['failed'] += 1
+                continue
+
+            if result.matched_count:
+                report['migrated'] += 1
+            else:
+                # Deleted or migrated concurrently; drop the blob we just wrote
+                release_record_blobs([blob_id], db)
+                report['skipped'] += 1
+
+        if progress:
+            progress(report)
+
+    return report
@@ -6,6 +6,7 @@ from .database import (
     get_access_permissions_collection,
     init_db
 )
+from .indexes import INDEX_REGISTRY, ensure_indexes, check_index_drift
 from .schemas import UserSchema, RecordSchema, AccessPermissionSchema, AuditLogSchema
 
 __all__ = [
@@ -15,6 +16,9 @@ __all__ = [
     'get_audit_logs_collection',
     'get_access_permissions_collection',
     'init_db',
+    'INDEX_REGISTRY',
+    'ensure_indexes',
+    'check_index_drift',
     'UserSchema',
     'RecordSchema',
     'AccessPermissionSchema',
@@ -1,16 +1,142 @@
-from pymongo import MongoClient
+import logging
+from pymongo import MongoClient, monitoring
 from pymongo.errors import ConnectionFailure
 import os
+import threading
 from dotenv import load_dotenv
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Collects live connection pool statistics from pymongo pool events.
+    Tracks checked-out and waiting connections plus checkout latency so
+    socket starvation under load can be observed.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Reset all counters"""
+        with self._lock:
+            self.open_connections = 0
+            self.checked_out = 0
+            self.waiting = 0
+            self.max_waiting = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checkout_timeouts = 0
+            self.total_checkout_ms = 0.0
+            self.max_checkout_ms = 0.0
+            self.pool_clears = 0
+    
+    def _record_latency(self, event):
+        duration = getattr(event, 'duration', None)
+        if duration is None:
+            return
+        duration_ms = duration * 1000
+        self.total_checkout_ms += duration_ms
+        if duration_ms > self.max_checkout_ms:
+            self.max_checkout_ms = duration_ms
+    
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+            if self.waiting > self.max_waiting:
+                self.max_waiting = self.waiting
+    
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting = max(0, self.waiting - 1)
+            self.checked_out += 1
+            self.checkouts += 1
+            self._record_latency(event)
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting = max(0, self.waiting - 1)
+            self.checkout_failures += 1
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                self.checkout_timeouts += 1
+            self._record_latency(event)
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+    
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def snapshot(self):
+        """Return a point-in-time copy of the pool statistics"""
+        with self._lock:
+            avg_checkout_ms = self.total_checkout_ms / self.checkouts if self.checkouts else 0.0
+            return {
+                'open_connections': self.open_connections,
+                'checked_out': self.checked_out,
+                'waiting': self.waiting,
+                'max_waiting': self.max_waiting,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'checkout_timeouts': self.checkout_timeouts,
+                'avg_checkout_ms': round(avg_checkout_ms, 3),
+                'max_checkout_ms': round(self.max_checkout_ms, 3),
+                'pool_clears': self.pool_clears
+            }
+
 class Database:
     """MongoDB Database Connection Manager"""
     
     _client = None
     _db = None
+    pool_stats = PoolStatsListener()
+    
+    @classmethod
+    def get_connection_options(cls):
+        """Build MongoClient options from Config"""
+        options = {
+            'serverSelectionTimeoutMS': Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            'connectTimeoutMS': Config.MONGO_CONNECT_TIMEOUT_MS,
+            'maxPoolSize': Config.MONGO_MAX_POOL_SIZE,
+            'minPoolSize': Config.MONGO_MIN_POOL_SIZE,
+            'maxIdleTimeMS': Config.MONGO_MAX_IDLE_TIME_MS,
+            'waitQueueTimeoutMS': Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            'readPreference': Config.MONGO_READ_PREFERENCE,
+            'event_listeners': [cls.pool_stats]
+        }
+        
+        compressors = [c.strip() for c in Config.MONGO_COMPRESSORS.split(',') if c.strip()]
+        if compressors:
+            options['compressors'] = compressors
+        
+        return options
     
     @classmethod
     def get_client(cls):
@@ -18,17 +144,14 @@ class Database:
         if cls._client is None:
             try:
                 mongo_uri = os.getenv('MONGO_URI')
-                print(f"Attempting MongoDB connection with URI: {mongo_uri}")
+                logger.debug("Attempting MongoDB connection")
                 
                 # Parse TLS setting from URI or default to False for local/Docker
                 # Only enable TLS for production MongoDB Atlas connections
                 use_tls = 'tls=true' in mongo_uri.lower() or 'ssl=true' in mongo_uri.lower()
                 
-                # Build connection options based on TLS setting
-                connection_options = {
-                    'serverSelectionTimeoutMS': 10000,
-                    'connectTimeoutMS': 10000
-                }
+                # Build connection options (pool, compression, read preference) from Config
+                connection_options = cls.get_connection_options()
                 
                 # Only add TLS options if TLS is enabled
                 if use_tls:
@@ -39,9 +162,9 @@ class Database:
                 
                 # Test the connection
                 cls._client.admin.command('ping')
-                print("✓ Successfully connected to MongoDB")
+                logger.info("Successfully connected to MongoDB")
             except Exception as e:
-                print(f"✗ Failed to connect to MongoDB: {e}")
+                logger.error("Failed to connect to MongoDB: %s", e)
                 cls._client = None
         return cls._client
     
@@ -51,8 +174,8 @@ class Database:
         if cls._db is None:
             client = cls.get_client()
             if client is not None:
-                cls._db = client.bharathmedicare
-                print("✓ Database instance created: bharathmedicare")
+                cls._db = client[Config.MONGO_DB_NAME]
+                logger.info("Database instance created: %s", Config.MONGO_DB_NAME)
         return cls._db
     
     @classmethod
@@ -61,9 +184,20 @@ class Database:
         db = cls.get_db()
         if db is not None:
             return db[collection_name]
-        print(f"✗ Failed to get collection '{collection_name}' - database is None")
+        logger.error("Failed to get collection '%s' - database is None", collection_name)
         return None
     
+    @classmethod
+    def get_pool_stats(cls):
+        """Get live connection pool statistics"""
+        stats = cls.pool_stats.snapshot()
+        stats['max_pool_size'] = Config.MONGO_MAX_POOL_SIZE
+        stats['min_pool_size'] = Config.MONGO_MIN_POOL_SIZE
+        stats['compressors'] = Config.MONGO_COMPRESSORS
+        stats['read_preference'] = Config.MONGO_READ_PREFERENCE
+        stats['connected'] = cls._client is not None
+        return stats
+    
     @classmethod
     def close_connection(cls):
         """Close database connection"""
@@ -71,17 +205,31 @@ class Database:
             cls._client.close()
             cls._client = None
             cls._db = None
-            print("✓ MongoDB connection closed")
+            logger.info("MongoDB connection closed")
+    
+    @classmethod
+    def reset_after_fork(cls):
+        """
+        Forget the parent's client in a forked child process.
+        MongoClient is not fork-safe, so each worker connects lazily on first use.
+        """
+        cls._client = None
+        cls._db = None
+        cls.pool_stats.reset()
+
+# Workers forked by gunicorn (or any other pre-fork server) must not share the parent's sockets
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=Database.reset_after_fork)
 
-# Initialize database connection on module load
+# Initialize database connection (call after fork; connections are otherwise opened lazily)
 def init_db():
     """Initialize database connection"""
     db = Database.get_db()
     if db is not None:
-        print("✓ Database initialized successfully")
+        logger.info("Database initialized successfully")
         return True
     else:
-        print("✗ Database initialization failed")
+        logger.error("Database initialization failed")
         return False
 
 # Getter functions for collections
@@ -89,29 +237,26 @@ def get_users_collection():
     """Get users collection"""
     collection = Database.get_collection('users')
     if collection is None:
-        print("ERROR: users_collection is None!")
+        logger.error("users_collection is None!")
     return collection
 
 def get_records_collection():
     """Get records collection"""
     collection = Database.get_collection('records')
     if collection is None:
-        print("ERROR: records_collection is None!")
+        logger.error("records_collection is None!")
     return collection
 
 def get_audit_logs_collection():
     """Get audit logs collection"""
     collection = Database.get_collection('audit_logs')
     if collection is None:
-        print("ERROR: audit_logs_collection is None!")
+        logger.error("audit_logs_collection is None!")
     return collection
 
 def get_access_permissions_collection():
     """Get access permissions collection"""
     collection = Database.get_collection('access_permissions')
     if collection is None:
-        print("ERROR: access_permissions_collection is None!")
+        logger.error("access_permissions_collection is None!")
     return collection
-
-# Try to initialize on import
-init_db()
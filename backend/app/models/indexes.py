@@ -1,22 +1,246 @@
-from .database import users_collection, records_collection, access_permissions_collection
-
-def create_indexes():
-    """Create database indexes for better performance"""
-    
-    # Users collection indexes
-    users_collection.create_index("email", unique=True)
-    users_collection.create_index("role")
-    
-    # Records collection indexes
-    records_collection.create_index("patient_id")
-    records_collection.create_index("uploaded_by")
-    records_collection.create_index("uploaded_at")
-    
-    # Access permissions collection indexes
-    access_permissions_collection.create_index([("patient_id", 1), ("doctor_id", 1)])
-    access_permissions_collection.create_index("is_active")
-    
-    print("✓ Database indexes created successfully")
-
-if __name__ == "__main__":
-    create_indexes()
+"""
+Declarative MongoDB index registry
+Every query the blueprints issue should be served by one of these indexes.
+Applied idempotently on startup by create_app() and by add_indexes.py.
+"""
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+# Index options that define an index (anything else, e.g. name or v, is ignored for drift)
+_COMPARED_OPTIONS = ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds')
+
+# Matches only non-empty strings, so documents holding None are left out of unique indexes
+_NON_EMPTY_STRING = {'$gt': ''}
+
+# Doctors patients can book (see app/utils/doctor_search.py)
+_BOOKABLE_DOCTORS = {'role': 'doctor', 'is_verified': True, 'is_active': True, 'is_profile_complete': True}
+
+INDEX_REGISTRY = {
+    'users': [
+        # Login, registration duplicate check
+        {'keys': [('email', ASCENDING)], 'unique': True},
+        # Hospital portal, RFID login, SMS login, doctor lookup; unique so a
+        # reused ID is rejected at insert (app/utils/id_generator.py)
+        {'keys': [('patient_id', ASCENDING)], 'unique': True,
+         'partialFilterExpression': {'patient_id': _NON_EMPTY_STRING}},
+        {'keys': [('doctor_id', ASCENDING)], 'unique': True,
+         'partialFilterExpression': {'doctor_id': _NON_EMPTY_STRING}},
+        {'keys': [('rfid_id', ASCENDING)], 'unique': True,
+         'partialFilterExpression': {'rfid_id': _NON_EMPTY_STRING}},
+        {'keys': [('phone', ASCENDING)]},
+        {'keys': [('nmc_uid', ASCENDING)]},
+        # Role counts, pending doctors (sorted by created_at)
+        {'keys': [('role', ASCENDING), ('is_verified', ASCENDING), ('created_at', DESCENDING)]},
+        # search_doctors: filter + sort combinations over bookable doctors
+        {'keys': [('directory.sort_name', ASCENDING), ('_id', ASCENDING)],
+         'partialFilterExpression': _BOOKABLE_DOCTORS},
+        {'keys': [('directory.experience', DESCENDING), ('_id', ASCENDING)],
+         'partialFilterExpression': _BOOKABLE_DOCTORS},
+        {'keys': [('directory.specialization', ASCENDING), ('directory.sort_name', ASCENDING), ('_id', ASCENDING)],
+         'partialFilterExpression': _BOOKABLE_DOCTORS},
+        {'keys': [('directory.specialization', ASCENDING), ('directory.experience', DESCENDING), ('_id', ASCENDING)],
+         'partialFilterExpression': _BOOKABLE_DOCTORS},
+        {'keys': [('directory.languages', ASCENDING), ('directory.sort_name', ASCENDING), ('_id', ASCENDING)],
+         'partialFilterExpression': _BOOKABLE_DOCTORS},
+        # Name and hospital prefixes (few matches; sorted in memory)
+        {'keys': [('directory.name_words', ASCENDING)], 'partialFilterExpression': _BOOKABLE_DOCTORS},
+        {'keys': [('directory.hospital_words', ASCENDING)], 'partialFilterExpression': _BOOKABLE_DOCTORS},
+        # Registration counts and growth trends
+        {'keys': [('created_at', DESCENDING)]},
+        # Patient search (edge n-grams of name, email, ID and phone)
+        {'keys': [('search_tokens', ASCENDING)], 'partialFilterExpression': {'role': 'patient'}}
+    ],
+    'records': [
+        # my-records, patient records, record counts, CDS recent records
+        {'keys': [('patient_id', ASCENDING), ('is_deleted', ASCENDING), ('uploaded_at', DESCENDING)]},
+        # Admin upload counts and growth trends
+        {'keys': [('is_deleted', ASCENDING), ('uploaded_at', DESCENDING)]},
+        # Archive job: soft-deleted records by deletion time (deleted records only)
+        {'keys': [('deleted_at', ASCENDING), ('_id', ASCENDING)],
+         'partialFilterExpression': {'is_deleted': True}}
+    ],
+    'records_archive': [
+        # Deleting a patient's archived records
+        {'keys': [('patient_id', ASCENDING)]}
+    ],
+    # GridFS bucket holding encrypted record files (the indexes GridFS itself expects)
+    'record_blobs.files': [
+        {'keys': [('filename', ASCENDING), ('uploadDate', ASCENDING)]},
+        # Per-patient deduplication of uploads (content fingerprint lookup)
+        {'keys': [('metadata.patient_id', ASCENDING), ('metadata.content_hash', ASCENDING)]}
+    ],
+    'record_blobs.chunks': [
+        {'keys': [('files_id', ASCENDING), ('n', ASCENDING)], 'unique': True}
+    ],
+    # GridFS bucket holding files of archived records
+    'record_archive_blobs.files': [
+        {'keys': [('filename', ASCENDING), ('uploadDate', ASCENDING)]}
+    ],
+    'record_archive_blobs.chunks': [
+        {'keys': [('files_id', ASCENDING), ('n', ASCENDING)], 'unique': True}
+    ],
+    'profile_photos': [
+        # Replacing or deleting a user's photos
+        {'keys': [('user_id', ASCENDING), ('version', ASCENDING)]}
+    ],
+    'appointments': [
+        {'keys': [('appointment_id', ASCENDING)], 'unique': True,
+         'partialFilterExpression': {'appointment_id': _NON_EMPTY_STRING}},
+        # my-appointments (sorted by appointment_date)
+        {'keys': [('patient_id', ASCENDING), ('appointment_date', DESCENDING)]},
+        {'keys': [('doctor_id', ASCENDING), ('appointment_date', DESCENDING)]},
+        # Doctor analytics status counts
+        {'keys': [('doctor_id', ASCENDING), ('status', ASCENDING)]}
+    ],
+    'access_permissions': [
+        # Permission checks and patient's doctor list
+        {'keys': [('patient_id', ASCENDING), ('doctor_id', ASCENDING)]},
+        # Doctor's patient list and patient growth analytics
+        {'keys': [('doctor_id', ASCENDING), ('granted_at', DESCENDING)]}
+    ],
+    'audit_logs': [
+        # get_user_activity
+        {'keys': [('user_id', ASCENDING), ('timestamp', DESCENDING)]},
+        # Admin audit log view
+        {'keys': [('timestamp', DESCENDING)]},
+        {'keys': [('action', ASCENDING), ('timestamp', DESCENDING)]}
+    ],
+    'cds_feedback': [
+        # get_feedback_analytics
+        {'keys': [('physician_id', ASCENDING), ('timestamp', DESCENDING)]}
+    ],
+    'physician_preferences': [
+        {'keys': [('physician_id', ASCENDING)], 'unique': True}
+    ],
+    'testimonials': [
+        # Landing page testimonials
+        {'keys': [('is_approved', ASCENDING), ('is_active', ASCENDING), ('created_at', DESCENDING)]},
+        # My testimonials, pending testimonial check
+        {'keys': [('user_id', ASCENDING), ('created_at', DESCENDING)]}
+    ],
+    'contact_messages': [
+        # Admin inbox, filtered by status and sorted by submission time
+        {'keys': [('status', ASCENDING), ('submitted_at', DESCENDING)]},
+        {'keys': [('submitted_at', DESCENDING)]}
+    ],
+    'revoked_tokens': [
+        # Entries are removed once the revoked token would have expired anyway
+        {'keys': [('expires_at', ASCENDING)], 'expireAfterSeconds': 0},
+        # Incremental revocation refresh
+        {'keys': [('revoked_at', ASCENDING)]},
+        # Confirming Bloom filter hits
+        {'keys': [('token_digest', ASCENDING)], 'sparse': True}
+    ],
+    'bulk_imports': [
+        # Admin import list (most recent first)
+        {'keys': [('started_at', DESCENDING)]}
+    ]
+}
+
+
+def _index_options(spec):
+    """Extract creation options from an index spec"""
+    return {key: value for key, value in spec.items() if key != 'keys'}
+
+
+def _normalize_key(keys):
+    """Normalize an index key for comparison"""
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in keys)
+
+
+def _options_match(spec, existing):
+    """Check whether an existing index has the options the registry requires"""
+    for option in _COMPARED_OPTIONS:
+        if spec.get(option) != existing.get(option):
+            # Treat unique/sparse False and missing as equivalent
+            if option in ('unique', 'sparse') and not spec.get(option) and not existing.get(option):
+                continue
+            return False
+    return True
+
+
+def check_index_drift(db, registry=None):
+    """
+    Compare the indexes present in the database against the registry
+
+    Returns:
+        dict: collection name -> {'missing', 'mismatched', 'unmanaged'} lists
+              (collections without drift are omitted)
+    """
+    registry = registry or INDEX_REGISTRY
+    drift = {}
+
+    for collection_name, specs in registry.items():
+        existing = db[collection_name].index_information()
+        existing_by_key = {_normalize_key(info['key']): (name, info) for name, info in existing.items()}
+        managed_keys = set()
+
+        missing = []
+        mismatched = []
+
+        for spec in specs:
+            key = _normalize_key(spec['keys'])
+            managed_keys.add(key)
+
+            if key not in existing_by_key:
+                missing.append(spec)
+                continue
+
+            name, info = existing_by_key[key]
+            if not _options_match(spec, info):
+                mismatched.append({'name': name, 'expected': spec, 'actual': info})
+
+        unmanaged = [
+            name for key, (name, info) in existing_by_key.items()
+            if key not in managed_keys and name != '_id_'
+        ]
+
+        if missing or mismatched or unmanaged:
+            drift[collection_name] = {
+                'missing': missing,
+                'mismatched': mismatched,
+                'unmanaged': unmanaged
+            }
+
+    return drift
+
+
+def ensure_indexes(db, registry=None, rebuild_mismatched=False):
+    """
+    Create every registry index that does not exist yet (idempotent)
+
+    Args:
+        db: pymongo Database
+        registry: Optional registry override
+        rebuild_mismatched: Drop and recreate indexes whose options differ from the registry
+
+    Returns:
+        dict: {'created': [...], 'rebuilt': [...], 'failed': [...]} of 'collection.index' names
+    """
+    registry = registry or INDEX_REGISTRY
+    report = {'created': [], 'rebuilt': [], 'failed': []}
+    drift = check_index_drift(db, registry)
+
+    for collection_name, collection_drift in drift.items():
+        collection = db[collection_name]
+
+        if rebuild_mismatched:
+            for mismatch in collection_drift['mismatched']:
+                spec = mismatch['expected']
+                try:
+                    collection.drop_index(mismatch['name'])
+                    name = collection.create_index(spec['keys'], **_index_options(spec))
+                    report['rebuilt'].append(f"{collection_name}.{name}")
+                except OperationFailure as e:
+                    report['failed'].append(f"{collection_name}.{mismatch['name']}: {e}")
+
+        for spec in collection_drift['missing']:
+            try:
+                name = collection.create_index(spec['keys'], **_index_options(spec))
+                report['created'].append(f"{collection_name}.{name}")
+            except OperationFailure as e:
+                report['failed'].append(f"{collection_name}.{spec['keys']}: {e}")
+
+    return report
@@ -68,16 +68,16 @@ class RecordSchema:
     """Medical record document schema"""
     
     @staticmethod
-    def create(patient_id, uploaded_by, file_name, file_type, encrypted_data, 
-               encryption_metadata, description=''):
-        """Create a new record document"""
+    def create(patient_id, uploaded_by, file_name, file_type, description=''):
+        """
+        Create a new record document
+        The encrypted file itself is attached by insert_record_with_file (blob_id)
+        """
         return {
             'patient_id': ObjectId(patient_id),
             'uploaded_by': ObjectId(uploaded_by),
             'file_name': file_name,
             'file_type': file_type,
-            'encrypted_data': encrypted_data,
-            'encryption_metadata': encryption_metadata,
             'description': description,
             'uploaded_at': datetime.utcnow(),
             'is_deleted': False
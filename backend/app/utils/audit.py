@@ -1,21 +1,240 @@
+import logging
 from datetime import datetime
+import atexit
+import os
+import queue
+import threading
+import time
+from bson import ObjectId
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError
 from app.models.database import get_audit_logs_collection
 from app.models.schemas import AuditLogSchema
+from config.settings import Config
 from flask import request
 
+logger = logging.getLogger(__name__)
+
+# Longest wait between attempts at writing a batch
+_MAX_RETRY_BACKOFF = 10.0
+
+class AuditLogWriter:
+    """
+    Background audit log writer
+    Entries are queued in-process and written with insert_many in batches,
+    flushed when a batch fills up or the flush interval elapses, so request
+    threads never wait on an audit round trip. A batch that cannot be written
+    is retried with exponential backoff (entries carry their _id, so a retry
+    never writes one twice); only after write_attempts are its entries counted
+    as failed. New entries keep queueing meanwhile, up to max_queue_size.
+    """
+
+    def __init__(self, max_queue_size, batch_size, flush_interval_ms, write_concern_w, late_threshold_ms,
+                 write_attempts=1, retry_backoff_ms=0):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.write_concern = WriteConcern(w=write_concern_w)
+        self.late_threshold = late_threshold_ms / 1000
+        self.write_attempts = max(write_attempts, 1)
+        self.retry_backoff = retry_backoff_ms / 1000
+        self._start_lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        """(Re)create per-process state; threads and queues do not survive fork"""
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._thread = None
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.late = 0
+        self.batches = 0
+        self.max_flush_ms = 0.0
+
+    def reset_after_fork(self):
+        """Discard the parent's queue and writer thread in a forked child"""
+        self._start_lock = threading.Lock()
+        self._reset_state()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, entry):
+        """Queue an entry without blocking; returns False if it was dropped"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+        with self._stats_lock:
+            self.enqueued += 1
+        return True
+
+    def _collect_batch(self):
+        """Wait for the first entry, then gather more until the batch is full or the interval elapses"""
+        batch = []
+        flush_requests = []
+        try:
+            item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return batch, flush_requests
+
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if isinstance(item, threading.Event):
+                flush_requests.append(item)
+                break
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        return batch, flush_requests
+
+    def _insert(self, entries):
+        """Write entries; returns those that were not written"""
+        collection = get_audit_logs_collection()
+        if collection is None:
+            raise RuntimeError("database not connected")
+        try:
+            collection.with_options(write_concern=self.write_concern).insert_many(entries, ordered=False)
+            return []
+        except BulkWriteError as e:
+            # Duplicate keys are entries an earlier attempt already wrote
+            unwritten = {error['index'] for error in e.details.get('writeErrors', []) if error.get('code') != 11000}
+            return [entry for index, entry in enumerate(entries) if index in unwritten]
+
+    def _write(self, batch):
+        started = time.monotonic()
+        pending = batch
+        backoff = self.retry_backoff
+        error = None
+        for attempt in range(self.write_attempts):
+            if attempt:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, _MAX_RETRY_BACKOFF)
+                with self._stats_lock:
+                    self.retries += 1
+            try:
+                pending = self._insert(pending)
+                error = 'write errors' if pending else None
+            except Exception as e:
+                error = e
+            if not pending:
+                break
+            logger.warning("Audit log write failed (attempt %d of %d): %s", attempt + 1, self.write_attempts, error)
+
+        pending_ids = {id(entry) for entry in pending}
+        written = [entry for entry in batch if id(entry) not in pending_ids]
+        now = datetime.utcnow()
+        late = sum(1 for entry in written
+                   if (now - entry['timestamp']).total_seconds() > self.late_threshold)
+        flush_ms = (time.monotonic() - started) * 1000
+        with self._stats_lock:
+            self.written += len(written)
+            self.late += late
+            self.batches += 1
+            self.max_flush_ms = max(self.max_flush_ms, flush_ms)
+            self.failed += len(pending)
+        if pending:
+            logger.error("Audit logging error: %d entries lost after %d attempts: %s",
+                         len(pending), self.write_attempts, error)
+
+    def _run(self):
+        while True:
+            batch, flush_requests = self._collect_batch()
+            if batch:
+                self._write(batch)
+            for event in flush_requests:
+                event.set()
+            if self._stopping.is_set() and self._queue.empty():
+                return
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far has been written"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def shutdown(self, timeout=5.0):
+        """Flush pending entries and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self.flush(timeout)
+        self._thread.join(timeout)
+
+    def stats(self):
+        """Writer counters for monitoring"""
+        with self._stats_lock:
+            return {
+                'queued': self._queue.qsize(),
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'retries': self.retries,
+                'late': self.late,
+                'batches': self.batches,
+                'max_flush_ms': round(self.max_flush_ms, 3)
+            }
+
+_audit_writer = AuditLogWriter(
+    max_queue_size=Config.AUDIT_QUEUE_SIZE,
+    batch_size=Config.AUDIT_BATCH_SIZE,
+    flush_interval_ms=Config.AUDIT_FLUSH_INTERVAL_MS,
+    write_concern_w=Config.AUDIT_WRITE_CONCERN,
+    late_threshold_ms=Config.AUDIT_LATE_THRESHOLD_MS,
+    write_attempts=Config.AUDIT_WRITE_ATTEMPTS,
+    retry_backoff_ms=Config.AUDIT_RETRY_BACKOFF_MS
+)
+
+atexit.register(_audit_writer.shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_audit_writer.reset_after_fork)
+
+def get_audit_writer_stats():
+    """Get background audit writer statistics"""
+    stats = _audit_writer.stats()
+    stats['async'] = Config.AUDIT_ASYNC
+    return stats
+
+def flush_audit_logs(timeout=5.0):
+    """Write out all queued audit entries (used on shutdown)"""
+    _audit_writer.shutdown(timeout)
+
 def log_action(user_id, action, resource_type, resource_id=None, details=None):
     """
     Log user action for audit trail
+    Entries are written in the background unless AUDIT_ASYNC is disabled
     """
     try:
-        audit_logs_collection = get_audit_logs_collection()
-        if audit_logs_collection is None:
-            print("Warning: Could not log action - database not connected")
-            return None
-        
         # Get IP address from request
         ip_address = request.remote_addr if request else None
-        
+
         # Create audit log document
         log_entry = AuditLogSchema.create(
             user_id=user_id,
@@ -25,14 +244,26 @@ def log_action(user_id, action, resource_type, resource_id=None, details=None):
             ip_address=ip_address,
             details=details
         )
-        
+        log_entry['_id'] = ObjectId()
+
+        if Config.AUDIT_ASYNC:
+            if not _audit_writer.submit(log_entry):
+                logger.warning("Audit log queue full - entry dropped")
+                return None
+            return log_entry['_id']
+
+        audit_logs_collection = get_audit_logs_collection()
+        if audit_logs_collection is None:
+            logger.warning("Could not log action - database not connected")
+            return None
+
         # Insert into database
         result = audit_logs_collection.insert_one(log_entry)
-        
+
         return result.inserted_id
-    
+
     except Exception as e:
-        print(f"Audit logging error: {e}")
+        logger.error("Audit logging error: %s", e)
         return None
 
 def get_user_activity(user_id, limit=50):
@@ -41,13 +272,13 @@ def get_user_activity(user_id, limit=50):
         audit_logs_collection = get_audit_logs_collection()
         if audit_logs_collection is None:
             return []
-        
+
         logs = audit_logs_collection.find(
             {'user_id': user_id}
         ).sort('timestamp', -1).limit(limit)
-        
+
         return list(logs)
-    
+
     except Exception as e:
-        print(f"Error fetching user activity: {e}")
+        logger.error("Error fetching user activity: %s", e)
         return []
@@ -1,79 +1,95 @@
+import logging
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify
 import os
 from dotenv import load_dotenv
+from config.settings import Config
+from app.utils.token_cache import token_digest, get_cached_payload, cache_payload, is_token_revoked, epoch_ms
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 SECRET_KEY = os.getenv('JWT_SECRET_KEY', os.getenv('SECRET_KEY', 'your-secret-key-here-change-in-production'))
 JWT_ALGORITHM = 'HS256'
-JWT_EXPIRATION_HOURS = 24
+JWT_EXPIRATION_HOURS = Config.JWT_EXPIRATION_HOURS
 
 def create_token(user_id, email, role):
     """Create JWT token"""
     try:
+        now = datetime.utcnow()
         payload = {
             'user_id': user_id,
             'email': email,
             'role': role,
-            'exp': datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS),
-            'iat': datetime.utcnow()
+            'exp': now + timedelta(hours=JWT_EXPIRATION_HOURS),
+            'iat': now,
+            # iat is whole seconds; revocation checks need finer (see token_cache)
+            'iat_ms': epoch_ms(now)
         }
         
         token = jwt.encode(payload, SECRET_KEY, algorithm=JWT_ALGORITHM)
         return token
     
     except Exception as e:
-        print(f"Token creation error: {e}")
+        logger.error("Token creation error: %s", e)
         return None
 
 def decode_token(token):
-    """Decode and verify JWT token"""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
+    """
+    Decode and verify JWT token
+    Verified payloads are cached until exp; revoked tokens are rejected either way
+    """
+    digest = token_digest(token)
+    payload = get_cached_payload(digest)
+    
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            return {'error': 'Token has expired'}
+        except jwt.InvalidTokenError:
+            return {'error': 'Invalid token'}
+        cache_payload(digest, payload)
     
-    except jwt.ExpiredSignatureError:
-        return {'error': 'Token has expired'}
-    except jwt.InvalidTokenError:
-        return {'error': 'Invalid token'}
+    if is_token_revoked(digest, payload):
+        return {'error': 'Token has been revoked'}
+    
+    return payload
+
+def get_request_token():
+    """Get the bearer token from the Authorization header, or None"""
+    auth_header = request.headers.get('Authorization', '')
+    parts = auth_header.split(' ')
+    return parts[1] if len(parts) > 1 and parts[1] else None
 
 def require_auth(f):
     """Decorator to require authentication"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # DEBUG: Log all headers
-        print(f"\n=== AUTH DEBUG for {request.path} ===")
-        print(f"All headers: {dict(request.headers)}")
-        
         auth_header = request.headers.get('Authorization')
-        print(f"Authorization header: {auth_header}")
         
         if not auth_header:
-            print("ERROR: No authorization header found")
+            logger.info("Rejected %s: no authorization header", request.path)
             return jsonify({'error': 'No authorization header'}), 401
         
         try:
             token = auth_header.split(' ')[1]
-            print(f"Extracted token (first 50 chars): {token[:50]}...")
         except IndexError:
-            print("ERROR: Invalid authorization header format")
+            logger.info("Rejected %s: invalid authorization header format", request.path)
             return jsonify({'error': 'Invalid authorization header format'}), 401
         
-        print(f"Using SECRET_KEY (first 20 chars): {SECRET_KEY[:20]}...")
         payload = decode_token(token)
-        print(f"Decode result: {payload}")
         
         if 'error' in payload:
-            print(f"ERROR: Token decode failed: {payload['error']}")
+            logger.info("Rejected %s: %s", request.path, payload['error'])
             return jsonify({'error': payload['error']}), 401
         
         # Attach user info to request
         request.user = payload
-        print(f"SUCCESS: User authenticated: {payload.get('email')}")
-        print("=== END AUTH DEBUG ===\n")
+        logger.debug("Authenticated user %s for %s", payload.get('user_id'), request.path)
         
         return f(*args, **kwargs)
     
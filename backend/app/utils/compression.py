@@ -0,0 +1,107 @@
+"""
+Record file compression
+Compressible files (text reports, CSV exports, HL7/FHIR messages, uncompressed
+images) are compressed before they are encrypted; ciphertext does not
+compress, so this is the only point where it helps. zstd is used when the
+zstandard package is available (pymongo's zstd extra installs it), zlib
+otherwise. The codec is recorded in the record's encryption_metadata and
+reversed on read.
+"""
+
+import zlib
+from config.settings import Config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_ZSTD = 'zstd'
+CODEC_ZLIB = 'zlib'
+
+# Bytes of an unfamiliar file compressed to judge whether the rest is worth it
+SAMPLE_SIZE = 64 * 1024
+
+_ZSTD_LEVEL = 3
+_ZLIB_LEVEL = 6
+
+# Compressed whatever the content
+_COMPRESSIBLE_TYPES = {
+    'application/json', 'application/fhir+json', 'application/xml', 'application/fhir+xml',
+    'application/hl7-v2', 'application/x-hl7', 'application/csv', 'application/x-ndjson',
+    'application/rtf', 'image/bmp', 'image/x-ms-bmp', 'image/tiff', 'image/svg+xml'
+}
+
+# Already compressed (or encrypted) formats are stored as-is
+_INCOMPRESSIBLE_PREFIXES = ('image/', 'video/', 'audio/', 'application/pdf', 'application/zip',
+                            'application/gzip', 'application/x-7z-compressed', 'application/zstd')
+
+def default_codec():
+    """The codec new files are compressed with"""
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+def choose_codec(file_type, sample):
+    """
+    Pick the codec for a file, or None to store it uncompressed
+
+    Args:
+        file_type: The file's content type
+        sample: The first bytes of the file (up to SAMPLE_SIZE)
+    """
+    if not Config.RECORD_COMPRESSION or not sample:
+        return None
+    file_type = (file_type or '').split(';')[0].strip().lower()
+    if file_type in _COMPRESSIBLE_TYPES or file_type.startswith('text/'):
+        return default_codec()
+    if file_type.startswith(_INCOMPRESSIBLE_PREFIXES):
+        return None
+    # Unfamiliar types: compress when a fast pass over the sample saves enough
+    saving = 1 - len(zlib.compress(sample, 1)) / len(sample)
+    return default_codec() if saving >= Config.RECORD_COMPRESSION_MIN_SAVING else None
+
+def _compressor(codec):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compressobj()
+    if codec == CODEC_ZLIB:
+        return zlib.compressobj(_ZLIB_LEVEL)
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+def _decompressor(codec):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise Exception("Decompression failed: the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if codec == CODEC_ZLIB:
+        return zlib.decompressobj()
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+def compress_stream(pieces, codec):
+    """
+    Compress an iterator of byte strings
+
+    Yields:
+        bytes: Compressed data (pieces may be empty until the compressor fills a block)
+    """
+    compressor = _compressor(codec)
+    for piece in pieces:
+        data = compressor.compress(piece)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def decompress_stream(pieces, codec):
+    """
+    Decompress an iterator of byte strings
+
+    Yields:
+        bytes: Decompressed data
+    """
+    decompressor = _decompressor(codec)
+    for piece in pieces:
+        data = decompressor.decompress(piece)
+        if data:
+            yield data
+    if codec == CODEC_ZLIB:
+        data = decompressor.flush()
+        if data:
+            yield data
@@ -0,0 +1,85 @@
+"""
+Derived user fields
+Some user fields are computed from others: is_profile_complete, patients'
+search_tokens and doctors' directory entry. DEPENDENCIES says which fields
+each one is computed from; the write paths pass what they $set through
+derived_updates() so the derived fields change in the same update, and read
+paths use the stored values as they are.
+
+backfill_derived_fields.py recomputes them for users written before a field
+existed or before the way it is computed changed.
+"""
+
+from app.utils.doctor_search import DIRECTORY_FIELDS, directory_entry
+from app.utils.patient_search import SEARCH_FIELDS, search_tokens
+
+# Fields a profile needs before it counts as complete
+PATIENT_PROFILE_FIELDS = ('full_name', 'phone', 'gender', 'date_of_birth', 'address', 'blood_group',
+                          'emergency_contact_name', 'emergency_contact', 'emergency_contact_relation',
+                          'allergies', 'chronic_conditions')
+DOCTOR_PROFILE_FIELDS = ('full_name', 'phone', 'gender', 'date_of_birth', 'blood_group', 'specialization',
+                         'years_of_experience', 'qualification', 'languages_spoken')
+
+# Lists that may be empty (a patient with no allergies has still answered)
+_OPTIONAL_LISTS = ('allergies', 'chronic_conditions')
+
+def profile_complete(user):
+    """
+    Whether a user has filled in every field their role requires
+
+    Returns:
+        bool: Always True for roles without a profile to complete
+    """
+    role = user.get('role')
+    if role == 'patient':
+        required = PATIENT_PROFILE_FIELDS
+    elif role == 'doctor':
+        required = DOCTOR_PROFILE_FIELDS
+    else:
+        return True
+    for field in required:
+        value = user.get(field)
+        if value is None:
+            return False
+        if field not in _OPTIONAL_LISTS and value in ('', []):
+            return False
+    return True
+
+# derived field -> (roles it is kept for or None for every role, fields it is computed from, how)
+DEPENDENCIES = {
+    'is_profile_complete': (None, tuple(dict.fromkeys(PATIENT_PROFILE_FIELDS + DOCTOR_PROFILE_FIELDS)),
+                            profile_complete),
+    'search_tokens': (('patient',), SEARCH_FIELDS, search_tokens),
+    'directory': (('doctor',), DIRECTORY_FIELDS, directory_entry)
+}
+
+def _applies(field, user):
+    roles = DEPENDENCIES[field][0]
+    return roles is None or user.get('role') in roles
+
+def derived_values(user):
+    """
+    Every derived field for a complete user document (registration, imports)
+
+    Returns:
+        dict: Field -> value for the fields kept for the user's role
+    """
+    return {field: compute(user) for field, (_, _, compute) in DEPENDENCIES.items() if _applies(field, user)}
+
+def derived_updates(update_fields, current_user):
+    """
+    $set fields for the derived fields an update changes
+
+    Args:
+        update_fields: The fields being $set
+        current_user: The user document before the update
+
+    Returns:
+        dict: Derived field -> new value, only for fields whose sources are being set
+    """
+    updated = {**current_user, **update_fields}
+    return {
+        field: compute(updated)
+        for field, (_, sources, compute) in DEPENDENCIES.items()
+        if _applies(field, current_user) and any(source in update_fields for source in sources)
+    }
@@ -0,0 +1,328 @@
+"""
+Doctor search
+Doctors carry a directory subdocument: their profile fields normalized for
+searching (lowercased specialization, languages and hospital, name and
+hospital words, numeric fee and experience), a derived field (see
+derived_fields) written with the profile. Partial indexes over bookable
+doctors (verified, active, profile complete) serve the filter + sort
+combinations the booking page uses.
+
+Results are paged with an opaque cursor (the last sort value and _id), so
+later pages cost the same as the first. Facet counts (doctors per
+specialization, language, fee band, experience band and hospital) come from
+an in-memory snapshot each worker refreshes every DOCTOR_FACET_REFRESH_SECONDS;
+they may lag new registrations by that long.
+"""
+
+import base64
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from bson import ObjectId
+from bson.errors import InvalidId
+from app.models.database import Database
+from app.utils.patient_search import normalize
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Doctors patients can book
+BOOKABLE = {'role': 'doctor', 'is_verified': True, 'is_active': True, 'is_profile_complete': True}
+
+# Profile fields the directory is built from (a change to any of them rebuilds it)
+DIRECTORY_FIELDS = ('full_name', 'specialization', 'languages_spoken', 'hospital_affiliation',
+                    'consultation_fee', 'years_of_experience')
+
+# Filters find_doctors accepts
+SEARCH_FILTERS = ('specialization', 'language', 'name', 'hospital', 'min_fee', 'max_fee', 'min_experience')
+
+# Sort orders: directory field, direction (ties broken by _id)
+SORTS = {
+    'name': ('directory.sort_name', 1),
+    'experience': ('directory.experience', -1)
+}
+
+FEE_BANDS = [(0, 300), (300, 500), (500, 1000), (1000, 2000), (2000, None)]
+EXPERIENCE_BANDS = [(0, 5), (5, 10), (10, 20), (20, None)]
+
+# Hospitals listed in the facets
+_TOP_HOSPITALS = 20
+
+_WORD = re.compile(r'[a-z0-9]+')
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+class InvalidSearch(ValueError):
+    """A filter or cursor that cannot be used"""
+
+def _number(value):
+    """A fee or experience as a number (profiles may hold "500", "₹500" or 500), or None"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    match = _NUMBER.search(str(value or ''))
+    return float(match.group()) if match else None
+
+def directory_entry(user):
+    """
+    Normalized search fields for a doctor
+
+    Returns:
+        dict: The directory subdocument (None for anyone but doctors)
+    """
+    if user.get('role') != 'doctor':
+        return None
+    name = normalize(user.get('full_name'))
+    hospital = normalize(user.get('hospital_affiliation'))
+    languages = user.get('languages_spoken') if isinstance(user.get('languages_spoken'), list) else []
+    return {
+        'sort_name': name,
+        'name_words': sorted(set(_WORD.findall(name)) - {'dr'}),
+        'specialization': normalize(user.get('specialization')) or None,
+        'languages': sorted({normalize(language) for language in languages if normalize(language)}),
+        'hospital': hospital or None,
+        'hospital_words': sorted(set(_WORD.findall(hospital))),
+        'fee': _number(user.get('consultation_fee')),
+        'experience': _number(user.get('years_of_experience'))
+    }
+
+def encode_cursor(sort, doctor):
+    """Opaque cursor pointing just after a doctor in a sort order"""
+    field = SORTS[sort][0].split('.', 1)[1]
+    state = {'sort': sort, 'value': doctor['directory'].get(field), 'id': str(doctor['_id'])}
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode().rstrip('=')
+
+def _after_cursor(sort, cursor):
+    """Query clause for documents after a cursor"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        last_id = ObjectId(state['id'])
+        value = state['value']
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise InvalidSearch('Invalid cursor')
+    if state.get('sort') != sort:
+        raise InvalidSearch('Cursor belongs to a different sort order')
+
+    field, direction = SORTS[sort]
+    if value is None:
+        # Missing values sort last in descending order and first in ascending order
+        clauses = [{field: None, '_id': {'$gt': last_id}}]
+        if direction == 1:
+            clauses.append({field: {'$ne': None}})
+        return {'$or': clauses}
+    clauses = [{field: {'$gt' if direction == 1 else '$lt': value}}, {field: value, '_id': {'$gt': last_id}}]
+    if direction == -1:
+        clauses.append({field: None})
+    return {'$or': clauses}
+
+def _prefix(text):
+    """Anchored, index-friendly prefix match on a lowercased field"""
+    return {'$regex': '^' + re.escape(text)}
+
+def build_query(filters):
+    """
+    MongoDB query for a set of search filters
+
+    Args:
+        filters: dict with any of specialization, language, hospital, name (prefixes),
+            min_fee, max_fee, min_experience
+
+    Raises:
+        InvalidSearch: If a numeric filter is not a number
+    """
+    query = dict(BOOKABLE)
+    conditions = []
+
+    if filters.get('specialization'):
+        query['directory.specialization'] = normalize(filters['specialization'])
+    if filters.get('language'):
+        query['directory.languages'] = normalize(filters['language'])
+
+    for field, words_field in (('name', 'directory.name_words'), ('hospital', 'directory.hospital_words')):
+        words = [word for word in _WORD.findall(normalize(filters.get(field))) if word != 'dr' or field != 'name']
+        # Every typed word must start one of the doctor's words
+        conditions.extend({words_field: _prefix(word)} for word in words)
+
+    fee = {}
+    for key, operator in (('min_fee', '$gte'), ('max_fee', '$lte')):
+        if filters.get(key) not in (None, ''):
+            try:
+                fee[operator] = float(filters[key])
+            except (TypeError, ValueError):
+                raise InvalidSearch(f'{key} must be a number')
+    if fee:
+        query['directory.fee'] = fee
+
+    if filters.get('min_experience') not in (None, ''):
+        try:
+            query['directory.experience'] = {'$gte': float(filters['min_experience'])}
+        except (TypeError, ValueError):
+            raise InvalidSearch('min_experience must be a number')
+
+    if conditions:
+        query['$and'] = conditions
+    return query
+
+def find_doctors(users_collection, filters, sort='name', cursor=None, limit=20, projection=None):
+    """
+    One page of bookable doctors matching the filters
+
+    Returns:
+        tuple: (doctors, next_cursor or None)
+
+    Raises:
+        InvalidSearch: For an unknown sort, bad numeric filter or cursor
+    """
+    if sort not in SORTS:
+        raise InvalidSearch(f"sort must be one of: {', '.join(SORTS)}")
+    query = build_query(filters)
+    if cursor:
+        query.setdefault('$and', []).append(_after_cursor(sort, cursor))
+    if projection is not None:
+        projection = {**projection, 'directory': 1}
+
+    field, direction = SORTS[sort]
+    # One extra document tells whether there is a next page
+    doctors = list(users_collection.find(query, projection).sort([(field, direction), ('_id', 1)]).limit(limit + 1))
+    next_cursor = encode_cursor(sort, doctors[limit - 1]) if len(doctors) > limit else None
+    return doctors[:limit], next_cursor
+
+def _band(value, bands):
+    if value is None:
+        return None
+    for low, high in bands:
+        if high is None or value < high:
+            return f"{low}+" if high is None else f"{low}-{high}"
+    return None
+
+class FacetCache:
+    """
+    Per-worker snapshot of facet counts over bookable doctors, refreshed every refresh_seconds
+    Only the first count blocks searches; later ones run on a background thread
+    while the previous snapshot keeps being served.
+    """
+
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._facets = None
+        self._next_refresh = 0.0
+        self.refreshes = 0
+
+    def _compute(self, collection):
+        by_specialization = {}
+        labels = {}
+
+        def counters():
+            return {'specialization': Counter(), 'language': Counter(), 'fee': Counter(),
+                    'experience': Counter(), 'hospital': Counter()}
+
+        overall = counters()
+        projection = {'specialization': 1, 'languages_spoken': 1, 'hospital_affiliation': 1, 'directory': 1}
+        for doctor in collection.find(BOOKABLE, projection):
+            entry = doctor.get('directory') or directory_entry({**doctor, 'role': 'doctor'})
+            specialization = entry.get('specialization')
+            targets = [overall]
+            if specialization:
+                labels.setdefault(('specialization', specialization), doctor.get('specialization'))
+                targets.append(by_specialization.setdefault(specialization, counters()))
+            for counts in targets:
+                if specialization:
+                    counts['specialization'][specialization] += 1
+                for language in entry.get('languages', []):
+                    counts['language'][language] += 1
+                if entry.get('hospital'):
+                    counts['hospital'][entry['hospital']] += 1
+                fee_band = _band(entry.get('fee'), FEE_BANDS)
+                if fee_band:
+                    counts['fee'][fee_band] += 1
+                experience_band = _band(entry.get('experience'), EXPERIENCE_BANDS)
+                if experience_band:
+                    counts['experience'][experience_band] += 1
+            for language in doctor.get('languages_spoken') or []:
+                labels.setdefault(('language', normalize(language)), language)
+            if entry.get('hospital'):
+                labels.setdefault(('hospital', entry['hospital']), doctor.get('hospital_affiliation'))
+
+        def listing(counts):
+            facets = {}
+            for facet, counter in counts.items():
+                items = counter.most_common(_TOP_HOSPITALS if facet == 'hospital' else None)
+                facets[facet] = [{'value': labels.get((facet, key), key), 'count': count} for key, count in items]
+            return facets
+
+        return {
+            'all': listing(overall),
+            'by_specialization': {key: listing(counts) for key, counts in by_specialization.items()},
+            'doctors': sum(overall['specialization'].values())
+        }
+
+    def _refresh(self):
+        """Recount the facets (the caller holds _lock)"""
+        self._next_refresh = time.monotonic() + self.refresh_seconds
+        db = Database.get_db()
+        if db is None:
+            return
+        try:
+            self._facets = self._compute(db['users'])
+            self.refreshes += 1
+        except Exception as e:
+            logger.error("Doctor facet refresh error: %s", e)
+
+    def _refresh_and_release(self):
+        try:
+            self._refresh()
+        finally:
+            self._lock.release()
+
+    def get(self, specialization=None):
+        """Facet counts, for one specialization or for every bookable doctor"""
+        if time.monotonic() >= self._next_refresh:
+            if self._facets is None:
+                # Nothing to serve yet: wait for the first count
+                with self._lock:
+                    if time.monotonic() >= self._next_refresh:
+                        self._refresh()
+            elif self._lock.acquire(blocking=False):
+                # Keep serving the stale counts while one background thread recounts
+                try:
+                    if time.monotonic() < self._next_refresh:
+                        self._lock.release()
+                    else:
+                        threading.Thread(target=self._refresh_and_release, name='doctor-facet-refresh',
+                                         daemon=True).start()
+                except Exception:
+                    self._lock.release()
+                    raise
+        facets = self._facets
+        if facets is None:
+            return {}
+        if specialization:
+            return facets['by_specialization'].get(normalize(specialization), {})
+        return facets['all']
+
+    def stats(self):
+        facets = self._facets or {}
+        return {
+            'doctors': facets.get('doctors', 0),
+            'specializations': len(facets.get('by_specialization', {})),
+            'refreshes': self.refreshes
+        }
+
+_facet_cache = FacetCache(Config.DOCTOR_FACET_REFRESH_SECONDS)
+
+def _reset_after_fork():
+    _facet_cache._lock = threading.Lock()
+    _facet_cache._next_refresh = 0.0
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_facets(specialization=None):
+    """Cached facet counts (see FacetCache)"""
+    return _facet_cache.get(specialization)
+
+def get_facet_cache_stats():
+    return _facet_cache.stats()
@@ -1,16 +1,95 @@
-from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 import os
 import base64
+import hashlib
+import hmac
+import struct
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Segmented AES-GCM stream format:
+#   header  = magic | key id (4 bytes) | segment size (uint32) | 16-byte salt | 7-byte nonce prefix
+#   segment = AES-GCM(plaintext segment) | 16-byte tag, one per segment_size bytes
+# The per-file key is HKDF(key, salt). Each segment's nonce is
+# prefix | segment index (uint32) | final-segment flag, and the header is the
+# associated data of every segment, so reordered, truncated or extended streams
+# fail authentication. Version 1 headers (BMS1) carry no key id; the ring keys
+# are tried on their first segment.
+STREAM_METHOD = 'AES-256-GCM-STREAM'
+STREAM_MAGIC = b'BMS2'
+_STREAM_MAGIC_V1 = b'BMS1'
+_STREAM_HEADER = struct.Struct('>4s4sI16s7s')
+_STREAM_HEADER_V1 = struct.Struct('>4sI16s7s')
+_STREAM_TAG_SIZE = 16
+_STREAM_KEY_INFO = b'bharathmedicare record stream v1'
+_CONTENT_HASH_INFO = b'bharathmedicare content hash v1'
+
+class KeyRing:
+    """
+    Encryption keys, loaded once per process
+    The first key encrypts; every key can decrypt. Each key is identified by
+    the first 4 bytes of its SHA-256 (shown as 8 hex characters).
+    """
+
+    def __init__(self, keys):
+        if not keys:
+            raise ValueError("ENCRYPTION_KEY not found in environment variables")
+        self.keys = [key.encode() if isinstance(key, str) else key for key in keys]
+        self.raw_ids = [hashlib.sha256(key).digest()[:4] for key in self.keys]
+        self._keys_by_id = dict(zip(self.raw_ids, self.keys))
+        self.fernet = MultiFernet([Fernet(key) for key in self.keys])
+
+    @property
+    def primary_key(self):
+        return self.keys[0]
+
+    @property
+    def primary_id(self):
+        return self.raw_ids[0].hex()
+
+    @property
+    def key_ids(self):
+        return [raw_id.hex() for raw_id in self.raw_ids]
+
+    def key_for(self, raw_id):
+        key = self._keys_by_id.get(raw_id)
+        if key is None:
+            raise Exception(f"Decryption failed: unknown key id {raw_id.hex()}")
+        return key
+
+_keyring = None
+_keyring_lock = threading.Lock()
+
+def get_keyring():
+    """
+    Get the process-wide key ring
+    ENCRYPTION_KEYS lists every key, newest first (comma separated); without it
+    ENCRYPTION_KEY is the only key.
+    """
+    global _keyring
+    if _keyring is None:
+        with _keyring_lock:
+            if _keyring is None:
+                keys = os.getenv('ENCRYPTION_KEYS') or os.getenv('ENCRYPTION_KEY') or ''
+                _keyring = KeyRing([key.strip() for key in keys.split(',') if key.strip()])
+    return _keyring
+
+def reload_keyring():
+    """Re-read the keys from the environment"""
+    global _keyring
+    with _keyring_lock:
+        _keyring = None
+    return get_keyring()
+
 def get_encryption_key():
-    """Get encryption key from environment variables"""
-    key = os.getenv('ENCRYPTION_KEY')
-    if not key:
-        raise ValueError("ENCRYPTION_KEY not found in environment variables")
-    return key.encode()
+    """Get the primary (encrypting) key"""
+    return get_keyring().primary_key
 
 def encrypt_file_data(file_data):
     """
@@ -23,11 +102,8 @@ def encrypt_file_data(file_data):
         dict: Contains encrypted data and metadata
     """
     try:
-        key = get_encryption_key()
-        fernet = Fernet(key)
-        
-        # Encrypt the file data
-        encrypted_data = fernet.encrypt(file_data)
+        # Encrypt the file data with the primary key
+        encrypted_data = get_keyring().fernet.encrypt(file_data)
         
         # Convert to base64 for safe storage
         encrypted_base64 = base64.b64encode(encrypted_data).decode('utf-8')
@@ -55,20 +131,195 @@ def decrypt_file_data(encrypted_base64):
         bytes: The decrypted file data
     """
     try:
-        key = get_encryption_key()
-        fernet = Fernet(key)
-        
         # Decode from base64
         encrypted_data = base64.b64decode(encrypted_base64.encode('utf-8'))
         
-        # Decrypt the data
-        decrypted_data = fernet.decrypt(encrypted_data)
+        # Decrypt the data with whichever key in the ring encrypted it
+        decrypted_data = get_keyring().fernet.decrypt(encrypted_data)
         
         return decrypted_data
     
     except Exception as e:
         raise Exception(f"Decryption failed: {str(e)}")
 
+def encrypt_bytes(data):
+    """Encrypt small data with the primary key as a binary Fernet token"""
+    return base64.urlsafe_b64decode(get_keyring().fernet.encrypt(data))
+
+def decrypt_bytes(ciphertext):
+    """Decrypt a binary Fernet token (a Fernet token without its base64 text encoding)"""
+    try:
+        return get_keyring().fernet.decrypt(base64.urlsafe_b64encode(ciphertext))
+    except Exception as e:
+        raise Exception(f"Decryption failed: {str(e)}")
+
+def rotate_file_data(encrypted_base64):
+    """Re-encrypt inline encrypted_data under the primary key (keeps the original timestamp)"""
+    token = base64.b64decode(encrypted_base64.encode('utf-8'))
+    return base64.b64encode(get_keyring().fernet.rotate(token)).decode('utf-8')
+
+def rotate_bytes(ciphertext):
+    """Re-encrypt a binary Fernet token under the primary key"""
+    token = get_keyring().fernet.rotate(base64.urlsafe_b64encode(ciphertext))
+    return base64.urlsafe_b64decode(token)
+
+def legacy_ciphertext_to_bytes(encrypted_base64):
+    """Convert inline encrypted_data (base64 of a Fernet token) to a binary Fernet token without decrypting"""
+    token = base64.b64decode(encrypted_base64.encode('utf-8'))
+    return base64.urlsafe_b64decode(token)
+
+def content_hasher(patient_id):
+    """
+    Keyed fingerprint (HMAC-SHA256) of a record file's plaintext, scoped to one patient
+    The HMAC key is derived per patient, so the same file uploaded by two
+    patients gets unrelated fingerprints. CONTENT_HASH_KEY keeps fingerprints
+    comparable across encryption key rotations; without it the primary key is used.
+    
+    Returns:
+        hmac object: feed it the plaintext with update(), read hexdigest()
+    """
+    secret = os.getenv('CONTENT_HASH_KEY')
+    master_key = secret.encode('utf-8') if secret else base64.urlsafe_b64decode(get_keyring().primary_key)
+    patient_key = HKDF(
+        algorithm=hashes.SHA256(), length=32, salt=None,
+        info=_CONTENT_HASH_INFO + b':' + str(patient_id).encode('utf-8')
+    ).derive(master_key)
+    return hmac.new(patient_key, digestmod=hashlib.sha256)
+
+def _stream_key(key, salt):
+    master_key = base64.urlsafe_b64decode(key)
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=_STREAM_KEY_INFO).derive(master_key)
+
+def _segment_nonce(prefix, index, last):
+    return prefix + struct.pack('>IB', index, 1 if last else 0)
+
+def _read_full(reader, size):
+    """Read exactly size bytes unless the reader hits EOF first"""
+    data = reader.read(size)
+    while data and len(data) < size:
+        more = reader.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+def encrypt_stream(reader, segment_size=64 * 1024):
+    """
+    Encrypt a file-like object into the segmented AES-GCM stream format
+    
+    Args:
+        reader: File-like object with read(size)
+        segment_size: Plaintext bytes per segment
+    
+    Yields:
+        bytes: The stream header, then one sealed segment at a time
+    """
+    keyring = get_keyring()
+    salt = os.urandom(16)
+    prefix = os.urandom(7)
+    header = _STREAM_HEADER.pack(STREAM_MAGIC, keyring.raw_ids[0], segment_size, salt, prefix)
+    aead = AESGCM(_stream_key(keyring.primary_key, salt))
+    yield header
+    
+    # Read one segment ahead so the final segment can be flagged
+    index = 0
+    segment = _read_full(reader, segment_size)
+    while True:
+        following = _read_full(reader, segment_size) if len(segment) == segment_size else b''
+        last = not following
+        yield aead.encrypt(_segment_nonce(prefix, index, last), segment, header)
+        if last:
+            return
+        segment = following
+        index += 1
+
+class _StreamCipher:
+    """Opens the segments of one stream; with several candidate keys the first segment settles which"""
+
+    def __init__(self, header, segment_size, salt, prefix, keys):
+        self.header = header
+        self.segment_size = segment_size
+        self.prefix = prefix
+        self._ciphers = [AESGCM(_stream_key(key, salt)) for key in keys]
+
+    def open(self, index, last, segment):
+        nonce = _segment_nonce(self.prefix, index, last)
+        for aead in self._ciphers:
+            try:
+                plaintext = aead.decrypt(nonce, segment, self.header)
+            except InvalidTag:
+                continue
+            self._ciphers = [aead]
+            return plaintext
+        raise Exception(f"Decryption failed: segment {index} failed authentication")
+
+def _open_stream(reader):
+    """Read and check a stream header; returns a _StreamCipher"""
+    magic = _read_full(reader, 4)
+    if magic == STREAM_MAGIC:
+        header = magic + _read_full(reader, _STREAM_HEADER.size - 4)
+        if len(header) != _STREAM_HEADER.size:
+            raise Exception("Decryption failed: truncated stream header")
+        _, raw_id, segment_size, salt, prefix = _STREAM_HEADER.unpack(header)
+        keys = [get_keyring().key_for(raw_id)]
+    elif magic == _STREAM_MAGIC_V1:
+        header = magic + _read_full(reader, _STREAM_HEADER_V1.size - 4)
+        if len(header) != _STREAM_HEADER_V1.size:
+            raise Exception("Decryption failed: truncated stream header")
+        _, segment_size, salt, prefix = _STREAM_HEADER_V1.unpack(header)
+        keys = get_keyring().keys
+    else:
+        raise Exception("Decryption failed: not a segmented stream")
+    return _StreamCipher(header, segment_size, salt, prefix, keys)
+
+def decrypt_stream(reader):
+    """
+    Decrypt a segmented AES-GCM stream from a file-like object
+    
+    Yields:
+        bytes: Plaintext, one segment at a time
+    """
+    cipher = _open_stream(reader)
+    sealed_size = cipher.segment_size + _STREAM_TAG_SIZE
+    
+    index = 0
+    segment = _read_full(reader, sealed_size)
+    while True:
+        following = _read_full(reader, sealed_size) if len(segment) == sealed_size else b''
+        last = not following
+        yield cipher.open(index, last, segment)
+        if last:
+            return
+        segment = following
+        index += 1
+
+def decrypt_stream_range(reader, stream_length, start, stop):
+    """
+    Decrypt plaintext bytes [start, stop) of a segmented AES-GCM stream
+    Only the segments covering the range are read (the reader must be seekable).
+    
+    Args:
+        reader: Seekable file-like object positioned at the start of the stream
+        stream_length: Total stream length in bytes (to identify the final segment)
+        start, stop: Plaintext byte range, stop exclusive
+    
+    Yields:
+        bytes: Plaintext of the range, one segment at a time
+    """
+    cipher = _open_stream(reader)
+    header_size = len(cipher.header)
+    segment_size = cipher.segment_size
+    sealed_size = segment_size + _STREAM_TAG_SIZE
+    segment_count = max(1, -(-(stream_length - header_size) // sealed_size))
+    
+    first = start // segment_size
+    reader.seek(header_size + first * sealed_size)
+    for index in range(first, (stop - 1) // segment_size + 1):
+        segment = _read_full(reader, sealed_size)
+        plaintext = cipher.open(index, index == segment_count - 1, segment)
+        offset = index * segment_size
+        yield plaintext[max(start - offset, 0):stop - offset]
+
 def generate_encryption_key():
     """
     Generate a new Fernet encryption key
@@ -1,88 +1,231 @@
 """
-Unique ID Generator for Users
-Generates unique IDs for patients and doctors
+Unique ID allocator for patients, doctors and appointments
+IDs keep their PREFIX-XXXXXXXX form (8 uppercase letters or digits) but are no
+longer drawn at random and checked with a find_one per attempt. Each kind has
+a sequence in the counters collection; workers reserve blocks of it with one
+$inc (ID_BLOCK_SIZE at a time, or as many as a bulk import asks for), and a
+keyed Feistel permutation turns each sequence number into a distinct ID that
+does not reveal how many came before it.
+
+Two sequence numbers never give the same ID. IDs issued before the allocator
+(random ones) can, very rarely, equal a new one; the unique indexes reject
+that insert and insert_with_id() retries with the next ID.
+
+The permutation is keyed by ID_PERMUTATION_KEY, a secret of its own so that
+rotating any other secret leaves it alone. It is required unless FLASK_DEBUG is
+on: without it, allocation fails rather than issue IDs anyone could map back
+to sequence numbers.
 """
 
-import random
+import hashlib
+import logging
+import os
 import string
-import secrets
-from app.models.database import get_users_collection
+import threading
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.models.database import Database
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# kind -> (prefix, collection, field)
+ID_KINDS = {
+    'patient': ('PAT', 'users', 'patient_id'),
+    'doctor': ('DOC', 'users', 'doctor_id'),
+    'appointment': ('APT', 'appointments', 'appointment_id')
+}
+
+COUNTERS_COLLECTION = 'counters'
 
+ID_ALPHABET = string.ascii_uppercase + string.digits
+ID_LENGTH = 8
+# Distinct IDs per kind (36^8, about 2.8 trillion)
+ID_SPACE = len(ID_ALPHABET) ** ID_LENGTH
+
+# The Feistel network permutes 42-bit numbers; results outside ID_SPACE are
+# permuted again (cycle walking) until they fall inside it
+_HALF_BITS = 21
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+# Attempts insert_with_id makes before giving up
+_INSERT_ATTEMPTS = 5
+
+# Stands in for ID_PERMUTATION_KEY in debug mode only
+_DEVELOPMENT_KEY = 'development-only-id-permutation-key'
+
+def check_permutation_key():
+    """Log (at startup) when ID_PERMUTATION_KEY is missing; True if it is set"""
+    if Config.ID_PERMUTATION_KEY:
+        return True
+    if Config.DEBUG:
+        logger.warning("ID_PERMUTATION_KEY is not set; using a development key, so IDs reveal registration order")
+    else:
+        logger.error("ID_PERMUTATION_KEY is not set; registrations and bookings will fail until it is")
+    return False
 
-def generate_unique_id(role):
+def _kind_key(kind):
     """
-    Generate a unique random ID based on user role
-    - Patients: PAT-XXXXXXXX (8 random alphanumeric characters)
-    - Doctors: DOC-XXXXXXXX (8 random alphanumeric characters)
-    
-    Uses cryptographically secure random generation for unpredictability
+    Permutation key for a kind
+
+    Raises:
+        RuntimeError: If ID_PERMUTATION_KEY is not set outside debug mode
     """
-    users_collection = get_users_collection()
-    
-    if role == 'patient':
-        prefix = 'PAT'
-        field_name = 'patient_id'
-    elif role == 'doctor':
-        prefix = 'DOC'
-        field_name = 'doctor_id'
-    else:
-        return None
-    
-    max_attempts = 20
-    for _ in range(max_attempts):
-        # Generate 8-character random alphanumeric string (uppercase letters and digits)
-        # This gives us 36^8 = 2.8 trillion possible combinations
-        characters = string.ascii_uppercase + string.digits
-        random_part = ''.join(secrets.choice(characters) for _ in range(8))
-        unique_id = f"{prefix}-{random_part}"
-        
-        # Check if ID already exists
-        existing = users_collection.find_one({field_name: unique_id})
-        if not existing:
-            return unique_id
-    
-    # If we couldn't generate a unique ID after max_attempts, raise an error
-    raise ValueError(f"Could not generate unique {role} ID after {max_attempts} attempts")
-
-
-def get_next_sequential_id(role):
+    secret = Config.ID_PERMUTATION_KEY
+    if not secret:
+        if not Config.DEBUG:
+            raise RuntimeError('ID_PERMUTATION_KEY is not set')
+        secret = _DEVELOPMENT_KEY
+    master = hashlib.sha256(secret.encode('utf-8')).digest()
+    return hashlib.blake2b(kind.encode('utf-8'), key=master, digest_size=32).digest()
+
+def _round(key, round_number, half):
+    digest = hashlib.blake2b(bytes([round_number]) + half.to_bytes(3, 'big'), key=key, digest_size=4).digest()
+    return int.from_bytes(digest, 'big') & _HALF_MASK
+
+def permute(number, key):
     """
-    Alternative method: Generate sequential IDs
-    - Patients: PAT-000001, PAT-000002, etc.
-    - Doctors: DOC-000001, DOC-000002, etc.
+    Map a sequence number to a distinct number in [0, ID_SPACE)
+
+    Raises:
+        ValueError: If the sequence has run past ID_SPACE
     """
-    users_collection = get_users_collection()
-    
-    if role == 'patient':
-        prefix = 'PAT'
-        field_name = 'patient_id'
-    elif role == 'doctor':
-        prefix = 'DOC'
-        field_name = 'doctor_id'
-    else:
-        return None
-    
-    # Find the highest existing ID
-    pipeline = [
-        {'$match': {field_name: {'$regex': f'^{prefix}-'}}},
-        {'$project': {
-            'number': {
-                '$toInt': {
-                    '$substr': [f'${field_name}', len(prefix) + 1, -1]
-                }
-            }
-        }},
-        {'$sort': {'number': -1}},
-        {'$limit': 1}
-    ]
-    
-    result = list(users_collection.aggregate(pipeline))
-    
-    if result:
-        next_number = result[0]['number'] + 1
-    else:
-        next_number = 1
-    
-    # Format with leading zeros (6 digits)
-    unique_id = f"{prefix}-{next_number:06d}"
-    return unique_id
+    if not 0 <= number < ID_SPACE:
+        raise ValueError('ID sequence exhausted')
+    value = number
+    while True:
+        left, right = value >> _HALF_BITS, value & _HALF_MASK
+        for round_number in range(_ROUNDS):
+            left, right = right, left ^ _round(key, round_number, right)
+        value = (left << _HALF_BITS) | right
+        if value < ID_SPACE:
+            return value
+
+def format_id(prefix, value):
+    """PREFIX-XXXXXXXX for a number in [0, ID_SPACE)"""
+    characters = []
+    for _ in range(ID_LENGTH):
+        value, digit = divmod(value, len(ID_ALPHABET))
+        characters.append(ID_ALPHABET[digit])
+    return f"{prefix}-{''.join(reversed(characters))}"
+
+class IdAllocator:
+    """Hands out IDs of one kind from blocks of its sequence reserved in the counters collection"""
+
+    def __init__(self, kind, block_size):
+        self.kind = kind
+        self.prefix = ID_KINDS[kind][0]
+        self.block_size = block_size
+        # Derived on first use, so a missing key fails allocation rather than import
+        self._key = None
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self.allocated = 0
+        self.blocks = 0
+
+    def reserve(self, count):
+        """
+        Reserve count sequence numbers
+
+        Returns:
+            tuple: (first, end) of the reserved range
+        """
+        db = Database.get_db()
+        if db is None:
+            raise RuntimeError('Database connection error')
+        counter = db[COUNTERS_COLLECTION].find_one_and_update(
+            {'_id': self.kind},
+            {'$inc': {'next': count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self.blocks += 1
+        return counter['next'] - count, counter['next']
+
+    def _format(self, number):
+        return format_id(self.prefix, permute(number, self._key))
+
+    def _check_key(self):
+        # Before reserving anything, so a missing key wastes no sequence numbers
+        if self._key is None:
+            self._key = _kind_key(self.kind)
+
+    def next_id(self):
+        """One ID, from this worker's current block"""
+        self._check_key()
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self.reserve(self.block_size)
+            number = self._next
+            self._next += 1
+            self.allocated += 1
+        return self._format(number)
+
+    def allocate(self, count):
+        """count IDs from a block of their own (bulk imports)"""
+        if count <= 0:
+            return []
+        self._check_key()
+        first, end = self.reserve(count)
+        with self._lock:
+            self.allocated += count
+        return [self._format(number) for number in range(first, end)]
+
+    def stats(self):
+        return {'allocated': self.allocated, 'blocks': self.blocks, 'buffered': self._end - self._next}
+
+_allocators = {kind: IdAllocator(kind, Config.ID_BLOCK_SIZE) for kind in ID_KINDS}
+
+def _reset_after_fork():
+    # A block inherited from the parent would be handed out twice
+    for allocator in _allocators.values():
+        allocator._lock = threading.Lock()
+        allocator._next = allocator._end = 0
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def next_id(kind):
+    """A new ID for a patient, doctor or appointment"""
+    return _allocators[kind].next_id()
+
+def allocate_ids(kind, count):
+    """count new IDs in one counters round trip"""
+    return _allocators[kind].allocate(count)
+
+def get_id_allocator_stats():
+    return {kind: allocator.stats() for kind, allocator in _allocators.items()}
+
+def insert_with_id(collection, document, kind, prepare=None):
+    """
+    Give a document a new ID of a kind and insert it, retrying with another ID if it is taken
+
+    Args:
+        collection: Collection the kind's IDs are unique in
+        document: Document to insert (its ID field is set here)
+        kind: A key of ID_KINDS
+        prepare: Optional callback(document) after each ID is set, for fields computed from it
+
+    Returns:
+        InsertOneResult
+
+    Raises:
+        DuplicateKeyError: For a clash on any other unique field
+        ValueError: If every attempt clashed
+    """
+    field = ID_KINDS[kind][2]
+    for _ in range(_INSERT_ATTEMPTS):
+        document[field] = next_id(kind)
+        if prepare:
+            prepare(document)
+        try:
+            return collection.insert_one(document)
+        except DuplicateKeyError:
+            # Only retry if it was the ID that clashed
+            if not collection.find_one({field: document[field]}, {'_id': 1}):
+                raise
+            document.pop('_id', None)
+            logger.warning("%s %s already taken; allocating another", field, document[field])
+    raise ValueError(f"Could not allocate a unique {kind} ID after {_INSERT_ATTEMPTS} attempts")
@@ -0,0 +1,157 @@
+"""
+Application logging
+Modules log through logging.getLogger(__name__). setup_logging() (called by
+create_app) attaches a QueueHandler to the 'app' logger; a QueueListener thread
+does the formatting and stream I/O, so request threads never block on stdout.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from config.settings import Config
+
+APP_LOGGER = 'app'
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'taskName'}
+
+class JsonFormatter(logging.Formatter):
+    """Format each record as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName
+        }
+
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records per level, e.g. {logging.DEBUG: 0.1}"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the message and traceback now; arguments may change once the caller returns
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def parse_sample_rates(value):
+    """Parse 'DEBUG=0.1,INFO=0.5' into {logging.DEBUG: 0.1, logging.INFO: 0.5}"""
+    rates = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        level_name, rate = item.split('=', 1)
+        level = logging.getLevelName(level_name.strip().upper())
+        if isinstance(level, int):
+            rates[level] = float(rate)
+    return rates
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+_output_handler = None
+
+def _start_listener():
+    global _listener
+    _handler.queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(_handler.queue, _output_handler, respect_handler_level=True)
+    _listener.start()
+
+def setup_logging():
+    """Attach the queue handler to the 'app' logger and start the listener (idempotent)"""
+    global _handler, _output_handler
+    with _lock:
+        if _handler is not None:
+            return
+
+        _output_handler = logging.StreamHandler(sys.stdout)
+        if Config.LOG_FORMAT == 'json':
+            _output_handler.setFormatter(JsonFormatter())
+        else:
+            _output_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+        _handler.addFilter(SamplingFilter(parse_sample_rates(Config.LOG_SAMPLE_RATES)))
+
+        app_logger = logging.getLogger(APP_LOGGER)
+        app_logger.setLevel(Config.LOG_LEVEL.upper())
+        app_logger.addHandler(_handler)
+        app_logger.propagate = False
+
+        _start_listener()
+        atexit.register(stop_logging)
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            pass
+        _listener = None
+
+def _restart_after_fork():
+    """The listener thread does not survive fork; give the child its own queue and thread"""
+    if _handler is not None:
+        _start_listener()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+def get_logging_stats():
+    """Get logging queue statistics"""
+    if _handler is None:
+        return {}
+    return {
+        'queued': _handler.queue.qsize(),
+        'dropped': _handler.dropped
+    }
@@ -1,23 +1,172 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import bcrypt
+from config.settings import Config
 
-def hash_password(password):
-    """Hash a password using bcrypt"""
-    # Generate salt and hash the password
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+logger = logging.getLogger(__name__)
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+class HashingExecutor:
+    """
+    Dedicated bcrypt thread pool
+    bcrypt releases the GIL, so a small pool caps how many CPU-bound hashes run
+    at once per worker; submissions beyond max_pending are rejected instead of
+    queueing behind a login surge.
+    """
+
+    def __init__(self, max_workers, max_pending, timeout_seconds):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout_seconds
+        self._reset()
+
+    def _reset(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_queue_ms = 0.0
+        self.max_queue_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bcrypt')
+        return self._executor
+
+    def _timed(self, submitted_at, fn, args):
+        started_at = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            finished_at = time.monotonic()
+            queue_ms = (started_at - submitted_at) * 1000
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+                self.total_queue_ms += queue_ms
+                self.max_queue_ms = max(self.max_queue_ms, queue_ms)
+                self.total_run_ms += (finished_at - started_at) * 1000
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) on the pool and return a Future"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHashingBusy("Too many password checks in progress")
+            self.pending += 1
+        try:
+            return self._get_executor().submit(self._timed, time.monotonic(), fn, args)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and wait for the result"""
+        try:
+            return self.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHashingBusy("Timed out waiting for password hashing")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'avg_queue_ms': round(self.total_queue_ms / self.completed, 3) if self.completed else 0.0,
+                'max_queue_ms': round(self.max_queue_ms, 3),
+                'avg_hash_ms': round(self.total_run_ms / self.completed, 3) if self.completed else 0.0,
+                'rounds': Config.BCRYPT_ROUNDS
+            }
+
+_hashing_executor = HashingExecutor(
+    max_workers=Config.BCRYPT_MAX_CONCURRENCY,
+    max_pending=Config.BCRYPT_MAX_PENDING,
+    timeout_seconds=Config.BCRYPT_TIMEOUT_SECONDS
+)
+
+# The pool's threads do not survive fork; each worker starts its own on first use
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_hashing_executor._reset)
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def _checkpw(password, hashed_password):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def hash_password(password, rounds=None):
+    """Hash a password using bcrypt at the configured cost (BCRYPT_ROUNDS)"""
+    return _hashing_executor.run(_hashpw, password, rounds or Config.BCRYPT_ROUNDS)
 
 def verify_password(password, hashed_password):
     """Verify a password against its hash"""
     try:
-        return bcrypt.checkpw(
-            password.encode('utf-8'), 
-            hashed_password.encode('utf-8')
-        )
+        return _hashing_executor.run(_checkpw, password, hashed_password)
+    except PasswordHashingBusy:
+        raise
     except Exception as e:
-        print(f"Password verification error: {e}")
+        logger.error("Password verification error: %s", e)
         return False
 
+def get_hash_rounds(hashed_password):
+    """Cost factor of a bcrypt hash ('$2b$12$...' -> 12), or None if unparseable"""
+    try:
+        return int(hashed_password.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed_password):
+    """True when a stored hash was made with a different cost than BCRYPT_ROUNDS"""
+    return get_hash_rounds(hashed_password) != Config.BCRYPT_ROUNDS
+
+def rehash_in_background(user_id, password, old_hash):
+    """
+    Re-hash a just-verified password at the configured cost without delaying the login
+    The update only applies if the stored hash has not changed in the meantime.
+    """
+    from app.models.database import get_users_collection
+    from app.utils.user_cache import invalidate_user
+
+    def _rehash():
+        try:
+            new_hash = _hashpw(password, Config.BCRYPT_ROUNDS)
+            users_collection = get_users_collection()
+            if users_collection is None:
+                return
+            result = users_collection.update_one(
+                {'_id': user_id, 'password_hash': old_hash},
+                {'$set': {'password_hash': new_hash}}
+            )
+            if result.modified_count:
+                invalidate_user(user_id)
+                logger.info("Rehashed password for user %s (cost %s -> %s)",
+                            user_id, get_hash_rounds(old_hash), Config.BCRYPT_ROUNDS)
+        except Exception as e:
+            logger.error("Password rehash error: %s", e)
+
+    try:
+        _hashing_executor.submit(_rehash)
+    except PasswordHashingBusy:
+        # Busy: try again on a later login
+        pass
+
+def get_hashing_stats():
+    """Get bcrypt executor statistics"""
+    return _hashing_executor.stats()
+
 def is_strong_password(password):
     """
     Validate password strength
@@ -0,0 +1,189 @@
+"""
+Patient search
+Patients carry a search_tokens array: edge n-grams (prefixes) of every word
+of their name, email (the whole address and its parts), patient ID and phone
+number (digits only, with and without the country code), all lowercased, plus
+'^'-marked edge n-grams of each of those values whole.
+A search looks the query up in the multikey index on that array instead of
+scanning users with unanchored regexes, then ranks what it found: exact ID,
+email or phone first, then records the query is a prefix of, then other word
+matches. Prefix matches are fetched in a pass of their own before the word
+matches, so a common word ("kumar") matching thousands of patients cannot
+crowd out the ones whose name starts with it.
+
+search_tokens is a derived field (see derived_fields): it is written with the
+patient and backfill_derived_fields.py fills it in for older patients.
+"""
+
+import re
+import unicodedata
+from config.settings import Config
+
+# Shortest and longest indexed prefix; longer query words are matched on their first MAX_PREFIX characters
+MIN_PREFIX = 2
+MAX_PREFIX = 20
+
+# Fields the tokens are built from (a change to any of them rebuilds the tokens)
+SEARCH_FIELDS = ('full_name', 'email', 'phone', 'patient_id')
+
+# Marks the edge n-grams of whole values (as opposed to single words)
+WHOLE_PREFIX = '^'
+
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_TOKEN = 2
+
+_WORD = re.compile(r'[a-z0-9]+')
+_PHONE_LIKE = re.compile(r'^\+?[\d\s().-]+$')
+
+def normalize(text):
+    """Lowercase, strip accents and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+def _digits(text):
+    return ''.join(char for char in str(text or '') if char.isdigit())
+
+def _query_digits(query):
+    """Digits of a phone-like query (the last ten of longer numbers, so a country code is optional), else ''"""
+    if not _PHONE_LIKE.match(query.strip()):
+        return ''
+    digits = _digits(query)
+    return digits[-10:] if len(digits) > 10 else digits
+
+def _phone_forms(phone):
+    """Digits of a phone number, with and without the country code"""
+    digits = _digits(phone)
+    return {digits, digits[-10:]} if digits else set()
+
+def _whole_values(user):
+    """The values a query can be a prefix of (RANK_PREFIX)"""
+    values = {normalize(user.get(field)) for field in ('full_name', 'email', 'patient_id')}
+    values.update(_phone_forms(user.get('phone')))
+    values.discard('')
+    return values
+
+def _words(user):
+    """Every searchable word of a user (what query words are matched against)"""
+    words = set()
+    for field in ('full_name', 'email', 'patient_id'):
+        value = normalize(user.get(field))
+        if not value:
+            continue
+        words.update(_WORD.findall(value))
+        if field == 'email':
+            # The whole address, so "ravi.k@gm" matches as typed
+            words.add(value)
+    words.update(_phone_forms(user.get('phone')))
+    return words
+
+def search_tokens(user):
+    """
+    Index tokens for a user document (empty for anyone but patients)
+
+    Returns:
+        list: Sorted edge n-grams of every searchable word and of every whole value
+    """
+    if user.get('role') != 'patient':
+        return []
+    tokens = set()
+    for word in _words(user):
+        for length in range(MIN_PREFIX, min(len(word), MAX_PREFIX) + 1):
+            tokens.add(word[:length])
+    for value in _whole_values(user):
+        for length in range(MIN_PREFIX, min(len(value), MAX_PREFIX) + 1):
+            tokens.add(WHOLE_PREFIX + value[:length])
+    return sorted(tokens)
+
+def query_terms(query):
+    """
+    Index terms for a search query; each must prefix-match one of a patient's words
+
+    Phone-like queries ("+91 98765 43210") become a single digits-only term.
+    Words shorter than MIN_PREFIX are left to ranking.
+    """
+    digits = _query_digits(query)
+    if len(digits) >= MIN_PREFIX:
+        return [digits]
+    words = []
+    for word in normalize(query).split():
+        # Email addresses are matched whole; other punctuation ("O'Brien,", "PAT-1A2B") splits words
+        words.extend([word] if '@' in word else _WORD.findall(word))
+    terms = {word[:MAX_PREFIX] for word in words if len(word) >= MIN_PREFIX}
+    # Longest first: the index is searched on the first term, the most selective one
+    return sorted(terms, key=len, reverse=True)
+
+def prefix_term(query):
+    """Index term for patients whose name, email, ID or phone starts with the query, or None"""
+    value = _query_digits(query) or normalize(query)
+    if len(value) < MIN_PREFIX:
+        return None
+    return WHOLE_PREFIX + value[:MAX_PREFIX]
+
+def rank(user, query):
+    """
+    Rank of a candidate for a query (lower is better), or None if it does not match
+
+    RANK_EXACT: the query is the patient's ID, email or phone number
+    RANK_PREFIX: the query is the start of the name, ID, email or phone number
+    RANK_TOKEN: every query word starts one of the patient's words
+    """
+    normalized = normalize(query)
+    digits = _query_digits(query)
+    phones = _phone_forms(user.get('phone'))
+    patient_id = normalize(user.get('patient_id'))
+    email = normalize(user.get('email'))
+
+    if normalized in (patient_id, email) or (digits and digits in phones):
+        return RANK_EXACT
+    if any(value.startswith(digits or normalized) for value in _whole_values(user)):
+        return RANK_PREFIX
+
+    words = _words(user)
+    terms = query_terms(query)
+    if terms and all(any(word.startswith(term) for word in words) for term in terms):
+        return RANK_TOKEN
+    return None
+
+def find_patients(users_collection, query, limit=20, projection=None):
+    """
+    Find and rank patients matching a query
+
+    Args:
+        users_collection: The users collection
+        query: What was typed (ID, name, email or phone, whole or in part)
+        limit: Results to return
+        projection: Fields to return (the searchable fields are always included)
+
+    Returns:
+        list: Matching patient documents, best first
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    if projection is not None:
+        projection = {**projection, **{field: 1 for field in SEARCH_FIELDS}}
+
+    candidates = {}
+    # An exact ID may be buried among many token matches; fetch it directly
+    exact = users_collection.find_one({'patient_id': query.strip().upper(), 'role': 'patient'}, projection)
+    if exact:
+        candidates[exact['_id']] = exact
+    # Prefix matches first, then fill up with word matches
+    prefix = prefix_term(query)
+    if prefix:
+        for user in users_collection.find({'role': 'patient', 'search_tokens': prefix}, projection) \
+                                    .limit(Config.PATIENT_SEARCH_CANDIDATES):
+            candidates.setdefault(user['_id'], user)
+    for user in users_collection.find({'role': 'patient', 'search_tokens': {'$all': terms}}, projection) \
+                                .limit(Config.PATIENT_SEARCH_CANDIDATES):
+        candidates.setdefault(user['_id'], user)
+
+    ranked = []
+    for user in candidates.values():
+        user_rank = rank(user, query)
+        if user_rank is not None:
+            ranked.append((user_rank, normalize(user.get('full_name')), user.get('patient_id') or '', user))
+    ranked.sort(key=lambda entry: entry[:3])
+    return [entry[3] for entry in ranked[:limit]]
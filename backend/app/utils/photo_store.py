@@ -0,0 +1,130 @@
+"""
+Profile photo store
+Uploaded profile photos are resized on the server into fixed variants (a
+square avatar, a card-sized and a full-sized image), re-encoded as WebP and
+kept in profile_photos, one document per variant. The user document only
+holds the URL of the card variant. Every upload gets a new random version in
+that URL, so photos can be cached for a year and a new photo is simply a new
+URL; the version is also what keeps the unauthenticated photo route from being
+enumerated.
+"""
+
+import re
+import secrets
+from datetime import datetime
+from io import BytesIO
+from bson import Binary, ObjectId
+from PIL import Image, ImageOps
+from app.models.database import Database
+from config.settings import Config
+
+PHOTOS_COLLECTION = 'profile_photos'
+PHOTO_CONTENT_TYPE = 'image/webp'
+PHOTO_URL_PREFIX = '/api/users/photos/'
+
+# Longest side in pixels (avatars are cropped square)
+PHOTO_VARIANTS = {'avatar': 96, 'card': 320, 'full': 1024}
+DEFAULT_VARIANT = 'card'
+
+_PHOTO_URL = re.compile(r'^' + re.escape(PHOTO_URL_PREFIX) + r'(?P<version>[0-9a-f]+)/(?P<variant>[a-z]+)$')
+
+def photo_url(version, variant=DEFAULT_VARIANT):
+    """URL of one variant of a stored photo"""
+    return f"{PHOTO_URL_PREFIX}{version}/{variant}"
+
+def photo_version(url):
+    """Version of a stored photo URL, or None for anything else (no photo, legacy data URIs)"""
+    match = _PHOTO_URL.match(url or '')
+    return match.group('version') if match else None
+
+def variant_url(url, variant):
+    """The same photo at another size; URLs that are not from this store are returned unchanged"""
+    version = photo_version(url)
+    return photo_url(version, variant) if version else url
+
+def _get_collection(db=None):
+    db = db if db is not None else Database.get_db()
+    return db[PHOTOS_COLLECTION]
+
+def render_variants(data):
+    """
+    Resize an uploaded photo into every variant
+
+    Returns:
+        dict: variant -> (WebP bytes, width, height)
+
+    Raises:
+        ValueError: If the data is not a readable image
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except Exception as e:
+        raise ValueError(f"Unreadable image: {e}")
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    variants = {}
+    for variant, size in PHOTO_VARIANTS.items():
+        if variant == 'avatar':
+            # Crop to a square without upscaling small photos
+            side = min(size, image.width, image.height)
+            resized = ImageOps.fit(image, (side, side))
+        else:
+            resized = image.copy()
+            resized.thumbnail((size, size))
+        output = BytesIO()
+        resized.save(output, 'WEBP', quality=Config.PROFILE_PHOTO_QUALITY)
+        variants[variant] = (output.getvalue(), resized.width, resized.height)
+    return variants
+
+def store_photo(user_id, data, db=None):
+    """
+    Resize and store a user's photo under a new version
+
+    Returns:
+        str: URL of the card variant, to be saved as the user's profile_photo
+
+    Raises:
+        ValueError: If the data is not a readable image
+    """
+    variants = render_variants(data)
+    version = secrets.token_hex(8)
+    now = datetime.utcnow()
+    _get_collection(db).insert_many([{
+        '_id': f"{version}/{variant}",
+        'user_id': ObjectId(user_id),
+        'version': version,
+        'variant': variant,
+        'data': Binary(image),
+        'content_type': PHOTO_CONTENT_TYPE,
+        'width': width,
+        'height': height,
+        'created_at': now
+    } for variant, (image, width, height) in variants.items()])
+    return photo_url(version)
+
+def get_photo(version, variant, db=None):
+    """Stored document for one variant of a photo, or None"""
+    if variant not in PHOTO_VARIANTS:
+        return None
+    return _get_collection(db).find_one({'_id': f"{version}/{variant}"})
+
+def delete_photos(user_id, keep=(), db=None):
+    """
+    Delete a user's stored photos
+
+    Args:
+        user_id: The user whose photos are deleted
+        keep: Versions to leave in place
+
+    Returns:
+        int: Number of variant documents deleted
+    """
+    query = {'user_id': ObjectId(user_id)}
+    keep = [version for version in keep if version]
+    if keep:
+        query['version'] = {'$nin': keep}
+    return _get_collection(db).delete_many(query).deleted_count
@@ -0,0 +1,546 @@
+"""
+Encrypted record file storage
+Record files are stored in the record_blobs GridFS bucket and referenced from
+the record document by blob_id, so record documents stay small regardless of
+file size. New files are written in the segmented AES-GCM stream format, so
+uploads and downloads are encrypted/decrypted a segment at a time in constant
+memory; compressible files are compressed first (app.utils.compression). Older records (a Fernet token as a blob, or base64 ciphertext inline in
+encrypted_data until moved by migrate_record_blobs.py) stay readable.
+
+Files are deduplicated per patient: each file's keyed fingerprint
+(content_hash) is kept on the record and in the blob's GridFS metadata, and a
+patient uploading the same file again gets a record pointing at the existing
+blob. Blobs count the records referencing them (metadata.refcount); soft-deleted
+records keep their reference, and a blob is only deleted when the last record
+referencing it is removed (release_record_blobs).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from io import BytesIO
+from bson import ObjectId
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from pymongo.errors import BulkWriteError
+from app.models.database import Database
+from app.utils.encryption import (
+    STREAM_METHOD, get_keyring, encrypt_stream, decrypt_stream, decrypt_stream_range,
+    decrypt_bytes, decrypt_file_data, rotate_bytes, content_hasher
+)
+from app.utils.compression import SAMPLE_SIZE, choose_codec, compress_stream, decompress_stream
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+BLOB_BUCKET = 'record_blobs'
+
+# Encrypted previews, one per blob (see app.utils.thumbnails)
+THUMBNAILS_COLLECTION = 'record_thumbnails'
+
+# Cold storage for files of archived (long soft-deleted) records (see app.jobs.record_archive)
+ARCHIVE_BUCKET = 'record_archive_blobs'
+
+# Projection for record metadata queries: never pull legacy inline payloads
+RECORD_METADATA_PROJECTION = {'encrypted_data': 0}
+
+class RecordFileTooLarge(Exception):
+    """Raised when a file exceeds the allowed size while it is being stored"""
+
+class _CountingReader:
+    """File-like wrapper that counts bytes read, enforces a size limit and optionally hashes what it reads"""
+
+    def __init__(self, reader, max_size=None, hasher=None):
+        self._reader = reader
+        self.max_size = max_size
+        self.hasher = hasher
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self._reader.read(size)
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            raise RecordFileTooLarge(f"File size must be less than {self.max_size // (1024 * 1024)}MB")
+        if self.hasher is not None:
+            self.hasher.update(data)
+        return data
+
+class _IterReader:
+    """File-like reader over an iterator of byte strings"""
+
+    def __init__(self, pieces):
+        self._pieces = iter(pieces)
+        self._buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            piece = next(self._pieces, None)
+            if piece is None:
+                break
+            self._buffer += piece
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+def get_blob_bucket(db=None):
+    """GridFS bucket for encrypted record files"""
+    db = db if db is not None else Database.get_db()
+    return GridFSBucket(db, bucket_name=BLOB_BUCKET, chunk_size_bytes=Config.RECORD_BLOB_CHUNK_SIZE)
+
+def get_archive_bucket(db=None):
+    """GridFS bucket for files of archived records"""
+    db = db if db is not None else Database.get_db()
+    return GridFSBucket(db, bucket_name=ARCHIVE_BUCKET, chunk_size_bytes=Config.RECORD_BLOB_CHUNK_SIZE)
+
+def get_blob_files(db=None):
+    """The bucket's files collection (one document per blob, with its metadata)"""
+    db = db if db is not None else Database.get_db()
+    return db[f'{BLOB_BUCKET}.files']
+
+def store_ciphertext(ciphertext, record_id, patient_id, db=None):
+    """Store already-encrypted bytes for a record and return the blob_id"""
+    return get_blob_bucket(db).upload_from_stream(
+        str(record_id),
+        ciphertext,
+        metadata={'record_id': record_id, 'patient_id': patient_id, 'refcount': 1}
+    )
+
+def _seekable(reader):
+    try:
+        return reader.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+def _acquire_blob(files, patient_id, content_hash, key_id, exclude=None):
+    """Add a reference to the patient's blob with this fingerprint under key_id; returns its files document or None"""
+    query = {
+        'metadata.patient_id': patient_id,
+        'metadata.content_hash': content_hash,
+        'metadata.encryption.key_id': key_id,
+        # A blob at zero references is being deleted
+        'metadata.refcount': {'$gt': 0}
+    }
+    if exclude is not None:
+        query['_id'] = {'$ne': exclude}
+    return files.find_one_and_update(query, {'$inc': {'metadata.refcount': 1}})
+
+def _shared_blob_fields(blob, file_size):
+    metadata = blob['metadata']
+    return {
+        'blob_id': blob['_id'],
+        'blob_sha256': metadata.get('blob_sha256'),
+        'file_size': file_size,
+        'content_hash': metadata['content_hash'],
+        'encryption_metadata': dict(metadata['encryption'])
+    }
+
+def _compressed(reader, file_type):
+    """Plaintext reader for encryption, compressed when worthwhile; returns (reader, codec)"""
+    sample = reader.read(SAMPLE_SIZE)
+    codec = choose_codec(file_type, sample)
+    pieces = chain([sample], iter(lambda: reader.read(Config.RECORD_SEGMENT_SIZE), b''))
+    return _IterReader(compress_stream(pieces, codec) if codec else pieces), codec
+
+def store_record_file(source, record_id, patient_id, max_size=None, db=None, file_type=None):
+    """
+    Encrypt and store a record file, one segment at a time
+
+    The file is fingerprinted (content_hash) as it is read. A seekable source
+    is fingerprinted before anything is written, and if the patient already
+    has the same file under the primary key, that blob gains a reference and
+    nothing is stored. Other sources are stored first and folded into an
+    existing blob afterwards. Compressible files are compressed before
+    encryption (recorded as encryption_metadata.codec).
+
+    Args:
+        source: File data as bytes, or a file-like object read incrementally
+        max_size: Optional limit in bytes (raises RecordFileTooLarge; nothing is kept)
+        file_type: The file's content type, to decide on compression
+
+    Returns:
+        dict: Fields to merge into the record document (blob_id, blob_sha256,
+        file_size, content_hash, encryption_metadata)
+    """
+    source = BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    files = get_blob_files(db)
+    key_id = get_keyring().primary_id
+
+    deduplicate_after = not _seekable(source)
+    if deduplicate_after:
+        reader = _CountingReader(source, max_size, content_hasher(patient_id))
+    else:
+        start = source.tell()
+        fingerprint = _CountingReader(source, max_size, content_hasher(patient_id))
+        while fingerprint.read(Config.RECORD_SEGMENT_SIZE):
+            pass
+        existing = _acquire_blob(files, patient_id, fingerprint.hasher.hexdigest(), key_id)
+        if existing is not None:
+            return _shared_blob_fields(existing, fingerprint.size)
+        source.seek(start)
+        reader = _CountingReader(source, max_size)
+
+    plaintext, codec = _compressed(reader, file_type)
+    encryption_metadata = {
+        'method': STREAM_METHOD,
+        'segment_size': Config.RECORD_SEGMENT_SIZE,
+        'key_id': key_id,
+        'storage': 'gridfs'
+    }
+    if codec:
+        encryption_metadata['codec'] = codec
+    grid_in = get_blob_bucket(db).open_upload_stream(
+        str(record_id),
+        metadata={'record_id': record_id, 'patient_id': patient_id}
+    )
+    blob_hash = hashlib.sha256()
+    try:
+        for piece in encrypt_stream(plaintext, Config.RECORD_SEGMENT_SIZE):
+            blob_hash.update(piece)
+            grid_in.write(piece)
+    except BaseException:
+        grid_in.abort()
+        raise
+
+    content_hash = (reader.hasher if deduplicate_after else fingerprint.hasher).hexdigest()
+    # Written with the files document on close, so a blob is never visible half-described
+    grid_in.metadata = {
+        'record_id': record_id,
+        'patient_id': patient_id,
+        'content_hash': content_hash,
+        'blob_sha256': blob_hash.hexdigest(),
+        'encryption': encryption_metadata,
+        'refcount': 1
+    }
+    grid_in.close()
+
+    if deduplicate_after:
+        existing = _acquire_blob(files, patient_id, content_hash, key_id, exclude=grid_in._id)
+        if existing is not None:
+            release_record_blobs([grid_in._id], db)
+            return _shared_blob_fields(existing, reader.size)
+
+    return {
+        'blob_id': grid_in._id,
+        'blob_sha256': blob_hash.hexdigest(),
+        'file_size': reader.size,
+        'content_hash': content_hash,
+        'encryption_metadata': encryption_metadata
+    }
+
+def reencrypt_record_file(record, db=None):
+    """
+    Re-encrypt a record's blob under the primary key into a new blob
+
+    Streamed files are re-encrypted a segment at a time (and fingerprinted
+    again, so records that shared the old blob share the new one). The old
+    blob is left in place; the caller releases it once the record points at
+    the new one.
+
+    Returns:
+        dict: Fields to $set on the record
+    """
+    if record.get('encryption_metadata', {}).get('method') == STREAM_METHOD:
+        pieces = open_record_file(record, db)
+        if pieces is None:
+            raise NoFile(f"Blob {record['blob_id']} missing")
+        fields = store_record_file(_IterReader(pieces), record['_id'], record.get('patient_id'),
+                                   db=db, file_type=record.get('file_type'))
+        del fields['file_size']
+        return fields
+
+    with get_blob_bucket(db).open_download_stream(record['blob_id']) as grid_out:
+        ciphertext = rotate_bytes(grid_out.read())
+    return {
+        'blob_id': store_ciphertext(ciphertext, record['_id'], record.get('patient_id'), db),
+        'blob_sha256': hashlib.sha256(ciphertext).hexdigest(),
+        'encryption_metadata': {
+            'method': 'Fernet',
+            'key_id': get_keyring().primary_id,
+            'storage': 'gridfs'
+        }
+    }
+
+def insert_record_with_file(records_collection, record_doc, source, max_size=None):
+    """
+    Store the file for a new record and insert the record document
+
+    The record _id is assigned up front so the blob can point back at it.
+    If the insert fails the blob reference is released again.
+
+    Returns:
+        ObjectId: The inserted record's _id
+    """
+    record_doc.setdefault('_id', ObjectId())
+    record_doc.update(store_record_file(source, record_doc['_id'], record_doc.get('patient_id'), max_size,
+                                        file_type=record_doc.get('file_type')))
+    try:
+        records_collection.insert_one(record_doc)
+    except Exception:
+        release_record_blobs([record_doc['blob_id']])
+        raise
+    return record_doc['_id']
+
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+
+def _get_upload_executor():
+    global _upload_executor
+    if _upload_executor is None:
+        with _upload_executor_lock:
+            if _upload_executor is None:
+                _upload_executor = ThreadPoolExecutor(max_workers=Config.RECORD_UPLOAD_WORKERS,
+                                                      thread_name_prefix='record-upload')
+    return _upload_executor
+
+def _reset_upload_executor():
+    global _upload_executor, _upload_executor_lock
+    _upload_executor = None
+    _upload_executor_lock = threading.Lock()
+
+# The pool's threads do not survive fork; each worker starts its own on first use
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_upload_executor)
+
+def insert_records_with_files(records_collection, items, max_size=None):
+    """
+    Store the files for several new records in parallel and insert the records together
+
+    Files are encrypted and written to the blob store on the upload pool
+    (RECORD_UPLOAD_WORKERS threads, overlapping the GridFS round trips), then
+    all records go to MongoDB in one unordered insert_many. Blob references of
+    records that could not be inserted are released again.
+
+    Args:
+        items: List of (record_doc, source) pairs; source as for store_record_file
+
+    Returns:
+        list: One (record_id, None) or (None, error message) per item, in order
+    """
+    executor = _get_upload_executor()
+    futures = []
+    for record_doc, source in items:
+        record_doc.setdefault('_id', ObjectId())
+        futures.append(executor.submit(store_record_file, source, record_doc['_id'],
+                                       record_doc.get('patient_id'), max_size,
+                                       file_type=record_doc.get('file_type')))
+
+    results = [None] * len(items)
+    stored = []
+    for index, ((record_doc, _), future) in enumerate(zip(items, futures)):
+        try:
+            record_doc.update(future.result())
+            stored.append(index)
+        except RecordFileTooLarge as e:
+            results[index] = (None, str(e))
+        except Exception as e:
+            logger.error("Failed to store file for record %s: %s", record_doc['_id'], e)
+            results[index] = (None, 'Encryption failed')
+
+    if not stored:
+        return results
+
+    failed = set()
+    try:
+        records_collection.insert_many([items[index][0] for index in stored], ordered=False)
+    except BulkWriteError as e:
+        failed = {stored[error['index']] for error in e.details.get('writeErrors', [])}
+    except Exception:
+        release_record_blobs([items[index][0]['blob_id'] for index in stored])
+        raise
+
+    for index in stored:
+        record_doc = items[index][0]
+        results[index] = (None, 'Failed to save record') if index in failed else (record_doc['_id'], None)
+    release_record_blobs([items[index][0]['blob_id'] for index in failed])
+    return results
+
+def attach_inline_payload(records_collection, record):
+    """
+    Load encrypted_data for a record fetched with RECORD_METADATA_PROJECTION
+    Only records not yet moved to the blob store keep their file inline.
+    """
+    if not record.get('blob_id'):
+        inline = records_collection.find_one({'_id': record['_id']}, {'encrypted_data': 1})
+        record['encrypted_data'] = (inline or {}).get('encrypted_data')
+    return record
+
+def has_record_file(record):
+    """Check whether a record document references any file data"""
+    return bool(record.get('blob_id') or record.get('encrypted_data'))
+
+def record_etag(record):
+    """
+    Strong ETag for a record's file, from the record id and the stored ciphertext hash
+    Record files never change after upload, so older records without a hash fall
+    back to their blob id (or upload time for inline files).
+    """
+    content = record.get('blob_sha256') or str(record.get('blob_id') or record.get('uploaded_at'))
+    return hashlib.sha256(f"{record['_id']}:{content}".encode('utf-8')).hexdigest()[:32]
+
+def supports_byte_ranges(record):
+    """Whether parts of a record's file can be decrypted without reading the rest (not for compressed files)"""
+    encryption_metadata = record.get('encryption_metadata', {})
+    return (bool(record.get('blob_id'))
+            and record.get('file_size') is not None
+            and encryption_metadata.get('method') == STREAM_METHOD
+            and not encryption_metadata.get('codec'))
+
+def _decrypt_blob(grid_out):
+    with grid_out:
+        yield from decrypt_stream(grid_out)
+
+def _decrypt_blob_range(grid_out, start, stop):
+    with grid_out:
+        yield from decrypt_stream_range(grid_out, grid_out.length, start, stop)
+
+def _open_blob(record, db=None):
+    try:
+        return get_blob_bucket(db).open_download_stream(record['blob_id'])
+    except NoFile:
+        logger.error("Blob %s missing for record %s", record['blob_id'], record.get('_id'))
+        return None
+
+def _primed(pieces):
+    """Pull the first piece now so key and format errors surface before a response starts"""
+    first = next(pieces, None)
+
+    def _iterate():
+        if first is not None:
+            yield first
+        yield from pieces
+
+    return _iterate()
+
+def open_record_file(record, db=None):
+    """
+    Open a record's file as an iterator of decrypted pieces
+
+    Streamed records are decrypted (and decompressed) a segment at a time;
+    older formats are decrypted in one piece.
+
+    Returns:
+        iterator of bytes, or None if the record has no stored file
+    """
+    if record.get('blob_id'):
+        grid_out = _open_blob(record, db)
+        if grid_out is None:
+            return None
+        encryption_metadata = record.get('encryption_metadata', {})
+        if encryption_metadata.get('method') == STREAM_METHOD:
+            pieces = _decrypt_blob(grid_out)
+            if encryption_metadata.get('codec'):
+                pieces = decompress_stream(pieces, encryption_metadata['codec'])
+            return _primed(pieces)
+        with grid_out:
+            return iter([decrypt_bytes(grid_out.read())])
+    if record.get('encrypted_data'):
+        return iter([decrypt_file_data(record['encrypted_data'])])
+    return None
+
+def open_record_range(record, start, stop):
+    """
+    Open plaintext bytes [start, stop) of a record's file (see supports_byte_ranges)
+
+    Returns:
+        iterator of bytes, or None if the blob is missing
+    """
+    grid_out = _open_blob(record)
+    if grid_out is None:
+        return None
+    return _primed(_decrypt_blob_range(grid_out, start, stop))
+
+def load_record_file(record, db=None):
+    """
+    Load and decrypt a record's whole file into memory
+
+    Returns:
+        bytes: Decrypted file data, or None if the record has no stored file
+    """
+    pieces = open_record_file(record, db)
+    return b''.join(pieces) if pieces is not None else None
+
+def archive_blob(blob_id, db=None):
+    """
+    Copy a blob's ciphertext into the archive bucket under the same id
+    The copy is streamed chunk by chunk and is not decrypted, so the record's
+    encryption_metadata stays valid for it.
+
+    Returns:
+        int: Bytes written (0 if the blob was already archived)
+    """
+    db = db if db is not None else Database.get_db()
+    if db[f'{ARCHIVE_BUCKET}.files'].find_one({'_id': blob_id}, {'_id': 1}):
+        return 0
+    with get_blob_bucket(db).open_download_stream(blob_id) as grid_out:
+        metadata = {key: value for key, value in (grid_out.metadata or {}).items() if key != 'refcount'}
+        get_archive_bucket(db).upload_from_stream_with_id(blob_id, grid_out.filename, grid_out, metadata=metadata)
+        return grid_out.length
+
+def delete_archived_blobs(blob_ids, db=None):
+    """Delete archived record files; missing ones are ignored"""
+    bucket = get_archive_bucket(db)
+    deleted = 0
+    for blob_id in set(blob_ids):
+        try:
+            bucket.delete(blob_id)
+            deleted += 1
+        except NoFile:
+            pass
+    return deleted
+
+def _release_blob(files, blob_id):
+    """Drop one reference to a blob (compare-and-set); True when that was the last one"""
+    while True:
+        blob = files.find_one({'_id': blob_id}, {'metadata': 1})
+        if blob is None:
+            return False
+        metadata = blob.get('metadata') or {}
+        # Blobs stored before reference counting belong to exactly one record
+        refcount = metadata.get('refcount', 1)
+        if refcount <= 0:
+            return False
+        current = refcount if 'refcount' in metadata else {'$exists': False}
+        result = files.update_one(
+            {'_id': blob_id, 'metadata.refcount': current},
+            {'$set': {'metadata.refcount': refcount - 1}}
+        )
+        if result.modified_count:
+            return refcount == 1
+
+def release_record_blobs(blob_ids, db=None):
+    """
+    Drop one record's reference to each blob (list a blob once per record)
+    Blobs left without references are deleted along with their thumbnails;
+    missing blobs are ignored.
+
+    Returns:
+        int: Number of blobs deleted
+    """
+    files = get_blob_files(db)
+    return delete_record_blobs([blob_id for blob_id in blob_ids if _release_blob(files, blob_id)], db)
+
+def delete_record_blobs(blob_ids, db=None):
+    """
+    Delete record blobs along with their thumbnails; missing blobs are ignored
+    Callers must already have made sure no record references them.
+
+    Returns:
+        int: Number of blobs deleted
+    """
+    db = db if db is not None else Database.get_db()
+    bucket = get_blob_bucket(db)
+    deleted = []
+    for blob_id in blob_ids:
+        try:
+            bucket.delete(blob_id)
+            deleted.append(blob_id)
+        except NoFile:
+            pass
+    if deleted:
+        db[THUMBNAILS_COLLECTION].delete_many({'_id': {'$in': deleted}})
+    return len(deleted)
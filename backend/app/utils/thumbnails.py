@@ -0,0 +1,199 @@
+"""
+Record thumbnails
+Small previews of image and PDF records (a downscaled image, or the first page
+of a PDF) so record lists can show files without downloading them. Thumbnails
+are rendered in the background after upload, or when first asked for, then
+encrypted with the key ring and stored in record_thumbnails. There is one per
+blob, so records sharing a file share its thumbnail, and it is deleted together
+with the blob.
+
+PDF pages are rendered with pypdfium2 when it is installed; without it PDFs
+get no thumbnail.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO
+from bson import Binary
+from PIL import Image, ImageOps
+from pymongo.errors import DuplicateKeyError
+from app.models.database import Database
+from app.utils.encryption import get_keyring, encrypt_bytes, decrypt_bytes
+from app.utils.record_store import THUMBNAILS_COLLECTION, load_record_file
+from config.settings import Config
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_CONTENT_TYPE = 'image/webp'
+
+# Image types Pillow can decode
+_IMAGE_TYPES = {'image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp', 'image/bmp', 'image/tiff'}
+
+# A render that never finished (worker restarted) is retried after this long
+_PENDING_TIMEOUT = timedelta(minutes=10)
+
+def can_preview(file_type):
+    """Whether a thumbnail can be rendered for this content type"""
+    file_type = (file_type or '').lower()
+    return file_type in _IMAGE_TYPES or (file_type == 'application/pdf' and pypdfium2 is not None)
+
+def _render_pdf_page(data, max_size):
+    pdf = pypdfium2.PdfDocument(data)
+    try:
+        page = pdf[0]
+        width, height = page.get_size()
+        # Render straight at thumbnail resolution rather than downscaling a full page
+        bitmap = page.render(scale=max_size / max(width, height, 1))
+        return bitmap.to_pil()
+    finally:
+        pdf.close()
+
+def render_thumbnail(data, file_type, max_size=None):
+    """
+    Render a thumbnail of a file
+
+    Args:
+        data: The decrypted file
+        file_type: The file's content type
+        max_size: Longest side in pixels (default THUMBNAIL_SIZE)
+
+    Returns:
+        tuple: (WebP bytes, width, height), or None if the file cannot be previewed
+    """
+    max_size = max_size or Config.THUMBNAIL_SIZE
+    file_type = (file_type or '').lower()
+    try:
+        if file_type == 'application/pdf':
+            if pypdfium2 is None:
+                return None
+            image = _render_pdf_page(data, max_size)
+        elif file_type in _IMAGE_TYPES:
+            image = Image.open(BytesIO(data))
+            # JPEGs decode at a fraction of full size when that is all we need
+            image.draft('RGB', (max_size, max_size))
+            image = ImageOps.exif_transpose(image)
+        else:
+            return None
+
+        image.thumbnail((max_size, max_size))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        output = BytesIO()
+        image.save(output, 'WEBP', quality=Config.THUMBNAIL_QUALITY)
+        return output.getvalue(), image.width, image.height
+    except Exception as e:
+        # Corrupt files, decompression bombs and unsupported variants get no thumbnail
+        logger.info("No thumbnail for %s file: %s", file_type, e)
+        return None
+
+def _get_collection(db=None):
+    db = db if db is not None else Database.get_db()
+    return db[THUMBNAILS_COLLECTION]
+
+def generate_thumbnail(record, db=None):
+    """
+    Render, encrypt and store the thumbnail for a record's blob
+
+    Returns:
+        str: The thumbnail status ('ready' or 'unavailable')
+    """
+    collection = _get_collection(db)
+    rendered = None
+    try:
+        data = load_record_file(record, db)
+        if data is not None:
+            rendered = render_thumbnail(data, record.get('file_type'))
+    except Exception as e:
+        logger.error("Thumbnail source for record %s unreadable: %s", record.get('_id'), e)
+
+    if rendered is None:
+        collection.update_one({'_id': record['blob_id']},
+                              {'$set': {'status': 'unavailable', 'updated_at': datetime.utcnow()}})
+        return 'unavailable'
+
+    thumbnail, width, height = rendered
+    collection.update_one({'_id': record['blob_id']}, {'$set': {
+        'status': 'ready',
+        'data': Binary(encrypt_bytes(thumbnail)),
+        'content_type': THUMBNAIL_CONTENT_TYPE,
+        'width': width,
+        'height': height,
+        'key_id': get_keyring().primary_id,
+        'updated_at': datetime.utcnow()
+    }})
+    return 'ready'
+
+def _generate_in_background(record):
+    try:
+        generate_thumbnail(record)
+    except Exception as e:
+        logger.error("Thumbnail generation failed for record %s: %s", record.get('_id'), e)
+
+_thumbnail_executor = None
+_thumbnail_executor_lock = threading.Lock()
+
+def _get_thumbnail_executor():
+    global _thumbnail_executor
+    if _thumbnail_executor is None:
+        with _thumbnail_executor_lock:
+            if _thumbnail_executor is None:
+                _thumbnail_executor = ThreadPoolExecutor(max_workers=Config.THUMBNAIL_WORKERS,
+                                                         thread_name_prefix='record-thumbnail')
+    return _thumbnail_executor
+
+def _reset_thumbnail_executor():
+    global _thumbnail_executor, _thumbnail_executor_lock
+    _thumbnail_executor = None
+    _thumbnail_executor_lock = threading.Lock()
+
+# The pool's threads do not survive fork; each worker starts its own on first use
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_thumbnail_executor)
+
+def _claim(collection, record):
+    """Mark a blob's thumbnail as pending; False if it exists or another render is under way"""
+    now = datetime.utcnow()
+    try:
+        collection.insert_one({'_id': record['blob_id'], 'patient_id': record.get('patient_id'),
+                               'status': 'pending', 'updated_at': now})
+        return True
+    except DuplicateKeyError:
+        result = collection.update_one(
+            {'_id': record['blob_id'], 'status': 'pending', 'updated_at': {'$lt': now - _PENDING_TIMEOUT}},
+            {'$set': {'updated_at': now}}
+        )
+        return bool(result.modified_count)
+
+def schedule_thumbnails(records, db=None):
+    """
+    Queue thumbnail rendering for records that have none yet
+    Records need _id, blob_id, patient_id, file_type and encryption_metadata.
+
+    Returns:
+        set: blob_ids queued for rendering
+    """
+    collection = _get_collection(db)
+    queued = set()
+    for record in records:
+        if not record.get('blob_id') or record['blob_id'] in queued or not can_preview(record.get('file_type')):
+            continue
+        if _claim(collection, record):
+            queued.add(record['blob_id'])
+            _get_thumbnail_executor().submit(_generate_in_background, record)
+    return queued
+
+def find_thumbnails(blob_ids, db=None):
+    """Stored thumbnail documents for the given blobs, keyed by blob_id"""
+    return {doc['_id']: doc for doc in _get_collection(db).find({'_id': {'$in': list(blob_ids)}})}
+
+def decrypt_thumbnail(doc):
+    """Decrypted image bytes of a ready thumbnail document"""
+    return decrypt_bytes(bytes(doc['data']))
@@ -0,0 +1,285 @@
+"""
+Verified JWT cache and token revocation
+Tokens are keyed by their SHA-256 digest. A verified payload is cached until the
+token's exp, so repeat requests skip HMAC verification. Revocations are stored
+in the revoked_tokens collection (TTL-indexed on expires_at) and mirrored in
+memory by a Bloom filter of token digests plus a per-user "revoked before"
+timestamp, refreshed from MongoDB every TOKEN_REVOCATION_REFRESH_SECONDS.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from app.models.database import Database
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+def token_digest(token):
+    """SHA-256 hex digest of a raw token (never store or log the token itself)"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+def epoch_ms(moment):
+    """Milliseconds since the epoch for a naive UTC datetime (MongoDB's precision)"""
+    return int(moment.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+def issued_at_ms(payload):
+    """
+    When a token was issued, in milliseconds
+    Tokens from before the iat_ms claim count as issued at the start of their
+    iat second, which revokes them when issued anywhere in the revocation's second.
+    """
+    if 'iat_ms' in payload:
+        return payload['iat_ms']
+    return payload.get('iat', 0) * 1000
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified token payloads, each valid until its exp claim"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return payload
+
+    def put(self, digest, payload):
+        if self.max_size <= 0 or 'exp' not in payload:
+            return
+        with self._lock:
+            self._entries[digest] = (payload, payload['exp'])
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+class BloomFilter:
+    """Fixed-size Bloom filter over hex digests"""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest):
+        # Double hashing over two 64-bit halves of the (already uniform) SHA-256 digest
+        h1 = int(digest[:16], 16)
+        h2 = int(digest[16:32], 16) | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, digest):
+        for position in self._positions(digest):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+class RevocationList:
+    """In-memory view of revoked_tokens, refreshed incrementally from MongoDB"""
+
+    def __init__(self, capacity, error_rate, refresh_seconds):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        self._revoked_before = {}
+        self._not_revoked = set()
+        self._last_seen = None
+        self._next_refresh = 0.0
+        self.bloom_positives = 0
+        self.false_positives = 0
+        self.refreshes = 0
+
+    def _collection(self):
+        db = Database.get_db()
+        return db['revoked_tokens'] if db is not None else None
+
+    def _apply(self, entry):
+        digest = entry.get('token_digest')
+        if digest:
+            self._not_revoked.discard(digest)
+            if digest not in self._bloom:
+                self._bloom.add(digest)
+        if entry.get('revoked_before'):
+            user_id = entry['user_id']
+            # Stored as naive UTC; compared in milliseconds with the iat_ms claim, since a
+            # whole-second iat cannot tell tokens issued just before a revocation from
+            # ones issued just after it (re-activation)
+            revoked_before = epoch_ms(entry['revoked_before'])
+            if revoked_before > self._revoked_before.get(user_id, 0):
+                self._revoked_before[user_id] = revoked_before
+        if self._last_seen is None or entry['revoked_at'] > self._last_seen:
+            self._last_seen = entry['revoked_at']
+
+    def refresh(self, force=False):
+        """Pull revocations recorded since the last refresh (by this or any other worker)"""
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        with self._lock:
+            if not force and now < self._next_refresh:
+                return
+            self._next_refresh = now + self.refresh_seconds
+            collection = self._collection()
+            if collection is None:
+                return
+            try:
+                # Start over once the filter is full, dropping entries whose tokens have expired
+                if self._bloom.count >= self.capacity:
+                    self._reset()
+                    self._next_refresh = now + self.refresh_seconds
+                query = {'expires_at': {'$gt': datetime.utcnow()}}
+                if self._last_seen is not None:
+                    # Overlap the previous window so revocations committed late by other workers are not missed
+                    query['revoked_at'] = {'$gte': self._last_seen - timedelta(seconds=self.refresh_seconds)}
+                for entry in collection.find(query, {'_id': 0}).sort('revoked_at', 1):
+                    self._apply(entry)
+                self.refreshes += 1
+            except Exception as e:
+                logger.error("Token revocation refresh error: %s", e)
+
+    def is_revoked(self, digest, payload):
+        """Check a verified token against the in-memory revocation state"""
+        self.refresh()
+
+        revoked_before = self._revoked_before.get(payload.get('user_id'))
+        if revoked_before is not None and issued_at_ms(payload) <= revoked_before:
+            return True
+
+        if digest not in self._bloom or digest in self._not_revoked:
+            return False
+
+        # Possible false positive: confirm against the collection (rare by construction)
+        self.bloom_positives += 1
+        collection = self._collection()
+        if collection is None:
+            return True
+        if collection.find_one({'token_digest': digest}, {'_id': 1}) is not None:
+            return True
+        self.false_positives += 1
+        self._not_revoked.add(digest)
+        return False
+
+    def record(self, entry):
+        """Persist a revocation and apply it locally straight away"""
+        collection = self._collection()
+        if collection is not None:
+            collection.insert_one(dict(entry))
+        with self._lock:
+            self._apply(entry)
+
+    def stats(self):
+        return {
+            'revoked_tokens': self._bloom.count,
+            'revoked_users': len(self._revoked_before),
+            'bloom_bits': self._bloom.num_bits,
+            'bloom_hashes': self._bloom.num_hashes,
+            'bloom_positives': self.bloom_positives,
+            'false_positives': self.false_positives,
+            'refreshes': self.refreshes
+        }
+
+_token_cache = VerifiedTokenCache(Config.TOKEN_CACHE_SIZE)
+_revocations = RevocationList(
+    capacity=Config.TOKEN_REVOCATION_CAPACITY,
+    error_rate=Config.TOKEN_REVOCATION_ERROR_RATE,
+    refresh_seconds=Config.TOKEN_REVOCATION_REFRESH_SECONDS
+)
+
+def _reset_after_fork():
+    _token_cache.clear()
+    _revocations._lock = threading.Lock()
+    _revocations._next_refresh = 0.0
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_cached_payload(digest):
+    """Get a previously verified payload (copy) or None"""
+    payload = _token_cache.get(digest)
+    return dict(payload) if payload is not None else None
+
+def cache_payload(digest, payload):
+    """Remember a verified payload until the token expires"""
+    _token_cache.put(digest, dict(payload))
+
+def is_token_revoked(digest, payload):
+    """Check whether a verified token has been revoked"""
+    return _revocations.is_revoked(digest, payload)
+
+def revoke_token(token, payload):
+    """Revoke a single token (logout) until it would have expired anyway"""
+    digest = token_digest(token)
+    now = datetime.utcnow()
+    _revocations.record({
+        'token_digest': digest,
+        'user_id': payload.get('user_id'),
+        'revoked_at': now,
+        'expires_at': datetime.utcfromtimestamp(payload['exp']) if 'exp' in payload else now + timedelta(hours=Config.JWT_EXPIRATION_HOURS)
+    })
+    _token_cache.discard(digest)
+
+def revoke_user_tokens(user_id):
+    """Revoke every token issued to a user up to now (deactivation, deletion)"""
+    now = datetime.utcnow()
+    _revocations.record({
+        'user_id': user_id,
+        'revoked_before': now,
+        'revoked_at': now,
+        'expires_at': now + timedelta(hours=Config.JWT_EXPIRATION_HOURS)
+    })
+
+def get_token_cache_stats():
+    """Get token cache and revocation statistics"""
+    return {
+        'cache': _token_cache.stats(),
+        'revocation': _revocations.stats()
+    }
@@ -1,17 +1,17 @@
+import logging
 from twilio.rest import Client
 import os
 from flask import current_app
 
+logger = logging.getLogger(__name__)
+
 def get_twilio_client():
     """Initializes and returns the Twilio client."""
     account_sid = current_app.config.get('TWILIO_ACCOUNT_SID')
     auth_token = current_app.config.get('TWILIO_AUTH_TOKEN')
     
     if not account_sid or not auth_token:
-        # CRITICAL DEBUG LOGGING
-        print("!!! TWILIO CONFIGURATION ERROR !!!")
-        print(f"TWILIO_ACCOUNT_SID: {account_sid}")
-        print("Please check your backend/.env file and ensure TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN are set.")
+        logger.error("Twilio configuration error: set TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN in backend/.env")
         raise ValueError("Twilio credentials not configured")
     
     return Client(account_sid, auth_token)
@@ -23,9 +23,7 @@ def send_otp(phone_number):
         service_sid = current_app.config.get('TWILIO_VERIFY_SERVICE_SID')
         
         if not service_sid or service_sid == 'VAxxxxxxxxxxxxxxxxxxxxxxxxxxxxx':
-            # CRITICAL DEBUG LOGGING
-            print("!!! TWILIO SERVICE SID ERROR !!!")
-            print("Please update TWILIO_VERIFY_SERVICE_SID in backend/.env with your actual Twilio Service SID.")
+            logger.error("Twilio service SID error: set TWILIO_VERIFY_SERVICE_SID in backend/.env")
             raise ValueError("Twilio Verify Service SID not configured or is placeholder.")
         
         # Twilio recommends sending code via SMS
@@ -34,11 +32,11 @@ def send_otp(phone_number):
             channel='sms'
         )
         
-        print(f"Twilio verification initiated: {verification.sid}, Status: {verification.status}")
+        logger.debug("Twilio verification initiated: %s, Status: %s", verification.sid, verification.status)
         return {'success': True, 'sid': verification.sid}
     
     except Exception as e:
-        print(f"Twilio send_otp fatal error: {e}")
+        logger.error("Twilio send_otp fatal error: %s", e)
         return {'success': False, 'error': str(e)}
 
 def verify_otp(phone_number, code):
@@ -58,9 +56,9 @@ def verify_otp(phone_number, code):
         # 'approved' status indicates successful verification
         is_valid = verification_check.status == 'approved'
         
-        print(f"Twilio verification check: {verification_check.sid}, Status: {verification_check.status}")
+        logger.debug("Twilio verification check: %s, Status: %s", verification_check.sid, verification_check.status)
         return {'success': True, 'is_valid': is_valid}
     
     except Exception as e:
-        print(f"Twilio verify_otp fatal error: {e}")
+        logger.error("Twilio verify_otp fatal error: %s", e)
         return {'success': False, 'error': str(e)}
\ No newline at end of file
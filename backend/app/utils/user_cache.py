@@ -0,0 +1,131 @@
+"""
+User document cache
+Lookups by _id go through a per-request memo (flask.g), then a per-worker
+TTL + LRU cache, then MongoDB. Callers always receive their own copy.
+Write paths must call invalidate_user(); other workers see the change once
+their entry expires (USER_CACHE_TTL_SECONDS).
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from bson import ObjectId
+from flask import g, has_app_context
+from app.models.database import get_users_collection
+from config.settings import Config
+
+class UserCache:
+    """Thread-safe TTL + LRU cache of user documents keyed by str(_id)"""
+
+    def __init__(self, max_size, ttl_seconds):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.request_hits = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return user
+
+    def put(self, key, user):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'request_hits': self.request_hits,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+_user_cache = UserCache(Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL_SECONDS)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_user_cache.clear)
+
+def _request_memo():
+    """Per-request dict of user documents, or None outside a request/app context"""
+    if not has_app_context():
+        return None
+    if 'user_memo' not in g:
+        g.user_memo = {}
+    return g.user_memo
+
+def get_user_by_id(user_id):
+    """
+    Get a user document by _id (ObjectId or string), or None if not found
+    The result is a copy; mutating it does not affect the cache.
+    """
+    key = str(user_id)
+
+    memo = _request_memo()
+    if memo is not None and key in memo:
+        _user_cache.request_hits += 1
+        return copy.deepcopy(memo[key])
+
+    user = _user_cache.get(key)
+    if user is None:
+        users_collection = get_users_collection()
+        if users_collection is None:
+            return None
+        user = users_collection.find_one({'_id': ObjectId(key)})
+        if user is None:
+            return None
+        _user_cache.put(key, user)
+
+    if memo is not None:
+        memo[key] = user
+    return copy.deepcopy(user)
+
+def invalidate_user(user_id):
+    """Drop a user from this worker's cache and the current request memo after a write"""
+    key = str(user_id)
+    _user_cache.invalidate(key)
+    memo = _request_memo()
+    if memo is not None:
+        memo.pop(key, None)
+
+def get_user_cache_stats():
+    """Get user cache statistics"""
+    return _user_cache.stats()
@@ -0,0 +1,72 @@
+"""
+Streaming ZIP writer
+Builds a ZIP archive on the fly and yields it in pieces, so an archive of any
+size is sent without being held in memory or written to disk. Entries are
+written with data descriptors (sizes and CRC after the data), which is what
+zipfile does for unseekable output.
+"""
+
+import logging
+import zipfile
+from io import RawIOBase
+
+logger = logging.getLogger(__name__)
+
+# Content that is already compressed is stored as-is
+_STORED_PREFIXES = ('image/', 'video/', 'audio/', 'application/pdf', 'application/zip',
+                    'application/gzip', 'application/x-7z-compressed')
+
+class _ZipSink(RawIOBase):
+    """Unseekable output that hands written bytes back to the generator"""
+
+    def __init__(self):
+        self._pieces = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._pieces.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._pieces)
+        self._pieces.clear()
+        return data
+
+def compression_for(content_type):
+    """ZIP compression method for a MIME type"""
+    if content_type and content_type.startswith(_STORED_PREFIXES):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+def stream_zip(entries):
+    """
+    Build a ZIP archive from entries, yielding it as it is written
+
+    Args:
+        entries: Iterable of (name, date_time tuple, content_type, pieces) where
+                 pieces is an iterable of bytes, or a callable returning one
+                 (called only when the entry is written)
+
+    Yields:
+        bytes: Archive data
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode='w', allowZip64=True) as archive:
+        for name, date_time, content_type, pieces in entries:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = compression_for(content_type)
+            with archive.open(info, mode='w', force_zip64=True) as entry:
+                try:
+                    for piece in (pieces() if callable(pieces) else pieces):
+                        entry.write(piece)
+                        data = sink.drain()
+                        if data:
+                            yield data
+                except Exception as e:
+                    # Too late for an error response; note the failure inside the archive
+                    logger.error("ZIP entry %s failed: %s", name, e)
+                    entry.write(b"\n\n[This file could not be exported]\n")
+            yield sink.drain()
+    yield sink.drain()
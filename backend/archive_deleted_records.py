@@ -0,0 +1,103 @@
+"""
+Archive Soft-Deleted Records
+Moves records deleted more than RECORD_RETENTION_DAYS ago out of the hot
+records collection and record_blobs bucket into records_archive and the
+record_archive_blobs bucket, and reports the storage reclaimed. Throttled and
+batched; safe to interrupt and re-run (e.g. nightly from cron).
+
+Usage:
+    python archive_deleted_records.py --dry-run    # what would be archived
+    python archive_deleted_records.py              # archive with the configured policy
+    python archive_deleted_records.py --days 90 --rate 50
+"""
+
+from app.models.database import Database
+from app.jobs.record_archive import archive_deleted_records
+from config.settings import Config
+import argparse
+import sys
+
+def format_bytes(size):
+    """Human readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def print_progress(report):
+    print(f"   ... {report['scanned']} scanned, {report['archived']} archived, {report['failed']} failed, "
+          f"{format_bytes(report['record_bytes'] + report['blob_bytes'])} reclaimed")
+
+def archive_records(retention_days, batch_size, rate_limit, limit, dry_run):
+    """Run the archive job and print a report"""
+    try:
+        print("🔗 Connecting to MongoDB...")
+        db = Database.get_db()
+
+        if db is None:
+            print("❌ Failed to connect to database")
+            return False
+
+        print("✅ Connected to MongoDB")
+        print(f"\n🗄️  Retention: records deleted more than {retention_days} days ago")
+        print("   Dry run - nothing will be moved...\n" if dry_run else "   Archiving records...\n")
+
+        report = archive_deleted_records(
+            db,
+            retention_days=retention_days,
+            batch_size=batch_size,
+            rate_limit=rate_limit,
+            limit=limit,
+            dry_run=dry_run,
+            progress=print_progress
+        )
+
+        print(f"\n   Records scanned:     {report['scanned']}")
+        if dry_run:
+            print(f"   Without deleted_at:  {report['stamped']} (retention starts on the first run)")
+            print(f"   Record documents:    {format_bytes(report['record_bytes'])}")
+            print(f"   Files (unshared):    {format_bytes(report['blob_bytes'])}")
+            return True
+
+        print(f"   Archived:            {report['archived']}")
+        print(f"   Skipped:             {report['skipped']}")
+        print(f"   Failed:              {report['failed']}")
+        print(f"   Files still shared:  {report['shared']}")
+        print(f"   Given deleted_at:    {report['stamped']}")
+        print(f"   Reclaimed (records): {format_bytes(report['record_bytes'])}")
+        print(f"   Reclaimed (files):   {format_bytes(report['blob_bytes'])}")
+        print(f"   Written to archive:  {format_bytes(report['archive_bytes'])}")
+        print(f"   Time:                {report['elapsed']:.1f}s")
+
+        return not report['failed']
+
+    except Exception as e:
+        print(f"\n❌ Error archiving records: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Archive records soft-deleted beyond the retention period')
+    parser.add_argument('--days', type=int, default=Config.RECORD_RETENTION_DAYS, help='Retention period in days')
+    parser.add_argument('--batch-size', type=int, default=Config.RECORD_ARCHIVE_BATCH_SIZE, help='Records per query')
+    parser.add_argument('--rate', type=float, default=Config.RECORD_ARCHIVE_RATE_LIMIT,
+                        help='Records per second (0 for no limit)')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many records')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+    args = parser.parse_args()
+
+    print("="*50)
+    print("  Soft-Deleted Record Archive")
+    print("="*50)
+    print()
+
+    success = archive_records(args.days, args.batch_size, args.rate, args.limit, args.dry_run)
+
+    if success:
+        print("\n✅ Archive run completed successfully!")
+        sys.exit(0)
+    else:
+        print("\n❌ Some records could not be archived!")
+        print("   Please check the messages above.")
+        sys.exit(1)
@@ -0,0 +1,91 @@
+"""
+Backfill Derived Fields
+Writes the user fields computed from other fields (is_profile_complete,
+search_tokens for patients, the directory entry for doctors) for users written
+before they existed, or recomputes them after the way they are computed
+changes. Safe to interrupt and re-run; use --start-after to skip ahead to the
+last _id printed.
+
+Usage:
+    python backfill_derived_fields.py                                        # every field, users without it
+    python backfill_derived_fields.py --field is_profile_complete --rebuild  # fix stale completeness flags
+    python backfill_derived_fields.py --field search_tokens --rebuild        # after tokenizer changes
+    python backfill_derived_fields.py --field directory --limit 100000 --batch-size 1000
+"""
+
+from app.models.database import Database
+from app.jobs.derived_fields import backfill_derived_field
+from app.utils.derived_fields import DEPENDENCIES
+from bson import ObjectId
+import argparse
+import sys
+
+def print_progress(report):
+    print(f"   ... {report['scanned']} scanned, {report['updated']} updated (last _id {report['last_id']})")
+
+def backfill(fields, rebuild, batch_size, limit, start_after):
+    """Run the backfill for each field and print a report"""
+    try:
+        print("🔗 Connecting to MongoDB...")
+        db = Database.get_db()
+
+        if db is None:
+            print("❌ Failed to connect to database")
+            return False
+
+        print("✅ Connected to MongoDB")
+
+        for field in fields:
+            print(f"\n🔎 Recomputing {field} for every user...\n" if rebuild
+                  else f"\n🔎 Filling in missing {field}...\n")
+
+            report = backfill_derived_field(
+                db,
+                field,
+                rebuild=rebuild,
+                batch_size=batch_size,
+                limit=limit,
+                start_after=ObjectId(start_after) if start_after else None,
+                progress=print_progress
+            )
+
+            print(f"\n   Users scanned:    {report['scanned']}")
+            print(f"   Updated:          {report['updated']}")
+            if report['last_id'] is not None:
+                print(f"   Last _id:         {report['last_id']}")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ Error backfilling derived fields: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Backfill derived user fields')
+    parser.add_argument('--field', choices=list(DEPENDENCIES), default=None, help='Only this field (default: all)')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute the field for every user it is kept for')
+    parser.add_argument('--batch-size', type=int, default=500, help='Users per query')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many users')
+    parser.add_argument('--start-after', default=None, help='Resume after this user _id')
+    args = parser.parse_args()
+
+    if args.start_after and not args.field:
+        parser.error('--start-after needs --field')
+
+    print("="*50)
+    print("  Derived Fields")
+    print("="*50)
+    print()
+
+    fields = [args.field] if args.field else list(DEPENDENCIES)
+    success = backfill(fields, args.rebuild, args.batch_size, args.limit, args.start_after)
+
+    if success:
+        print("\n✅ Derived fields backfilled successfully!")
+        sys.exit(0)
+    else:
+        print("\n❌ Derived fields could not be backfilled!")
+        print("   Please check the messages above.")
+        sys.exit(1)
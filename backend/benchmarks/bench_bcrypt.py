@@ -0,0 +1,82 @@
+"""
+bcrypt Login Throughput Benchmark
+Measures password checks per second per core at each bcrypt cost factor, then
+pushes a simulated login surge through the hashing executor to show queue times.
+
+Usage:
+    python benchmarks/bench_bcrypt.py                     # costs 10-14
+    python benchmarks/bench_bcrypt.py --rounds 12 13 --surge 200
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+from app.utils.password import HashingExecutor, _checkpw
+
+PASSWORD = 'CorrectHorse9Battery'
+
+def bench_per_core(rounds, min_seconds):
+    """Single-threaded checks/sec at one cost factor"""
+    hashed = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+    checks = 0
+    started = time.perf_counter()
+    while True:
+        _checkpw(PASSWORD, hashed)
+        checks += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds and checks >= 3:
+            return checks / elapsed, elapsed / checks * 1000, hashed
+
+def bench_surge(hashed, logins, concurrency, max_pending):
+    """Fire `logins` concurrent checks through a HashingExecutor"""
+    executor = HashingExecutor(max_workers=concurrency, max_pending=max_pending, timeout_seconds=300)
+    started = time.perf_counter()
+    # One client thread per login, as gthread request threads would be
+    with ThreadPoolExecutor(max_workers=min(logins, 256)) as clients:
+        results = list(clients.map(lambda _: _try(executor, hashed), range(logins)))
+    elapsed = time.perf_counter() - started
+    return elapsed, results.count(True), executor.stats()
+
+def _try(executor, hashed):
+    try:
+        return executor.run(_checkpw, PASSWORD, hashed)
+    except Exception:
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark bcrypt cost factors')
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 11, 12, 13, 14])
+    parser.add_argument('--seconds', type=float, default=2.0, help='Minimum time per cost factor')
+    parser.add_argument('--surge', type=int, default=100, help='Concurrent logins in the surge test (0 to skip)')
+    parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 2, help='Executor threads')
+    parser.add_argument('--max-pending', type=int, default=64)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  bcrypt Login Throughput")
+    print("="*60)
+    print(f"  CPUs: {os.cpu_count()}   executor threads: {args.concurrency}")
+    print()
+    print(f"{'cost':>6} {'ms/check':>10} {'logins/s/core':>15}")
+
+    hashes = {}
+    for rounds in args.rounds:
+        rate, ms, hashed = bench_per_core(rounds, args.seconds)
+        hashes[rounds] = hashed
+        print(f"{rounds:>6} {ms:>10.1f} {rate:>15.1f}")
+
+    if args.surge:
+        print(f"\n📈 Surge: {args.surge} simultaneous logins, max_pending={args.max_pending}")
+        print(f"{'cost':>6} {'wall s':>8} {'ok':>6} {'rejected':>9} {'avg queue ms':>13} {'max queue ms':>13}")
+        for rounds, hashed in hashes.items():
+            elapsed, ok, stats = bench_surge(hashed, args.surge, args.concurrency, args.max_pending)
+            print(f"{rounds:>6} {elapsed:>8.2f} {ok:>6} {stats['rejected']:>9} "
+                  f"{stats['avg_queue_ms']:>13.1f} {stats['max_queue_ms']:>13.1f}")
+
+    print("\n✅ Done")
@@ -0,0 +1,125 @@
+"""
+ID Allocation Throughput Benchmark
+Measures patient IDs allocated per second under concurrent registrations:
+worker processes (as gunicorn would fork them) with several request threads
+each, for the old random ID + find_one check against a users collection
+already holding --existing IDs, for the block allocator at a few block sizes,
+and for bulk allocation (one counters round trip per --bulk-size IDs). Every
+mode checks that no ID was handed out twice. Uses a scratch database that is
+dropped afterwards.
+
+Usage:
+    python benchmarks/bench_id_allocator.py --mongo-uri mongodb://localhost:27017
+    python benchmarks/bench_id_allocator.py --processes 8 --threads 8 --per-thread 500
+"""
+
+import argparse
+import multiprocessing
+import os
+import secrets
+import string
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Benchmark patient/doctor/appointment ID allocation')
+parser.add_argument('--processes', type=int, default=4, help='Worker processes')
+parser.add_argument('--threads', type=int, default=4, help='Request threads per process')
+parser.add_argument('--per-thread', type=int, default=250, help='IDs allocated per thread')
+parser.add_argument('--existing', type=int, default=200_000, help='Users already registered (legacy lookups)')
+parser.add_argument('--block-sizes', type=int, nargs='+', default=[1, 20, 100])
+parser.add_argument('--bulk-size', type=int, default=10_000, help='IDs per bulk allocation')
+parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+args = parser.parse_args()
+
+# Settings are read at import time
+os.environ['MONGO_URI'] = args.mongo_uri
+os.environ['MONGO_DB_NAME'] = 'bharathmedicare_id_bench'
+os.environ.setdefault('ID_PERMUTATION_KEY', 'bharathmedicare-id-bench')
+
+from app.models.database import Database
+from app.models.indexes import ensure_indexes
+from app.utils import id_generator
+from app.utils.id_generator import IdAllocator
+
+def legacy_id():
+    """The old generator: random characters, checked with a find_one per attempt"""
+    users_collection = Database.get_db()['users']
+    characters = string.ascii_uppercase + string.digits
+    while True:
+        unique_id = 'PAT-' + ''.join(secrets.choice(characters) for _ in range(8))
+        if not users_collection.find_one({'patient_id': unique_id}):
+            return unique_id
+
+def run_worker(mode, block_size, per_thread):
+    """One worker process: threads allocating IDs like concurrent registrations"""
+    if mode == 'allocator':
+        allocator = IdAllocator('patient', block_size)
+        allocate_one = allocator.next_id
+    elif mode == 'bulk':
+        allocator = IdAllocator('patient', block_size)
+        allocate_one = None
+    else:
+        allocate_one = legacy_id
+
+    def thread(_):
+        if allocate_one is None:
+            return allocator.allocate(per_thread)
+        return [allocate_one() for _ in range(per_thread)]
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        return [unique_id for ids in pool.map(thread, range(args.threads)) for unique_id in ids]
+
+def measure(mode, block_size=1, per_thread=None):
+    Database.get_db()[id_generator.COUNTERS_COLLECTION].delete_many({})
+    context = multiprocessing.get_context('fork')
+    started = time.perf_counter()
+    with context.Pool(args.processes) as pool:
+        batches = pool.starmap(run_worker, [(mode, block_size, per_thread or args.per_thread)] * args.processes)
+    elapsed = time.perf_counter() - started
+    ids = [unique_id for batch in batches for unique_id in batch]
+    return len(ids) / elapsed, len(ids) - len(set(ids))
+
+def seed_existing(db):
+    characters = string.ascii_uppercase + string.digits
+    batch = []
+    for i in range(args.existing):
+        batch.append({'role': 'patient', 'email': f'p{i}@example.com',
+                      'patient_id': 'PAT-' + ''.join(secrets.choice(characters) for _ in range(8))})
+        if len(batch) == 10_000:
+            db['users'].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db['users'].insert_many(batch, ordered=False)
+
+if __name__ == "__main__":
+    print("="*64)
+    print("  ID Allocation Throughput")
+    print("="*64)
+    print(f"  {args.processes} processes x {args.threads} threads x {args.per_thread} IDs")
+    print()
+
+    db = Database.get_db()
+    if db is None:
+        print("❌ Failed to connect to database")
+        sys.exit(1)
+
+    try:
+        print(f"🌱 Seeding {args.existing} existing patients...")
+        seed_existing(db)
+        ensure_indexes(db)
+
+        print(f"\n{'mode':<24} {'IDs/sec':>12} {'duplicates':>11}")
+        rate, duplicates = measure('legacy')
+        print(f"{'random + find_one':<24} {rate:>12,.0f} {duplicates:>11}")
+        for block_size in args.block_sizes:
+            rate, duplicates = measure('allocator', block_size)
+            print(f"{f'blocks of {block_size}':<24} {rate:>12,.0f} {duplicates:>11}")
+        rate, duplicates = measure('bulk', args.bulk_size, args.bulk_size)
+        print(f"{f'bulk {args.bulk_size}':<24} {rate:>12,.0f} {duplicates:>11}")
+    finally:
+        Database.get_client().drop_database(os.environ['MONGO_DB_NAME'])
+
+    print("\n✅ Done")
@@ -0,0 +1,136 @@
+"""
+Patient Search Latency Benchmark
+Seeds a scratch database with synthetic patients (search_tokens included),
+applies the index registry and measures p50/p95 latency of the indexed,
+ranked search against the old unanchored $regex $or, for a mix of queries:
+exact ID, ID prefix, name prefix, first + last name, email prefix and the
+first digits of a phone number. The scratch database is dropped afterwards.
+
+Usage:
+    python benchmarks/bench_patient_search.py --mongo-uri mongodb://localhost:27017   # 1M patients
+    python benchmarks/bench_patient_search.py --patients 100000 --queries 500
+    python benchmarks/bench_patient_search.py --regex-queries 0                       # skip the slow baseline
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Benchmark patient search latency')
+parser.add_argument('--patients', type=int, default=1_000_000, help='Patients to seed')
+parser.add_argument('--queries', type=int, default=1000, help='Indexed searches per query kind')
+parser.add_argument('--regex-queries', type=int, default=20, help='Regex baseline searches per query kind')
+parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+args = parser.parse_args()
+
+# Settings are read at import time
+os.environ['MONGO_URI'] = args.mongo_uri
+os.environ['MONGO_DB_NAME'] = 'bharathmedicare_search_bench'
+
+from bson import ObjectId
+from app.models.database import Database
+from app.models.indexes import ensure_indexes
+from app.utils.patient_search import find_patients, search_tokens
+
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Krishna', 'Ishaan', 'Rohan',
+               'Ananya', 'Diya', 'Saanvi', 'Aadhya', 'Pari', 'Anika', 'Navya', 'Myra', 'Sara', 'Priya',
+               'Ravi', 'Kavya', 'Lakshmi', 'Suresh', 'Meena', 'Deepak', 'Pooja', 'Rahul', 'Sneha', 'Vikram']
+LAST_NAMES = ['Sharma', 'Verma', 'Iyer', 'Reddy', 'Nair', 'Patel', 'Gupta', 'Singh', 'Kumar', 'Das',
+              'Menon', 'Rao', 'Joshi', 'Mehta', 'Chopra', 'Bose', 'Pillai', 'Kulkarni', 'Mishra', 'Agarwal']
+ID_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+def make_patient(i, rng):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    patient = {
+        '_id': ObjectId(),
+        'role': 'patient',
+        'full_name': f'{first} {last}',
+        'email': f'{first.lower()}.{last.lower()}{i}@example.com',
+        'phone': f'+91{rng.randint(6000000000, 9999999999)}',
+        'patient_id': 'PAT-' + ''.join(rng.choice(ID_CHARS) for _ in range(8)),
+        'is_active': True
+    }
+    patient['search_tokens'] = search_tokens(patient)
+    return patient
+
+def seed(collection, rng):
+    sample = []
+    batch = []
+    for i in range(args.patients):
+        patient = make_patient(i, rng)
+        batch.append(patient)
+        if rng.random() < 0.001 or len(sample) < 100:
+            sample.append(patient)
+        if len(batch) == 10_000:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+            print(f"   ... {i + 1} patients seeded", end='\r')
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    print()
+    return sample
+
+QUERY_KINDS = [
+    ('exact ID', lambda p: p['patient_id']),
+    ('ID prefix', lambda p: p['patient_id'][:7]),
+    ('name prefix', lambda p: p['full_name'][:4]),
+    ('first + last', lambda p: p['full_name']),
+    ('email prefix', lambda p: p['email'][:10]),
+    ('phone prefix', lambda p: p['phone'][3:9]),
+]
+
+def regex_search(collection, query):
+    return list(collection.find({'role': 'patient', '$or': [
+        {field: {'$regex': query, '$options': 'i'}} for field in ('patient_id', 'full_name', 'email', 'phone')
+    ]}).limit(20))
+
+def percentiles(times):
+    times = sorted(times)
+    return times[len(times) // 2], times[min(len(times) - 1, int(len(times) * 0.95))]
+
+def measure(fn, queries):
+    times = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        times.append((time.perf_counter() - started) * 1000)
+    return percentiles(times)
+
+if __name__ == "__main__":
+    print("="*72)
+    print("  Patient Search Latency")
+    print("="*72)
+    print(f"  {args.patients} patients, {args.queries} indexed / {args.regex_queries} regex searches per kind")
+    print()
+
+    db = Database.get_db()
+    if db is None:
+        print("❌ Failed to connect to database")
+        sys.exit(1)
+    collection = db['users']
+    rng = random.Random(21)
+
+    try:
+        print("🌱 Seeding patients...")
+        started = time.perf_counter()
+        sample = seed(collection, rng)
+        print(f"   Seeded in {time.perf_counter() - started:.0f}s; building indexes...")
+        ensure_indexes(db)
+
+        print(f"\n{'query':<14} {'index p50':>10} {'index p95':>10} {'regex p50':>10} {'regex p95':>10}  (ms)")
+        for label, make_query in QUERY_KINDS:
+            queries = [make_query(rng.choice(sample)) for _ in range(args.queries)]
+            p50, p95 = measure(lambda q: find_patients(collection, q), queries)
+            if args.regex_queries:
+                regex_p50, regex_p95 = measure(lambda q: regex_search(collection, q), queries[:args.regex_queries])
+                print(f"{label:<14} {p50:>10.2f} {p95:>10.2f} {regex_p50:>10.1f} {regex_p95:>10.1f}")
+            else:
+                print(f"{label:<14} {p50:>10.2f} {p95:>10.2f} {'-':>10} {'-':>10}")
+    finally:
+        Database.get_client().drop_database(os.environ['MONGO_DB_NAME'])
+
+    print("\n✅ Done")
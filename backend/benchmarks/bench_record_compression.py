@@ -0,0 +1,176 @@
+"""
+Record Compression Benchmark
+Generates sample files of each record type (text report, CSV lab export,
+FHIR JSON, HL7 v2, BMP, JPEG, PDF) and measures, per codec, the compression
+ratio and compress/decompress latency, then the end-to-end cost of
+compress+encrypt against encrypting as-is. Shows which codec choose_codec
+picks for each type.
+
+Usage:
+    python benchmarks/bench_record_compression.py               # 1 MB samples
+    python benchmarks/bench_record_compression.py --size-kb 4096 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.getenv('ENCRYPTION_KEY'):
+    from cryptography.fernet import Fernet
+    os.environ['ENCRYPTION_KEY'] = Fernet.generate_key().decode()
+
+from app.utils.compression import (
+    CODEC_ZLIB, CODEC_ZSTD, SAMPLE_SIZE, choose_codec, compress_stream, decompress_stream, zstandard
+)
+from app.utils.encryption import encrypt_stream
+from app.utils.record_store import _IterReader
+from config.settings import Config
+
+TESTS = ['Hemoglobin', 'WBC', 'Platelets', 'Glucose', 'Creatinine', 'Sodium', 'Potassium', 'ALT', 'HbA1c']
+WORDS = ('patient presents with mild fever and cough no known allergies blood pressure within normal '
+         'limits advised rest fluids and follow up in one week chest clear on auscultation').split()
+
+def text_report(size, rng):
+    lines = []
+    while sum(len(line) for line in lines) < size:
+        lines.append(' '.join(rng.choice(WORDS) for _ in range(12)) + f'. Temp {rng.uniform(97, 103):.1f}F.\n')
+    return ''.join(lines).encode()[:size]
+
+def csv_export(size, rng):
+    rows = ['patient_id,test,value,unit,collected_at\n']
+    while sum(len(row) for row in rows) < size:
+        rows.append(f'PAT-{rng.randint(0, 99999999):08d},{rng.choice(TESTS)},{rng.uniform(0, 300):.2f},mg/dL,'
+                    f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z\n')
+    return ''.join(rows).encode()[:size]
+
+def fhir_bundle(size, rng):
+    entries = []
+    while len(entries) * 420 < size:
+        entries.append({'resource': {
+            'resourceType': 'Observation', 'status': 'final',
+            'code': {'coding': [{'system': 'http://loinc.org', 'code': f'{rng.randint(1000, 99999)}-{rng.randint(0, 9)}',
+                                 'display': rng.choice(TESTS)}]},
+            'subject': {'reference': f'Patient/{rng.randint(0, 10**8)}'},
+            'valueQuantity': {'value': round(rng.uniform(0, 300), 2), 'unit': 'mg/dL'}
+        }})
+    return json.dumps({'resourceType': 'Bundle', 'type': 'collection', 'entry': entries}, indent=2).encode()[:size]
+
+def hl7_messages(size, rng):
+    messages = []
+    while sum(len(m) for m in messages) < size:
+        messages.append(
+            f'MSH|^~\\&|LAB|HOSP|EHR|HOSP|20240101{rng.randint(0, 235959):06d}||ORU^R01|{rng.randint(0, 10**9)}|P|2.5\r'
+            f'PID|1||PAT-{rng.randint(0, 10**8):08d}||DOE^JANE\r'
+            f'OBX|1|NM|{rng.choice(TESTS)}||{rng.uniform(0, 300):.2f}|mg/dL|||||F\r'
+        )
+    return ''.join(messages).encode()[:size]
+
+def bmp_image(size, rng):
+    from PIL import Image
+    side = max(16, int((size / 3) ** 0.5))
+    image = Image.linear_gradient('L').resize((side, side)).convert('RGB')
+    output = BytesIO()
+    image.save(output, 'BMP')
+    return output.getvalue()
+
+def jpeg_image(size, rng):
+    from PIL import Image
+    side = max(16, int((size / 3) ** 0.5))
+    image = Image.frombytes('RGB', (side, side), rng.randbytes(side * side * 3))
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=90)
+    return output.getvalue()
+
+def pdf_report(size, rng):
+    from reportlab.pdfgen import canvas
+    output = BytesIO()
+    pdf = canvas.Canvas(output)
+    text = text_report(size // 2, rng).decode()
+    for start in range(0, len(text), 3000):
+        y = 800
+        for line in text[start:start + 3000].splitlines():
+            pdf.drawString(40, y, line[:100])
+            y -= 12
+        pdf.showPage()
+    pdf.save()
+    return output.getvalue()
+
+SAMPLES = [
+    ('text/plain', 'Text report', text_report),
+    ('text/csv', 'CSV lab export', csv_export),
+    ('application/fhir+json', 'FHIR JSON', fhir_bundle),
+    ('application/hl7-v2', 'HL7 v2', hl7_messages),
+    ('image/bmp', 'BMP image', bmp_image),
+    ('image/jpeg', 'JPEG image', jpeg_image),
+    ('application/pdf', 'PDF report', pdf_report),
+]
+
+def pieces_of(data, size=64 * 1024):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+def best_time(fn, repeat):
+    """Fastest of `repeat` runs, in ms"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return min(times)
+
+def drain(pieces):
+    for _ in pieces:
+        pass
+
+def encrypt_only(data):
+    drain(encrypt_stream(BytesIO(data), Config.RECORD_SEGMENT_SIZE))
+
+def compress_and_encrypt(data, codec):
+    drain(encrypt_stream(_IterReader(compress_stream(pieces_of(data), codec)), Config.RECORD_SEGMENT_SIZE))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark record compression per content type')
+    parser.add_argument('--size-kb', type=int, default=1024, help='Approximate sample size per type')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (fastest is shown)')
+    args = parser.parse_args()
+
+    codecs = [CODEC_ZLIB] + ([CODEC_ZSTD] if zstandard is not None else [])
+    rng = random.Random(7)
+
+    print("="*78)
+    print("  Record Compression")
+    print("="*78)
+    print(f"  Codecs: {', '.join(codecs)}" + ("" if zstandard is not None else "   (zstandard not installed)"))
+    print()
+    print(f"{'type':<16} {'size KB':>8} {'chosen':>7} {'codec':>6} {'ratio':>6} {'comp ms':>8} {'decomp ms':>9}")
+
+    pipeline = []
+    for file_type, label, generate in SAMPLES:
+        data = generate(args.size_kb * 1024, rng)
+        chosen = choose_codec(file_type, data[:SAMPLE_SIZE]) or '-'
+        for codec in codecs:
+            compressed = b''.join(compress_stream(pieces_of(data), codec))
+            assert b''.join(decompress_stream(pieces_of(compressed), codec)) == data
+            comp_ms = best_time(lambda: drain(compress_stream(pieces_of(data), codec)), args.repeat)
+            decomp_ms = best_time(lambda: drain(decompress_stream(pieces_of(compressed), codec)), args.repeat)
+            print(f"{label:<16} {len(data) / 1024:>8.0f} {chosen:>7} {codec:>6} "
+                  f"{len(data) / max(len(compressed), 1):>6.2f} {comp_ms:>8.1f} {decomp_ms:>9.1f}")
+        pipeline.append((label, data, chosen))
+
+    print("\n🔐 Upload path: encrypt as-is vs compress then encrypt (chosen codec)")
+    print(f"{'type':<16} {'stored KB':>10} {'as-is ms':>9} {'stored KB':>10} {'comp+enc ms':>12}")
+    for label, data, chosen in pipeline:
+        plain_ms = best_time(lambda: encrypt_only(data), args.repeat)
+        if chosen == '-':
+            print(f"{label:<16} {len(data) / 1024:>10.0f} {plain_ms:>9.1f} {'(stored as-is)':>23}")
+            continue
+        stored = len(b''.join(compress_stream(pieces_of(data), chosen)))
+        both_ms = best_time(lambda: compress_and_encrypt(data, chosen), args.repeat)
+        print(f"{label:<16} {len(data) / 1024:>10.0f} {plain_ms:>9.1f} {stored / 1024:>10.0f} {both_ms:>12.1f}")
+
+    print("\n✅ Done")
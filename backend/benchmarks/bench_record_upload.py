@@ -0,0 +1,111 @@
+"""
+Record Upload Throughput Benchmark
+Compares files/sec of the single-upload path (one file encrypted, stored and
+inserted at a time) with the batch path (files encrypted and stored on the
+upload pool, records written with one insert_many).
+
+Runs against a scratch database that is dropped afterwards. --encrypt-only
+skips MongoDB and measures encryption alone (serial vs the thread pool).
+
+Usage:
+    python benchmarks/bench_record_upload.py --mongo-uri mongodb://localhost:27017
+    python benchmarks/bench_record_upload.py --files 50 --size-kb 2048 --workers 8
+    python benchmarks/bench_record_upload.py --encrypt-only
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+parser = argparse.ArgumentParser(description='Benchmark record upload throughput')
+parser.add_argument('--files', type=int, default=30, help='Files per upload')
+parser.add_argument('--size-kb', type=int, default=1024, help='Size of each file')
+parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help='Upload pool threads')
+parser.add_argument('--rounds', type=int, default=3)
+parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+parser.add_argument('--encrypt-only', action='store_true', help='Measure encryption without MongoDB')
+args = parser.parse_args()
+
+# Settings are read at import time
+os.environ['MONGO_URI'] = args.mongo_uri
+os.environ['MONGO_DB_NAME'] = 'bharathmedicare_upload_bench'
+os.environ['RECORD_UPLOAD_WORKERS'] = str(args.workers)
+if not os.getenv('ENCRYPTION_KEY') and not os.getenv('ENCRYPTION_KEYS'):
+    from cryptography.fernet import Fernet
+    os.environ['ENCRYPTION_KEY'] = Fernet.generate_key().decode()
+
+from bson import ObjectId
+from app.models.database import Database
+from app.models.schemas import RecordSchema
+from app.utils.encryption import encrypt_stream
+from app.utils.record_store import insert_record_with_file, insert_records_with_files
+
+def make_records(payloads):
+    patient_id = str(ObjectId())
+    return [(RecordSchema.create(patient_id, patient_id, f'report-{i}.pdf', 'application/pdf'), BytesIO(data))
+            for i, data in enumerate(payloads)]
+
+def run_single(collection, payloads):
+    for record_doc, source in make_records(payloads):
+        insert_record_with_file(collection, record_doc, source)
+
+def run_batch(collection, payloads):
+    results = insert_records_with_files(collection, make_records(payloads))
+    assert all(record_id for record_id, _ in results)
+
+def encrypt_one(data):
+    for _ in encrypt_stream(BytesIO(data)):
+        pass
+
+def run_encrypt_serial(_, payloads):
+    for data in payloads:
+        encrypt_one(data)
+
+def run_encrypt_pool(_, payloads):
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(encrypt_one, payloads))
+
+def best_rate(fn, collection, payloads):
+    """Best files/sec over args.rounds runs"""
+    best = 0.0
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        fn(collection, payloads)
+        best = max(best, len(payloads) / (time.perf_counter() - started))
+    return best
+
+if __name__ == "__main__":
+    print("="*60)
+    print("  Record Upload Throughput")
+    print("="*60)
+    print(f"  {args.files} files x {args.size_kb} KB, {args.workers} upload threads, best of {args.rounds}")
+    print()
+
+    payloads = [os.urandom(args.size_kb * 1024) for _ in range(args.files)]
+
+    if args.encrypt_only:
+        modes = [('serial encrypt', run_encrypt_serial), ('pooled encrypt', run_encrypt_pool)]
+        collection = None
+    else:
+        db = Database.get_db()
+        if db is None:
+            print("❌ Failed to connect to database (use --encrypt-only to skip MongoDB)")
+            sys.exit(1)
+        collection = db['records']
+        modes = [('single uploads', run_single), ('upload-batch', run_batch)]
+
+    try:
+        print(f"{'mode':>16} {'files/s':>10} {'MB/s':>8}")
+        for label, fn in modes:
+            rate = best_rate(fn, collection, payloads)
+            print(f"{label:>16} {rate:>10.1f} {rate * args.size_kb / 1024:>8.1f}")
+    finally:
+        if collection is not None:
+            Database.get_client().drop_database(os.environ['MONGO_DB_NAME'])
+
+    print("\n✅ Done")
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -13,9 +14,124 @@ class Config:
     
     # MongoDB Settings
     MONGO_URI = os.getenv('MONGO_URI')
-    
+    MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'bharathmedicare')
+
+    # MongoDB Connection Pool Settings
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 5))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 60000))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 10000))
+    # Wire compression, in order of preference; unavailable codecs are skipped by the driver
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', 'zstd,snappy,zlib')
+    MONGO_READ_PREFERENCE = os.getenv('MONGO_READ_PREFERENCE', 'primary')
+    # Apply the index registry (app/models/indexes.py) on startup
+    MONGO_AUTO_CREATE_INDEXES = os.getenv('MONGO_AUTO_CREATE_INDEXES', 'True').lower() == 'true'
+
+    # Audit Log Settings
+    # Audit entries are queued and written by a background thread in batches
+    AUDIT_ASYNC = os.getenv('AUDIT_ASYNC', 'True').lower() == 'true'
+    AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 200))
+    AUDIT_FLUSH_INTERVAL_MS = int(os.getenv('AUDIT_FLUSH_INTERVAL_MS', 500))
+    # 0 = unacknowledged, 1 = acknowledged by the primary only
+    AUDIT_WRITE_CONCERN = int(os.getenv('AUDIT_WRITE_CONCERN', 1))
+    # Entries written later than this after the action are counted as late
+    AUDIT_LATE_THRESHOLD_MS = int(os.getenv('AUDIT_LATE_THRESHOLD_MS', 5000))
+    # Attempts at writing a batch (backing off from AUDIT_RETRY_BACKOFF_MS, doubling) before
+    # its entries are counted as failed, so a short MongoDB outage loses nothing
+    AUDIT_WRITE_ATTEMPTS = int(os.getenv('AUDIT_WRITE_ATTEMPTS', 6))
+    AUDIT_RETRY_BACKOFF_MS = int(os.getenv('AUDIT_RETRY_BACKOFF_MS', 500))
+
+    # Logging Settings
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    # json (one object per line) or text
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+    # Fraction of records kept per level, e.g. "DEBUG=0.1,INFO=0.5" (unlisted levels are kept)
+    LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+    # Records beyond this many pending in the log queue are dropped rather than blocking
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+
+    # JWT Settings
+    JWT_EXPIRATION_HOURS = int(os.getenv('JWT_EXPIRATION_HOURS', 24))
+    # Verified tokens cached per worker, keyed by token digest, until they expire
+    TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+    # Revoked tokens (logout, deactivation) are mirrored in memory by a Bloom filter
+    TOKEN_REVOCATION_CAPACITY = int(os.getenv('TOKEN_REVOCATION_CAPACITY', 100000))
+    TOKEN_REVOCATION_ERROR_RATE = float(os.getenv('TOKEN_REVOCATION_ERROR_RATE', 0.01))
+    # How often each worker picks up revocations made by other workers
+    TOKEN_REVOCATION_REFRESH_SECONDS = int(os.getenv('TOKEN_REVOCATION_REFRESH_SECONDS', 10))
+
+    # User Cache Settings
+    # Per-worker cache of user documents by _id; other workers see writes after the TTL
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 5000))
+    USER_CACHE_TTL_SECONDS = int(os.getenv('USER_CACHE_TTL_SECONDS', 10))
+
+    # Password Hashing Settings
+    # bcrypt cost factor; stored hashes with a different cost are upgraded on login
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    # Concurrent bcrypt operations per worker (defaults to the CPU count)
+    BCRYPT_MAX_CONCURRENCY = int(os.getenv('BCRYPT_MAX_CONCURRENCY', os.cpu_count() or 2))
+    # Hashes queued or running per worker before new logins get a 503
+    BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', 64))
+    BCRYPT_TIMEOUT_SECONDS = float(os.getenv('BCRYPT_TIMEOUT_SECONDS', 10))
+
+    # Record File Storage
+    # Encrypted record files live in the record_blobs GridFS bucket, split into chunks of this size
+    RECORD_BLOB_CHUNK_SIZE = int(os.getenv('RECORD_BLOB_CHUNK_SIZE', 255 * 1024))
+    # Plaintext bytes per AES-GCM segment; memory per upload/download is about two segments
+    RECORD_SEGMENT_SIZE = int(os.getenv('RECORD_SEGMENT_SIZE', 64 * 1024))
+    # Threads per worker encrypting and storing files from batch uploads
+    RECORD_UPLOAD_WORKERS = int(os.getenv('RECORD_UPLOAD_WORKERS', min(4, os.cpu_count() or 1)))
+    RECORD_BATCH_MAX_FILES = int(os.getenv('RECORD_BATCH_MAX_FILES', 50))
+    # Compress compressible files before encryption (zstd, or zlib without zstandard);
+    # files of unfamiliar types are compressed when a sample shrinks by at least MIN_SAVING
+    RECORD_COMPRESSION = os.getenv('RECORD_COMPRESSION', 'True').lower() == 'true'
+    RECORD_COMPRESSION_MIN_SAVING = float(os.getenv('RECORD_COMPRESSION_MIN_SAVING', 0.1))
+    # Record thumbnails: longest side in pixels, WebP quality, render threads per worker
+    THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', 256))
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 60))
+    THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 1))
+    # Records per thumbnail batch request
+    THUMBNAIL_BATCH_MAX = int(os.getenv('THUMBNAIL_BATCH_MAX', 100))
+    # WebP quality of the resized profile photo variants
+    PROFILE_PHOTO_QUALITY = int(os.getenv('PROFILE_PHOTO_QUALITY', 80))
+    # Token matches fetched per patient search before ranking
+    PATIENT_SEARCH_CANDIDATES = int(os.getenv('PATIENT_SEARCH_CANDIDATES', 200))
+    # Doctor search: seconds between facet count refreshes (per worker) and page sizes
+    DOCTOR_FACET_REFRESH_SECONDS = int(os.getenv('DOCTOR_FACET_REFRESH_SECONDS', 300))
+    DOCTOR_SEARCH_PAGE_SIZE = int(os.getenv('DOCTOR_SEARCH_PAGE_SIZE', 20))
+    DOCTOR_SEARCH_PAGE_MAX = int(os.getenv('DOCTOR_SEARCH_PAGE_MAX', 50))
+    # Patient, doctor and appointment IDs: sequence numbers each worker reserves per
+    # counters round trip, and the secret that scrambles them (required unless FLASK_DEBUG
+    # is on; keep it fixed once IDs have been issued)
+    ID_BLOCK_SIZE = int(os.getenv('ID_BLOCK_SIZE', 20))
+    ID_PERMUTATION_KEY = os.getenv('ID_PERMUTATION_KEY')
+    # Bulk user imports: rows per batch, bcrypt processes and cost for initial passwords
+    # (upgraded to BCRYPT_ROUNDS on first login), where admin uploads (deleted once their
+    # import completes) and reject files (passwords masked) are kept, and how long a running
+    # import may go without progress before it can be resumed
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000))
+    IMPORT_HASH_WORKERS = int(os.getenv('IMPORT_HASH_WORKERS', os.cpu_count() or 2))
+    IMPORT_BCRYPT_ROUNDS = int(os.getenv('IMPORT_BCRYPT_ROUNDS', 10))
+    IMPORT_DIR = os.getenv('IMPORT_DIR', os.path.join(tempfile.gettempdir(), 'bharathmedicare-imports'))
+    IMPORT_STALE_SECONDS = int(os.getenv('IMPORT_STALE_SECONDS', 300))
+
     # Security Settings
     ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY')
+    # Key ring for rotation: every key, newest (encrypting) first, comma separated
+    ENCRYPTION_KEYS = os.getenv('ENCRYPTION_KEYS')
+    # Key rotation job throttle (records re-encrypted per second) and batch size
+    KEY_ROTATION_RATE_LIMIT = float(os.getenv('KEY_ROTATION_RATE_LIMIT', 50))
+    KEY_ROTATION_BATCH_SIZE = int(os.getenv('KEY_ROTATION_BATCH_SIZE', 100))
+    # Days a soft-deleted record stays in the hot collection before the archive job moves it
+    RECORD_RETENTION_DAYS = int(os.getenv('RECORD_RETENTION_DAYS', 30))
+    # Archive job throttle (records archived per second) and batch size
+    RECORD_ARCHIVE_RATE_LIMIT = float(os.getenv('RECORD_ARCHIVE_RATE_LIMIT', 20))
+    RECORD_ARCHIVE_BATCH_SIZE = int(os.getenv('RECORD_ARCHIVE_BATCH_SIZE', 100))
+    # Secret for per-patient file fingerprints (deduplication); defaults to the primary encryption key
+    CONTENT_HASH_KEY = os.getenv('CONTENT_HASH_KEY')
     
     # Server Settings
     HOST = os.getenv('HOST', '0.0.0.0')
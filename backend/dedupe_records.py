@@ -0,0 +1,105 @@
+"""
+Deduplicate Record Files
+Fingerprints record files uploaded before per-patient deduplication (their
+files are decrypted once), then reports how much storage duplicate files take
+up. With --apply, each patient's duplicates are merged into a single blob.
+Safe to interrupt and re-run.
+
+Usage:
+    python dedupe_records.py                       # fingerprint, then report
+    python dedupe_records.py --apply               # fingerprint, then merge duplicates
+    python dedupe_records.py --skip-fingerprint    # report on fingerprinted records only
+"""
+
+from app.models.database import Database
+from app.jobs.dedup import fingerprint_records, duplicate_report
+from bson import ObjectId
+import argparse
+import sys
+
+def format_bytes(size):
+    """Human readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def print_progress(report):
+    print(f"   ... {report['scanned']} scanned, {report['fingerprinted']} fingerprinted, "
+          f"{report['failed']} failed (last _id {report['last_id']})")
+
+def print_group_progress(report):
+    print(f"   ... {report['groups']} duplicate groups, {format_bytes(report['reclaimable_bytes'])} reclaimable")
+
+def dedupe_records(batch_size, limit, start_after, skip_fingerprint, apply):
+    """Run the fingerprint and duplicate jobs and print a report"""
+    try:
+        print("🔗 Connecting to MongoDB...")
+        db = Database.get_db()
+
+        if db is None:
+            print("❌ Failed to connect to database")
+            return False
+
+        print("✅ Connected to MongoDB")
+
+        failed = 0
+        if not skip_fingerprint:
+            print("\n🔍 Fingerprinting records uploaded before deduplication...\n")
+            report = fingerprint_records(
+                db,
+                batch_size=batch_size,
+                limit=limit,
+                start_after=ObjectId(start_after) if start_after else None,
+                progress=print_progress
+            )
+            print(f"\n   Records scanned:  {report['scanned']}")
+            print(f"   Fingerprinted:    {report['fingerprinted']}")
+            print(f"   Missing blobs:    {report['missing']}")
+            print(f"   Failed:           {report['failed']}")
+            failed += report['failed']
+
+        print("\n🧮 Merging duplicate files...\n" if apply else "\n🧮 Looking for duplicate files...\n")
+        report = duplicate_report(db, apply=apply, progress=print_group_progress)
+
+        print(f"\n   Duplicate groups:     {report['groups']}")
+        print(f"   Duplicate blobs:      {report['duplicate_blobs']}")
+        print(f"   Reclaimable:          {format_bytes(report['reclaimable_bytes'])}")
+        if apply:
+            print(f"   Merged:               {report['merged']}")
+            print(f"   Reclaimed:            {format_bytes(report['reclaimed_bytes'])}")
+            print(f"   Failed:               {report['failed']}")
+        print(f"   Saved by shared blobs: {format_bytes(report['shared_bytes'])}")
+        failed += report['failed']
+
+        return not failed
+
+    except Exception as e:
+        print(f"\n❌ Error deduplicating records: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fingerprint record files and merge per-patient duplicates')
+    parser.add_argument('--batch-size', type=int, default=100, help='Records per query')
+    parser.add_argument('--limit', type=int, default=None, help='Fingerprint at most this many records')
+    parser.add_argument('--start-after', default=None, help='Resume fingerprinting after this record _id')
+    parser.add_argument('--skip-fingerprint', action='store_true', help='Only report on fingerprinted records')
+    parser.add_argument('--apply', action='store_true', help='Merge duplicates instead of only reporting them')
+    args = parser.parse_args()
+
+    print("="*50)
+    print("  Record File Deduplication")
+    print("="*50)
+    print()
+
+    success = dedupe_records(args.batch_size, args.limit, args.start_after, args.skip_fingerprint, args.apply)
+
+    if success:
+        print("\n✅ Deduplication completed successfully!")
+        sys.exit(0)
+    else:
+        print("\n❌ Some records could not be processed!")
+        print("   Please check the messages above.")
+        sys.exit(1)
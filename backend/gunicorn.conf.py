@@ -0,0 +1,112 @@
+"""
+Gunicorn configuration for production serving
+Usage: gunicorn --config gunicorn.conf.py run:app
+
+Environment overrides:
+    WEB_CONCURRENCY          Number of worker processes (default: derived from CPU count)
+    GUNICORN_WORKER_CLASS    sync | gthread | gevent (default: gthread)
+    GUNICORN_THREADS         Threads per gthread worker (default: 4)
+    GUNICORN_WORKER_CONNECTIONS  Concurrent greenlets per gevent worker (default: 1000)
+    GUNICORN_TIMEOUT         Worker timeout in seconds (default: 120, Gemini calls are slow)
+    GUNICORN_MAX_REQUESTS    Recycle a worker after this many requests (default: 1000)
+    FLASK_DEBUG              When true, disables preload and reloads on code changes
+
+Graceful reload: send SIGHUP to the master. With preload_app the application code is
+loaded once in the master, so deploying new code needs a full restart (or SIGUSR2 + SIGQUIT).
+"""
+
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _cpu_count():
+    """CPUs available to this process (respects container CPU affinity)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+def _gevent_available():
+    try:
+        import gevent  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+cpu_count = _cpu_count()
+debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+
+# Server socket
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+backlog = 2048
+
+# Worker class: gthread by default because most slow routes wait on Gemini, Twilio or MongoDB
+# rather than the CPU. gevent suits very high concurrency but needs the gevent package.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+# Reported through gunicorn's logger in on_starting
+gevent_fallback = worker_class == 'gevent' and not _gevent_available()
+if gevent_fallback:
+    worker_class = 'gthread'
+
+if worker_class == 'sync':
+    default_workers = cpu_count * 2 + 1
+elif worker_class == 'gthread':
+    default_workers = cpu_count + 1
+else:
+    default_workers = cpu_count
+
+workers = int(os.getenv('WEB_CONCURRENCY', default_workers))
+threads = int(os.getenv('GUNICORN_THREADS', 4)) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Timeouts
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth; jitter avoids all workers restarting at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Load the app once in the master so workers share imported code via copy-on-write.
+# gevent must monkey-patch before the app is imported, so it loads the app in each worker.
+preload_app = not debug and worker_class != 'gevent'
+reload = debug
+
+# Logging
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Report settings that were adjusted while loading this file"""
+    if gevent_fallback:
+        server.log.warning("gevent is not installed, falling back to gthread workers")
+
+
+def when_ready(server):
+    """Close the master's MongoDB client before workers fork (it was opened while preloading)"""
+    from app.models.database import Database
+    Database.close_connection()
+    server.log.info(f"Serving with {workers} {worker_class} workers ({threads} threads each)")
+
+
+def post_fork(server, worker):
+    """Each worker opens its own MongoDB connection pool after fork"""
+    from app.models.database import Database
+    Database.reset_after_fork()
+
+
+def worker_exit(server, worker):
+    """Flush queued audit entries, then release this worker's MongoDB connections"""
+    from app.models.database import Database
+    from app.utils.audit import flush_audit_logs
+    flush_audit_logs()
+    Database.close_connection()
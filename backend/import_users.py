@@ -0,0 +1,97 @@
+"""
+Import Users
+Bulk-loads patients or doctors from a partner hospital's CSV or NDJSON export
+(see app/jobs/bulk_import.py for the columns). Rejected rows are written to a
+reject file with the reason. Safe to interrupt: running the same command again
+resumes after the last finished batch.
+
+Usage:
+    python import_users.py apollo_patients.csv
+    python import_users.py apollo_doctors.ndjson --role doctor --rejects doctors_rejected.ndjson
+    python import_users.py apollo_patients.csv --workers 8 --batch-size 2000
+    python import_users.py apollo_patients.csv --restart       # ignore earlier progress
+"""
+
+from app.models.database import Database
+from app.jobs.bulk_import import run_import, ImportInProgress, IMPORT_ROLES
+import argparse
+import os
+import sys
+import time
+
+def import_users(path, import_id, role, reject_path, batch_size, workers, restart):
+    """Run the import and print a report"""
+    try:
+        print("🔗 Connecting to MongoDB...")
+        db = Database.get_db()
+
+        if db is None:
+            print("❌ Failed to connect to database")
+            return False
+
+        print("✅ Connected to MongoDB")
+        print(f"\n📥 Importing {path} as import '{import_id}'...\n")
+
+        started = time.perf_counter()
+
+        def print_progress(state):
+            elapsed = time.perf_counter() - started
+            print(f"   ... row {state['rows_done']}: {state['inserted']} inserted, {state['rejected']} rejected, "
+                  f"{state['skipped']} already imported ({elapsed:.0f}s)")
+
+        state = run_import(
+            db,
+            import_id,
+            path=path,
+            role=role,
+            reject_path=reject_path,
+            batch_size=batch_size,
+            workers=workers,
+            restart=restart,
+            progress=print_progress
+        )
+
+        print(f"\n   Rows read:        {state['rows_done']}")
+        print(f"   Inserted:         {state['inserted']}")
+        print(f"   Rejected:         {state['rejected']}")
+        print(f"   Already imported: {state['skipped']}")
+        if state['rejected']:
+            print(f"   Reject file:      {state['reject_path']}")
+
+        return True
+
+    except ImportInProgress as e:
+        print(f"\n❌ {e}")
+        return False
+    except Exception as e:
+        print(f"\n❌ Error importing users: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Bulk import patients or doctors')
+    parser.add_argument('path', help='CSV (with a header row) or NDJSON file')
+    parser.add_argument('--role', choices=IMPORT_ROLES, default='patient', help='Role for rows without a role column')
+    parser.add_argument('--import-id', default=None, help='Name of the import (default: the file name)')
+    parser.add_argument('--rejects', default=None, help='Reject file (default: <path>.rejects.ndjson)')
+    parser.add_argument('--batch-size', type=int, default=None, help='Rows per batch')
+    parser.add_argument('--workers', type=int, default=None, help='Password hashing processes')
+    parser.add_argument('--restart', action='store_true', help='Start over instead of resuming')
+    args = parser.parse_args()
+
+    print("="*50)
+    print("  Import Users")
+    print("="*50)
+    print()
+
+    success = import_users(args.path, args.import_id or os.path.basename(args.path), args.role, args.rejects,
+                           args.batch_size, args.workers, args.restart)
+
+    if success:
+        print("\n✅ Import completed successfully!")
+        sys.exit(0)
+    else:
+        print("\n❌ Import did not complete!")
+        print("   Please check the messages above; run the same command again to resume.")
+        sys.exit(1)
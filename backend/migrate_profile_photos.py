@@ -0,0 +1,90 @@
+"""
+Move Inline Profile Photos into the Photo Store
+Resizes profile photos that users still keep as base64 data URIs in the users
+collection into the profile_photos store and replaces them with the photo URL.
+Safe to interrupt and re-run; use --start-after to skip ahead to the last _id
+printed.
+
+Usage:
+    python migrate_profile_photos.py                 # migrate everything
+    python migrate_profile_photos.py --dry-run       # report sizes only
+    python migrate_profile_photos.py --limit 1000 --batch-size 200
+"""
+
+from app.models.database import Database
+from app.jobs.profile_photos import migrate_inline_photos
+from bson import ObjectId
+import argparse
+import sys
+
+def format_bytes(size):
+    """Human readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def print_progress(report):
+    print(f"   ... {report['scanned']} scanned, {report['migrated']} migrated, "
+          f"{report['failed']} failed (last _id {report['last_id']})")
+
+def migrate_profile_photos(batch_size, limit, dry_run, start_after):
+    """Run the inline photo migration and print a report"""
+    try:
+        print("🔗 Connecting to MongoDB...")
+        db = Database.get_db()
+
+        if db is None:
+            print("❌ Failed to connect to database")
+            return False
+
+        print("✅ Connected to MongoDB")
+        print("\n🖼️  Dry run - nothing will be written...\n" if dry_run else "\n🖼️  Moving profile photos...\n")
+
+        report = migrate_inline_photos(
+            db,
+            batch_size=batch_size,
+            limit=limit,
+            dry_run=dry_run,
+            start_after=ObjectId(start_after) if start_after else None,
+            progress=print_progress
+        )
+
+        print(f"\n   Users scanned:    {report['scanned']}")
+        print(f"   Migrated:         {report['migrated']}")
+        print(f"   Skipped:          {report['skipped']}")
+        print(f"   Failed:           {report['failed']}")
+        print(f"   Inline size:      {format_bytes(report['inline_bytes'])}")
+        if report['last_id'] is not None:
+            print(f"   Last _id:         {report['last_id']}")
+
+        return not report['failed']
+
+    except Exception as e:
+        print(f"\n❌ Error migrating profile photos: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Move inline profile photos into the photo store')
+    parser.add_argument('--batch-size', type=int, default=100, help='Users per query')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many users')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+    parser.add_argument('--start-after', default=None, help='Resume after this user _id')
+    args = parser.parse_args()
+
+    print("="*50)
+    print("  Profile Photo Migration")
+    print("="*50)
+    print()
+
+    success = migrate_profile_photos(args.batch_size, args.limit, args.dry_run, args.start_after)
+
+    if success:
+        print("\n✅ Photo migration completed successfully!")
+        sys.exit(0)
+    else:
+        print("\n❌ Some photos could not be migrated!")
+        print("   Please check the messages above.")
+        sys.exit(1)
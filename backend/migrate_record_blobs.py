@@ -0,0 +1,90 @@
+"""
+Move Inline Record Files into the Blob Store
+Transcodes records that still keep base64 ciphertext in encrypted_data into the
+record_blobs GridFS bucket. Safe to interrupt and re-run; use --start-after to
+skip ahead to the last _id printed.
+
+Usage:
+    python migrate_record_blobs.py                 # migrate everything
+    python migrate_record_blobs.py --dry-run       # report sizes only
+    python migrate_record_blobs.py --limit 1000 --batch-size 200
+"""
+
+from app.models.database import Database
+from app.jobs.record_blobs import migrate_inline_records
+from bson import ObjectId
+import argparse
+import sys
+
+def format_bytes(size):
+    """Human readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def print_progress(report):
+    print(f"   ... {report['scanned']} scanned, {report['migrated']} migrated, "
+          f"{report['failed']} failed (last _id {report['last_id']})")
+
+def migrate_record_blobs(batch_size, limit, dry_run, start_after):
+    """Run the inline record migration and print a report"""
+    try:
+        print("🔗 Connecting to MongoDB...")
+        db = Database.get_db()
+
+        if db is None:
+            print("❌ Failed to connect to database")
+            return False
+
+        print("✅ Connected to MongoDB")
+        print("\n📦 Dry run - nothing will be written...\n" if dry_run else "\n📦 Moving record files...\n")
+
+        report = migrate_inline_records(
+            db,
+            batch_size=batch_size,
+            limit=limit,
+            dry_run=dry_run,
+            start_after=ObjectId(start_after) if start_after else None,
+            progress=print_progress
+        )
+
+        print(f"\n   Records scanned:  {report['scanned']}")
+        print(f"   Migrated:         {report['migrated']}")
+        print(f"   Skipped:          {report['skipped']}")
+        print(f"   Failed:           {report['failed']}")
+        print(f"   Inline size:      {format_bytes(report['inline_bytes'])}")
+        print(f"   Blob size:        {format_bytes(report['blob_bytes'])}")
+        if report['last_id'] is not None:
+            print(f"   Last _id:         {report['last_id']}")
+
+        return not report['failed']
+
+    except Exception as e:
+        print(f"\n❌ Error migrating records: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Move inline record files into GridFS')
+    parser.add_argument('--batch-size', type=int, default=100, help='Records per query')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many records')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+    parser.add_argument('--start-after', default=None, help='Resume after this record _id')
+    args = parser.parse_args()
+
+    print("="*50)
+    print("  Record Blob Migration")
+    print("="*50)
+    print()
+
+    success = migrate_record_blobs(args.batch_size, args.limit, args.dry_run, args.start_after)
+
+    if success:
+        print("\n✅ Record migration completed successfully!")
+        sys.exit(0)
+    else:
+        print("\n❌ Some records could not be migrated!")
+        print("   Please check the messages above.")
+        sys.exit(1)
@@ -0,0 +1,94 @@
+"""
+Rotate Record Encryption Keys
+Re-encrypts record files that are not under the primary key (the first key
+in ENCRYPTION_KEYS). Throttled, batched and checkpointed: re-running resumes
+after the last _id processed for the current primary key, or from the batch of
+the first record that failed. Drop old keys only after --dry-run reports 0
+records scanned.
+
+Usage:
+    ENCRYPTION_KEYS=new-key,old-key python rotate_encryption_keys.py --dry-run
+    ENCRYPTION_KEYS=new-key,old-key python rotate_encryption_keys.py --rate 200
+    python rotate_encryption_keys.py --restart      # ignore the saved checkpoint
+"""
+
+from app.models.database import Database
+from app.jobs.key_rotation import rotate_record_keys
+from app.utils.encryption import get_keyring
+from config.settings import Config
+from bson import ObjectId
+import argparse
+import sys
+
+def print_progress(report):
+    rate = report['scanned'] / report['elapsed'] if report['elapsed'] else 0.0
+    print(f"   ... {report['scanned']} scanned, {report['rotated']} rotated, {report['failed']} failed "
+          f"({rate:.0f}/s, last _id {report['last_id']})")
+
+def rotate_keys(batch_size, rate_limit, limit, dry_run, start_after, restart):
+    """Run the key rotation job and print a report"""
+    try:
+        keyring = get_keyring()
+        print(f"🔑 Primary key: {keyring.primary_id}   ring: {', '.join(keyring.key_ids)}")
+
+        print("🔗 Connecting to MongoDB...")
+        db = Database.get_db()
+
+        if db is None:
+            print("❌ Failed to connect to database")
+            return False
+
+        print("✅ Connected to MongoDB")
+        print("\n🔁 Dry run - counting records to rotate...\n" if dry_run else "\n🔁 Re-encrypting records...\n")
+
+        report = rotate_record_keys(
+            db,
+            batch_size=batch_size,
+            rate_limit=rate_limit,
+            limit=limit,
+            start_after=ObjectId(start_after) if start_after else None,
+            resume=not restart,
+            dry_run=dry_run,
+            progress=print_progress
+        )
+
+        print(f"\n   Records scanned:  {report['scanned']}")
+        print(f"   Rotated:          {report['rotated']}")
+        print(f"   Skipped:          {report['skipped']}")
+        print(f"   Failed:           {report['failed']}")
+        print(f"   Time:             {report['elapsed']:.1f}s")
+        if report['last_id'] is not None:
+            print(f"   Last _id:         {report['last_id']}")
+
+        return not report['failed']
+
+    except Exception as e:
+        print(f"\n❌ Error rotating keys: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Re-encrypt record files under the primary key')
+    parser.add_argument('--batch-size', type=int, default=Config.KEY_ROTATION_BATCH_SIZE, help='Records per bulk write')
+    parser.add_argument('--rate', type=float, default=Config.KEY_ROTATION_RATE_LIMIT, help='Records per second (0 = unlimited)')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many records')
+    parser.add_argument('--dry-run', action='store_true', help='Only count records still on older keys')
+    parser.add_argument('--start-after', default=None, help='Start after this record _id')
+    parser.add_argument('--restart', action='store_true', help='Ignore the saved checkpoint')
+    args = parser.parse_args()
+
+    print("="*50)
+    print("  Record Key Rotation")
+    print("="*50)
+    print()
+
+    success = rotate_keys(args.batch_size, args.rate, args.limit, args.dry_run, args.start_after, args.restart)
+
+    if success:
+        print("\n✅ Key rotation completed successfully!")
+        sys.exit(0)
+    else:
+        print("\n❌ Some records could not be re-encrypted!")
+        print("   Please check the messages above.")
+        sys.exit(1)
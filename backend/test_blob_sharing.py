@@ -0,0 +1,154 @@
+"""
+Shared record blob tests
+Checks that identical files of one patient share a reference-counted blob,
+that patients never share blobs, and that a blob is deleted only when its
+last record releases it (against mongomock's GridFS; skipped if mongomock is
+not installed).
+
+    python -m pytest -q test_blob_sharing.py
+"""
+
+import io
+import os
+import sys
+
+import pytest
+from bson import ObjectId
+from cryptography.fernet import Fernet
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import Database
+from app.utils import encryption, record_store
+from app.utils.encryption import KeyRing
+from app.utils.record_store import load_record_file, release_record_blobs, store_record_file
+from config.settings import Config
+
+FILE_DATA = os.urandom(5000)
+
+
+class _Bucket(GridFSBucket):
+    """GridFSBucket.delete does not run against mongomock; remove the documents directly"""
+
+    def __init__(self, db):
+        super().__init__(db, bucket_name=record_store.BLOB_BUCKET)
+        self._db = db
+
+    def delete(self, file_id):
+        if not self._db[f'{record_store.BLOB_BUCKET}.files'].delete_one({'_id': file_id}).deleted_count:
+            raise NoFile(file_id)
+        self._db[f'{record_store.BLOB_BUCKET}.chunks'].delete_many({'files_id': file_id})
+
+
+class _Stream(io.RawIOBase):
+    """An upload that cannot seek, so it is deduplicated after being stored"""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._data.readinto(buffer)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    import mongomock.gridfs
+    mongomock.gridfs.enable_gridfs_integration()
+    db = mongomock.MongoClient()['blob_sharing_test']
+    monkeypatch.setattr(Database, 'get_db', classmethod(lambda cls: db))
+    monkeypatch.setattr(record_store, 'get_blob_bucket', lambda db=None: _Bucket(db if db is not None else Database.get_db()))
+    monkeypatch.setattr(encryption, '_keyring', KeyRing([Fernet.generate_key()]))
+    monkeypatch.setattr(Config, 'RECORD_SEGMENT_SIZE', 1024)
+    return db
+
+
+def _refcount(db, blob_id):
+    blob = db[f'{record_store.BLOB_BUCKET}.files'].find_one({'_id': blob_id})
+    return blob['metadata']['refcount'] if blob else None
+
+
+def _store(source, patient_id):
+    return store_record_file(source, ObjectId(), patient_id, file_type='application/octet-stream')
+
+
+def test_same_patient_shares_blob(db):
+    patient_id = ObjectId()
+    first = _store(FILE_DATA, patient_id)
+    second = _store(FILE_DATA, patient_id)
+
+    assert second['blob_id'] == first['blob_id']
+    assert second['content_hash'] == first['content_hash']
+    assert _refcount(db, first['blob_id']) == 2
+    assert db[f'{record_store.BLOB_BUCKET}.files'].count_documents({}) == 1
+    assert load_record_file(second) == FILE_DATA
+
+
+def test_unseekable_upload_is_folded_into_existing_blob(db):
+    patient_id = ObjectId()
+    first = _store(FILE_DATA, patient_id)
+    second = _store(_Stream(FILE_DATA), patient_id)
+
+    assert second['blob_id'] == first['blob_id']
+    assert _refcount(db, first['blob_id']) == 2
+    # The copy stored while reading the stream is gone again
+    assert db[f'{record_store.BLOB_BUCKET}.files'].count_documents({}) == 1
+
+
+def test_different_patients_get_separate_blobs(db):
+    first = _store(FILE_DATA, ObjectId())
+    second = _store(FILE_DATA, ObjectId())
+
+    assert second['blob_id'] != first['blob_id']
+    # Fingerprints are keyed per patient, so they reveal nothing across patients
+    assert second['content_hash'] != first['content_hash']
+    assert _refcount(db, first['blob_id']) == 1
+    assert _refcount(db, second['blob_id']) == 1
+
+
+def test_different_files_get_separate_blobs(db):
+    patient_id = ObjectId()
+    first = _store(FILE_DATA, patient_id)
+    second = _store(FILE_DATA[:-1], patient_id)
+    assert second['blob_id'] != first['blob_id']
+
+
+def test_blob_deleted_on_last_release(db):
+    patient_id = ObjectId()
+    blob_id = _store(FILE_DATA, patient_id)['blob_id']
+    _store(FILE_DATA, patient_id)
+    db[record_store.THUMBNAILS_COLLECTION].insert_one({'_id': blob_id})
+
+    assert release_record_blobs([blob_id]) == 0
+    assert _refcount(db, blob_id) == 1
+    assert db[record_store.THUMBNAILS_COLLECTION].count_documents({}) == 1
+
+    assert release_record_blobs([blob_id]) == 1
+    assert _refcount(db, blob_id) is None
+    assert db[f'{record_store.BLOB_BUCKET}.chunks'].count_documents({'files_id': blob_id}) == 0
+    assert db[record_store.THUMBNAILS_COLLECTION].count_documents({}) == 0
+
+    # Releasing again (or a missing blob) is a no-op
+    assert release_record_blobs([blob_id, ObjectId()]) == 0
+
+
+def test_released_blob_is_not_reused(db):
+    patient_id = ObjectId()
+    blob_id = _store(FILE_DATA, patient_id)['blob_id']
+    release_record_blobs([blob_id])
+
+    assert _store(FILE_DATA, patient_id)['blob_id'] != blob_id
+
+
+def test_blob_without_refcount_belongs_to_one_record(db):
+    blob_id = _store(FILE_DATA, ObjectId())['blob_id']
+    # Stored before reference counting
+    db[f'{record_store.BLOB_BUCKET}.files'].update_one({'_id': blob_id}, {'$unset': {'metadata.refcount': ''}})
+
+    assert release_record_blobs([blob_id]) == 1
@@ -0,0 +1,212 @@
+"""
+Bulk user import tests
+Runs imports of small CSV and NDJSON files against mongomock (skipped if it
+is not installed): invalid rows go to the reject file with their passwords
+masked, emails already registered or repeated in the file are rejected, and
+an import interrupted mid-batch resumes without duplicating users or rejects.
+
+    python -m pytest -q test_bulk_import.py
+"""
+
+import csv
+import json
+import os
+import sys
+
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.jobs import bulk_import
+from app.jobs.bulk_import import IMPORTS_COLLECTION, _MASK, ImportInProgress, InvalidRow, parse_row, run_import
+from app.models.database import Database
+from app.utils.password import _checkpw
+from config.settings import Config
+
+COLUMNS = ['email', 'full_name', 'password', 'role', 'nmc_uid', 'allergies']
+PASSWORD = 'Initial2024'
+
+
+@pytest.fixture
+def db(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient()['bulk_import_test']
+    db['users'].create_index('email', unique=True)
+    monkeypatch.setattr(Database, 'get_db', classmethod(lambda cls: db))
+    monkeypatch.setattr(Config, 'ID_PERMUTATION_KEY', 'test-permutation-key')
+    monkeypatch.setattr(Config, 'IMPORT_BCRYPT_ROUNDS', 4)
+    return db
+
+
+def _write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as target:
+        writer = csv.DictWriter(target, COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    return str(path)
+
+
+def _rejects(state):
+    with open(state['reject_path'], encoding='utf-8') as source:
+        return [json.loads(line) for line in source]
+
+
+def _import(db, path, **kwargs):
+    return run_import(db, 'test-import', path, workers=0, **kwargs)
+
+
+def test_parse_row():
+    user, password = parse_row({'email': ' a@example.com ', 'full_name': 'A', 'password': PASSWORD,
+                                'allergies': 'dust; pollen;'}, 'patient')
+    assert user['email'] == 'a@example.com'
+    assert user['role'] == 'patient'
+    assert user['allergies'] == ['dust', 'pollen']
+    assert password == PASSWORD
+
+    with pytest.raises(InvalidRow, match='email'):
+        parse_row({'email': 'not-an-email', 'full_name': 'A'}, 'patient')
+    with pytest.raises(InvalidRow, match='nmc_uid'):
+        parse_row({'email': 'd@example.com', 'full_name': 'D', 'role': 'doctor'}, 'patient')
+    with pytest.raises(InvalidRow, match='role'):
+        parse_row({'email': 'x@example.com', 'full_name': 'X', 'role': 'admin'}, 'patient')
+
+
+def test_invalid_rows_are_rejected_with_passwords_masked(db, tmp_path):
+    path = _write_csv(tmp_path / 'users.csv', [
+        {'email': 'good@example.com', 'full_name': 'Good', 'password': PASSWORD},
+        {'email': 'bad-email', 'full_name': 'Bad', 'password': PASSWORD},
+        {'email': 'weak@example.com', 'full_name': 'Weak', 'password': 'weak'},
+        {'email': 'doctor@example.com', 'full_name': 'Doctor', 'role': 'doctor', 'nmc_uid': '1234567'},
+        {'email': 'nameless@example.com', 'full_name': ''}
+    ])
+
+    state = _import(db, path)
+
+    assert state['status'] == 'completed'
+    assert (state['inserted'], state['rejected'], state['skipped']) == (2, 3, 0)
+    rejects = _rejects(state)
+    assert [reject['row'] for reject in rejects] == [2, 3, 5]
+    assert rejects[0]['data']['password'] == _MASK
+    assert rejects[1]['data']['password'] == _MASK
+    with open(state['reject_path'], encoding='utf-8') as source:
+        assert PASSWORD not in source.read()
+
+    good = db['users'].find_one({'email': 'good@example.com'})
+    assert _checkpw(PASSWORD, good['password_hash'])
+    assert good['patient_id'].startswith('PAT-')
+    assert good['import_id'] == 'test-import' and good['import_row'] == 1
+    doctor = db['users'].find_one({'email': 'doctor@example.com'})
+    assert doctor['doctor_id'].startswith('DOC-') and doctor['password_hash'] is None
+
+
+def test_invalid_ndjson_lines_are_rejected(db, tmp_path):
+    path = tmp_path / 'users.ndjson'
+    path.write_text('{"email": "a@example.com", "full_name": "A"}\n'
+                    'not json\n'
+                    '\n'
+                    '["a list"]\n', encoding='utf-8')
+
+    state = _import(db, str(path))
+
+    assert (state['inserted'], state['rejected']) == (1, 2)
+    assert [reject['row'] for reject in _rejects(state)] == [2, 4]
+
+
+def test_duplicates_in_file_and_database_are_rejected(db, tmp_path):
+    db['users'].insert_one({'email': 'taken@example.com', 'role': 'patient'})
+    db['users'].insert_one({'email': 'other-doctor@example.com', 'role': 'doctor', 'nmc_uid': '7654321'})
+    path = _write_csv(tmp_path / 'users.csv', [
+        {'email': 'a@example.com', 'full_name': 'A'},
+        {'email': 'taken@example.com', 'full_name': 'Taken'},
+        {'email': 'a@example.com', 'full_name': 'A again', 'password': PASSWORD},
+        {'email': 'b@example.com', 'full_name': 'B'},
+        # Repeats a@example.com from an earlier batch
+        {'email': 'a@example.com', 'full_name': 'A once more'},
+        {'email': 'doctor@example.com', 'full_name': 'D', 'role': 'doctor', 'nmc_uid': '7654321'}
+    ])
+
+    state = _import(db, path, batch_size=4)
+
+    assert (state['inserted'], state['rejected'], state['skipped']) == (2, 4, 0)
+    errors = {reject['row']: reject['error'] for reject in _rejects(state)}
+    assert errors == {2: 'Email already registered', 3: 'Email repeated in the file',
+                      5: 'Email repeated in the file', 6: 'NMC UID already registered'}
+    assert _rejects(state)[1]['data']['password'] == _MASK
+    assert db['users'].count_documents({'email': 'a@example.com'}) == 1
+
+
+def test_interrupted_batch_resumes_without_duplicates(db, tmp_path, monkeypatch):
+    path = _write_csv(tmp_path / 'users.csv', [
+        {'email': 'a@example.com', 'full_name': 'A'},
+        {'email': 'bad-1', 'full_name': 'Bad 1', 'password': PASSWORD},
+        {'email': 'b@example.com', 'full_name': 'B'},
+        {'email': 'bad-2', 'full_name': 'Bad 2'},
+        {'email': 'c@example.com', 'full_name': 'C'},
+        {'email': 'd@example.com', 'full_name': 'D'}
+    ])
+
+    # The second batch writes its users and rejects, then the process dies
+    insert = bulk_import._Batch._insert
+    calls = []
+
+    def _crash_on_second_batch(self, entries):
+        insert(self, entries)
+        calls.append(len(entries))
+        if len(calls) == 2:
+            raise RuntimeError('worker killed')
+
+    monkeypatch.setattr(bulk_import._Batch, '_insert', _crash_on_second_batch)
+    with pytest.raises(RuntimeError):
+        _import(db, path, batch_size=2)
+
+    state = db[IMPORTS_COLLECTION].find_one({'_id': 'test-import'})
+    assert state['status'] == 'failed'
+    assert state['rows_done'] == 2
+    # The interrupted batch's reject is in the file but past the saved offset
+    assert len(_rejects(state)) == 2
+    assert os.path.getsize(state['reject_path']) > state['reject_offset']
+
+    monkeypatch.setattr(bulk_import._Batch, '_insert', insert)
+    state = run_import(db, 'test-import', workers=0, batch_size=2)
+
+    assert state['status'] == 'completed'
+    assert state['rows_done'] == 6
+    # b@example.com was written before the crash (its batch was never counted) and is skipped on resume
+    assert (state['inserted'], state['rejected'], state['skipped']) == (3, 2, 1)
+    assert [reject['row'] for reject in _rejects(state)] == [2, 4]
+    assert db['users'].count_documents({}) == 4
+
+
+def test_completed_import_is_not_run_again(db, tmp_path):
+    path = _write_csv(tmp_path / 'users.csv', [{'email': 'a@example.com', 'full_name': 'A'}])
+    _import(db, path)
+    state = _import(db, path)
+    assert state['inserted'] == 1
+    assert db['users'].count_documents({}) == 1
+
+    # Starting over finds the rows this import already wrote
+    state = _import(db, path, restart=True)
+    assert (state['inserted'], state['rejected'], state['skipped']) == (0, 0, 1)
+
+
+def test_running_import_cannot_be_claimed_twice(db, tmp_path):
+    path = _write_csv(tmp_path / 'users.csv', [{'email': 'a@example.com', 'full_name': 'A'}])
+    bulk_import.create_import(db, 'test-import', path)
+    db[IMPORTS_COLLECTION].update_one({'_id': 'test-import'}, {'$set': {'status': 'running'}})
+
+    with pytest.raises(ImportInProgress):
+        _import(db, path)
+
+
+def test_uploaded_source_is_deleted_on_completion(db, tmp_path):
+    path = _write_csv(tmp_path / 'upload.csv', [{'email': 'a@example.com', 'full_name': 'A', 'password': PASSWORD}])
+    bulk_import.create_import(db, 'test-import', path, delete_source=True)
+
+    state = run_import(db, 'test-import', workers=0)
+
+    assert state['status'] == 'completed'
+    assert not os.path.exists(path)
+    assert state['source_deleted_at']
+    assert os.path.exists(state['reject_path'])
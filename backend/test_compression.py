@@ -0,0 +1,118 @@
+"""
+Record compression tests
+Round-trips both codecs (zstd only if zstandard is installed), checks which
+files are compressed, and stores and reads back a compressed record file
+through record_store (against mongomock's GridFS; skipped if mongomock is
+not installed).
+
+    python -m pytest -q test_compression.py
+"""
+
+import os
+import sys
+
+import pytest
+from bson import ObjectId
+from cryptography.fernet import Fernet
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import Database
+from app.utils import compression, encryption
+from app.utils.compression import CODEC_ZLIB, CODEC_ZSTD, choose_codec, compress_stream, decompress_stream
+from app.utils.encryption import KeyRing
+from app.utils.record_store import load_record_file, store_record_file, supports_byte_ranges
+from config.settings import Config
+
+TEXT = b''.join(b'%d,Hemoglobin,13.%d,g/dL,normal\n' % (row, row % 10) for row in range(5000))
+RANDOM = os.urandom(200000)
+
+
+def _codecs():
+    codecs = [CODEC_ZLIB]
+    if compression.zstandard is not None:
+        codecs.append(CODEC_ZSTD)
+    return codecs
+
+
+def _chunks(data, size=7000):
+    return [data[offset:offset + size] for offset in range(0, len(data), size)]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    import mongomock.gridfs
+    mongomock.gridfs.enable_gridfs_integration()
+    db = mongomock.MongoClient()['compression_test']
+    monkeypatch.setattr(Database, 'get_db', classmethod(lambda cls: db))
+    monkeypatch.setattr(encryption, '_keyring', KeyRing([Fernet.generate_key()]))
+    monkeypatch.setattr(Config, 'RECORD_SEGMENT_SIZE', 4096)
+    monkeypatch.setattr(Config, 'RECORD_COMPRESSION', True)
+    return db
+
+
+@pytest.mark.parametrize('codec', _codecs())
+@pytest.mark.parametrize('data', [b'', b'x', TEXT, RANDOM])
+def test_codec_round_trip(codec, data):
+    compressed = list(compress_stream(_chunks(data), codec))
+    assert b''.join(decompress_stream(_chunks(b''.join(compressed), 1000), codec)) == data
+
+
+@pytest.mark.parametrize('codec', _codecs())
+def test_text_shrinks(codec):
+    assert len(b''.join(compress_stream(_chunks(TEXT), codec))) < len(TEXT) // 4
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError, match='Unknown compression codec'):
+        list(compress_stream([TEXT], 'lzma'))
+    with pytest.raises(ValueError, match='Unknown compression codec'):
+        list(decompress_stream([TEXT], 'lzma'))
+
+
+def test_choose_codec(monkeypatch):
+    monkeypatch.setattr(Config, 'RECORD_COMPRESSION', True)
+    codec = compression.default_codec()
+
+    assert choose_codec('text/csv', TEXT[:1000]) == codec
+    assert choose_codec('application/fhir+json; charset=utf-8', b'{}') == codec
+    # Already compressed formats, whatever the sample looks like
+    assert choose_codec('application/pdf', TEXT[:1000]) is None
+    assert choose_codec('image/jpeg', TEXT[:1000]) is None
+    # Unfamiliar types are judged on the sample
+    assert choose_codec('application/octet-stream', TEXT[:compression.SAMPLE_SIZE]) == codec
+    assert choose_codec('application/octet-stream', RANDOM[:compression.SAMPLE_SIZE]) is None
+    assert choose_codec(None, RANDOM[:compression.SAMPLE_SIZE]) is None
+    assert choose_codec('text/plain', b'') is None
+
+    monkeypatch.setattr(Config, 'RECORD_COMPRESSION', False)
+    assert choose_codec('text/csv', TEXT[:1000]) is None
+
+
+def test_zstd_record_without_zstandard(monkeypatch):
+    monkeypatch.setattr(compression, 'zstandard', None)
+    assert compression.default_codec() == CODEC_ZLIB
+    with pytest.raises(Exception, match='zstandard package is not installed'):
+        list(decompress_stream([b'data'], CODEC_ZSTD))
+
+
+def test_compressible_record_is_stored_compressed(db):
+    fields = store_record_file(TEXT, ObjectId(), ObjectId(), file_type='text/csv')
+
+    assert fields['encryption_metadata']['codec'] == compression.default_codec()
+    assert fields['file_size'] == len(TEXT)
+    blob = db['record_blobs.files'].find_one({'_id': fields['blob_id']})
+    assert blob['length'] < len(TEXT) // 4
+    assert load_record_file(fields) == TEXT
+    # Compressed files are served whole
+    assert not supports_byte_ranges(fields)
+
+
+def test_incompressible_record_is_stored_as_is(db):
+    fields = store_record_file(RANDOM, ObjectId(), ObjectId(), file_type='application/octet-stream')
+
+    assert 'codec' not in fields['encryption_metadata']
+    assert load_record_file(fields) == RANDOM
+    assert supports_byte_ranges(fields)
@@ -0,0 +1,168 @@
+"""
+Doctor search tests
+Pages through find_doctors with cursors in both sort orders, including
+doctors missing the sort value, checks the cursor clauses themselves and the
+facet counts (against mongomock; skipped if it is not installed).
+
+    python -m pytest -q test_doctor_search.py
+"""
+
+import os
+import sys
+
+import pytest
+from bson import ObjectId
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import Database
+from app.utils.doctor_search import (
+    BOOKABLE, FacetCache, InvalidSearch, _after_cursor, build_query, directory_entry, encode_cursor, find_doctors
+)
+
+# name, specialization, fee, experience (None: not filled in)
+DOCTORS = [
+    ('Dr. Asha Rao', 'Cardiology', '₹500', 12),
+    ('Dr. Bala Iyer', 'Cardiology', 800, None),
+    ('Dr. Chitra Nair', 'Dermatology', '300', 5),
+    ('Dr. Dev Menon', 'Cardiology', None, 12),
+    ('Dr. Esha Pillai', 'Dermatology', 1500, None),
+    ('Dr. Farhan Ali', 'Neurology', 2500, 25),
+    ('Dr. Gita Shah', 'Cardiology', 450, 3),
+]
+
+
+@pytest.fixture
+def users(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient()['doctor_search_test']
+    monkeypatch.setattr(Database, 'get_db', classmethod(lambda cls: db))
+    for name, specialization, fee, experience in DOCTORS:
+        doctor = {**BOOKABLE, 'full_name': name, 'specialization': specialization, 'consultation_fee': fee,
+                  'years_of_experience': experience, 'languages_spoken': ['English', 'Tamil'],
+                  'hospital_affiliation': 'Apollo Hospital'}
+        doctor['directory'] = directory_entry(doctor)
+        if experience is None:
+            # Profiles saved before the field existed
+            del doctor['directory']['experience']
+        db['users'].insert_one(doctor)
+    db['users'].insert_one({**BOOKABLE, 'full_name': 'Dr. Unverified', 'is_verified': False,
+                            'directory': directory_entry({'role': 'doctor', 'full_name': 'Dr. Unverified'})})
+    return db['users']
+
+
+def _page_through(users, sort, limit, filters=None):
+    names, cursor = [], None
+    while True:
+        doctors, cursor = find_doctors(users, filters or {}, sort=sort, cursor=cursor, limit=limit)
+        names.extend(doctor['full_name'] for doctor in doctors)
+        if cursor is None:
+            return names
+
+
+def test_directory_entry():
+    entry = directory_entry({'role': 'doctor', 'full_name': 'Dr. Élan Kumar', 'specialization': 'Cardiology',
+                             'languages_spoken': ['Hindi', ' english '], 'consultation_fee': '₹500',
+                             'years_of_experience': '12 years', 'hospital_affiliation': 'AIIMS Delhi'})
+    assert entry['sort_name'] == 'dr. elan kumar'
+    assert entry['name_words'] == ['elan', 'kumar']
+    assert entry['languages'] == ['english', 'hindi']
+    assert entry['hospital_words'] == ['aiims', 'delhi']
+    assert (entry['fee'], entry['experience']) == (500.0, 12.0)
+    assert directory_entry({'role': 'patient'}) is None
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 10])
+def test_pages_by_name_cover_every_doctor_once(users, limit):
+    assert _page_through(users, 'name', limit) == [doctor[0] for doctor in DOCTORS]
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 10])
+def test_pages_by_experience_put_missing_values_last(users, limit):
+    # Ties (and the doctors without experience) in _id order
+    assert _page_through(users, 'experience', limit) == [
+        'Dr. Farhan Ali', 'Dr. Asha Rao', 'Dr. Dev Menon', 'Dr. Chitra Nair', 'Dr. Gita Shah',
+        'Dr. Bala Iyer', 'Dr. Esha Pillai'
+    ]
+
+
+def test_cursor_after_missing_value_in_ascending_order(users):
+    # Missing values sort first in ascending order: everything with a value comes after
+    first = users.find_one({'full_name': 'Dr. Gita Shah'})
+    users.update_one({'_id': first['_id']}, {'$unset': {'directory.sort_name': ''}})
+    cursor = encode_cursor('name', users.find_one({'_id': first['_id']}))
+
+    doctors, _ = find_doctors(users, {}, sort='name', cursor=cursor, limit=10)
+    assert [doctor['full_name'] for doctor in doctors] == [doctor[0] for doctor in DOCTORS[:-1]]
+
+
+def test_after_cursor_clauses():
+    last_id = ObjectId()
+    doctor = {'_id': last_id, 'directory': {'sort_name': 'dr. asha rao', 'experience': 12}}
+
+    assert _after_cursor('name', encode_cursor('name', doctor)) == {'$or': [
+        {'directory.sort_name': {'$gt': 'dr. asha rao'}},
+        {'directory.sort_name': 'dr. asha rao', '_id': {'$gt': last_id}}
+    ]}
+    assert _after_cursor('experience', encode_cursor('experience', doctor)) == {'$or': [
+        {'directory.experience': {'$lt': 12}},
+        {'directory.experience': 12, '_id': {'$gt': last_id}},
+        {'directory.experience': None}
+    ]}
+
+    missing = {'_id': last_id, 'directory': {}}
+    assert _after_cursor('experience', encode_cursor('experience', missing)) == {'$or': [
+        {'directory.experience': None, '_id': {'$gt': last_id}}
+    ]}
+    assert _after_cursor('name', encode_cursor('name', missing)) == {'$or': [
+        {'directory.sort_name': None, '_id': {'$gt': last_id}},
+        {'directory.sort_name': {'$ne': None}}
+    ]}
+
+
+def test_invalid_cursors():
+    with pytest.raises(InvalidSearch, match='Invalid cursor'):
+        _after_cursor('name', 'not-a-cursor')
+    doctor = {'_id': ObjectId(), 'directory': {'sort_name': 'x', 'experience': 1}}
+    with pytest.raises(InvalidSearch, match='different sort order'):
+        _after_cursor('experience', encode_cursor('name', doctor))
+
+
+def test_filters(users):
+    assert _page_through(users, 'name', 2, {'specialization': 'cardiology', 'max_fee': '600'}) == [
+        'Dr. Asha Rao', 'Dr. Gita Shah'
+    ]
+    assert _page_through(users, 'name', 2, {'name': 'dr e'}) == ['Dr. Esha Pillai']
+    assert _page_through(users, 'experience', 2, {'min_experience': 10}) == [
+        'Dr. Farhan Ali', 'Dr. Asha Rao', 'Dr. Dev Menon'
+    ]
+    with pytest.raises(InvalidSearch, match='min_fee'):
+        build_query({'min_fee': 'cheap'})
+    with pytest.raises(InvalidSearch, match='sort'):
+        find_doctors(users, {}, sort='fee')
+
+
+def test_facet_counts(users):
+    cache = FacetCache(refresh_seconds=300)
+    facets = cache.get()
+
+    assert facets['specialization'][0] == {'value': 'Cardiology', 'count': 4}
+    assert {item['value']: item['count'] for item in facets['fee']} == {
+        '500-1000': 2, '300-500': 2, '1000-2000': 1, '2000+': 1
+    }
+    assert {item['value']: item['count'] for item in facets['experience']} == {'10-20': 2, '5-10': 1, '20+': 1,
+                                                                               '0-5': 1}
+    assert facets['language'] == [{'value': 'English', 'count': 7}, {'value': 'Tamil', 'count': 7}]
+    assert cache.get('Dermatology')['specialization'] == [{'value': 'Dermatology', 'count': 2}]
+    assert cache.get('Oncology') == {}
+    assert cache.stats() == {'doctors': 7, 'specializations': 3, 'refreshes': 1}
+
+
+def test_facet_counts_are_cached(users):
+    cache = FacetCache(refresh_seconds=300)
+    cache.get()
+    users.delete_many({})
+    # Served from the snapshot until the next refresh
+    assert cache.get()['specialization'][0]['count'] == 4
+    assert cache.stats()['refreshes'] == 1
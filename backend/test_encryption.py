@@ -0,0 +1,143 @@
+"""
+Record encryption tests
+Round-trips the segmented AES-GCM stream formats (BMS2, and BMS1 written the
+way older releases did), ranged decryption, tamper detection, key rotation
+through the key ring and the inline legacy Fernet fallback of record_store.
+
+    python -m pytest -q test_encryption.py
+"""
+
+import io
+import os
+import struct
+import sys
+
+import pytest
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils import encryption
+from app.utils.encryption import (
+    KeyRing, STREAM_MAGIC, decrypt_stream, decrypt_stream_range, encrypt_file_data, encrypt_stream
+)
+from app.utils.record_store import load_record_file, open_record_file
+
+SEGMENT_SIZE = 1024
+# Spans several segments and ends mid-segment
+PLAINTEXT = os.urandom(SEGMENT_SIZE * 3 + 100)
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    """Two keys; the first (primary) encrypts"""
+    new_key, old_key = Fernet.generate_key(), Fernet.generate_key()
+    monkeypatch.setattr(encryption, '_keyring', KeyRing([new_key, old_key]))
+    return new_key, old_key
+
+
+def _use_keys(monkeypatch, *keys):
+    monkeypatch.setattr(encryption, '_keyring', KeyRing(list(keys)))
+
+
+def _encrypt(data, segment_size=SEGMENT_SIZE):
+    return b''.join(encrypt_stream(io.BytesIO(data), segment_size))
+
+
+def _decrypt(stream):
+    return b''.join(decrypt_stream(io.BytesIO(stream)))
+
+
+def _encrypt_v1(data, key, segment_size=SEGMENT_SIZE):
+    """A BMS1 stream (no key id in the header), as written before key rotation"""
+    salt, prefix = os.urandom(16), os.urandom(7)
+    header = encryption._STREAM_HEADER_V1.pack(b'BMS1', segment_size, salt, prefix)
+    aead = AESGCM(encryption._stream_key(key, salt))
+    segments = [data[offset:offset + segment_size] for offset in range(0, len(data), segment_size)] or [b'']
+    sealed = [aead.encrypt(encryption._segment_nonce(prefix, index, index == len(segments) - 1), segment, header)
+              for index, segment in enumerate(segments)]
+    return header + b''.join(sealed)
+
+
+@pytest.mark.parametrize('data', [b'', b'x', PLAINTEXT[:SEGMENT_SIZE], PLAINTEXT])
+def test_bms2_round_trip(keys, data):
+    stream = _encrypt(data)
+    assert stream.startswith(STREAM_MAGIC)
+    assert _decrypt(stream) == data
+
+
+def test_bms1_round_trip(keys):
+    new_key, old_key = keys
+    for key in (new_key, old_key):
+        assert _decrypt(_encrypt_v1(PLAINTEXT, key)) == PLAINTEXT
+
+
+@pytest.mark.parametrize('start, stop', [
+    (0, 1), (0, len(PLAINTEXT)), (SEGMENT_SIZE - 10, SEGMENT_SIZE + 10),
+    (SEGMENT_SIZE, 2 * SEGMENT_SIZE), (len(PLAINTEXT) - 5, len(PLAINTEXT))
+])
+def test_range_round_trip(keys, start, stop):
+    stream = _encrypt(PLAINTEXT)
+    pieces = decrypt_stream_range(io.BytesIO(stream), len(stream), start, stop)
+    assert b''.join(pieces) == PLAINTEXT[start:stop]
+
+
+def test_tampered_segment_fails(keys):
+    stream = bytearray(_encrypt(PLAINTEXT))
+    header_size = encryption._STREAM_HEADER.size
+    # Flip a ciphertext byte in the second segment
+    stream[header_size + SEGMENT_SIZE + encryption._STREAM_TAG_SIZE + 3] ^= 1
+    with pytest.raises(Exception, match='segment 1 failed authentication'):
+        _decrypt(bytes(stream))
+
+
+def test_tampered_tag_fails(keys):
+    stream = bytearray(_encrypt(PLAINTEXT))
+    stream[-1] ^= 1
+    with pytest.raises(Exception, match='failed authentication'):
+        _decrypt(bytes(stream))
+
+
+def test_tampered_header_fails(keys):
+    stream = bytearray(_encrypt(PLAINTEXT))
+    # The segment size field is associated data of every segment
+    struct.pack_into('>I', stream, 8, SEGMENT_SIZE + 1)
+    with pytest.raises(Exception, match='Decryption failed'):
+        _decrypt(bytes(stream))
+
+
+def test_truncated_stream_fails(keys):
+    stream = _encrypt(PLAINTEXT)
+    sealed_size = SEGMENT_SIZE + encryption._STREAM_TAG_SIZE
+    # Drop the final segment: the new last one was not sealed as final
+    with pytest.raises(Exception, match='failed authentication'):
+        _decrypt(stream[:encryption._STREAM_HEADER.size + 3 * sealed_size])
+
+
+def test_older_key_still_decrypts(monkeypatch):
+    old_key, new_key = Fernet.generate_key(), Fernet.generate_key()
+    _use_keys(monkeypatch, old_key)
+    stream = _encrypt(PLAINTEXT)
+    legacy = encrypt_file_data(b'inline record')['encrypted_data']
+
+    # Rotated: the new key encrypts, the old one stays in the ring
+    _use_keys(monkeypatch, new_key, old_key)
+    assert _decrypt(stream) == PLAINTEXT
+    assert encryption.decrypt_file_data(legacy) == b'inline record'
+
+    # Dropped from the ring: unreadable
+    _use_keys(monkeypatch, new_key)
+    with pytest.raises(Exception, match='unknown key id'):
+        _decrypt(stream)
+
+
+def test_record_with_only_inline_fernet_data(keys):
+    record = {'encrypted_data': encrypt_file_data(b'%PDF-1.4 legacy record')['encrypted_data']}
+    assert b''.join(open_record_file(record)) == b'%PDF-1.4 legacy record'
+    assert load_record_file(record) == b'%PDF-1.4 legacy record'
+
+
+def test_record_without_file(keys):
+    assert open_record_file({}) is None
@@ -0,0 +1,152 @@
+"""
+ID allocator tests
+Checks that the keyed Feistel permutation is a bijection (exhaustively on a
+shrunken ID space, by sampling on the real one), that allocators reserving
+blocks of one sequence never hand out the same ID, and that a permutation
+key is required outside debug mode. Sequence tests run against mongomock
+(skipped if it is not installed).
+
+    python -m pytest -q test_id_generator.py
+"""
+
+import os
+import re
+import sys
+import threading
+
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import Database
+from app.utils import id_generator
+from app.utils.id_generator import (
+    COUNTERS_COLLECTION, ID_SPACE, IdAllocator, _kind_key, check_permutation_key, format_id, insert_with_id, permute
+)
+from config.settings import Config
+
+ID_PATTERN = re.compile(r'^PAT-[A-Z0-9]{8}$')
+
+
+@pytest.fixture
+def key(monkeypatch):
+    monkeypatch.setattr(Config, 'ID_PERMUTATION_KEY', 'test-permutation-key')
+    return _kind_key('patient')
+
+
+@pytest.fixture
+def db(monkeypatch, key):
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient()['id_generator_test']
+    monkeypatch.setattr(Database, 'get_db', classmethod(lambda cls: db))
+    return db
+
+
+def test_permutation_is_a_bijection_on_a_small_space(monkeypatch, key):
+    # 12-bit Feistel network cycle-walked into 3000 values
+    monkeypatch.setattr(id_generator, '_HALF_BITS', 6)
+    monkeypatch.setattr(id_generator, '_HALF_MASK', (1 << 6) - 1)
+    monkeypatch.setattr(id_generator, 'ID_SPACE', 3000)
+
+    assert sorted(permute(number, key) for number in range(3000)) == list(range(3000))
+
+
+def test_permutation_is_distinct_over_the_id_space(key):
+    numbers = list(range(50000)) + list(range(ID_SPACE - 50000, ID_SPACE))
+    values = [permute(number, key) for number in numbers]
+
+    assert len(set(values)) == len(values)
+    assert all(0 <= value < ID_SPACE for value in values)
+    # Consecutive sequence numbers do not give neighbouring IDs
+    assert sum(abs(a - b) < 1000 for a, b in zip(values, values[1:])) < 10
+
+
+def test_permutation_rejects_numbers_past_the_space(key):
+    with pytest.raises(ValueError, match='exhausted'):
+        permute(ID_SPACE, key)
+    with pytest.raises(ValueError):
+        permute(-1, key)
+
+
+def test_permutation_depends_on_key_and_kind(monkeypatch, key):
+    assert [permute(n, key) for n in range(20)] != [permute(n, _kind_key('doctor')) for n in range(20)]
+    monkeypatch.setattr(Config, 'ID_PERMUTATION_KEY', 'another-key')
+    assert [permute(n, key) for n in range(20)] != [permute(n, _kind_key('patient')) for n in range(20)]
+
+
+def test_format_id():
+    assert format_id('PAT', 0) == 'PAT-AAAAAAAA'
+    assert format_id('PAT', ID_SPACE - 1) == 'PAT-99999999'
+    assert format_id('DOC', 36) == 'DOC-AAAAAABA'
+
+
+def test_allocators_never_overlap(db):
+    # Two workers sharing one counter, one of them also allocating in bulk
+    first, second = IdAllocator('patient', 7), IdAllocator('patient', 5)
+    ids = []
+    for _ in range(40):
+        ids.append(first.next_id())
+        ids.append(second.next_id())
+    ids.extend(second.allocate(23))
+    ids.append(first.next_id())
+
+    assert len(set(ids)) == len(ids) == 104
+    assert all(ID_PATTERN.match(value) for value in ids)
+    # Whole blocks were reserved, whether or not they have been handed out yet
+    assert db[COUNTERS_COLLECTION].find_one({'_id': 'patient'})['next'] == 7 * first.blocks + 5 * (second.blocks - 1) + 23
+
+
+def test_allocator_is_thread_safe(db):
+    allocator = IdAllocator('patient', 3)
+    ids = []
+
+    def _take():
+        ids.extend(allocator.next_id() for _ in range(50))
+
+    threads = [threading.Thread(target=_take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == len(ids) == 200
+    assert allocator.stats()['allocated'] == 200
+
+
+def test_key_required_outside_debug(db, monkeypatch):
+    monkeypatch.setattr(Config, 'ID_PERMUTATION_KEY', None)
+    monkeypatch.setattr(Config, 'DEBUG', False)
+
+    assert check_permutation_key() is False
+    allocator = IdAllocator('patient', 5)
+    with pytest.raises(RuntimeError, match='ID_PERMUTATION_KEY is not set'):
+        allocator.next_id()
+    with pytest.raises(RuntimeError):
+        allocator.allocate(3)
+    # Failing before the counter is touched wastes no sequence numbers
+    assert db[COUNTERS_COLLECTION].count_documents({}) == 0
+
+
+def test_debug_mode_falls_back_to_development_key(db, monkeypatch):
+    monkeypatch.setattr(Config, 'ID_PERMUTATION_KEY', None)
+    monkeypatch.setattr(Config, 'DEBUG', True)
+
+    assert check_permutation_key() is False
+    assert ID_PATTERN.match(IdAllocator('patient', 5).next_id())
+
+
+def test_insert_with_id_retries_taken_ids(db, monkeypatch, key):
+    users = db['users']
+    users.create_index('patient_id', unique=True, sparse=True)
+    allocator = IdAllocator('patient', 5)
+    monkeypatch.setitem(id_generator._allocators, 'patient', allocator)
+    # An ID issued before the allocator that happens to equal its next one
+    taken = format_id('PAT', permute(0, key))
+    users.insert_one({'patient_id': taken})
+
+    result = insert_with_id(users, {'email': 'new@example.com'}, 'patient')
+
+    document = users.find_one({'_id': result.inserted_id})
+    assert document['patient_id'] != taken
+    assert ID_PATTERN.match(document['patient_id'])
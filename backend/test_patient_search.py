@@ -0,0 +1,120 @@
+"""
+Patient search tests
+Covers index tokens, query terms and ranking (exact ID, email or phone, then
+prefix, then word matches), phone queries with or without a country code, and
+find_patients against mongomock (skipped if it is not installed).
+
+    python -m pytest -q test_patient_search.py
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import Database
+from app.utils.patient_search import (
+    RANK_EXACT, RANK_PREFIX, RANK_TOKEN, WHOLE_PREFIX, find_patients, prefix_term, query_terms, rank, search_tokens
+)
+
+RAVI = {'role': 'patient', 'full_name': 'Ravi Kumar', 'email': 'ravi.k@gmail.com',
+        'phone': '+91 98765 43210', 'patient_id': 'PAT-1A2B3C4D'}
+KUMAR = {'role': 'patient', 'full_name': 'Kumar Swamy', 'email': 'kswamy@example.com',
+         'phone': '9123456789', 'patient_id': 'PAT-ZZZZ0001'}
+ANIL = {'role': 'patient', 'full_name': 'Anil Kumaraswamy', 'email': 'anil@example.com',
+        'phone': '9000000000', 'patient_id': 'PAT-ZZZZ0002'}
+
+
+@pytest.fixture
+def users(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient()['patient_search_test']
+    monkeypatch.setattr(Database, 'get_db', classmethod(lambda cls: db))
+    for user in (RAVI, KUMAR, ANIL, {**RAVI, 'role': 'doctor', 'email': 'dr.ravi@example.com', 'patient_id': None}):
+        db['users'].insert_one({**user, 'search_tokens': search_tokens(user)})
+    return db['users']
+
+
+def test_search_tokens():
+    tokens = search_tokens(RAVI)
+    assert {'ra', 'ravi', 'ku', 'kumar', 'ravi.k@gmail.com', 'gmail', 'pat', '1a2b3c4d'} <= set(tokens)
+    # Phone digits with and without the country code
+    assert {'919876543210', '9876543210', '98765'} <= set(tokens)
+    assert {WHOLE_PREFIX + 'ravi k', WHOLE_PREFIX + 'pat-1a2b', WHOLE_PREFIX + '98765'} <= set(tokens)
+    assert 'r' not in tokens
+    assert search_tokens({**RAVI, 'role': 'doctor'}) == []
+
+
+def test_query_terms():
+    assert query_terms('Ravi Kumar') == ['kumar', 'ravi']
+    assert query_terms("O'Brien, J") == ['brien']
+    assert query_terms('PAT-1A2B') == ['1a2b', 'pat']
+    assert query_terms('ravi.k@gmail.com') == ['ravi.k@gmail.com']
+    assert query_terms('Ré') == ['re']
+    assert query_terms('r') == []
+
+
+@pytest.mark.parametrize('query', ['+91 98765 43210', '919876543210', '98765-43210', '(987) 654 3210'])
+def test_phone_queries_ignore_formatting_and_country_code(query):
+    assert query_terms(query) == ['9876543210']
+    assert rank(RAVI, query) == RANK_EXACT
+
+
+def test_partial_phone_query():
+    assert query_terms('98765') == ['98765']
+    assert prefix_term('98765') == WHOLE_PREFIX + '98765'
+    assert rank(RAVI, '98765') == RANK_PREFIX
+
+
+def test_rank_exact_before_prefix_before_word():
+    assert rank(RAVI, 'PAT-1A2B3C4D') == RANK_EXACT
+    assert rank(RAVI, 'pat-1a2b3c4d') == RANK_EXACT
+    assert rank(RAVI, 'Ravi.K@Gmail.com') == RANK_EXACT
+
+    assert rank(RAVI, 'PAT-1A2B') == RANK_PREFIX
+    assert rank(RAVI, 'ravi ku') == RANK_PREFIX
+    assert rank(KUMAR, 'kumar') == RANK_PREFIX
+
+    assert rank(RAVI, 'kumar') == RANK_TOKEN
+    assert rank(ANIL, 'kumar') == RANK_TOKEN
+    assert rank(RAVI, 'kumar ravi') == RANK_TOKEN
+    assert RANK_EXACT < RANK_PREFIX < RANK_TOKEN
+
+
+def test_rank_rejects_non_matches():
+    assert rank(RAVI, 'kumar anil') is None
+    assert rank(RAVI, 'swamy') is None
+    assert rank(RAVI, '12345') is None
+
+
+def test_find_patients_orders_by_rank(users):
+    names = [user['full_name'] for user in find_patients(users, 'kumar')]
+    # Kumar Swamy starts with the query; the others only have a word starting with it
+    assert names == ['Kumar Swamy', 'Anil Kumaraswamy', 'Ravi Kumar']
+
+
+def test_find_patients_exact_id_first(users):
+    found = find_patients(users, 'pat-zzzz0002')
+    assert found[0]['full_name'] == 'Anil Kumaraswamy'
+    assert [user['patient_id'] for user in find_patients(users, 'PAT-ZZZZ')] == ['PAT-ZZZZ0002', 'PAT-ZZZZ0001']
+
+
+def test_find_patients_by_phone_and_email(users):
+    assert [user['full_name'] for user in find_patients(users, '+91-98765-43210')] == ['Ravi Kumar']
+    assert [user['full_name'] for user in find_patients(users, 'ravi.k@gm')] == ['Ravi Kumar']
+
+
+def test_find_patients_skips_other_roles_and_short_queries(users):
+    assert all(user['role'] == 'patient' for user in find_patients(users, 'ravi'))
+    assert find_patients(users, 'dr.ravi@example.com') == []
+    assert find_patients(users, 'r') == []
+
+
+def test_find_patients_limit_and_projection(users):
+    found = find_patients(users, 'kumar', limit=2, projection={'full_name': 1})
+    assert len(found) == 2
+    assert 'search_tokens' not in found[0]
+    assert found[0]['patient_id'] == 'PAT-ZZZZ0001'
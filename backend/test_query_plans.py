@@ -0,0 +1,402 @@
+"""
+Query plan regression suite
+Seeds a throwaway database with synthetic data, applies the index registry and
+explains every query shape the blueprints issue. Fails when a winning plan uses
+a collection scan (COLLSCAN) or an in-memory SORT stage.
+
+Requires a reachable mongod (skipped otherwise):
+    QUERY_PLAN_MONGO_URI=mongodb://localhost:27017 python -m pytest -q test_query_plans.py
+
+QUERY_PLAN_SCALE multiplies the seeded document counts (default 1).
+"""
+
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.indexes import ensure_indexes
+from app.utils.doctor_search import BOOKABLE, build_query, directory_entry
+from app.utils.patient_search import prefix_term, query_terms, search_tokens
+
+MONGO_URI = os.getenv('QUERY_PLAN_MONGO_URI', 'mongodb://localhost:27017')
+DB_NAME = os.getenv('QUERY_PLAN_DB', 'bharathmedicare_query_plans')
+SCALE = float(os.getenv('QUERY_PLAN_SCALE', '1'))
+
+SEED_COUNTS = {
+    'patients': 5000,
+    'doctors': 500,
+    'records': 20000,
+    'appointments': 10000,
+    'access_permissions': 5000,
+    'audit_logs': 50000,
+    'cds_feedback': 5000,
+    'testimonials': 1000,
+    'contact_messages': 2000,
+    'revoked_tokens': 2000
+}
+
+SPECIALIZATIONS = ['Cardiologist', 'Pediatrician', 'Dermatologist', 'Neurologist', 'General Physician']
+FILE_TYPES = ['application/pdf', 'image/jpeg', 'image/png']
+APPOINTMENT_STATUSES = ['pending', 'confirmed', 'completed', 'cancelled', 'rejected']
+AUDIT_ACTIONS = ['login', 'view', 'download', 'upload', 'patient_search']
+FEEDBACK_ACTIONS = ['accepted', 'dismissed', 'modified']
+
+
+def _count(name):
+    return max(1, int(SEED_COUNTS[name] * SCALE))
+
+
+def _seed(db):
+    """Insert synthetic documents shaped like the ones the blueprints write"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    def days_ago(max_days):
+        return now - timedelta(days=rng.randint(0, max_days), seconds=rng.randint(0, 86400))
+
+    patients = []
+    for i in range(_count('patients')):
+        patients.append({
+            '_id': ObjectId(),
+            'email': f'patient{i}@example.com',
+            'role': 'patient',
+            'full_name': f'Patient {i}',
+            'phone': f'+9190000{i:05d}',
+            'patient_id': f'PAT-{i:08d}',
+            'doctor_id': None,
+            'rfid_id': f'RFID{i:08d}' if i % 3 == 0 else None,
+            'nmc_uid': None,
+            'is_verified': True,
+            'is_active': True,
+            'is_profile_complete': i % 2 == 0,
+            'created_at': days_ago(365)
+        })
+        patients[-1]['search_tokens'] = search_tokens(patients[-1])
+
+    doctors = []
+    for i in range(_count('doctors')):
+        doctors.append({
+            '_id': ObjectId(),
+            'email': f'doctor{i}@example.com',
+            'role': 'doctor',
+            'full_name': f'Doctor {i}',
+            'phone': f'+9180000{i:05d}',
+            'patient_id': None,
+            'doctor_id': f'DOC-{i:08d}',
+            'rfid_id': None,
+            'nmc_uid': f'{i:07d}',
+            'specialization': SPECIALIZATIONS[i % len(SPECIALIZATIONS)],
+            'is_verified': i % 10 != 0,
+            'is_active': True,
+            'is_profile_complete': True,
+            'created_at': days_ago(365)
+        })
+        doctors[-1]['directory'] = directory_entry(doctors[-1])
+
+    db.users.insert_many(patients + doctors)
+
+    records = [{
+        'patient_id': rng.choice(patients)['_id'],
+        'uploaded_by': rng.choice(doctors)['_id'],
+        'file_name': f'report{i}.pdf',
+        'file_type': rng.choice(FILE_TYPES),
+        'uploaded_at': days_ago(365),
+        'is_deleted': i % 20 == 0
+    } for i in range(_count('records'))]
+    db.records.insert_many(records)
+
+    appointments = [{
+        'appointment_id': f'APT-{i:08d}',
+        'patient_id': rng.choice(patients)['_id'],
+        'doctor_id': rng.choice(doctors)['_id'],
+        'appointment_date': days_ago(180).strftime('%Y-%m-%d'),
+        'appointment_time': '10:00',
+        'status': rng.choice(APPOINTMENT_STATUSES),
+        'created_at': days_ago(180)
+    } for i in range(_count('appointments'))]
+    db.appointments.insert_many(appointments)
+
+    permissions = [{
+        'patient_id': rng.choice(patients)['_id'],
+        'doctor_id': rng.choice(doctors)['_id'],
+        'permission_level': 'read',
+        'granted_at': days_ago(180)
+    } for _ in range(_count('access_permissions'))]
+    db.access_permissions.insert_many(permissions)
+
+    audit_logs = [{
+        'user_id': str(rng.choice(patients)['_id']),
+        'action': rng.choice(AUDIT_ACTIONS),
+        'resource_type': 'record',
+        'timestamp': days_ago(90)
+    } for _ in range(_count('audit_logs'))]
+    db.audit_logs.insert_many(audit_logs)
+
+    feedback = [{
+        'physician_id': rng.choice(doctors)['_id'],
+        'suggestion_type': 'medication',
+        'action': rng.choice(FEEDBACK_ACTIONS),
+        'timestamp': days_ago(90)
+    } for _ in range(_count('cds_feedback'))]
+    db.cds_feedback.insert_many(feedback)
+
+    db.physician_preferences.insert_many([
+        {'physician_id': doctor['_id'], 'suggestion_frequency': 'normal'} for doctor in doctors
+    ])
+
+    testimonials = [{
+        'user_id': str(rng.choice(patients)['_id']),
+        'rating': rng.randint(1, 5),
+        'message': 'Great experience with the platform',
+        'is_approved': i % 2 == 0,
+        'is_active': True,
+        'created_at': days_ago(365)
+    } for i in range(_count('testimonials'))]
+    db.testimonials.insert_many(testimonials)
+
+    contact_messages = [{
+        'name': f'Visitor {i}',
+        'email': f'visitor{i}@example.com',
+        'message': 'Question about the platform',
+        'status': rng.choice(['unread', 'read', 'replied']),
+        'submitted_at': days_ago(365)
+    } for i in range(_count('contact_messages'))]
+    db.contact_messages.insert_many(contact_messages)
+
+    revoked_tokens = [{
+        'token_digest': f'{i:064x}',
+        'user_id': str(rng.choice(patients)['_id']),
+        'revoked_at': days_ago(1),
+        'expires_at': now + timedelta(hours=24)
+    } for i in range(_count('revoked_tokens'))]
+    db.revoked_tokens.insert_many(revoked_tokens)
+
+    return {
+        'patient': patients[0],
+        'doctor': doctors[1],
+        'now': now
+    }
+
+
+@pytest.fixture(scope='module')
+def plan_db():
+    """Seeded database with the index registry applied"""
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError as e:
+        pytest.skip(f"No mongod reachable at {MONGO_URI}: {e}")
+
+    client.drop_database(DB_NAME)
+    db = client[DB_NAME]
+    sample = _seed(db)
+
+    report = ensure_indexes(db)
+    assert not report['failed'], report['failed']
+
+    yield db, sample
+
+    client.drop_database(DB_NAME)
+    client.close()
+
+
+def _find(collection, query, sort=None, limit=0):
+    return {'kind': 'find', 'collection': collection, 'query': query, 'sort': sort, 'limit': limit}
+
+
+def _count_docs(collection, query):
+    return {'kind': 'count', 'collection': collection, 'query': query}
+
+
+def _catalog(sample):
+    """Every query shape issued by the blueprints, keyed by route/function"""
+    patient = sample['patient']
+    doctor = sample['doctor']
+    patient_oid = patient['_id']
+    doctor_oid = doctor['_id']
+    now = sample['now']
+    seven_days_ago = now - timedelta(days=7)
+    thirty_days_ago = now - timedelta(days=30)
+    month_range = {'$gte': now - timedelta(days=60), '$lt': now - timedelta(days=30)}
+    search = 'Patient 12'
+
+    return {
+        # auth.py
+        'auth.register.email': _find('users', {'email': patient['email']}, limit=1),
+        'auth.register.nmc_uid': _find('users', {'nmc_uid': doctor['nmc_uid']}, limit=1),
+        'auth.register.rfid': _find('users', {'rfid_id': 'RFID00000000'}, limit=1),
+        'auth.verify_otp.phone': _find('users', {'phone': patient['phone']}, limit=1),
+        'auth.hospital_login': _find('users', {'patient_id': patient['patient_id']}, limit=1),
+        'auth.change_password': _find('users', {'_id': patient_oid}, limit=1),
+        # users.py / patients.py / doctors.py
+        'users.me': _find('users', {'_id': patient_oid}, limit=1),
+        'users.update_profile.rfid': _find('users', {'rfid_id': 'RFID00000003', '_id': {'$ne': patient_oid}}, limit=1),
+        'users.replace_photo': _find('profile_photos', {'user_id': patient_oid, 'version': {'$nin': ['0' * 16]}}),
+        'patients.list_patients': _find('users', {'role': 'patient'}),
+        'doctors.doctor_card.patient_count': _count_docs('access_permissions', {'doctor_id': doctor_oid}),
+        # admin.py
+        'admin.stats.patients': _count_docs('users', {'role': 'patient'}),
+        'admin.stats.doctors': _count_docs('users', {'role': 'doctor', 'is_verified': True}),
+        'admin.stats.records': _count_docs('records', {'is_deleted': False}),
+        'admin.stats.recent_uploads': _count_docs('records', {'uploaded_at': {'$gte': seven_days_ago}, 'is_deleted': False}),
+        'admin.stats.recent_registrations': _count_docs('users', {'created_at': {'$gte': seven_days_ago}}),
+        'admin.audit_logs': _find('audit_logs', {}, sort=[('timestamp', -1)], limit=100),
+        'admin.pending_doctors': _find('users', {'role': 'doctor', 'is_verified': False}, sort=[('created_at', -1)]),
+        'admin.search_patients.exact_id': _find('users', {'patient_id': search.upper(), 'role': 'patient'}, limit=1),
+        'admin.search_patients.prefix': _find('users', {'role': 'patient', 'search_tokens': prefix_term(search)}, limit=200),
+        'admin.search_patients': _find('users', {'role': 'patient', 'search_tokens': {'$all': query_terms(search)}},
+                                       limit=200),
+        # derived_fields.py
+        'derived_fields.backfill': _find('users', {'_id': {'$gt': patient_oid}}, sort=[('_id', 1)], limit=500),
+        'derived_fields.backfill.search_tokens': _find('users', {'role': 'patient', 'search_tokens': {'$exists': False},
+                                                                 '_id': {'$gt': patient_oid}}, sort=[('_id', 1)], limit=500),
+        'derived_fields.backfill.directory': _find('users', {'role': 'doctor', 'directory': {'$exists': False},
+                                                             '_id': {'$gt': doctor_oid}}, sort=[('_id', 1)], limit=500),
+        'admin.delete_user.record_blobs': _find('records', {'patient_id': patient_oid, 'blob_id': {'$exists': True}}),
+        'admin.delete_user.archived_records': _find('records_archive', {'patient_id': patient_oid}),
+        # record_store.py
+        'record_store.acquire_blob': _find('record_blobs.files', {
+            'metadata.patient_id': patient_oid, 'metadata.content_hash': '0' * 64,
+            'metadata.encryption.key_id': '00000000', 'metadata.refcount': {'$gt': 0}
+        }, limit=1),
+        # records.py
+        'records.get_my_records': _find('records', {'patient_id': patient_oid, 'is_deleted': False}, sort=[('uploaded_at', -1)]),
+        'records.get_patient_records.permission': _find('access_permissions', {'doctor_id': doctor_oid, 'patient_id': {'$in': [patient_oid]}}),
+        'records.get_patient_records': _find('records', {'patient_id': patient_oid, 'is_deleted': False}, sort=[('uploaded_at', -1)]),
+        'records.get_thumbnails': _find('records', {'_id': {'$in': [ObjectId(), ObjectId()]}, 'is_deleted': False}),
+        'records.get_thumbnails.permission': _find('access_permissions', {'doctor_id': doctor_oid, 'patient_id': {'$in': [patient_oid, ObjectId()]}}),
+        'records.get_thumbnails.stored': _find('record_thumbnails', {'_id': {'$in': [ObjectId(), ObjectId()]}}),
+        # appointments.py
+        # bulk_import.py
+        'bulk_import.existing_emails': _find('users', {'email': {'$in': ['patient1@example.com', 'new@example.com']}}),
+        'bulk_import.existing_nmc_uids': _find('users', {'nmc_uid': {'$in': ['0000001', '9999999']}}),
+        'admin.get_user_imports': _find('bulk_imports', {}, sort=[('started_at', -1)], limit=50),
+        # id_generator.py
+        'id_generator.reserve': _find('counters', {'_id': 'appointment'}, limit=1),
+        'appointments.search_doctors.doctor_id': _find('users', {'doctor_id': 'DOC-00000001', **BOOKABLE}, limit=1),
+        'appointments.search_doctors': _find('users', build_query({}), sort=[('directory.sort_name', 1), ('_id', 1)],
+                                             limit=21),
+        'appointments.search_doctors.specialization': _find('users', build_query({'specialization': 'Cardiologist'}),
+                                                            sort=[('directory.sort_name', 1), ('_id', 1)], limit=21),
+        'appointments.search_doctors.experience': _find('users', build_query({'specialization': 'Cardiologist'}),
+                                                        sort=[('directory.experience', -1), ('_id', 1)], limit=21),
+        'appointments.search_doctors.language': _find('users', build_query({'language': 'Hindi'}),
+                                                      sort=[('directory.sort_name', 1), ('_id', 1)], limit=21),
+        'appointments.book.doctor': _find('users', {'_id': doctor_oid, 'role': 'doctor', 'is_verified': True}, limit=1),
+        'appointments.get_my_appointments.patient': _find('appointments', {'patient_id': patient_oid}, sort=[('appointment_date', -1)]),
+        'appointments.get_my_appointments.doctor': _find('appointments', {'doctor_id': doctor_oid}, sort=[('appointment_date', -1)]),
+        'appointments.approve.permission': _find('access_permissions', {'patient_id': patient_oid, 'doctor_id': doctor_oid}, limit=1),
+        # access.py
+        'access.my_permissions.patient': _find('access_permissions', {'patient_id': patient_oid}),
+        'access.my_permissions.doctor': _find('access_permissions', {'doctor_id': doctor_oid}),
+        # analytics.py
+        'analytics.patient_overview.total': _count_docs('records', {'patient_id': patient_oid, 'is_deleted': False}),
+        'analytics.patient_overview.pdf': _count_docs('records', {'patient_id': patient_oid, 'file_type': 'application/pdf', 'is_deleted': False}),
+        'analytics.patient_overview.doctors': _count_docs('access_permissions', {'patient_id': patient_oid}),
+        'analytics.patient_overview.recent': _count_docs('records', {'patient_id': patient_oid, 'uploaded_at': {'$gte': thirty_days_ago}, 'is_deleted': False}),
+        'analytics.patient_overview.timeline': _count_docs('records', {'patient_id': patient_oid, 'uploaded_at': month_range, 'is_deleted': False}),
+        'analytics.doctor_overview.patients': _count_docs('access_permissions', {'doctor_id': doctor_oid}),
+        'analytics.doctor_overview.appointments': _count_docs('appointments', {'doctor_id': doctor_oid}),
+        'analytics.doctor_overview.pending': _count_docs('appointments', {'doctor_id': doctor_oid, 'status': 'pending'}),
+        'analytics.doctor_overview.growth': _count_docs('access_permissions', {'doctor_id': doctor_oid, 'granted_at': month_range}),
+        'analytics.admin_overview.deleted': _count_docs('records', {'is_deleted': True}),
+        'analytics.admin_overview.growth_users': _count_docs('users', {'created_at': month_range}),
+        'analytics.admin_overview.growth_records': _count_docs('records', {'uploaded_at': month_range, 'is_deleted': False}),
+        # stats.py
+        'stats.testimonials': _find('testimonials', {'is_approved': True, 'is_active': True}, sort=[('created_at', -1)], limit=6),
+        'stats.submit_testimonial.pending': _find('testimonials', {'user_id': str(patient_oid), 'is_approved': False}, limit=1),
+        'stats.my_testimonials': _find('testimonials', {'user_id': str(patient_oid)}, sort=[('created_at', -1)]),
+        # contact.py
+        'contact.messages': _find('contact_messages', {}, sort=[('submitted_at', -1)], limit=100),
+        'contact.messages.by_status': _find('contact_messages', {'status': 'unread'}, sort=[('submitted_at', -1)], limit=100),
+        'contact.messages.unread_count': _count_docs('contact_messages', {'status': 'unread'}),
+        # utils/audit.py
+        'audit.get_user_activity': _find('audit_logs', {'user_id': str(patient_oid)}, sort=[('timestamp', -1)], limit=50),
+        # utils/token_cache.py
+        'token_cache.revocation_refresh': _find('revoked_tokens', {'expires_at': {'$gt': now}, 'revoked_at': {'$gte': thirty_days_ago}}, sort=[('revoked_at', 1)]),
+        'token_cache.confirm_revoked': _find('revoked_tokens', {'token_digest': f'{1:064x}'}, limit=1),
+        # ai_cds
+        'cds.context_analyzer.recent_records': _find('records', {'patient_id': patient_oid, 'is_deleted': False}, sort=[('uploaded_at', -1)], limit=5),
+        'cds.learning.get_feedback_analytics': _find('cds_feedback', {'physician_id': doctor_oid, 'timestamp': {'$gte': thirty_days_ago}}),
+        'cds.learning.get_physician_preferences': _find('physician_preferences', {'physician_id': doctor_oid}, limit=1),
+        # jobs/profile_photos.py
+        'profile_photos.inline': _find('users', {'profile_photo': {'$regex': '^data:'}, '_id': {'$gt': patient_oid}},
+                                       sort=[('_id', 1)], limit=100),
+        # jobs/record_archive.py
+        'record_archive.expired': _find('records', {
+            'is_deleted': True, 'deleted_at': {'$lt': thirty_days_ago},
+            '$or': [{'deleted_at': {'$gt': month_range['$gte']}},
+                    {'deleted_at': month_range['$gte'], '_id': {'$gt': patient_oid}}]
+        }, sort=[('deleted_at', 1), ('_id', 1)], limit=100),
+    }
+
+
+# Catalogue names, built without a database so pytest can parametrize at collection time
+QUERY_NAMES = sorted(_catalog({
+    'patient': {'_id': ObjectId(), 'email': '', 'phone': '', 'patient_id': ''},
+    'doctor': {'_id': ObjectId(), 'nmc_uid': ''},
+    'now': datetime.utcnow()
+}))
+
+
+def _explain(db, spec):
+    """Run explain for a catalogue entry and return the explain document"""
+    collection = db[spec['collection']]
+
+    if spec['kind'] == 'count':
+        # count_documents runs as a $match + $group aggregation
+        return db.command('explain', {
+            'aggregate': spec['collection'],
+            'pipeline': [{'$match': spec['query']}, {'$group': {'_id': 1, 'n': {'$sum': 1}}}],
+            'cursor': {}
+        }, verbosity='queryPlanner')
+
+    cursor = collection.find(spec['query'])
+    if spec['sort']:
+        cursor = cursor.sort(spec['sort'])
+    if spec['limit']:
+        cursor = cursor.limit(spec['limit'])
+    return cursor.explain()
+
+
+def plan_stages(explain):
+    """Collect every stage name in the winning plan(s) of an explain document"""
+    stages = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in ('rejectedPlans', 'executionStats', 'slotBasedPlan', 'command'):
+                    continue
+                if key == 'stage' and isinstance(value, str):
+                    stages.append(value)
+                elif key == '$sort':
+                    # Pipeline $sort that was not absorbed into the query plan
+                    stages.append('SORT')
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return stages
+
+
+@pytest.mark.parametrize('query_name', QUERY_NAMES)
+def test_query_plan_uses_index(plan_db, query_name):
+    db, sample = plan_db
+    spec = _catalog(sample)[query_name]
+
+    stages = plan_stages(_explain(db, spec))
+
+    assert 'COLLSCAN' not in stages, f"{query_name} does a collection scan: {stages}"
+    assert 'SORT' not in stages, f"{query_name} sorts in memory: {stages}"
@@ -0,0 +1,143 @@
+"""
+Record download tests
+Drives GET /api/records/<id>/download through the Flask test client against
+mongomock's GridFS (skipped if mongomock is not installed): byte ranges
+within and across encryption segments, suffix ranges, unsatisfiable ranges
+and conditional requests.
+
+    python -m pytest -q test_record_downloads.py
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from cryptography.fernet import Fernet
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.models.database import Database
+from app.utils import encryption
+from app.utils.auth import create_token
+from app.utils.encryption import KeyRing
+from app.utils.record_store import insert_record_with_file, supports_byte_ranges
+from config.settings import Config
+
+SEGMENT_SIZE = 1024
+# Random, so it is stored uncompressed; ends mid-segment
+FILE_DATA = os.urandom(SEGMENT_SIZE * 3 + 100)
+
+
+class DownloadTestConfig(Config):
+    TESTING = True
+    MONGO_AUTO_CREATE_INDEXES = False
+
+
+@pytest.fixture
+def db(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    import mongomock.gridfs
+    mongomock.gridfs.enable_gridfs_integration()
+    db = mongomock.MongoClient()['record_downloads_test']
+    monkeypatch.setattr(Database, 'get_db', classmethod(lambda cls: db))
+    monkeypatch.setattr(encryption, '_keyring', KeyRing([Fernet.generate_key()]))
+    monkeypatch.setattr(Config, 'RECORD_SEGMENT_SIZE', SEGMENT_SIZE)
+    monkeypatch.setattr(Config, 'ID_PERMUTATION_KEY', 'test-permutation-key')
+    monkeypatch.setattr(Config, 'AUDIT_ASYNC', False)
+    return db
+
+
+@pytest.fixture
+def patient_id(db):
+    return db.users.insert_one({'email': 'patient@example.com', 'role': 'patient', 'is_active': True}).inserted_id
+
+
+@pytest.fixture
+def record(db, patient_id):
+    record_doc = {
+        'patient_id': patient_id,
+        'file_name': 'scan.bin',
+        'file_type': 'application/octet-stream',
+        'uploaded_at': datetime.utcnow(),
+        'is_deleted': False
+    }
+    insert_record_with_file(db.records, record_doc, FILE_DATA)
+    assert supports_byte_ranges(record_doc)
+    return record_doc
+
+
+@pytest.fixture
+def download(db, patient_id, record):
+    client = create_app(DownloadTestConfig).test_client()
+    token = create_token(str(patient_id), 'patient@example.com', 'patient')
+    url = f"/api/records/{record['_id']}/download"
+
+    def _download(**headers):
+        return client.get(url, headers={'Authorization': f'Bearer {token}', **headers})
+
+    return _download
+
+
+def test_full_download(download):
+    response = download()
+    assert response.status_code == 200
+    assert response.data == FILE_DATA
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['ETag']
+
+
+@pytest.mark.parametrize('start, stop', [
+    (0, 10),
+    (SEGMENT_SIZE - 10, SEGMENT_SIZE + 10),
+    (SEGMENT_SIZE // 2, 3 * SEGMENT_SIZE + 50),
+    (SEGMENT_SIZE, 2 * SEGMENT_SIZE)
+])
+def test_range_download(download, start, stop):
+    response = download(Range=f'bytes={start}-{stop - 1}')
+    assert response.status_code == 206
+    assert response.data == FILE_DATA[start:stop]
+    assert response.headers['Content-Range'] == f'bytes {start}-{stop - 1}/{len(FILE_DATA)}'
+
+
+def test_suffix_range_download(download):
+    response = download(Range='bytes=-150')
+    assert response.status_code == 206
+    assert response.data == FILE_DATA[-150:]
+    assert response.headers['Content-Range'] == f'bytes {len(FILE_DATA) - 150}-{len(FILE_DATA) - 1}/{len(FILE_DATA)}'
+
+
+def test_open_ended_range_is_clamped(download):
+    response = download(Range=f'bytes={len(FILE_DATA) - 20}-{len(FILE_DATA) + 500}')
+    assert response.status_code == 206
+    assert response.data == FILE_DATA[-20:]
+
+
+def test_range_past_the_end_is_unsatisfiable(download):
+    response = download(Range=f'bytes={len(FILE_DATA)}-{len(FILE_DATA) + 10}')
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(FILE_DATA)}'
+
+
+def test_matching_etag_is_not_modified(download):
+    etag = download().headers['ETag']
+    response = download(**{'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    assert download(**{'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_stale_if_range_sends_whole_file(download):
+    response = download(Range='bytes=0-9', **{'If-Range': '"stale"'})
+    assert response.status_code == 200
+    assert response.data == FILE_DATA
+
+
+def test_other_patients_are_denied(download, db, record):
+    db.records.update_one({'_id': record['_id']}, {'$set': {'patient_id': ObjectId()}})
+    assert download().status_code == 403
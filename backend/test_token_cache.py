@@ -0,0 +1,129 @@
+"""
+Verified token cache and revocation tests
+Covers the verified-payload LRU, the Bloom filter of revoked digests and the
+revocation list's refresh from revoked_tokens (against mongomock; skipped if
+it is not installed).
+
+    python -m pytest -q test_token_cache.py
+"""
+
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.database import Database
+from app.utils.token_cache import BloomFilter, RevocationList, VerifiedTokenCache, epoch_ms, issued_at_ms
+
+
+def _digest(value):
+    return hashlib.sha256(str(value).encode('utf-8')).hexdigest()
+
+
+@pytest.fixture
+def revoked_tokens(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    db = mongomock.MongoClient()['token_cache_test']
+    monkeypatch.setattr(Database, 'get_db', classmethod(lambda cls: db))
+    return db['revoked_tokens']
+
+
+def test_verified_cache_returns_payload_until_exp():
+    cache = VerifiedTokenCache(max_size=10)
+    cache.put('a', {'user_id': 'u1', 'exp': time.time() + 60})
+    cache.put('b', {'user_id': 'u2', 'exp': time.time() - 1})
+
+    assert cache.get('a')['user_id'] == 'u1'
+    assert cache.get('b') is None
+    assert cache.stats()['size'] == 1
+
+
+def test_verified_cache_evicts_least_recently_used():
+    cache = VerifiedTokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.put('a', {'exp': exp})
+    cache.put('b', {'exp': exp})
+    cache.get('a')
+    cache.put('c', {'exp': exp})
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_verified_cache_skips_payloads_without_exp():
+    cache = VerifiedTokenCache(max_size=10)
+    cache.put('a', {'user_id': 'u1'})
+    assert cache.get('a') is None
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    added = [_digest(i) for i in range(1000)]
+    for digest in added:
+        bloom.add(digest)
+
+    assert all(digest in bloom for digest in added)
+    false_positives = sum(_digest(f"other-{i}") in bloom for i in range(10000))
+    # 1% target; allow for variance
+    assert false_positives < 300
+
+
+def test_issued_at_prefers_millisecond_claim():
+    assert issued_at_ms({'iat': 100, 'iat_ms': 100250}) == 100250
+    # Whole-second tokens count as issued at the start of their second
+    assert issued_at_ms({'iat': 100}) == 100000
+
+
+def test_revocation_applies_within_the_same_second(revoked_tokens):
+    revocations = RevocationList(capacity=100, error_rate=0.01, refresh_seconds=60)
+    revoked_at = datetime(2026, 1, 1, 12, 0, 0, 500000)
+    revocations.record({'user_id': 'u1', 'revoked_before': revoked_at, 'revoked_at': revoked_at,
+                        'expires_at': revoked_at + timedelta(hours=1)})
+
+    second = epoch_ms(revoked_at.replace(microsecond=0)) // 1000
+    before = {'user_id': 'u1', 'iat': second, 'iat_ms': epoch_ms(revoked_at) - 200}
+    after = {'user_id': 'u1', 'iat': second, 'iat_ms': epoch_ms(revoked_at) + 200}
+    legacy = {'user_id': 'u1', 'iat': second}
+
+    assert revocations.is_revoked(_digest('before'), before)
+    assert not revocations.is_revoked(_digest('after'), after)
+    assert revocations.is_revoked(_digest('legacy'), legacy)
+    assert not revocations.is_revoked(_digest('other'), {'user_id': 'u2', 'iat': second})
+
+
+def test_revocation_list_picks_up_other_workers_on_refresh(revoked_tokens):
+    revocations = RevocationList(capacity=100, error_rate=0.01, refresh_seconds=60)
+    token = _digest('token')
+    payload = {'user_id': 'u1', 'iat': int(time.time())}
+    assert not revocations.is_revoked(token, payload)
+
+    # Written by another worker: not seen until the next refresh
+    now = datetime.utcnow()
+    revoked_tokens.insert_one({'token_digest': token, 'user_id': 'u1', 'revoked_at': now,
+                               'expires_at': now + timedelta(hours=1)})
+    assert not revocations.is_revoked(token, payload)
+
+    revocations.refresh(force=True)
+    assert revocations.is_revoked(token, payload)
+    assert revocations.stats()['refreshes'] == 2
+
+
+def test_revocation_list_confirms_bloom_positives(revoked_tokens):
+    revocations = RevocationList(capacity=100, error_rate=0.01, refresh_seconds=60)
+    revocations.refresh(force=True)
+    digest = _digest('never-revoked')
+    # Simulate a Bloom false positive
+    revocations._bloom.add(digest)
+
+    assert not revocations.is_revoked(digest, {'user_id': 'u1', 'iat': 0})
+    assert revocations.stats()['false_positives'] == 1
+    # Remembered, so the collection is not asked again
+    assert not revocations.is_revoked(digest, {'user_id': 'u1', 'iat': 0})
+    assert revocations.stats()['false_positives'] == 1
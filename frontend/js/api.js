@@ -62,6 +62,47 @@ async function apiCall(endpoint, options = {}) {
     }
 }
 
+// Show record thumbnails in elements marked data-thumbnail-for="<record id>"
+// (fetched in batches; thumbnails still rendering are asked for once more)
+async function loadRecordThumbnails(recordIds, retry = true) {
+    const batchSize = 100;
+    const pending = [];
+    
+    for (let i = 0; i < recordIds.length; i += batchSize) {
+        try {
+            const response = await apiCall(API_ENDPOINTS.RECORD_THUMBNAILS(recordIds.slice(i, i + batchSize)));
+            (response.thumbnails || []).forEach(thumbnail => {
+                if (thumbnail.status === 'pending') {
+                    pending.push(thumbnail.record_id);
+                }
+                if (thumbnail.status !== 'ready') {
+                    return;
+                }
+                document.querySelectorAll(`[data-thumbnail-for="${thumbnail.record_id}"]`).forEach(element => {
+                    element.innerHTML = `<img src="data:${thumbnail.content_type};base64,${thumbnail.data}" alt="" ` +
+                        `style="max-width: 100%; max-height: 120px; border-radius: 6px; object-fit: cover;">`;
+                });
+            });
+        } catch (error) {
+            // Thumbnails are optional; the file icon stays
+            console.error('[API] Failed to load thumbnails:', error);
+        }
+    }
+    
+    if (retry && pending.length > 0) {
+        setTimeout(() => loadRecordThumbnails(pending, false), 3000);
+    }
+}
+
+// Profile photos are served by the API in 'avatar', 'card' and 'full' sizes;
+// photos from before the photo store (data URIs) are used as they are
+function profilePhotoUrl(photo, variant = 'card') {
+    if (!photo || !photo.startsWith('/')) {
+        return photo;
+    }
+    return `${API_BASE_URL}${photo.replace(/\/[a-z]+$/, `/${variant}`)}`;
+}
+
 // Upload file with FormData
 async function apiCallUpload(endpoint, formData) {
     const url = `${API_BASE_URL}${endpoint}`;
@@ -158,6 +199,16 @@ function isAuthenticated() {
 
 // Logout
 function logout() {
+    // Revoke the token server-side (fire and forget; keepalive survives the redirect)
+    const token = getAuthToken();
+    if (token) {
+        fetch(`${API_BASE_URL}${API_ENDPOINTS.LOGOUT}`, {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${token}` },
+            keepalive: true
+        }).catch(() => {});
+    }
+    
     // Clear all authentication data
     removeAuthToken();
     removeUserData();
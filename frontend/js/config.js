@@ -33,6 +33,7 @@ const API_ENDPOINTS = {
     REGISTER: '/api/auth/register',
     LOGIN: '/api/auth/login',
     VERIFY_TOKEN: '/api/auth/verify',
+    LOGOUT: '/api/auth/logout',
     SEND_OTP: '/api/auth/send-otp',
     VERIFY_OTP: '/api/auth/verify-otp', // For SMS login
     VERIFY_OTP_REGISTRATION: '/api/auth/verify-otp-registration', // For registration
@@ -64,6 +65,7 @@ const API_ENDPOINTS = {
     DOWNLOAD_RECORD: (recordId) => `/api/records/${recordId}/download`,
     DELETE_RECORD: (recordId) => `/api/records/${recordId}`,
     PATIENT_RECORDS: (patientId) => `/api/records/patient/${patientId}`,
+    RECORD_THUMBNAILS: (recordIds) => `/api/records/thumbnails?ids=${recordIds.join(',')}`,
     
     // Access control endpoints
     GRANT_ACCESS: '/api/access/grant',
@@ -174,7 +174,7 @@ function displayDoctorProfilePhoto(photoUrl) {
     if (!preview) return;
     
     if (photoUrl) {
-        preview.innerHTML = `<img src="${photoUrl}" style="width: 100%; height: 100%; object-fit: cover;" alt="Profile Photo">`;
+        preview.innerHTML = `<img src="${profilePhotoUrl(photoUrl)}" style="width: 100%; height: 100%; object-fit: cover;" alt="Profile Photo">`;
         if (deleteBtn) deleteBtn.style.display = 'inline-flex';
     } else {
         preview.innerHTML = '<i class="fas fa-user-md" style="font-size: 4rem;"></i>';
@@ -532,7 +532,8 @@ async function viewPatientRecords(patientId, patientName) {
                 <div style="display: grid; gap: 12px;">
                     ${records.map(record => `
                         <div style="border: 1px solid #e2e8f0; border-radius: 8px; padding: 16px; background: white;">
-                            <div style="display: flex; justify-content: space-between; align-items: start; margin-bottom: 12px;">
+                            <div style="display: flex; justify-content: space-between; align-items: start; gap: 12px; margin-bottom: 12px;">
+                                <div data-thumbnail-for="${record._id}" style="flex: 0 0 auto; max-width: 120px;"></div>
                                 <div style="flex: 1;">
                                     <h4 style="margin: 0 0 8px 0; color: var(--primary-color);">
                                         <i class="fas fa-file-medical"></i> ${record.file_name}
@@ -568,6 +569,7 @@ async function viewPatientRecords(patientId, patientName) {
         }
         
         document.getElementById('recordsModal').style.display = 'flex';
+        loadRecordThumbnails(records.map(record => record._id));
         
     } catch (error) {
         console.error('Failed to load patient records:', error);
@@ -1170,7 +1172,7 @@ async function searchAllPatients() {
                     <div style="display: flex; align-items: center; gap: 16px; margin-bottom: 16px;">
                         <div style="width: 60px; height: 60px; border-radius: 50%; background: linear-gradient(135deg, var(--primary-color), var(--secondary-color)); display: flex; align-items: center; justify-content: center; color: white; font-size: 1.5rem; flex-shrink: 0;">
                             ${patient.profile_photo ? 
-                                `<img src="${patient.profile_photo}" style="width: 100%; height: 100%; border-radius: 50%; object-fit: cover;" alt="${patient.full_name}">` :
+                                `<img src="${profilePhotoUrl(patient.profile_photo, 'avatar')}" style="width: 100%; height: 100%; border-radius: 50%; object-fit: cover;" alt="${patient.full_name}">` :
                                 '<i class="fas fa-user"></i>'
                             }
                         </div>
@@ -350,7 +350,7 @@ function displayProfilePhoto(photoUrl) {
     const deleteBtn = document.getElementById('deletePhotoBtn');
     
     if (photoUrl) {
-        preview.innerHTML = `<img src="${photoUrl}" style="width: 100%; height: 100%; object-fit: cover;" alt="Profile Photo">`;
+        preview.innerHTML = `<img src="${profilePhotoUrl(photoUrl)}" style="width: 100%; height: 100%; object-fit: cover;" alt="Profile Photo">`;
         deleteBtn.style.display = 'inline-flex';
     } else {
         preview.innerHTML = '<i class="fas fa-user" style="font-size: 4rem; color: white;"></i>';
@@ -488,7 +488,7 @@ function displayHealthCard() {
     const photoContainer = document.getElementById('cardPhotoContainer');
     if (photoContainer) {
         if (user.profile_photo) {
-            photoContainer.innerHTML = `<img src="${user.profile_photo}" style="width: 100%; height: 100%; object-fit: cover;" alt="Profile Photo">`;
+            photoContainer.innerHTML = `<img src="${profilePhotoUrl(user.profile_photo)}" style="width: 100%; height: 100%; object-fit: cover;" alt="Profile Photo">`;
         } else {
             photoContainer.innerHTML = '<i class="fas fa-user" style="font-size: 2rem; color: white;"></i>';
         }
@@ -574,7 +574,7 @@ function displayRecords() {
     grid.innerHTML = myRecords.map(record => `
         <div class="record-card">
             <div style="flex: 1;">
-                <div class="record-icon">
+                <div class="record-icon" data-thumbnail-for="${record._id}">
                     <i class="fas fa-file-${record.file_type === 'application/pdf' ? 'pdf' : 'image'}"></i>
                 </div>
                 <div class="record-name">${truncateText(record.file_name, 30)}</div>
@@ -594,6 +594,8 @@ function displayRecords() {
             </div>
         </div>
     `).join('');
+    
+    loadRecordThumbnails(myRecords.map(record => record._id));
 }
 
 // Display recent records
@@ -1089,7 +1091,7 @@ function printHealthCardSideBySide() {
     const qrImageUrl = `https://api.qrserver.com/v1/create-qr-code/?size=150x150&data=${qrData}&color=2ecc71&bgcolor=ffffff&qzone=1`;
     
     const profilePhoto = user.profile_photo ? 
-        `<img src="${user.profile_photo}" style="width: 100%; height: 100%; object-fit: cover;">` :
+        `<img src="${profilePhotoUrl(user.profile_photo)}" style="width: 100%; height: 100%; object-fit: cover;">` :
         '<i class="fas fa-user" style="font-size: 2rem; color: white;"></i>';
 
     const printWindow = window.open('', '_blank');
@@ -1503,7 +1505,7 @@ function displayDoctorResults(doctors) {
     container.innerHTML = doctors.map(doctor => {
         // Profile picture or default icon
         const profilePicture = doctor.profile_photo 
-            ? `<img src="${doctor.profile_photo}" style="width: 100%; height: 100%; object-fit: cover; border-radius: 50%;" alt="Dr. ${doctor.full_name}">`
+            ? `<img src="${profilePhotoUrl(doctor.profile_photo, 'avatar')}" style="width: 100%; height: 100%; object-fit: cover; border-radius: 50%;" alt="Dr. ${doctor.full_name}">`
             : `<i class="fas fa-user-md" style="font-size: 2.5rem;"></i>`;
         
         return `